@@ -4,18 +4,61 @@ Estrategia escalable con soporte para tablas grandes y retry automático
 """
 
 import boto3
+import base64
 import json
 import gzip
+import hashlib
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Tuple, Optional
 import os
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+# Layer common_layer: codec sin pérdida formato DynamoDB <-> JSONL compacto
+from dynamo_codec import encode_items, CODEC_NAME
+
 # Configuración desde variables de entorno
 BACKUP_BUCKET = os.environ.get('BACKUP_BUCKET', 'dynamodb-backups-prod')
 BACKUP_PREFIX = os.environ.get('BACKUP_PREFIX', 'backups')
 COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
 REGION = os.environ.get('AWS_REGION_ID', 'us-east-1')
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+
+# Scan paralelo: 0 = segmentos automáticos según el tamaño de la tabla
+SCAN_TOTAL_SEGMENTS = int(os.environ.get('SCAN_TOTAL_SEGMENTS', '0'))
+MAX_SCAN_SEGMENTS = int(os.environ.get('MAX_SCAN_SEGMENTS', '16'))
+BYTES_PER_SEGMENT = 256 * 1024 * 1024
+PAGES_IN_FLIGHT_PER_SEGMENT = 2  # Páginas escaneadas en espera de escribirse
+
+# Multipart upload: la parte mínima de S3 es 5 MB (salvo la última)
+MULTIPART_PART_SIZE = int(os.environ.get('MULTIPART_PART_SIZE_MB', '8')) * 1024 * 1024
+MAX_PARTS_IN_FLIGHT = 4
+
+# Formato por partes: JSONL (un item por línea) en partes de ~64 MB sin
+# comprimir, con un manifest.json que se escribe al final
+CHUNK_SIZE_BYTES = int(os.environ.get('BACKUP_CHUNK_SIZE_MB', '64')) * 1024 * 1024
+MANIFEST_FORMAT = 'jsonl-chunks'
+MANIFEST_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+# Tablas en paralelo: los segmentos de scan (MAX_SCAN_SEGMENTS) se reparten
+# entre las tablas en curso para no multiplicar hilos ni memoria
+MAX_PARALLEL_TABLES = max(1, int(os.environ.get('MAX_PARALLEL_TABLES', '4')))
+# Tiempo máximo por tabla (0 = solo el límite de la Lambda)
+TABLE_TIMEOUT_SECONDS = int(os.environ.get('TABLE_TIMEOUT_SECONDS', '0'))
+# Tiempo reservado al final de la Lambda para métricas y resumen
+DEADLINE_MARGIN_SECONDS = 30
+
+# Backups reanudables: al acercarse el límite de la Lambda se guarda un
+# checkpoint y la función se vuelve a invocar para continuar
+# (MAX_BACKUP_RESUMES = 0 lo deshabilita: la tabla falla por tiempo)
+MAX_BACKUP_RESUMES = int(os.environ.get('MAX_BACKUP_RESUMES', '8'))
+CHECKPOINT_MARGIN_SECONDS = int(os.environ.get('CHECKPOINT_MARGIN_SECONDS', '90'))
+CHECKPOINT_PREFIX = f"{BACKUP_PREFIX}/_checkpoints"
 
 # Lista de tablas - configuración centralizada
 TABLES_TO_BACKUP = [
@@ -36,182 +79,599 @@ TABLES_TO_BACKUP = [
     'usuarios'
 ]
 
-# Clientes AWS
-dynamodb = boto3.client('dynamodb', region_name=REGION)
-s3 = boto3.client('s3', region_name=REGION)
+# Clientes AWS (thread-safe; el pool de conexiones cubre los hilos de scan
+# y las subidas en vuelo de todas las tablas en curso)
+dynamodb = boto3.client('dynamodb', region_name=REGION,
+                        config=Config(max_pool_connections=MAX_SCAN_SEGMENTS + MAX_PARALLEL_TABLES))
+s3 = boto3.client('s3', region_name=REGION,
+                  config=Config(max_pool_connections=max(MAX_SCAN_SEGMENTS, MAX_PARTS_IN_FLIGHT * MAX_PARALLEL_TABLES) + MAX_PARALLEL_TABLES))
 cloudwatch = boto3.client('cloudwatch', region_name=REGION)
+lambda_client = boto3.client('lambda', region_name=REGION)
+
+# CloudWatch acepta un número limitado de métricas por llamada
+METRICS_PER_REQUEST = 20
 
 
 class BackupMetrics:
-    """Clase para tracking de métricas"""
+    """Clase para tracking de métricas (compartida por los hilos de cada tabla)"""
     def __init__(self):
         self.successful_backups = 0
         self.failed_backups = 0
         self.total_items = 0
         self.total_size_bytes = 0
         self.table_metrics = {}
+        self.lock = threading.Lock()
+
+    def record_success(self, table_name: str, item_count: int, table_metrics: Dict[str, Any]):
+        with self.lock:
+            self.successful_backups += 1
+            self.total_items += item_count
+            self.total_size_bytes += table_metrics['size_bytes']
+            self.table_metrics[table_name] = table_metrics
+
+    def record_failure(self):
+        with self.lock:
+            self.failed_backups += 1
+
+
+class TableBackupTimeout(Exception):
+    """La tabla no terminó antes de su tiempo límite"""
 
 
-def get_table_count(table_name: str) -> int:
-    """Obtiene el conteo aproximado de items en la tabla"""
+class BackupSuspended(Exception):
+    """
+    Se acabó el tiempo de esta invocación; state (si la tabla ya había
+    empezado) es lo necesario para continuarla en la siguiente
+    """
+    def __init__(self, table_name: str, state: Optional[Dict[str, Any]] = None):
+        super().__init__(f"{table_name} se suspende para continuar en otra invocación")
+        self.state = state
+
+
+def describe_table_info(table_name: str) -> Tuple[int, int, List[str]]:
+    """Obtiene conteo y tamaño aproximados y la llave primaria (items, bytes, atributos)"""
     try:
-        response = dynamodb.describe_table(TableName=table_name)
-        return response['Table']['ItemCount']
+        table = dynamodb.describe_table(TableName=table_name)['Table']
+        key_attributes = [key['AttributeName'] for key in table.get('KeySchema', [])]
+        return table['ItemCount'], table.get('TableSizeBytes', 0), key_attributes
     except ClientError as e:
         print(f"Error obteniendo conteo de {table_name}: {e}")
-        return 0
+        return 0, 0, []
+
+
+def get_total_segments(table_size_bytes: int, max_segments: int = MAX_SCAN_SEGMENTS) -> int:
+    """Segmentos del scan paralelo: uno por cada 256 MB, acotado"""
+    if SCAN_TOTAL_SEGMENTS > 0:
+        return SCAN_TOTAL_SEGMENTS
+    segments = table_size_bytes // BYTES_PER_SEGMENT + 1
+    return max(1, min(max_segments, segments))
+
+
+def check_deadline(deadline: Optional[float], table_name: str, checkpoint_at: Optional[float] = None):
+    """
+    Los hilos no se pueden matar: el scan revisa los límites en cada página.
+    deadline es el límite de la tabla (falla); checkpoint_at el de la
+    invocación (se suspende para continuar después).
+    """
+    now = time.monotonic()
+    if deadline is not None and now > deadline:
+        raise TableBackupTimeout(f"{table_name} excedió su tiempo límite de backup")
+    if checkpoint_at is not None and now > checkpoint_at:
+        raise BackupSuspended(table_name)
+
 
+def _put_until_stopped(pages: queue.Queue, message, stop: threading.Event) -> bool:
+    """Encola respetando el límite de la cola; se rinde si el consumidor terminó"""
+    while not stop.is_set():
+        try:
+            pages.put(message, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
 
-def scan_table_with_pagination(table_name: str) -> List[Dict[str, Any]]:
+
+def scan_segment(table_name: str, segment: int, total_segments: int,
+                 pages: queue.Queue, stop: threading.Event,
+                 start_key: Optional[Dict[str, Any]] = None):
     """
-    Escanea tabla completa con paginación automática.
-    Maneja tablas de cualquier tamaño.
+    Escanea un segmento con paginación y encola cada página junto con su
+    LastEvaluatedKey (None en la última), desde start_key si se continúa.
+    La cola acotada frena el scan si la escritura va más lenta.
     """
-    items = []
     scan_kwargs = {
         'TableName': table_name,
-        'ConsistentRead': False  # Lectura eventual para mejor performance
+        'ConsistentRead': False,  # Lectura eventual para mejor performance
+        'Segment': segment,
+        'TotalSegments': total_segments
     }
-    
+    if start_key:
+        scan_kwargs['ExclusiveStartKey'] = start_key
+
     try:
-        print(f"Iniciando scan de tabla: {table_name}")
-        page_count = 0
-        
-        while True:
+        while not stop.is_set():
             response = dynamodb.scan(**scan_kwargs)
-            items.extend(response.get('Items', []))
-            page_count += 1
-            
-            # Log de progreso cada 5 páginas
-            if page_count % 5 == 0:
-                print(f"  {table_name}: {len(items)} items escaneados...")
-            
+            page = (segment, response.get('Items', []), response.get('LastEvaluatedKey'))
+            if not _put_until_stopped(pages, ('items', page), stop):
+                return
+
             # Verificar si hay más páginas
             if 'LastEvaluatedKey' not in response:
                 break
-                
+
             scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
-        
-        print(f"✓ Scan completo de {table_name}: {len(items)} items totales")
-        return items
-        
+
+        _put_until_stopped(pages, ('end', segment), stop)
+
     except ClientError as e:
         error_code = e.response['Error']['Code']
-        print(f"✗ Error escaneando {table_name}: {error_code} - {e}")
-        
+        print(f"✗ Error escaneando {table_name} (segmento {segment}): {error_code} - {e}")
+
         # Enviar métrica de error
         send_error_metric(table_name, error_code)
-        raise
+        _put_until_stopped(pages, ('error', e), stop)
 
+    except Exception as e:
+        _put_until_stopped(pages, ('error', e), stop)
 
-def convert_dynamodb_to_json(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+
+def scan_table_parallel(table_name: str, total_segments: int,
+                        deadline: Optional[float] = None,
+                        checkpoint_at: Optional[float] = None,
+                        start_keys: Optional[Dict[int, Dict[str, Any]]] = None,
+                        segments: Optional[List[int]] = None
+                        ) -> Iterator[Tuple[int, List[Dict[str, Any]], Optional[Dict[str, Any]]]]:
     """
-    Convierte formato DynamoDB a JSON limpio.
-    Ejemplo: {'S': 'valor'} -> 'valor'
+    Scan paralelo (Segment/TotalSegments): un hilo por segmento y las
+    páginas se regresan conforme llegan como (segmento, items,
+    LastEvaluatedKey), sin acumular la tabla en memoria. Dentro de un
+    segmento el orden es el del scan.
+    En memoria quedan como máximo PAGES_IN_FLIGHT_PER_SEGMENT páginas
+    (<= 1 MB cada una) por segmento.
+    Con deadline/checkpoint_at (time.monotonic()) lanza TableBackupTimeout
+    o BackupSuspended al pasarlos, aunque ningún segmento entregue páginas.
+    Para continuar un backup: segments son los que faltan y start_keys el
+    ExclusiveStartKey de cada uno.
     """
-    def deserialize_item(item):
-        result = {}
-        for key, value in item.items():
-            if 'S' in value:
-                result[key] = value['S']
-            elif 'N' in value:
-                result[key] = float(value['N']) if '.' in value['N'] else int(value['N'])
-            elif 'BOOL' in value:
-                result[key] = value['BOOL']
-            elif 'NULL' in value:
-                result[key] = None
-            elif 'M' in value:
-                result[key] = deserialize_item(value['M'])
-            elif 'L' in value:
-                result[key] = [deserialize_item({'item': i})['item'] for i in value['L']]
-            elif 'SS' in value:
-                result[key] = value['SS']
-            elif 'NS' in value:
-                result[key] = [float(n) if '.' in n else int(n) for n in value['NS']]
+    segments = list(range(total_segments)) if segments is None else segments
+    start_keys = start_keys or {}
+    print(f"Iniciando scan de tabla: {table_name} ({len(segments)}/{total_segments} segmentos)")
+
+    pages = queue.Queue(maxsize=max(1, len(segments)) * PAGES_IN_FLIGHT_PER_SEGMENT)
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max(1, len(segments)))
+    limits = [limit for limit in (deadline, checkpoint_at) if limit is not None]
+
+    try:
+        for segment in segments:
+            executor.submit(scan_segment, table_name, segment, total_segments, pages, stop,
+                            start_keys.get(segment))
+
+        finished = 0
+        page_count = 0
+        while finished < len(segments):
+            if not limits:
+                kind, payload = pages.get()
             else:
-                result[key] = value
-        return result
-    
-    return [deserialize_item(item) for item in items]
+                try:
+                    kind, payload = pages.get(timeout=max(0.0, min(limits) - time.monotonic()))
+                except queue.Empty:
+                    check_deadline(deadline, table_name, checkpoint_at)
+                    continue
+            if kind == 'end':
+                finished += 1
+            elif kind == 'error':
+                raise payload
+            else:
+                check_deadline(deadline, table_name, checkpoint_at)
+                page_count += 1
+                # Log de progreso cada 50 páginas
+                if page_count % 50 == 0:
+                    print(f"  {table_name}: {page_count} páginas escaneadas...")
+                yield payload
 
+        print(f"✓ Scan completo de {table_name}: {page_count} páginas")
 
-def compress_data(data: str) -> bytes:
-    """Comprime datos usando gzip"""
-    return gzip.compress(data.encode('utf-8'))
+    finally:
+        # Si el consumidor falló o terminó antes, liberar a los productores
+        stop.set()
+        executor.shutdown(wait=True)
 
 
-def upload_to_s3(table_name: str, data: List[Dict], timestamp: str, metrics: BackupMetrics) -> bool:
+class S3MultipartWriter:
     """
-    Sube backup a S3 con estructura organizada por fecha
-    Estructura: s3://bucket/backups/YYYY/MM/DD/table_name/backup_HHMMSS.json[.gz]
+    Objeto tipo archivo que sube a S3 por partes conforme se escribe.
+    En memoria solo quedan la parte en curso y hasta MAX_PARTS_IN_FLIGHT
+    partes subiéndose en paralelo. Si al cerrar no se juntó ni una parte,
+    se sube con un solo put_object.
     """
-    try:
-        # Preparar datos
-        json_data = json.dumps(data, indent=2, ensure_ascii=False, default=str)
-        data_size = len(json_data.encode('utf-8'))
-        
-        # Estructura de carpetas por fecha
-        date_obj = datetime.strptime(timestamp, '%Y%m%d-%H%M%S')
-        s3_key = (
-            f"{BACKUP_PREFIX}/"
-            f"{date_obj.year}/"
-            f"{date_obj.month:02d}/"
-            f"{date_obj.day:02d}/"
-            f"{table_name}/"
-            f"backup_{timestamp}"
+
+    def __init__(self, bucket: str, key: str, content_type: str, metadata: Dict[str, str],
+                 part_size: int = MULTIPART_PART_SIZE, max_in_flight: int = MAX_PARTS_IN_FLIGHT):
+        self.bucket = bucket
+        self.key = key
+        self.content_type = content_type
+        self.metadata = metadata
+        self.part_size = part_size
+        self.max_in_flight = max_in_flight
+        self.buffer = bytearray()
+        self.bytes_written = 0
+        self.sha256 = hashlib.sha256()
+        self.upload_id = None
+        self.parts = []
+        self.executor = None
+
+    def writable(self) -> bool:
+        return True
+
+    def flush(self):
+        pass
+
+    def write(self, data: bytes) -> int:
+        self.buffer += data
+        self.bytes_written += len(data)
+        self.sha256.update(data)
+        while len(self.buffer) >= self.part_size:
+            part = bytes(self.buffer[:self.part_size])
+            del self.buffer[:self.part_size]
+            self._upload_part(part)
+        return len(data)
+
+    def _upload_part(self, body: bytes):
+        if self.upload_id is None:
+            response = s3.create_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                ContentType=self.content_type,
+                Metadata=self.metadata,
+                ServerSideEncryption='AES256',
+                StorageClass='STANDARD_IA'  # Infrequent Access para ahorrar costos
+            )
+            self.upload_id = response['UploadId']
+            self.executor = ThreadPoolExecutor(max_workers=self.max_in_flight)
+
+        # Esperar a la parte más vieja si ya hay demasiadas en vuelo
+        pending = [part for part in self.parts if not part.done()]
+        if len(pending) >= self.max_in_flight:
+            pending[0].result()
+
+        part_number = len(self.parts) + 1
+        self.parts.append(self.executor.submit(self._send_part, part_number, body))
+
+    def _send_part(self, part_number: int, body: bytes) -> Dict[str, Any]:
+        response = s3.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=body
         )
-        
-        # Comprimir si está habilitado
+        return {'PartNumber': part_number, 'ETag': response['ETag']}
+
+    def complete(self, extra_metadata: Dict[str, str] = None):
+        """Sube lo que queda y cierra el objeto"""
+        if self.upload_id is None:
+            s3.put_object(
+                Bucket=self.bucket,
+                Key=self.key,
+                Body=bytes(self.buffer),
+                ContentType=self.content_type,
+                Metadata={**self.metadata, **(extra_metadata or {})},
+                ServerSideEncryption='AES256',
+                StorageClass='STANDARD_IA'
+            )
+            return
+
+        if self.buffer:
+            self._upload_part(bytes(self.buffer))
+            self.buffer = bytearray()
+
+        parts = [part.result() for part in self.parts]
+        self.executor.shutdown(wait=True)
+        s3.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={'Parts': parts}
+        )
+
+    def abort(self):
+        """Descarta las partes ya subidas (no deja objetos a medias)"""
+        if self.executor:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        if self.upload_id:
+            try:
+                s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+            except ClientError as e:
+                print(f"⚠ Error abortando multipart upload de {self.key}: {e}")
+
+
+class BackupChunk:
+    """
+    Una parte del backup: items en JSONL compacto sin pérdida (dynamo_codec;
+    gzip si está habilitado) de un solo segmento del scan, subida a S3 conforme se escribe. Guarda lo que
+    el manifest necesita: items, bytes, SHA256 y la llave primaria (formato
+    DynamoDB) del primer y último item en el orden del scan.
+    """
+
+    def __init__(self, s3_key: str, segment: int, key_attributes: List[str], max_in_flight: int):
+        self.s3_key = s3_key
+        self.segment = segment
+        self.key_attributes = key_attributes
+        self.writer = S3MultipartWriter(
+            BACKUP_BUCKET,
+            s3_key,
+            'application/gzip' if COMPRESSION_ENABLED else 'application/x-ndjson',
+            {'segment': str(segment), 'compressed': str(COMPRESSION_ENABLED)},
+            max_in_flight=max_in_flight
+        )
+        # mtime=0: la misma parte produce los mismos bytes (y SHA256) aunque
+        # se vuelva a escribir al continuar un backup
+        self.output = gzip.GzipFile(fileobj=self.writer, mode='wb', compresslevel=GZIP_LEVEL, mtime=0) if COMPRESSION_ENABLED else self.writer
+        self.items = 0
+        self.size_bytes = 0
+        self.first_key = None
+        self.last_key = None
+
+    def _key_of(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        return {name: item[name] for name in self.key_attributes if name in item}
+
+    def write_page(self, page: List[Dict[str, Any]]):
+        encoded = encode_items(page).encode('utf-8')
+        self.output.write(encoded)
+        self.size_bytes += len(encoded)
+        self.items += len(page)
+        if self.first_key is None:
+            self.first_key = self._key_of(page[0])
+        self.last_key = self._key_of(page[-1])
+
+    def is_full(self) -> bool:
+        return self.size_bytes >= CHUNK_SIZE_BYTES
+
+    def close(self) -> Dict[str, Any]:
+        """Termina de subir la parte y regresa su entrada del manifest"""
         if COMPRESSION_ENABLED:
-            body = compress_data(json_data)
-            s3_key += '.json.gz'
-            content_type = 'application/gzip'
-            compression_ratio = (1 - len(body) / data_size) * 100
-            print(f"  Compresión: {data_size:,} -> {len(body):,} bytes ({compression_ratio:.1f}% reducción)")
-        else:
-            body = json_data.encode('utf-8')
-            s3_key += '.json'
-            content_type = 'application/json'
-        
-        # Metadata del backup
-        metadata = {
+            self.output.close()  # Escribe el trailer gzip (no cierra el writer)
+        self.writer.complete({'item_count': str(self.items)})
+        return {
+            'key': self.s3_key,
+            'segment': self.segment,
+            'items': self.items,
+            'size_bytes': self.size_bytes,
+            'compressed_size_bytes': self.writer.bytes_written,
+            'sha256': self.writer.sha256.hexdigest(),
+            'first_key': self.first_key,
+            'last_key': self.last_key
+        }
+
+    def abort(self):
+        self.writer.abort()
+
+
+def build_backup_prefix(table_name: str, timestamp: str) -> str:
+    """
+    Estructura: s3://bucket/backups/YYYY/MM/DD/table_name/backup_HHMMSS/
+                    manifest.json
+                    part-SSSS-NNNNN.jsonl[.gz]   (segmento, número de parte)
+    Los backups anteriores (un solo backup_HHMMSS.json[.gz]) siguen siendo
+    legibles por el script de restauración.
+    """
+    date_obj = datetime.strptime(timestamp, '%Y%m%d-%H%M%S')
+    return (
+        f"{BACKUP_PREFIX}/"
+        f"{date_obj.year}/"
+        f"{date_obj.month:02d}/"
+        f"{date_obj.day:02d}/"
+        f"{table_name}/"
+        f"backup_{timestamp}"
+    )
+
+
+def build_chunk_key(backup_prefix: str, segment: int, sequence: int) -> str:
+    return f"{backup_prefix}/part-{segment:04d}-{sequence:05d}" + ('.jsonl.gz' if COMPRESSION_ENABLED else '.jsonl')
+
+
+def _base64_default(value: bytes) -> str:
+    """json.dumps: llaves binarias (B) en base64, como en el JSON de DynamoDB"""
+    return base64.b64encode(value).decode('ascii')
+
+
+def decode_key(key: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Llave leída de JSON (B en base64) -> formato DynamoDB para ExclusiveStartKey"""
+    if not key:
+        return key
+    return {name: {'B': base64.b64decode(value['B'])} if 'B' in value else value
+            for name, value in key.items()}
+
+
+def stream_table_to_s3(table_name: str, timestamp: str, total_segments: int,
+                       key_attributes: List[str], deadline: Optional[float] = None,
+                       checkpoint_at: Optional[float] = None,
+                       resume: Optional[Dict[str, Any]] = None) -> Tuple[int, Dict[str, Any]]:
+    """
+    Escanea la tabla en paralelo y escribe los items directo a S3 en partes
+    JSONL: cada segmento llena sus propias partes de ~CHUNK_SIZE_BYTES, así
+    cada parte es un rango contiguo del scan. Al final se sube el
+    manifest.json; sin él el backup no existe para los lectores (las partes
+    de un backup fallido las limpia la regla de lifecycle del bucket).
+    Si se alcanza deadline se aborta antes de escribir el manifest.
+
+    Al pasar checkpoint_at lanza BackupSuspended con el estado para
+    continuar (resume): las partes ya subidas y, por segmento, el
+    LastEvaluatedKey donde terminó su última parte cerrada. La parte abierta
+    de un segmento se descarta y al continuar se vuelve a escanear desde
+    ese punto, así las partes (llaves, contenido y SHA256) y el manifest
+    salen iguales que sin interrupción: el estado de gzip y del SHA256 de
+    un multipart a medias no se puede guardar.
+
+    return: (número de items respaldados, métricas de la tabla)
+    """
+    started = time.monotonic()
+    backup_prefix = build_backup_prefix(table_name, timestamp)
+    manifest_key = f"{backup_prefix}/{MANIFEST_NAME}"
+    # Una parte abierta por segmento: repartir las subidas en vuelo entre ellas
+    max_in_flight = max(1, MAX_PARTS_IN_FLIGHT // total_segments)
+
+    open_chunks: Dict[int, BackupChunk] = {}
+    next_sequence: Dict[int, int] = {}
+    chunks = []
+    # Por segmento: dónde continuar (fin de su última parte cerrada) y si ya terminó
+    resume_keys: Dict[int, Optional[Dict[str, Any]]] = {}
+    ended = set()
+    previous_elapsed = 0.0
+    if resume:
+        chunks = list(resume['chunks'])
+        for segment, state in resume['segments'].items():
+            segment = int(segment)
+            next_sequence[segment] = state['sequence']
+            resume_keys[segment] = decode_key(state['start_key'])
+            if state['done']:
+                ended.add(segment)
+        previous_elapsed = resume['elapsed_seconds']
+        print(f"  Continuando {table_name}: {len(chunks)} partes ya subidas, "
+              f"{total_segments - len(ended)} segmentos pendientes")
+
+    def close_chunk(segment: int):
+        chunk = open_chunks.pop(segment)
+        chunks.append(chunk.close())
+        print(f"  Parte subida: {chunk.s3_key} ({chunk.items:,} items)")
+
+    try:
+        pending = [segment for segment in range(total_segments) if segment not in ended]
+        for segment, page, last_key in scan_table_parallel(table_name, total_segments, deadline,
+                                                           checkpoint_at, resume_keys, pending):
+            if page:
+                if segment not in open_chunks:
+                    sequence = next_sequence.get(segment, 0)
+                    next_sequence[segment] = sequence + 1
+                    open_chunks[segment] = BackupChunk(
+                        build_chunk_key(backup_prefix, segment, sequence),
+                        segment, key_attributes, max_in_flight
+                    )
+                open_chunks[segment].write_page(page)
+                if open_chunks[segment].is_full():
+                    close_chunk(segment)
+                    resume_keys[segment] = last_key
+            elif segment not in open_chunks:
+                resume_keys[segment] = last_key
+            if last_key is None:
+                ended.add(segment)
+
+        for segment in sorted(open_chunks):
+            close_chunk(segment)
+
+        # Sin manifest no hay backup: no publicarlo si ya se pasó el límite
+        check_deadline(deadline, table_name)
+
+        chunks.sort(key=lambda chunk: chunk['key'])
+        item_count = sum(chunk['items'] for chunk in chunks)
+        data_size = sum(chunk['size_bytes'] for chunk in chunks)
+        compressed_size = sum(chunk['compressed_size_bytes'] for chunk in chunks)
+
+        manifest = {
+            'format': MANIFEST_FORMAT,
+            'version': MANIFEST_VERSION,
             'table_name': table_name,
             'backup_timestamp': timestamp,
-            'item_count': str(len(data)),
-            'original_size_bytes': str(data_size),
-            'compressed': str(COMPRESSION_ENABLED)
+            'compressed': COMPRESSION_ENABLED,
+            'codec': CODEC_NAME,
+            'key_attributes': key_attributes,
+            'total_segments': total_segments,
+            'item_count': item_count,
+            'size_bytes': data_size,
+            'compressed_size_bytes': compressed_size,
+            'chunks': chunks
         }
-        
-        # Upload a S3
         s3.put_object(
             Bucket=BACKUP_BUCKET,
-            Key=s3_key,
-            Body=body,
-            ContentType=content_type,
-            Metadata=metadata,
+            Key=manifest_key,
+            Body=json.dumps(manifest, ensure_ascii=False, indent=2, default=_base64_default).encode('utf-8'),
+            ContentType='application/json',
+            Metadata={
+                'table_name': table_name,
+                'backup_timestamp': timestamp,
+                'item_count': str(item_count),
+                'chunk_count': str(len(chunks))
+            },
             ServerSideEncryption='AES256',
-            StorageClass='STANDARD_IA'  # Infrequent Access para ahorrar costos
+            StorageClass='STANDARD_IA'
         )
-        
-        # Actualizar métricas
-        metrics.table_metrics[table_name] = {
-            'items': len(data),
-            'size_bytes': len(body),
-            's3_key': s3_key
-        }
-        
-        print(f"✓ Backup subido: s3://{BACKUP_BUCKET}/{s3_key}")
-        return True
-        
+
+    except BackupSuspended:
+        try:
+            # Un segmento que ya terminó de escanear cierra su parte igual
+            # que al final de un backup sin interrupción
+            for segment in sorted(open_chunks):
+                if segment in ended:
+                    close_chunk(segment)
+        finally:
+            for segment, chunk in open_chunks.items():
+                chunk.abort()
+                next_sequence[segment] -= 1
+        raise BackupSuspended(table_name, {
+            'total_segments': total_segments,
+            'key_attributes': key_attributes,
+            'chunks': chunks,
+            'segments': {
+                str(segment): {
+                    'done': segment in ended,
+                    'start_key': resume_keys.get(segment),
+                    'sequence': next_sequence.get(segment, 0)
+                }
+                for segment in range(total_segments)
+            },
+            'elapsed_seconds': previous_elapsed + time.monotonic() - started
+        }) from None
+
     except ClientError as e:
-        print(f"✗ Error subiendo a S3 para {table_name}: {e}")
-        send_error_metric(table_name, 'S3UploadError')
-        return False
+        for chunk in open_chunks.values():
+            chunk.abort()
+        if e.operation_name in ('CreateMultipartUpload', 'UploadPart', 'CompleteMultipartUpload', 'PutObject'):
+            print(f"✗ Error subiendo a S3 para {table_name}: {e}")
+            send_error_metric(table_name, 'S3UploadError')
+        raise
 
+    except Exception:
+        for chunk in open_chunks.values():
+            chunk.abort()
+        raise
+
+    if COMPRESSION_ENABLED and data_size:
+        compression_ratio = (1 - compressed_size / data_size) * 100
+        print(f"  Compresión: {data_size:,} -> {compressed_size:,} bytes ({compression_ratio:.1f}% reducción)")
 
-def backup_table(table_name: str, timestamp: str, metrics: BackupMetrics) -> Dict[str, Any]:
+    # Throughput: MB/s sobre los datos sin comprimir; el ratio es
+    # sin comprimir / comprimido (1.0 si no hay compresión o datos)
+    elapsed = max(previous_elapsed + time.monotonic() - started, 0.001)
+    table_metrics = {
+        'items': item_count,
+        'size_bytes': compressed_size,
+        'uncompressed_bytes': data_size,
+        's3_key': manifest_key,
+        'segments': total_segments,
+        'chunks': len(chunks),
+        'duration_seconds': round(elapsed, 2),
+        'items_per_second': round(item_count / elapsed, 1),
+        'mb_per_second': round(data_size / 1024 / 1024 / elapsed, 2),
+        'compression_ratio': round(data_size / compressed_size, 2) if compressed_size and data_size else 1.0
+    }
+
+    print(f"✓ Backup subido: s3://{BACKUP_BUCKET}/{manifest_key} ({len(chunks)} partes)")
+    return item_count, table_metrics
+
+
+def backup_table(table_name: str, timestamp: str, metrics: BackupMetrics,
+                 table_info: Optional[Tuple[int, int, List[str]]] = None,
+                 deadline: Optional[float] = None,
+                 max_segments: int = MAX_SCAN_SEGMENTS,
+                 checkpoint_at: Optional[float] = None,
+                 resume: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
-    Función principal de backup para una tabla individual
+    Función principal de backup para una tabla individual.
+    table_info es el resultado de describe_table_info si ya se consultó;
+    max_segments es la parte del presupuesto de segmentos que le toca.
+    Si se pasa checkpoint_at el resultado puede venir con suspended=True y
+    el checkpoint de la tabla (resume de la siguiente invocación).
     """
     print(f"\n{'='*60}")
     print(f"Procesando tabla: {table_name}")
@@ -226,70 +686,187 @@ def backup_table(table_name: str, timestamp: str, metrics: BackupMetrics) -> Dic
     }
     
     try:
-        # 1. Obtener conteo estimado
-        estimated_count = get_table_count(table_name)
-        print(f"Items estimados: {estimated_count:,}")
-        
-        # 2. Escanear tabla
-        items = scan_table_with_pagination(table_name)
+        # Una tabla que esperó turno puede quedarse sin tiempo antes de empezar
+        check_deadline(deadline, table_name, checkpoint_at)
+
+        # 1. Obtener conteo y tamaño estimados (al continuar se conservan
+        # los segmentos y la llave con que empezó)
+        if resume:
+            total_segments, key_attributes = resume['total_segments'], resume['key_attributes']
+        else:
+            estimated_count, table_size, key_attributes = table_info or describe_table_info(table_name)
+            total_segments = get_total_segments(table_size, max_segments)
+            print(f"Items estimados de {table_name}: {estimated_count:,}")
         
-        if not items:
-            print(f"⚠ Tabla {table_name} está vacía, se creará backup vacío")
+        # 2. Escanear en paralelo y subir a S3 en partes JSONL
+        item_count, table_metrics = stream_table_to_s3(
+            table_name, timestamp, total_segments, key_attributes, deadline, checkpoint_at, resume
+        )
         
-        # 3. Convertir a JSON limpio
-        json_items = convert_dynamodb_to_json(items)
+        if not item_count:
+            print(f"⚠ Tabla {table_name} está vacía, se creó backup vacío")
         
-        # 4. Subir a S3
-        upload_success = upload_to_s3(table_name, json_items, timestamp, metrics)
+        result['success'] = True
+        result['items_backed_up'] = item_count
+        metrics.record_success(table_name, item_count, table_metrics)
         
-        if upload_success:
-            result['success'] = True
-            result['items_backed_up'] = len(items)
-            metrics.successful_backups += 1
-            metrics.total_items += len(items)
-            
-            elapsed = (datetime.now() - start_time).total_seconds()
-            print(f"✓ Backup completado en {elapsed:.2f}s")
-        else:
-            metrics.failed_backups += 1
-            result['error'] = 'Upload to S3 failed'
+        elapsed = (datetime.now() - start_time).total_seconds()
+        print(f"✓ Backup de {table_name} completado en {elapsed:.2f}s "
+              f"({table_metrics['items_per_second']:,.0f} items/s, {table_metrics['mb_per_second']} MB/s)")
             
+    except BackupSuspended as e:
+        print(f"⏸ {str(e)}")
+        result['suspended'] = True
+        result['checkpoint'] = e.state if e.state is not None else resume
+
+    except TableBackupTimeout as e:
+        print(f"✗ Tiempo agotado en {table_name}: {str(e)}")
+        result['error'] = str(e)
+        metrics.record_failure()
+        send_error_metric(table_name, 'Timeout')
+
     except Exception as e:
         print(f"✗ Error procesando {table_name}: {str(e)}")
         result['error'] = str(e)
-        metrics.failed_backups += 1
+        metrics.record_failure()
     
     return result
 
 
+def plan_tables(tables: List[str]) -> List[Tuple[str, Tuple[int, int, List[str]]]]:
+    """
+    Ordena las tablas de mayor a menor (TableSizeBytes, que DynamoDB
+    actualiza cada ~6 horas): la más grande marca la duración total, así que
+    arranca primero y las chicas llenan los huecos.
+    """
+    planned = [(table_name, describe_table_info(table_name)) for table_name in tables]
+    return sorted(planned, key=lambda entry: entry[1][1], reverse=True)
+
+
+def run_table_backups(tables: List[str], timestamp: str, metrics: BackupMetrics,
+                      lambda_deadline: Optional[float] = None,
+                      checkpoint_at: Optional[float] = None,
+                      resume_states: Optional[Dict[str, Optional[Dict[str, Any]]]] = None) -> List[Dict[str, Any]]:
+    """
+    Respalda hasta MAX_PARALLEL_TABLES tablas al mismo tiempo, la más grande
+    primero. Cada tabla tiene como límite TABLE_TIMEOUT_SECONDS desde que
+    empieza (si está configurado) y nunca más allá del tiempo de la Lambda.
+    Los segmentos de scan se reparten entre las tablas en curso.
+    Con checkpoint_at las tablas que no alcanzan a terminar se suspenden;
+    resume_states trae el checkpoint de las que ya habían empezado.
+
+    return: resultados de backup_table en el orden en que se programaron
+    """
+    resume_states = resume_states or {}
+    planned = plan_tables(tables)
+    workers = max(1, min(MAX_PARALLEL_TABLES, len(planned)))
+    max_segments = max(1, MAX_SCAN_SEGMENTS // workers)
+    print(f"Orden: {', '.join(name for name, _ in planned)}")
+    print(f"Tablas en paralelo: {workers} (hasta {max_segments} segmentos cada una)")
+
+    def run(table_name: str, table_info: Tuple[int, int, List[str]]) -> Dict[str, Any]:
+        deadline = lambda_deadline
+        if TABLE_TIMEOUT_SECONDS > 0:
+            table_deadline = time.monotonic() + TABLE_TIMEOUT_SECONDS
+            deadline = table_deadline if deadline is None else min(deadline, table_deadline)
+        return backup_table(table_name, timestamp, metrics, table_info, deadline, max_segments,
+                            checkpoint_at, resume_states.get(table_name))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run, table_name, table_info) for table_name, table_info in planned]
+
+    # backup_table atrapa sus propios errores
+    return [future.result() for future in futures]
+
+
+def build_checkpoint_key(timestamp: str) -> str:
+    """Un checkpoint por ejecución: backups/_checkpoints/backup_YYYYMMDD-HHMMSS.json"""
+    return f"{CHECKPOINT_PREFIX}/backup_{timestamp}.json"
+
+
+def save_checkpoint(checkpoint: Dict[str, Any]) -> str:
+    """
+    Guarda el estado para continuar el backup en otra invocación:
+    tablas suspendidas (partes subidas, LastEvaluatedKey y secuencia por
+    segmento), resultados y métricas de las tablas ya terminadas.
+    """
+    key = build_checkpoint_key(checkpoint['timestamp'])
+    s3.put_object(
+        Bucket=BACKUP_BUCKET,
+        Key=key,
+        Body=json.dumps(checkpoint, ensure_ascii=False, default=_base64_default).encode('utf-8'),
+        ContentType='application/json',
+        ServerSideEncryption='AES256'
+    )
+    return key
+
+
+def load_checkpoint(key: str) -> Dict[str, Any]:
+    response = s3.get_object(Bucket=BACKUP_BUCKET, Key=key)
+    return json.loads(response['Body'].read().decode('utf-8'))
+
+
+def invoke_continuation(context, checkpoint_key: str, invocation: int):
+    """
+    Invoca esta misma función (asíncrona) para continuar desde el
+    checkpoint. Si falla, el backup se puede continuar a mano con el
+    mismo evento: {"resume": "<checkpoint_key>", "invocation": N}
+    """
+    lambda_client.invoke(
+        FunctionName=context.invoked_function_arn,
+        InvocationType='Event',
+        Payload=json.dumps({'resume': checkpoint_key, 'invocation': invocation}).encode('utf-8')
+    )
+
+
 def send_cloudwatch_metrics(metrics: BackupMetrics, duration: float):
-    """Envía métricas a CloudWatch para monitoreo"""
+    """Envía métricas a CloudWatch para monitoreo (globales y por tabla)"""
     try:
-        cloudwatch.put_metric_data(
-            Namespace='DynamoDBBackup',
-            MetricData=[
-                {
-                    'MetricName': 'SuccessfulBackups',
-                    'Value': metrics.successful_backups,
-                    'Unit': 'Count'
-                },
-                {
-                    'MetricName': 'FailedBackups',
-                    'Value': metrics.failed_backups,
-                    'Unit': 'Count'
-                },
-                {
-                    'MetricName': 'TotalItemsBackedUp',
-                    'Value': metrics.total_items,
-                    'Unit': 'Count'
-                },
-                {
-                    'MetricName': 'BackupDuration',
-                    'Value': duration,
-                    'Unit': 'Seconds'
-                }
-            ]
-        )
+        metric_data = [
+            {
+                'MetricName': 'SuccessfulBackups',
+                'Value': metrics.successful_backups,
+                'Unit': 'Count'
+            },
+            {
+                'MetricName': 'FailedBackups',
+                'Value': metrics.failed_backups,
+                'Unit': 'Count'
+            },
+            {
+                'MetricName': 'TotalItemsBackedUp',
+                'Value': metrics.total_items,
+                'Unit': 'Count'
+            },
+            {
+                'MetricName': 'BackupDuration',
+                'Value': duration,
+                'Unit': 'Seconds'
+            }
+        ]
+
+        # Throughput por tabla, con dimensión TableName
+        for table_name, data in metrics.table_metrics.items():
+            dimensions = [{'Name': 'TableName', 'Value': table_name}]
+            for metric_name, value, unit in (
+                ('TableBackupDuration', data['duration_seconds'], 'Seconds'),
+                ('ItemsPerSecond', data['items_per_second'], 'Count/Second'),
+                ('MegabytesPerSecond', data['mb_per_second'], 'Megabytes/Second'),
+                ('CompressionRatio', data['compression_ratio'], 'None'),
+                ('BackupSizeBytes', data['size_bytes'], 'Bytes')
+            ):
+                metric_data.append({
+                    'MetricName': metric_name,
+                    'Value': value,
+                    'Unit': unit,
+                    'Dimensions': dimensions
+                })
+
+        for start in range(0, len(metric_data), METRICS_PER_REQUEST):
+            cloudwatch.put_metric_data(
+                Namespace='DynamoDBBackup',
+                MetricData=metric_data[start:start + METRICS_PER_REQUEST]
+            )
         print("\n✓ Métricas enviadas a CloudWatch")
     except Exception as e:
         print(f"⚠ Error enviando métricas: {e}")
@@ -319,7 +896,9 @@ def send_error_metric(table_name: str, error_type: str):
 def lambda_handler(event, context):
     """
     Handler principal de Lambda
-    Puede ser invocado por EventBridge o manualmente
+    Puede ser invocado por EventBridge o manualmente.
+    Con {"resume": key, "invocation": N} continúa un backup desde su
+    checkpoint (lo hace la propia función al acercarse a su límite).
     """
     print(f"\n{'#'*60}")
     print(f"# INICIO DE BACKUP AUTOMATIZADO - DynamoDB")
@@ -328,21 +907,93 @@ def lambda_handler(event, context):
     print(f"# Compresión: {'Habilitada' if COMPRESSION_ENABLED else 'Deshabilitada'}")
     print(f"{'#'*60}\n")
     
-    start_time = datetime.now()
-    timestamp = start_time.strftime('%Y%m%d-%H%M%S')
     metrics = BackupMetrics()
+    checkpoint_key = event.get('resume')
+    
+    if checkpoint_key:
+        checkpoint = load_checkpoint(checkpoint_key)
+        invocation = event.get('invocation', 0)
+        # Un reintento de una invocación que ya se continuó no debe correr en paralelo
+        if checkpoint['invocation'] != invocation:
+            print(f"⚠ Checkpoint {checkpoint_key} ya va en la invocación {checkpoint['invocation']}, se ignora la {invocation}")
+            return {'statusCode': 200, 'body': json.dumps({'skipped': True, 'checkpoint': checkpoint_key})}
+        
+        start_time = datetime.fromisoformat(checkpoint['started_at'])
+        timestamp = checkpoint['timestamp']
+        tables_to_process = checkpoint['tables']
+        pending = checkpoint['pending']
+        previous_results = checkpoint['results']
+        for result in previous_results:
+            if result['success']:
+                metrics.record_success(result['table_name'], result['items_backed_up'],
+                                       checkpoint['table_metrics'][result['table_name']])
+            else:
+                metrics.record_failure()
+        print(f"Continuando backup {timestamp} (invocación {invocation}): {len(pending)} tablas pendientes")
+    else:
+        start_time = datetime.now()
+        timestamp = start_time.strftime('%Y%m%d-%H%M%S')
+        invocation = 0
+        
+        # Permitir override de tablas desde evento
+        tables_to_process = event.get('tables', TABLES_TO_BACKUP)
+        pending = {table_name: None for table_name in tables_to_process}
+        previous_results = []
+        print(f"Tablas a respaldar: {len(tables_to_process)}")
     
-    # Permitir override de tablas desde evento
-    tables_to_process = event.get('tables', TABLES_TO_BACKUP)
-    print(f"Tablas a respaldar: {len(tables_to_process)}")
+    # Límites de la ejecución (None si se invoca fuera de Lambda): al pasar
+    # checkpoint_at se suspende y continúa en otra invocación
+    lambda_deadline = None
+    checkpoint_at = None
+    if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+        remaining = context.get_remaining_time_in_millis() / 1000
+        lambda_deadline = time.monotonic() + remaining - DEADLINE_MARGIN_SECONDS
+        if invocation < MAX_BACKUP_RESUMES:
+            checkpoint_at = time.monotonic() + remaining - CHECKPOINT_MARGIN_SECONDS
+    
+    # Procesar las tablas en paralelo, la más grande primero
+    run_results = run_table_backups(list(pending), timestamp, metrics, lambda_deadline, checkpoint_at, pending)
+    suspended = {result['table_name']: result['checkpoint'] for result in run_results if result.get('suspended')}
+    results = previous_results + [result for result in run_results if not result.get('suspended')]
+    
+    if suspended:
+        checkpoint_key = save_checkpoint({
+            'timestamp': timestamp,
+            'started_at': start_time.isoformat(),
+            'invocation': invocation + 1,
+            'tables': tables_to_process,
+            'pending': suspended,
+            'results': results,
+            'table_metrics': metrics.table_metrics
+        })
+        print(f"\n⏸ Checkpoint guardado: s3://{BACKUP_BUCKET}/{checkpoint_key}")
+        print(f"  Pendientes: {', '.join(suspended)}")
+        try:
+            invoke_continuation(context, checkpoint_key, invocation + 1)
+        except Exception as e:
+            print(f"✗ Error invocando la continuación: {e}")
+            send_error_metric('ALL', 'ResumeInvokeError')
+            return {
+                'statusCode': 500,
+                'body': json.dumps({'success': False, 'checkpoint': checkpoint_key, 'error': str(e)})
+            }
+        
+        return {
+            'statusCode': 202,
+            'body': json.dumps({
+                'timestamp': timestamp,
+                'checkpoint': checkpoint_key,
+                'invocation': invocation + 1,
+                'pending_tables': list(suspended),
+                'successful_backups': metrics.successful_backups,
+                'failed_backups': metrics.failed_backups
+            }, indent=2)
+        }
     
-    # Procesar cada tabla
-    results = []
-    for table_name in tables_to_process:
-        result = backup_table(table_name, timestamp, metrics)
-        results.append(result)
+    if event.get('resume'):
+        s3.delete_object(Bucket=BACKUP_BUCKET, Key=checkpoint_key)
     
-    # Calcular duración total
+    # Calcular duración total (desde la primera invocación)
     duration = (datetime.now() - start_time).total_seconds()
     
     # Enviar métricas a CloudWatch
@@ -361,7 +1012,9 @@ def lambda_handler(event, context):
     if metrics.table_metrics:
         print(f"\nDetalle por tabla:")
         for table, data in metrics.table_metrics.items():
-            print(f"  • {table}: {data['items']:,} items, {data['size_bytes']:,} bytes")
+            print(f"  • {table}: {data['items']:,} items, {data['size_bytes']:,} bytes, "
+                  f"{data['duration_seconds']}s, {data['items_per_second']:,.0f} items/s, "
+                  f"{data['mb_per_second']} MB/s, compresión {data['compression_ratio']}x")
     
     # Determinar éxito general
     success = metrics.failed_backups == 0
@@ -0,0 +1,189 @@
+"""
+Codec sin pérdida entre el formato de DynamoDB ({'S': ...}, {'N': ...})
+y una línea JSON compacta, para respaldar y restaurar millones de items.
+
+Formato compacto (dynamodb-compact-v1), un item por línea:
+    S    -> "texto"
+    N    -> número JSON con el texto de DynamoDB (sin pasar por float); al
+            leerlo se conserva el valor decimal exacto, aunque el texto
+            puede normalizarse (1e-7 -> 1E-7, -0 -> 0)
+    BOOL -> true / false
+    NULL -> null
+    L    -> [...]
+    M    -> {...}
+    B    -> {"$b": "base64"}
+    SS   -> {"$ss": ["a", "b"]}
+    NS   -> {"$ns": [1, 2.5]}
+    BS   -> {"$bs": ["base64", ...]}
+
+Un mapa cuya única llave sea una de las etiquetas ($b, $ss, ...) se
+escribe como {"$m": {...}} para no confundirlo con un tipo. Los números
+que no tienen sintaxis JSON válida se escriben como {"$n": "texto"}.
+
+El JSON resultante es legible con cualquier lector JSON; solo decode_item
+recupera los tipos exactos.
+"""
+
+import base64
+import json
+import re
+from decimal import Decimal
+from json.encoder import encode_basestring
+from typing import Any, Dict, Iterable, Iterator
+
+CODEC_NAME = 'dynamodb-compact-v1'
+
+TAG_NUMBER = '$n'
+TAG_BINARY = '$b'
+TAG_STRING_SET = '$ss'
+TAG_NUMBER_SET = '$ns'
+TAG_BINARY_SET = '$bs'
+TAG_MAP = '$m'
+TAGS = frozenset((TAG_NUMBER, TAG_BINARY, TAG_STRING_SET, TAG_NUMBER_SET, TAG_BINARY_SET, TAG_MAP))
+
+_JSON_NUMBER = re.compile(r'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?').fullmatch
+
+
+# =========================================
+# CODIFICACIÓN: formato DynamoDB -> línea compacta
+# =========================================
+
+def _number(text: str) -> str:
+    # Los enteros son el caso común: evitar la expresión regular
+    if text.isdigit() and (text[0] != '0' or len(text) == 1):
+        return text
+    if _JSON_NUMBER(text):
+        return text
+    return '{"' + TAG_NUMBER + '":' + encode_basestring(text) + '}'
+
+
+def _binary(data) -> str:
+    # boto3 entrega bytes; un export o un stream en JSON trae el base64 ya hecho
+    if isinstance(data, str):
+        return encode_basestring(data)
+    return '"' + base64.b64encode(data).decode('ascii') + '"'
+
+
+def _encode_map(attributes: Dict[str, Dict[str, Any]]) -> str:
+    parts = []
+    append = parts.append
+    for name, value in attributes.items():
+        # Camino rápido para S y N (la gran mayoría de los atributos)
+        data = value.get('S')
+        if data is not None:
+            append(encode_basestring(name) + ':' + encode_basestring(data))
+            continue
+        data = value.get('N')
+        if data is not None:
+            append(encode_basestring(name) + ':' + _number(data))
+            continue
+        append(encode_basestring(name) + ':' + _encode_value(value))
+    return '{' + ','.join(parts) + '}'
+
+
+def _encode_value(value: Dict[str, Any]) -> str:
+    for tag, data in value.items():
+        if tag == 'S':
+            return encode_basestring(data)
+        if tag == 'N':
+            return _number(data)
+        if tag == 'M':
+            if len(data) == 1 and next(iter(data)) in TAGS:
+                return '{"' + TAG_MAP + '":' + _encode_map(data) + '}'
+            return _encode_map(data)
+        if tag == 'L':
+            return '[' + ','.join(map(_encode_value, data)) + ']'
+        if tag == 'BOOL':
+            return 'true' if data else 'false'
+        if tag == 'NULL':
+            return 'null'
+        if tag == 'SS':
+            return '{"' + TAG_STRING_SET + '":[' + ','.join(map(encode_basestring, data)) + ']}'
+        if tag == 'NS':
+            return '{"' + TAG_NUMBER_SET + '":[' + ','.join(map(_number, data)) + ']}'
+        if tag == 'B':
+            return '{"' + TAG_BINARY + '":' + _binary(data) + '}'
+        if tag == 'BS':
+            return '{"' + TAG_BINARY_SET + '":[' + ','.join(map(_binary, data)) + ']}'
+        raise ValueError(f"Tipo de DynamoDB no soportado: {tag}")
+    raise ValueError("Valor de DynamoDB vacío")
+
+
+def encode_item(item: Dict[str, Dict[str, Any]]) -> str:
+    """Item en formato DynamoDB (cliente de bajo nivel) -> línea JSON compacta (sin salto de línea)"""
+    return _encode_map(item)
+
+
+def encode_items(items: Iterable[Dict[str, Dict[str, Any]]]) -> str:
+    """Página de items -> bloque JSONL (cada línea termina en salto de línea)"""
+    return ''.join(_encode_map(item) + '\n' for item in items)
+
+
+# =========================================
+# DECODIFICACIÓN: línea compacta -> formato DynamoDB
+# =========================================
+
+# Enteros como int y decimales como Decimal: ambos exactos y construidos en
+# C (un parse_float propio en Python hace el parseo ~40% más lento)
+_decoder = json.JSONDecoder(parse_float=Decimal)
+
+
+def _decode_tagged(tag: str, data: Any) -> Dict[str, Any]:
+    if tag == TAG_BINARY:
+        return {'B': base64.b64decode(data)}
+    if tag == TAG_STRING_SET:
+        return {'SS': data}
+    if tag == TAG_NUMBER_SET:
+        return {'NS': [n[TAG_NUMBER] if type(n) is dict else str(n) for n in data]}
+    if tag == TAG_BINARY_SET:
+        return {'BS': [base64.b64decode(b) for b in data]}
+    if tag == TAG_NUMBER:
+        return {'N': data}
+    return {'M': _decode_map(data)}
+
+
+def _decode_map(attributes: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    result = {}
+    for name, value in attributes.items():
+        # Camino rápido para S y N (la gran mayoría de los atributos)
+        kind = type(value)
+        if kind is str:
+            result[name] = {'S': value}
+        elif kind is int or kind is Decimal:
+            result[name] = {'N': str(value)}
+        else:
+            result[name] = _decode_value(value)
+    return result
+
+
+def _decode_value(value: Any) -> Dict[str, Any]:
+    kind = type(value)
+    if kind is str:
+        return {'S': value}
+    if kind is int or kind is Decimal:
+        return {'N': str(value)}
+    if kind is dict:
+        if len(value) == 1:
+            for tag, data in value.items():
+                if tag in TAGS:
+                    return _decode_tagged(tag, data)
+        return {'M': _decode_map(value)}
+    if kind is list:
+        return {'L': [_decode_value(v) for v in value]}
+    if kind is bool:
+        return {'BOOL': value}
+    if value is None:
+        return {'NULL': True}
+    raise ValueError(f"Valor JSON no soportado: {value!r}")
+
+
+def decode_item(line: str) -> Dict[str, Dict[str, Any]]:
+    """Línea JSON compacta -> item en formato DynamoDB (listo para BatchWriteItem)"""
+    return _decode_map(_decoder.decode(line))
+
+
+def decode_lines(lines: Iterable[str]) -> Iterator[Dict[str, Dict[str, Any]]]:
+    """Items de un archivo JSONL compacto (omite líneas vacías)"""
+    for line in lines:
+        if line.strip():
+            yield decode_item(line)
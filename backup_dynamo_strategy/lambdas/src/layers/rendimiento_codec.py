@@ -0,0 +1,172 @@
+"""
+Benchmark de dynamo_codec contra TypeDeserializer/TypeSerializer de boto3
+
+El backup escribe cada item del scan (formato de DynamoDB) como una línea
+con dynamo_codec.encode_item, y el restore la vuelve a formato de DynamoDB
+con dynamo_codec.decode_item. Este script mide items por segundo de esos
+dos caminos contra la alternativa con boto3, usando la copia de
+dynamo_codec de common_layer (la misma que carga Lambda):
+
+- escribir: item -> línea
+    boto3:  TypeDeserializer + json.dumps (Decimal, set y Binary a texto)
+    codec:  dynamo_codec.encode_item
+- leer: línea -> item
+    boto3:  json.loads(parse_float=Decimal) + TypeSerializer
+    codec:  dynamo_codec.decode_item
+
+Los items tienen 12 atributos (S, N enteros y decimales, BOOL, NULL, M, L,
+SS, NS y B). Antes de medir comprueba que decode_item(encode_item(item))
+regresa el mismo item. La línea de boto3 no es reversible (pierde sets y
+binarios), así que solo sirve como referencia de velocidad. De cada camino
+reporta la mediana de varias corridas sobre los mismos items. Está fuera de
+common_layer/ para no subirlo con la capa.
+
+Uso:
+    python rendimiento_codec.py
+    python rendimiento_codec.py --items 100000 --corridas 3
+    python rendimiento_codec.py --guardar codec.json
+"""
+
+import os
+import sys
+import json
+import base64
+import random
+import argparse
+import platform
+import statistics
+import time
+from decimal import Decimal
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer, Binary
+
+LAYER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'common_layer', 'python')
+sys.path.insert(0, LAYER_DIR)
+
+import dynamo_codec  # la copia de la capa
+
+
+def generar_items(cantidad, semilla=7):
+    """return: lista de items en formato de DynamoDB"""
+    aleatorio = random.Random(semilla)
+    items = []
+    for i in range(cantidad):
+        items.append({
+            'id': {'S': f'tanda_{i:08d}'},
+            'participanteId': {'S': f'part_{aleatorio.getrandbits(48):012x}'},
+            'nombre': {'S': aleatorio.choice(['María López', 'José Pérez', 'Ana Ruiz', 'Luis Gómez'])},
+            'numeroAsignado': {'N': str(aleatorio.randint(1, 40))},
+            'monto': {'N': f'{aleatorio.randint(100, 99999)}.{aleatorio.randint(0, 99):02d}'},
+            'pagado': {'BOOL': aleatorio.random() < 0.5},
+            'notas': {'NULL': True},
+            'createdAt': {'S': f'2026-0{aleatorio.randint(1, 9)}-1{aleatorio.randint(0, 9)}T10:00:00'},
+            'direccion': {'M': {
+                'calle': {'S': 'Av. Juárez'},
+                'numero': {'N': str(aleatorio.randint(1, 999))},
+                'cp': {'S': f'{aleatorio.randint(10000, 99999)}'}
+            }},
+            'rondas': {'L': [{'N': str(r)} for r in range(aleatorio.randint(1, 6))]},
+            'etiquetas': {'SS': ['vip', 'link', 'cumpleañera'][:aleatorio.randint(1, 3)]},
+            'firma': {'B': aleatorio.randbytes(16)}
+        })
+    return items
+
+
+deserializador = TypeDeserializer()
+serializador = TypeSerializer()
+
+
+def _a_json(valor):
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, (set, frozenset)):
+        return sorted(valor, key=str)
+    if isinstance(valor, Binary):
+        return base64.b64encode(valor.value).decode('ascii')
+    raise TypeError(f'{type(valor).__name__} no es serializable')
+
+
+def boto3_escribir(item):
+    return json.dumps(
+        {k: deserializador.deserialize(v) for k, v in item.items()},
+        default=_a_json, ensure_ascii=False, separators=(',', ':')
+    )
+
+
+def boto3_leer(linea):
+    return {k: serializador.serialize(v) for k, v in json.loads(linea, parse_float=Decimal).items()}
+
+
+def items_por_segundo(funcion, entradas, corridas):
+    """return: mediana de items por segundo"""
+    tasas = []
+    for _ in range(corridas):
+        inicio = time.perf_counter()
+        for entrada in entradas:
+            funcion(entrada)
+        tasas.append(len(entradas) / (time.perf_counter() - inicio))
+    return statistics.median(tasas)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compara dynamo_codec con TypeDeserializer/TypeSerializer (items por segundo)'
+    )
+    parser.add_argument('--items', type=int, default=20000, help='Items por corrida (default: 20000)')
+    parser.add_argument('--corridas', type=int, default=5, help='Corridas por camino (default: 5)')
+    parser.add_argument('--guardar', help='Archivo JSON donde guardar los resultados')
+    args = parser.parse_args()
+
+    items = generar_items(args.items)
+    lineas_codec = [dynamo_codec.encode_item(item) for item in items]
+    lineas_boto3 = [boto3_escribir(item) for item in items]
+
+    for item, linea in zip(items, lineas_codec):
+        if dynamo_codec.decode_item(linea) != item:
+            print(f"❌ decode_item(encode_item(item)) distinto para {item['id']['S']}")
+            return 1
+
+    bytes_codec = sum(len(linea.encode()) for linea in lineas_codec)
+    bytes_boto3 = sum(len(linea.encode()) for linea in lineas_boto3)
+
+    casos = {
+        'escribir': (
+            ('boto3', boto3_escribir, items),
+            ('codec', dynamo_codec.encode_item, items)
+        ),
+        'leer': (
+            ('boto3', boto3_leer, lineas_boto3),
+            ('codec', dynamo_codec.decode_item, lineas_codec)
+        )
+    }
+
+    print(f"Python {platform.python_version()}, {args.items:,} items de 12 atributos ({LAYER_DIR})")
+    print(f"{'camino':<10} {'boto3':>16} {'codec':>16} {'mejora':>8}")
+
+    resultados = {
+        'items': args.items,
+        'bytes_por_item': {'boto3': round(bytes_boto3 / args.items, 1), 'codec': round(bytes_codec / args.items, 1)}
+    }
+    for caso, caminos in casos.items():
+        tasas = {nombre: items_por_segundo(funcion, entradas, args.corridas)
+                 for nombre, funcion, entradas in caminos}
+        mejora = tasas['codec'] / tasas['boto3']
+        resultados[caso] = {
+            'boto3_items_s': round(tasas['boto3']),
+            'codec_items_s': round(tasas['codec']),
+            'mejora': round(mejora, 2)
+        }
+        print(f"{caso:<10} {tasas['boto3']:>9,.0f} items/s {tasas['codec']:>9,.0f} items/s {mejora:>7.2f}x")
+
+    print(f"\nBytes por línea: boto3 {resultados['bytes_por_item']['boto3']}, "
+          f"codec {resultados['bytes_por_item']['codec']}")
+
+    if args.guardar:
+        with open(args.guardar, 'w') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados guardados en {args.guardar}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -5,18 +5,68 @@ Uso: python restore_dynamodb.py --table alumnos --date 20241124
 """
 
 import boto3
+import base64
+import io
 import json
+import os
 import gzip
+import hashlib
 import argparse
+import queue
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 import sys
 from botocore.exceptions import ClientError
 
+# Codec del layer common_layer (en la Lambda vive en /opt/python; al correr
+# el script desde el repo se toma del directorio del layer)
+try:
+    from dynamo_codec import decode_item, CODEC_NAME
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 '..', 'layers', 'common_layer', 'python'))
+    from dynamo_codec import decode_item, CODEC_NAME
+
 # Configuración
 BACKUP_BUCKET = 'school-system-dynamodb-backups-prod'
 BACKUP_PREFIX = 'backups'
 BATCH_SIZE = 25  # DynamoDB BatchWriteItem limit
+MANIFEST_NAME = 'manifest.json'  # Backups por partes (JSONL)
+
+# Lectura en streaming: bloques descargados por adelantado mientras se
+# descomprime y parsea (memoria constante sin importar el tamaño del backup)
+STREAM_BLOCK_SIZE = 1024 * 1024
+STREAM_PREFETCH_BLOCKS = 8
+
+# Cada parte se descarga completa a disco y se valida antes de escribir
+# un solo item (una parte mide ~64 MB comprimida)
+SPOOL_DIR = os.environ.get('RESTORE_SPOOL_DIR') or tempfile.gettempdir()
+
+# Motor de escritura: lotes concurrentes con control de tasa adaptativo
+DEFAULT_WORKERS = 8
+DEFAULT_INITIAL_RATE = 1000      # items/s al arrancar
+MIN_RATE = 25                    # items/s mínimos (un lote por segundo)
+RATE_SLOW_START_FACTOR = 1.02    # Hasta el primer throttling la tasa crece 2% por lote
+RATE_INCREASE_PER_BATCH = 10     # Después, items/s que se suman por lote exitoso
+RATE_DECREASE_FACTOR = 0.5       # la tasa se divide ante throttling...
+RATE_DECREASE_INTERVAL = 1.0     # ...como máximo una vez por segundo
+TARGET_CAPACITY_UTILIZATION = 0.9  # Tablas provisionadas: fracción de WCU a usar
+MAX_RETRIES = 10
+BACKOFF_BASE_SECONDS = 0.05
+BACKOFF_MAX_SECONDS = 5.0
+PROGRESS_INTERVAL_SECONDS = 5.0
+THROTTLING_ERRORS = (
+    'ProvisionedThroughputExceededException',
+    'ThrottlingException',
+    'RequestLimitExceeded'
+)
 
 
 def list_available_backups(s3_client, table_name: str = None) -> List[Dict]:
@@ -34,59 +84,337 @@ def list_available_backups(s3_client, table_name: str = None) -> List[Dict]:
     for page in paginator.paginate(Bucket=BACKUP_BUCKET, Prefix=prefix):
         for obj in page.get('Contents', []):
             key = obj['Key']
-            if key.endswith(('.json', '.json.gz')):
-                # Parsear estructura: backups/YYYY/MM/DD/table_name/backup_YYYYMMDD-HHMMSS.json
-                parts = key.split('/')
-                if len(parts) >= 6:
-                    year, month, day, tbl_name = parts[1:5]
-                    filename = parts[5]
-                    
-                    if table_name and tbl_name != table_name:
-                        continue
-                    
-                    # Extraer timestamp del filename
-                    timestamp = filename.replace('backup_', '').replace('.json.gz', '').replace('.json', '')
-                    
-                    backups.append({
-                        'table': tbl_name,
-                        'date': f"{year}-{month}-{day}",
-                        'timestamp': timestamp,
-                        's3_key': key,
-                        'size': obj['Size'],
-                        'last_modified': obj['LastModified']
-                    })
+            parts = key.split('/')
+            
+            if len(parts) == 7 and parts[6] == MANIFEST_NAME:
+                # Por partes: backups/YYYY/MM/DD/table_name/backup_YYYYMMDD-HHMMSS/manifest.json
+                backup_format = 'chunked'
+                timestamp = parts[5].replace('backup_', '')
+            elif len(parts) == 6 and key.endswith(('.json', '.json.gz')):
+                # Archivo único: backups/YYYY/MM/DD/table_name/backup_YYYYMMDD-HHMMSS.json[.gz]
+                backup_format = 'single'
+                timestamp = parts[5].replace('backup_', '').replace('.json.gz', '').replace('.json', '')
+            else:
+                continue
+            
+            year, month, day, tbl_name = parts[1:5]
+            if table_name and tbl_name != table_name:
+                continue
+            
+            backups.append({
+                'table': tbl_name,
+                'date': f"{year}-{month}-{day}",
+                'timestamp': timestamp,
+                'format': backup_format,
+                's3_key': key,
+                'size': obj['Size'],
+                'last_modified': obj['LastModified']
+            })
     
     return sorted(backups, key=lambda x: x['timestamp'], reverse=True)
 
 
-def download_and_decompress_backup(s3_client, s3_key: str) -> List[Dict]:
-    """Descarga y descomprime backup desde S3"""
-    print(f"\n📥 Descargando backup: {s3_key}")
+class S3StreamReader(io.RawIOBase):
+    """
+    Lee el body de un objeto S3 en un hilo aparte, en bloques de
+    STREAM_BLOCK_SIZE y con hasta STREAM_PREFETCH_BLOCKS en espera, para que
+    la descarga se traslape con la descompresión y el parseo. Calcula el
+    SHA256 de lo leído para validarlo al terminar.
+    """
+
+    def __init__(self, body):
+        super().__init__()
+        self.blocks = queue.Queue(maxsize=STREAM_PREFETCH_BLOCKS)
+        self.stop = threading.Event()
+        self.sha256 = hashlib.sha256()
+        self.bytes_read = 0
+        self.current = b''
+        self.offset = 0
+        self.finished = False
+        self.thread = threading.Thread(target=self._download, args=(body,), daemon=True)
+        self.thread.start()
+
+    def _put(self, block) -> bool:
+        while not self.stop.is_set():
+            try:
+                self.blocks.put(block, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _download(self, body):
+        try:
+            while not self.stop.is_set():
+                block = body.read(STREAM_BLOCK_SIZE)
+                if not self._put(block) or not block:
+                    break
+        except Exception as e:
+            self._put(e)
+        finally:
+            body.close()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self.offset == len(self.current):
+            if self.finished:
+                return 0
+            block = self.blocks.get()
+            if isinstance(block, Exception):
+                raise block
+            if not block:
+                self.finished = True
+                return 0
+            self.sha256.update(block)
+            self.bytes_read += len(block)
+            self.current = block
+            self.offset = 0
+
+        count = min(len(buffer), len(self.current) - self.offset)
+        buffer[:count] = self.current[self.offset:self.offset + count]
+        self.offset += count
+        return count
+
+    def close(self):
+        # Si el consumidor se detiene antes, liberar el hilo de descarga
+        self.stop.set()
+        super().close()
+
+
+def open_backup_stream(s3_client, s3_key: str) -> Tuple[S3StreamReader, io.TextIOWrapper]:
+    """
+    Abre un objeto de backup como texto en streaming: descarga (hilo
+    aparte) -> gunzip incremental -> decodificación UTF-8.
+
+    return: (reader con el SHA256, stream de texto)
+    """
+    try:
+        response = s3_client.get_object(Bucket=BACKUP_BUCKET, Key=s3_key)
+    except ClientError as e:
+        print(f"✗ Error descargando {s3_key}: {e}")
+        sys.exit(1)
     
+    reader = S3StreamReader(response['Body'])
+    binary = io.BufferedReader(reader, buffer_size=STREAM_BLOCK_SIZE)
+    if s3_key.endswith('.gz'):
+        binary = gzip.GzipFile(fileobj=binary, mode='rb')
+    return reader, io.TextIOWrapper(binary, encoding='utf-8')
+
+
+class JsonArrayStream:
+    """
+    Parser incremental de un arreglo JSON: regresa un elemento a la vez
+    leyendo el texto por bloques, sin cargar el documento completo.
+    """
+    WHITESPACE = re.compile(r'\s*')
+    NUMBER_CHARS = frozenset('0123456789+-.eE')
+
+    def __init__(self, text: io.TextIOBase):
+        self.text = text
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        data = self.text.read(STREAM_BLOCK_SIZE)
+        if not data:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            self.pos = self.WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise ValueError(f"JSON inválido: se esperaba '{char}' en la posición {self.pos}")
+        self.pos += 1
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # Un número cortado por el final del bloque ('12' de '12.5')
+                # parece completo: confirmarlo con lo que sigue
+                if self.eof or (end < len(self.buffer) and self.buffer[end] not in self.NUMBER_CHARS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def __iter__(self) -> Iterator[Any]:
+        self._expect('[')
+        if self._peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._peek() == ',':
+                self.pos += 1
+                continue
+            self._expect(']')
+            return
+
+
+def iter_single_file_backup(s3_client, s3_key: str) -> Iterator[Dict]:
+    """Items de un backup de archivo único (arreglo JSON), en streaming"""
+    print(f"\n📥 Leyendo backup en streaming: {s3_key}")
+    
+    reader, text = open_backup_stream(s3_client, s3_key)
+    count = 0
+    try:
+        for item in JsonArrayStream(text):
+            count += 1
+            yield item
+    except (OSError, EOFError, ValueError) as e:
+        # gzip truncado o con CRC inválido, o JSON mal formado
+        print(f"✗ Backup {s3_key} corrupto tras {count:,} items: {e}")
+        sys.exit(1)
+    finally:
+        text.close()
+        reader.close()
+    
+    print(f"✓ {count:,} items leídos ({reader.bytes_read / 1024 / 1024:.2f} MB descargados)")
+
+
+def download_manifest(s3_client, s3_key: str) -> Dict[str, Any]:
+    """Descarga el manifest de un backup por partes"""
     try:
         response = s3_client.get_object(Bucket=BACKUP_BUCKET, Key=s3_key)
-        data = response['Body'].read()
-        
-        # Descomprimir si es gzip
-        if s3_key.endswith('.gz'):
-            print("📦 Descomprimiendo datos...")
-            data = gzip.decompress(data)
+        manifest = json.loads(response['Body'].read().decode('utf-8'))
+    except ClientError as e:
+        print(f"✗ Error descargando manifest: {e}")
+        sys.exit(1)
+    
+    compressed_mb = manifest['compressed_size_bytes'] / 1024 / 1024
+    print(f"\n📑 Manifest: {len(manifest['chunks'])} partes, "
+          f"{manifest['item_count']:,} items, {compressed_mb:.2f} MB")
+    return manifest
+
+
+def open_chunk_text(path: str, s3_key: str) -> io.TextIOBase:
+    """Texto de una parte ya descargada (gzip si su key termina en .gz)"""
+    if s3_key.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def spool_chunk(s3_client, chunk: Dict[str, Any]) -> str:
+    """
+    Descarga una parte a un archivo temporal (calculando su SHA256) y la
+    valida contra el manifest: checksum, CRC de gzip y conteo de items.
+    Cualquier falla detiene la restauración antes de escribir la parte.
+    
+    return: ruta del archivo validado (el llamador lo borra)
+    """
+    try:
+        response = s3_client.get_object(Bucket=BACKUP_BUCKET, Key=chunk['key'])
+    except ClientError as e:
+        print(f"✗ Error descargando {chunk['key']}: {e}")
+        sys.exit(1)
+    
+    reader = S3StreamReader(response['Body'])
+    spool = tempfile.NamedTemporaryFile(prefix='restore-', suffix='.part', dir=SPOOL_DIR, delete=False)
+    try:
+        with spool:
+            shutil.copyfileobj(reader, spool, STREAM_BLOCK_SIZE)
+        reader.close()
         
-        # Parsear JSON
-        items = json.loads(data.decode('utf-8'))
-        print(f"✓ {len(items):,} items cargados desde backup")
+        checksum = reader.sha256.hexdigest()
+        if checksum != chunk['sha256']:
+            print(f"✗ Checksum inválido en {chunk['key']}: esperado {chunk['sha256']}, calculado {checksum}")
+            sys.exit(1)
         
-        return items
+        count = 0
+        try:
+            with open_chunk_text(spool.name, chunk['key']) as text:
+                for line in text:
+                    if line.strip():
+                        count += 1
+        except (OSError, EOFError, UnicodeDecodeError) as e:
+            # gzip truncado o con CRC inválido
+            print(f"✗ Parte {chunk['key']} corrupta: {e}")
+            sys.exit(1)
         
-    except ClientError as e:
-        print(f"✗ Error descargando backup: {e}")
+        if count != chunk['items']:
+            print(f"✗ Parte {chunk['key']} incompleta: {count:,} de {chunk['items']:,} items")
+            sys.exit(1)
+    except BaseException:
+        reader.close()
+        os.remove(spool.name)
+        raise
+    
+    print(f"✓ Parte validada ({count:,} items, {reader.bytes_read / 1024 / 1024:.2f} MB)")
+    return spool.name
+
+
+def iter_chunk(s3_client, chunk: Dict[str, Any], decode) -> Iterator[Dict]:
+    """
+    Items de una parte JSONL en formato DynamoDB (decode convierte cada
+    línea). La parte se descarga a disco (SPOOL_DIR) y se valida completa
+    antes de regresar el primer item, así que una parte corrupta o alterada
+    no escribe nada; en memoria solo queda un bloque a la vez.
+    """
+    path = spool_chunk(s3_client, chunk)
+    count = 0
+    try:
+        with open_chunk_text(path, chunk['key']) as text:
+            for line in text:
+                if line.strip():
+                    count += 1
+                    yield decode(line)
+    except ValueError as e:
+        # Línea JSON mal formada (con checksum válido: el backup se escribió así)
+        print(f"✗ Parte {chunk['key']} con una línea inválida tras {count:,} items: {e}")
         sys.exit(1)
+    finally:
+        os.remove(path)
 
 
-def convert_to_dynamodb_format(items: List[Dict]) -> List[Dict]:
+def iter_backup_items(s3_client, backup: Dict[str, Any],
+                      manifest: Optional[Dict[str, Any]] = None) -> Iterator[Dict]:
     """
-    Convierte JSON limpio a formato DynamoDB
-    Inverso de la función en lambda
+    Regresa los items del backup en formato DynamoDB, uno a uno conforme se
+    descargan, en cualquiera de los formatos:
+    - por partes con codec (dynamo_codec): sin pérdida
+    - por partes o archivo único anteriores (JSON limpio): se convierten
+      con convert_to_dynamodb_format, como se respaldaron
+    """
+    if backup['format'] != 'chunked':
+        yield from convert_to_dynamodb_format(iter_single_file_backup(s3_client, backup['s3_key']))
+        return
+    
+    if manifest is None:
+        manifest = download_manifest(s3_client, backup['s3_key'])
+    codec = manifest.get('codec')
+    if codec not in (None, CODEC_NAME):
+        print(f"✗ Codec de backup no soportado: {codec}")
+        sys.exit(1)
+    
+    for index, chunk in enumerate(manifest['chunks'], 1):
+        print(f"\n📥 Parte {index}/{len(manifest['chunks'])}: {chunk['key']} ({chunk['items']:,} items)")
+        if codec == CODEC_NAME:
+            yield from iter_chunk(s3_client, chunk, decode_item)
+        else:
+            yield from convert_to_dynamodb_format(iter_chunk(s3_client, chunk, json.loads))
+
+
+def convert_to_dynamodb_format(items: Iterable[Dict]) -> Iterator[Dict]:
+    """
+    Convierte JSON limpio a formato DynamoDB (conforme se consumen los items).
+    Solo para backups anteriores al codec: los números ya venían como
+    float y los binarios como texto
     """
     def serialize_value(value):
         if value is None:
@@ -107,82 +435,263 @@ def convert_to_dynamodb_format(items: List[Dict]) -> List[Dict]:
     def serialize_item(item):
         return {key: serialize_value(value) for key, value in item.items()}
     
-    return [serialize_item(item) for item in items]
+    return (serialize_item(item) for item in items)
+
 
+def backoff_delay(attempt: int) -> float:
+    """Backoff exponencial con jitter completo (evita que los hilos reintenten juntos)"""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
 
-def batch_write_items(dynamodb_client, table_name: str, items: List[Dict]) -> bool:
+
+class AdaptiveRateLimiter:
     """
-    Escribe items a DynamoDB en lotes
-    Maneja automáticamente reintentos de unprocessed items
+    Token bucket en items/s con ajuste AIMD: hasta el primer throttling
+    la tasa crece de forma multiplicativa (arranque rápido), después cada
+    lote exitoso la sube un poco y el throttling la reduce a la mitad. En tablas
+    provisionadas el techo sale de las WCU de la tabla y de la capacidad
+    consumida por item que reporta DynamoDB; en on-demand no hay techo y
+    la tasa crece hasta que la tabla empieza a regresar throttling.
     """
-    print(f"\n📝 Restaurando {len(items):,} items a tabla '{table_name}'...")
-    
-    total_written = 0
-    total_failed = 0
-    
-    # Procesar en lotes de 25 (límite de BatchWriteItem)
-    for i in range(0, len(items), BATCH_SIZE):
-        batch = items[i:i + BATCH_SIZE]
-        
-        # Preparar request
-        request_items = {
-            table_name: [
-                {'PutRequest': {'Item': item}}
-                for item in batch
-            ]
-        }
-        
-        # Intentar escribir con reintentos
-        max_retries = 3
-        retry_count = 0
-        
-        while retry_count < max_retries:
+
+    def __init__(self, initial_rate: float, provisioned_wcu: Optional[int] = None):
+        self.rate = float(initial_rate)
+        self.provisioned_wcu = provisioned_wcu
+        self.max_rate = None
+        self.tokens = 0.0
+        self.last_refill = time.monotonic()
+        self.last_decrease = 0.0
+        self.slow_start = True
+        self.consumed_units = 0.0
+        self.measured_items = 0
+        self.lock = threading.Lock()
+
+    def acquire(self, count: int):
+        """Espera hasta poder escribir 'count' items"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                # Ráfaga máxima: un segundo de tasa (y al menos un lote)
+                capacity = max(self.rate, count)
+                self.tokens = min(capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= count:
+                    self.tokens -= count
+                    return
+                wait = (count - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self, items: int, consumed_units: float = 0.0):
+        with self.lock:
+            if consumed_units and self.provisioned_wcu:
+                self.consumed_units += consumed_units
+                self.measured_items += items
+                units_per_item = self.consumed_units / self.measured_items
+                self.max_rate = max(MIN_RATE, self.provisioned_wcu * TARGET_CAPACITY_UTILIZATION / units_per_item)
+            if self.slow_start:
+                self.rate *= RATE_SLOW_START_FACTOR
+            else:
+                self.rate += RATE_INCREASE_PER_BATCH
+            if self.max_rate:
+                self.rate = min(self.rate, self.max_rate)
+
+    def on_throttle(self):
+        with self.lock:
+            now = time.monotonic()
+            # Varios hilos ven el mismo throttling: reducir una sola vez
+            if now - self.last_decrease < RATE_DECREASE_INTERVAL:
+                return
+            self.last_decrease = now
+            self.slow_start = False
+            self.rate = max(MIN_RATE, self.rate * RATE_DECREASE_FACTOR)
+            self.tokens = 0.0
+
+
+class DeadLetterFile:
+    """
+    Archivo JSONL con cada item que no se pudo escribir y el motivo, en
+    formato DynamoDB para poder reintentarlo. Se crea solo si hay fallos.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def write(self, item: Dict[str, Any], error: str):
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, 'w', encoding='utf-8')
+            # Binarios (B/BS) en base64, como en el JSON de DynamoDB (aws dynamodb put-item)
+            self.file.write(json.dumps(
+                {'error': error, 'item': item}, ensure_ascii=False,
+                default=lambda b: base64.b64encode(b).decode('ascii')
+            ) + '\n')
+            self.count += 1
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+
+
+class RestoreWriter:
+    """
+    Escribe items a DynamoDB con BatchWriteItem desde varios hilos.
+
+    - La tasa la regula AdaptiveRateLimiter (throttling y capacidad consumida)
+    - UnprocessedItems y throttling se reintentan con backoff exponencial con jitter
+    - Un lote rechazado por validación se reintenta item por item para
+      saber exactamente cuáles fallan
+    - Cada item fallido va al dead-letter con su motivo
+
+    Los items se pueden entregar en varias llamadas a write() (una por
+    parte del backup); close() espera a que terminen todos los lotes.
+    """
+
+    def __init__(self, dynamodb_client, table_name: str, dead_letter_path: str,
+                 workers: int = DEFAULT_WORKERS, initial_rate: float = DEFAULT_INITIAL_RATE,
+                 provisioned_wcu: Optional[int] = None, expected_items: int = 0):
+        self.client = dynamodb_client
+        self.table_name = table_name
+        self.limiter = AdaptiveRateLimiter(initial_rate, provisioned_wcu)
+        self.dead_letter = DeadLetterFile(dead_letter_path)
+        self.expected_items = expected_items
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        # Lotes en vuelo acotados: la lectura del backup no se adelanta sin límite
+        self.slots = threading.BoundedSemaphore(workers * 2)
+        self.lock = threading.Lock()
+        self.written = 0
+        self.throttled = 0
+        self.consumed_units = 0.0
+        self.start_time = time.monotonic()
+        self.last_progress = self.start_time
+
+    @property
+    def failed(self) -> int:
+        return self.dead_letter.count
+
+    def items_per_second(self) -> float:
+        elapsed = time.monotonic() - self.start_time
+        return self.written / elapsed if elapsed > 0 else 0.0
+
+    def write(self, items: Iterable[Dict[str, Any]]):
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) == BATCH_SIZE:
+                self._submit(batch)
+                batch = []
+        if batch:
+            self._submit(batch)
+
+    def _submit(self, batch: List[Dict[str, Any]]):
+        self.slots.acquire()
+        future = self.executor.submit(self._write_batch, batch)
+        future.add_done_callback(lambda _: self.slots.release())
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.dead_letter.close()
+
+    def _record_success(self, count: int, consumed_units: float):
+        self.limiter.on_success(count, consumed_units)
+        with self.lock:
+            self.written += count
+            self.consumed_units += consumed_units
+            now = time.monotonic()
+            if now - self.last_progress < PROGRESS_INTERVAL_SECONDS:
+                return
+            self.last_progress = now
+            written = self.written
+        progress = f" ({written*100//self.expected_items}%)" if self.expected_items else ""
+        print(f"  Progreso: {written:,} items{progress} | {self.items_per_second():,.0f} items/s | "
+              f"tasa objetivo {self.limiter.rate:,.0f}/s | throttling: {self.throttled}")
+
+    def _record_throttle(self):
+        self.limiter.on_throttle()
+        with self.lock:
+            self.throttled += 1
+
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        pending = batch
+        last_error = None
+        for attempt in range(MAX_RETRIES + 1):
+            if attempt:
+                time.sleep(backoff_delay(attempt))
+            self.limiter.acquire(len(pending))
+
             try:
-                response = dynamodb_client.batch_write_item(RequestItems=request_items)
-                
-                # Verificar si hay items no procesados
-                unprocessed = response.get('UnprocessedItems', {})
-                
-                if not unprocessed:
-                    total_written += len(batch)
-                    if (i // BATCH_SIZE + 1) % 10 == 0:
-                        print(f"  Progreso: {total_written:,}/{len(items):,} items ({total_written*100//len(items)}%)")
-                    break
-                else:
-                    # Reintentar items no procesados
-                    request_items = unprocessed
-                    retry_count += 1
-                    print(f"  ⚠ Reintentando {len(unprocessed[table_name])} items no procesados...")
-                    
+                response = self.client.batch_write_item(
+                    RequestItems={self.table_name: [{'PutRequest': {'Item': item}} for item in pending]},
+                    ReturnConsumedCapacity='TOTAL'
+                )
             except ClientError as e:
                 error_code = e.response['Error']['Code']
-                if error_code == 'ProvisionedThroughputExceededException':
-                    print(f"  ⚠ Throughput excedido, esperando...")
-                    import time
-                    time.sleep(2 ** retry_count)  # Backoff exponencial
-                    retry_count += 1
-                else:
-                    print(f"  ✗ Error escribiendo lote: {e}")
-                    total_failed += len(batch)
+                if error_code in THROTTLING_ERRORS:
+                    last_error = f"{error_code} tras {MAX_RETRIES} reintentos"
+                    self._record_throttle()
+                    continue
+                if error_code == 'ValidationException':
+                    # Un item inválido rechaza todo el lote: aislarlo
+                    self._write_items_individually(pending)
+                    return
+                for item in pending:
+                    self.dead_letter.write(item, f"{error_code}: {e.response['Error'].get('Message', '')}")
+                return
+            except Exception as e:
+                # Errores de red: reintentar igual que el throttling
+                last_error = f"{type(e).__name__}: {e}"
+                continue
+
+            last_error = None
+            consumed = sum(c.get('CapacityUnits', 0) for c in response.get('ConsumedCapacity', []))
+            unprocessed = [
+                request['PutRequest']['Item']
+                for request in response.get('UnprocessedItems', {}).get(self.table_name, [])
+            ]
+            if len(unprocessed) < len(pending):
+                self._record_success(len(pending) - len(unprocessed), consumed)
+            if not unprocessed:
+                return
+
+            # DynamoDB regresa items sin procesar cuando la tabla está al límite
+            self._record_throttle()
+            pending = unprocessed
+
+        for item in pending:
+            self.dead_letter.write(item, last_error or f"UnprocessedItems tras {MAX_RETRIES} reintentos")
+
+    def _write_items_individually(self, items: List[Dict[str, Any]]):
+        for item in items:
+            for attempt in range(MAX_RETRIES + 1):
+                if attempt:
+                    time.sleep(backoff_delay(attempt))
+                self.limiter.acquire(1)
+                try:
+                    response = self.client.put_item(
+                        TableName=self.table_name,
+                        Item=item,
+                        ReturnConsumedCapacity='TOTAL'
+                    )
+                    self._record_success(1, response.get('ConsumedCapacity', {}).get('CapacityUnits', 0))
                     break
-        
-        if retry_count >= max_retries:
-            print(f"  ✗ Máximo de reintentos alcanzado para lote")
-            total_failed += len(batch)
-    
-    print(f"\n{'='*60}")
-    print(f"RESULTADO DE RESTAURACIÓN")
-    print(f"{'='*60}")
-    print(f"✓ Escritos exitosamente: {total_written:,}")
-    if total_failed > 0:
-        print(f"✗ Fallidos: {total_failed:,}")
-    print(f"{'='*60}\n")
-    
-    return total_failed == 0
+                except ClientError as e:
+                    error_code = e.response['Error']['Code']
+                    if error_code in THROTTLING_ERRORS and attempt < MAX_RETRIES:
+                        self._record_throttle()
+                        continue
+                    self.dead_letter.write(item, f"{error_code}: {e.response['Error'].get('Message', '')}")
+                    break
+                except Exception as e:
+                    if attempt < MAX_RETRIES:
+                        continue
+                    self.dead_letter.write(item, f"{type(e).__name__}: {e}")
 
 
 def restore_table(table_name: str, backup_date: str = None, backup_timestamp: str = None, 
-                 dry_run: bool = False) -> bool:
+                 dry_run: bool = False, workers: int = DEFAULT_WORKERS,
+                 initial_rate: float = DEFAULT_INITIAL_RATE) -> Dict[str, Any]:
     """
     Restaura una tabla desde backup
     
@@ -191,6 +700,11 @@ def restore_table(table_name: str, backup_date: str = None, backup_timestamp: st
         backup_date: Fecha en formato YYYY-MM-DD (opcional)
         backup_timestamp: Timestamp exacto YYYYMMDD-HHMMSS (opcional)
         dry_run: Si es True, solo muestra lo que se haría sin ejecutar
+        workers: Hilos escribiendo lotes en paralelo
+        initial_rate: Tasa inicial en items/s (se ajusta sola)
+    
+    Returns: {'success', y si se escribió: 'written', 'failed',
+              'elapsed_seconds', 'items_per_second', 'dead_letter_file'}
     """
     s3_client = boto3.client('s3')
     dynamodb_client = boto3.client('dynamodb')
@@ -200,7 +714,7 @@ def restore_table(table_name: str, backup_date: str = None, backup_timestamp: st
     
     if not backups:
         print(f"✗ No se encontraron backups para la tabla '{table_name}'")
-        return False
+        return {'success': False}
     
     # 2. Seleccionar backup
     selected_backup = None
@@ -220,7 +734,7 @@ def restore_table(table_name: str, backup_date: str = None, backup_timestamp: st
         print("\nBackups disponibles:")
         for b in backups[:5]:
             print(f"  • {b['date']} {b['timestamp']} - {b['size']:,} bytes")
-        return False
+        return {'success': False}
     
     print(f"\n{'='*60}")
     print(f"BACKUP SELECCIONADO")
@@ -228,45 +742,88 @@ def restore_table(table_name: str, backup_date: str = None, backup_timestamp: st
     print(f"Tabla: {selected_backup['table']}")
     print(f"Fecha: {selected_backup['date']}")
     print(f"Timestamp: {selected_backup['timestamp']}")
+    print(f"Formato: {'por partes (manifest)' if selected_backup['format'] == 'chunked' else 'archivo único'}")
     print(f"Tamaño: {selected_backup['size']:,} bytes")
     print(f"S3 Key: {selected_backup['s3_key']}")
     print(f"{'='*60}\n")
     
     if dry_run:
         print("🔍 DRY RUN: No se realizarán cambios")
-        return True
+        return {'success': True}
     
     # Confirmar restauración
     confirm = input("⚠️  ¿Confirmar restauración? Esto REEMPLAZARÁ los datos actuales (y/n): ")
     if confirm.lower() != 'y':
         print("❌ Restauración cancelada")
-        return False
-    
-    # 3. Descargar backup
-    items = download_and_decompress_backup(s3_client, selected_backup['s3_key'])
-    
-    # 4. Convertir a formato DynamoDB
-    print("\n🔄 Convirtiendo datos a formato DynamoDB...")
-    dynamodb_items = convert_to_dynamodb_format(items)
+        return {'success': False}
     
-    # 5. Verificar que la tabla existe
+    # 3. Verificar que la tabla existe (y su modo de capacidad)
     try:
-        dynamodb_client.describe_table(TableName=table_name)
+        table_description = dynamodb_client.describe_table(TableName=table_name)['Table']
     except ClientError as e:
         if e.response['Error']['Code'] == 'ResourceNotFoundException':
             print(f"✗ La tabla '{table_name}' no existe. Debe ser creada primero con Terraform.")
-            return False
+            return {'success': False}
         raise
     
-    # 6. Restaurar datos
-    success = batch_write_items(dynamodb_client, table_name, dynamodb_items)
+    # On-demand: sin techo de capacidad; provisionada: techo según sus WCU
+    billing_mode = table_description.get('BillingModeSummary', {}).get('BillingMode', 'PROVISIONED')
+    provisioned_wcu = None
+    if billing_mode == 'PROVISIONED':
+        provisioned_wcu = table_description.get('ProvisionedThroughput', {}).get('WriteCapacityUnits') or None
+    
+    print(f"\n📝 Restaurando a '{table_name}' ({billing_mode}"
+          f"{f', {provisioned_wcu} WCU' if provisioned_wcu else ''}) con {workers} hilos...")
+    
+    # Backups por partes: el manifest da el total de items para el progreso
+    manifest = None
+    if selected_backup['format'] == 'chunked':
+        manifest = download_manifest(s3_client, selected_backup['s3_key'])
     
-    if success:
+    # 4. Descargar, convertir a formato DynamoDB y restaurar en streaming
+    dead_letter_path = f"failed_items_{table_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+    writer = RestoreWriter(
+        dynamodb_client, table_name, dead_letter_path,
+        workers=workers,
+        initial_rate=min(initial_rate, provisioned_wcu) if provisioned_wcu else initial_rate,
+        provisioned_wcu=provisioned_wcu,
+        expected_items=manifest['item_count'] if manifest else 0
+    )
+    try:
+        # Descarga, gunzip, parseo y escritura se traslapan: en memoria solo
+        # quedan los bloques en espera y los lotes en vuelo
+        writer.write(iter_backup_items(s3_client, selected_backup, manifest))
+    finally:
+        writer.close()
+    
+    elapsed = time.monotonic() - writer.start_time
+    result = {
+        'success': writer.failed == 0,
+        'written': writer.written,
+        'failed': writer.failed,
+        'elapsed_seconds': elapsed,
+        'items_per_second': writer.written / elapsed if elapsed > 0 else 0.0,
+        'consumed_capacity_units': writer.consumed_units,
+        'throttled_requests': writer.throttled,
+        'dead_letter_file': dead_letter_path if writer.failed else None
+    }
+    
+    print(f"\n{'='*60}")
+    print(f"RESULTADO DE RESTAURACIÓN")
+    print(f"{'='*60}")
+    print(f"✓ Escritos exitosamente: {result['written']:,}")
+    if result['failed'] > 0:
+        print(f"✗ Fallidos: {result['failed']:,} (ver {dead_letter_path})")
+    print(f"Capacidad consumida: {result['consumed_capacity_units']:,.1f} WCU")
+    print(f"Respuestas con throttling: {result['throttled_requests']:,}")
+    print(f"{'='*60}\n")
+    
+    if result['success']:
         print("✅ Restauración completada exitosamente!")
     else:
         print("⚠️  Restauración completada con errores")
     
-    return success
+    return result
 
 
 def main():
@@ -289,6 +846,9 @@ Ejemplos de uso:
   
   # Simular restauración (dry-run)
   python restore_dynamodb.py --table alumnos --dry-run
+  
+  # Más hilos y tasa inicial más alta (tablas on-demand grandes)
+  python restore_dynamodb.py --table alumnos --workers 16 --initial-rate 4000
         """
     )
     
@@ -297,6 +857,10 @@ Ejemplos de uso:
     parser.add_argument('--timestamp', help='Timestamp exacto del backup (YYYYMMDD-HHMMSS)')
     parser.add_argument('--list', action='store_true', help='Solo listar backups disponibles')
     parser.add_argument('--dry-run', action='store_true', help='Simular sin hacer cambios')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Hilos escribiendo en paralelo (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--initial-rate', type=float, default=DEFAULT_INITIAL_RATE,
+                        help=f'Tasa inicial en items/s, se ajusta con el throttling (default: {DEFAULT_INITIAL_RATE})')
     
     args = parser.parse_args()
     
@@ -315,14 +879,20 @@ Ejemplos de uso:
         return
     
     # Restaurar
-    success = restore_table(
+    result = restore_table(
         table_name=args.table,
         backup_date=args.date,
         backup_timestamp=args.timestamp,
-        dry_run=args.dry_run
+        dry_run=args.dry_run,
+        workers=args.workers,
+        initial_rate=args.initial_rate
     )
     
-    sys.exit(0 if success else 1)
+    if 'items_per_second' in result:
+        print(f"⏱ {result['written']:,} items en {result['elapsed_seconds']:.1f}s "
+              f"({result['items_per_second']:,.0f} items/s)")
+    
+    sys.exit(0 if result['success'] else 1)
 
 
 if __name__ == '__main__':
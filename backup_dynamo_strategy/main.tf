@@ -152,10 +152,19 @@ resource "aws_iam_role_policy" "s3_access" {
         Action = [
           "s3:PutObject",
           "s3:PutObjectAcl",
-          "s3:GetObject"
+          "s3:GetObject",
+          "s3:AbortMultipartUpload"
         ]
         Resource = "${aws_s3_bucket.backup_bucket.arn}/*"
       },
+      {
+        # Checkpoints de backups reanudables (se borran al terminar)
+        Effect = "Allow"
+        Action = [
+          "s3:DeleteObject"
+        ]
+        Resource = "${aws_s3_bucket.backup_bucket.arn}/backups/_checkpoints/*"
+      },
       {
         Effect = "Allow"
         Action = [
@@ -206,6 +215,20 @@ data "archive_file" "lambda_zip" {
   source_dir  = "${path.module}/lambdas/src/backup_tablas_dynamo"
 }
 
+# Layer con el código compartido (dynamo_codec)
+data "archive_file" "common_layer_zip" {
+  type        = "zip"
+  output_path = "${path.module}/lambdas/src_zip/common_layer.zip"
+  source_dir  = "${path.module}/lambdas/src/layers/common_layer"
+}
+
+resource "aws_lambda_layer_version" "common_layer" {
+  filename            = data.archive_file.common_layer_zip.output_path
+  layer_name          = "${var.project_name}-common-layer-${var.environment}"
+  source_code_hash    = data.archive_file.common_layer_zip.output_base64sha256
+  compatible_runtimes = ["python3.11"]
+}
+
 resource "aws_lambda_function" "backup_function" {
   filename         = data.archive_file.lambda_zip.output_path
   function_name    = "${var.project_name}-dynamodb-backup-${var.environment}"
@@ -216,12 +239,19 @@ resource "aws_lambda_function" "backup_function" {
   timeout         = 900  # 15 minutos (máximo permitido)
   memory_size     = 1024 # 1GB RAM
 
+  layers = [aws_lambda_layer_version.common_layer.arn]
+
   environment {
     variables = {
       BACKUP_BUCKET        = aws_s3_bucket.backup_bucket.bucket
       BACKUP_PREFIX        = "backups"
       COMPRESSION_ENABLED  = var.enable_compression
       AWS_REGION_ID          = data.aws_region.current.id
+      MAX_SCAN_SEGMENTS      = var.max_scan_segments
+      BACKUP_CHUNK_SIZE_MB   = var.backup_chunk_size_mb
+      MAX_PARALLEL_TABLES    = var.max_parallel_tables
+      TABLE_TIMEOUT_SECONDS  = var.table_timeout_seconds
+      MAX_BACKUP_RESUMES     = var.max_backup_resumes
     }
   }
 
@@ -231,6 +261,28 @@ resource "aws_lambda_function" "backup_function" {
   }
 }
 
+# La función se vuelve a invocar para continuar un backup desde su checkpoint
+resource "aws_iam_role_policy" "self_invoke" {
+  name = "self-invoke"
+  role = aws_iam_role.backup_lambda_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "lambda:InvokeFunction"
+        ]
+        Resource = [
+          aws_lambda_function.backup_function.arn,
+          "${aws_lambda_function.backup_function.arn}:*"
+        ]
+      }
+    ]
+  })
+}
+
 # CloudWatch Log Group con retención
 resource "aws_cloudwatch_log_group" "backup_logs" {
   name              = "/aws/lambda/${aws_lambda_function.backup_function.function_name}"
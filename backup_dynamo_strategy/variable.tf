@@ -35,6 +35,36 @@ variable "enable_compression" {
   default     = true
 }
 
+variable "max_scan_segments" {
+  description = "Máximo de segmentos del Scan paralelo (uno por cada 256 MB), repartidos entre las tablas en curso"
+  type        = number
+  default     = 16
+}
+
+variable "backup_chunk_size_mb" {
+  description = "Tamaño (MB sin comprimir) de cada parte JSONL del backup"
+  type        = number
+  default     = 64
+}
+
+variable "max_parallel_tables" {
+  description = "Tablas respaldadas al mismo tiempo, la más grande primero"
+  type        = number
+  default     = 4
+}
+
+variable "table_timeout_seconds" {
+  description = "Tiempo máximo de backup por tabla (0 = solo el timeout de la Lambda)"
+  type        = number
+  default     = 0
+}
+
+variable "max_backup_resumes" {
+  description = "Veces que el backup puede continuar en otra invocación al acercarse al timeout (0 = sin checkpoints)"
+  type        = number
+  default     = 8
+}
+
 variable "alert_email" {
   description = "Email para notificaciones de errores"
   type        = string
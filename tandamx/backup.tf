@@ -18,6 +18,7 @@
 #   3. EventBridge Rule para programación
 #   4. SNS Topic para notificaciones
 #   5. IAM Roles y Policies necesarios
+#   6. Archivador de DynamoDB Streams para los backups incrementales
 #
 # Autor: Jose - Senior SOA Architect
 # Versión: 1.0
@@ -111,7 +112,35 @@ resource "aws_s3_bucket_lifecycle_configuration" "backup_lifecycle" {
     }
   }
 
-  # Regla 3: Limpiar uploads incompletos
+  # Regla 3: El archivo de streams solo se lee en el siguiente delta
+  rule {
+    id     = "expire-stream-archive"
+    status = "Enabled"
+
+    filter {
+      prefix = "${var.environment}/streams/"
+    }
+
+    expiration {
+      days = var.stream_archive_retention_days
+    }
+  }
+
+  # Regla 4: Las exportaciones Parquet se consultan, no se archivan en Glacier
+  rule {
+    id     = "expire-parquet-exports"
+    status = "Enabled"
+
+    filter {
+      prefix = "analytics/${var.environment}/"
+    }
+
+    expiration {
+      days = var.parquet_export_retention_days
+    }
+  }
+
+  # Regla 5: Limpiar uploads incompletos
   rule {
     id     = "cleanup-incomplete-uploads"
     status = "Enabled"
@@ -219,6 +248,7 @@ resource "aws_iam_role_policy" "backup_lambda_dynamodb_policy" {
           "dynamodb:Scan",
           "dynamodb:DescribeTable",
           "dynamodb:GetItem",
+          "dynamodb:BatchGetItem",
           "dynamodb:Query"
         ]
         Resource = [
@@ -230,6 +260,29 @@ resource "aws_iam_role_policy" "backup_lambda_dynamodb_policy" {
   })
 }
 
+# Policy para leer los streams que se archivan (backups incrementales)
+resource "aws_iam_role_policy" "backup_lambda_streams_policy" {
+  count = length(local.backup_stream_tables) > 0 ? 1 : 0
+  name  = "dynamodb-streams-read"
+  role  = aws_iam_role.backup_lambda_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:DescribeStream",
+          "dynamodb:GetRecords",
+          "dynamodb:GetShardIterator",
+          "dynamodb:ListStreams"
+        ]
+        Resource = values(local.backup_stream_tables)
+      }
+    ]
+  })
+}
+
 # Policy para acceder a S3
 resource "aws_iam_role_policy" "backup_lambda_s3_policy" {
   name = "s3-access"
@@ -305,8 +358,18 @@ resource "aws_iam_role_policy" "backup_lambda_logs_policy" {
 # Empaquetar código de Lambda
 data "archive_file" "backup_lambda_zip" {
   type        = "zip"
-  source_file = "${path.module}/src/lambdas/backup_system/backup_function.py"
   output_path = "${path.module}/src/lambdas/backup_system/backup_function.zip"
+
+  source {
+    content  = file("${path.module}/src/lambdas/backup_system/backup_function.py")
+    filename = "backup_function.py"
+  }
+
+  # Exportación Parquet (importado por backup_function)
+  source {
+    content  = file("${path.module}/src/lambdas/backup_system/parquet_export.py")
+    filename = "parquet_export.py"
+  }
 }
 
 resource "aws_lambda_function" "backup_function" {
@@ -319,12 +382,24 @@ resource "aws_lambda_function" "backup_function" {
   timeout         = var.lambda_timeout
   memory_size     = var.lambda_memory
 
+  # Temporales de la exportación Parquet
+  ephemeral_storage {
+    size = var.backup_ephemeral_storage
+  }
+
+  # pyarrow para la exportación Parquet (opcional; sin él se usa el escritor en Python)
+  layers = var.parquet_layer_arn != "" ? [var.parquet_layer_arn] : []
+
   environment {
     variables = {
       BACKUP_BUCKET  = aws_s3_bucket.backup_bucket.id
       ENVIRONMENT    = var.environment
       TABLES_CONFIG  = jsonencode(var.tables_config)
       SNS_TOPIC_ARN  = aws_sns_topic.backup_notifications.arn
+
+      MAX_PARALLEL_TABLES   = var.backup_max_parallel_tables
+      TABLE_TIMEOUT_SECONDS = var.backup_table_timeout
+      PARQUET_EXPORT        = jsonencode(var.parquet_export_tables)
     }
   }
 
@@ -382,6 +457,193 @@ resource "aws_lambda_permission" "allow_eventbridge" {
   source_arn    = aws_cloudwatch_event_rule.backup_schedule.arn
 }
 
+# Backups incrementales: solo los cambios desde el último backup de cada tabla
+resource "aws_cloudwatch_event_rule" "incremental_backup_schedule" {
+  count               = var.incremental_backup_schedule != "" ? 1 : 0
+  name                = "tandas-incremental-backup-schedule-${var.environment}"
+  description         = "Trigger backup incremental de DynamoDB para TandasMX"
+  schedule_expression = var.incremental_backup_schedule
+  state               = "ENABLED"
+
+  tags = {
+    Name        = "TandasMX Incremental Backup Schedule"
+    Environment = var.environment
+  }
+}
+
+resource "aws_cloudwatch_event_target" "incremental_backup_lambda_target" {
+  count     = var.incremental_backup_schedule != "" ? 1 : 0
+  rule      = aws_cloudwatch_event_rule.incremental_backup_schedule[0].name
+  target_id = "IncrementalBackupLambdaTarget"
+  arn       = aws_lambda_function.backup_function.arn
+
+  input = jsonencode({
+    source    = "eventbridge-schedule"
+    automated = true
+    mode      = "incremental"
+  })
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_incremental" {
+  count         = var.incremental_backup_schedule != "" ? 1 : 0
+  statement_id  = "AllowIncrementalExecutionFromEventBridge"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.backup_function.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.incremental_backup_schedule[0].arn
+}
+
+# ============================================================================
+# Verificación de Backups (checksums, conteos y muestra contra las tablas)
+# ============================================================================
+
+data "archive_file" "verify_lambda_zip" {
+  type        = "zip"
+  source_file = "${path.module}/src/lambdas/backup_system/verify_backup.py"
+  output_path = "${path.module}/src/lambdas/backup_system/verify_backup.zip"
+}
+
+resource "aws_lambda_function" "verify_function" {
+  filename         = data.archive_file.verify_lambda_zip.output_path
+  function_name    = "tandas-backup-verify-${var.environment}"
+  role            = aws_iam_role.backup_lambda_role.arn
+  handler         = "verify_backup.lambda_handler"
+  source_code_hash = data.archive_file.verify_lambda_zip.output_base64sha256
+  runtime         = "python3.12"
+  timeout         = var.lambda_timeout
+  memory_size     = var.lambda_memory
+
+  environment {
+    variables = {
+      BACKUP_BUCKET  = aws_s3_bucket.backup_bucket.id
+      ENVIRONMENT    = var.environment
+      TABLES_CONFIG  = jsonencode(var.tables_config)
+      SNS_TOPIC_ARN  = aws_sns_topic.backup_notifications.arn
+
+      VERIFY_SAMPLE_SIZE = var.verify_sample_size
+    }
+  }
+
+  tags = {
+    Name        = "TandasMX Backup Verify Function"
+    Environment = var.environment
+  }
+}
+
+resource "aws_cloudwatch_log_group" "verify_lambda_logs" {
+  name              = "/aws/lambda/${aws_lambda_function.verify_function.function_name}"
+  retention_in_days = 30
+
+  tags = {
+    Name        = "TandasMX Backup Verify Lambda Logs"
+    Environment = var.environment
+  }
+}
+
+resource "aws_cloudwatch_event_rule" "verify_backup_schedule" {
+  count               = var.verify_backup_schedule != "" ? 1 : 0
+  name                = "tandas-backup-verify-schedule-${var.environment}"
+  description         = "Trigger verificación de los backups de DynamoDB para TandasMX"
+  schedule_expression = var.verify_backup_schedule
+  state               = "ENABLED"
+
+  tags = {
+    Name        = "TandasMX Backup Verify Schedule"
+    Environment = var.environment
+  }
+}
+
+resource "aws_cloudwatch_event_target" "verify_lambda_target" {
+  count     = var.verify_backup_schedule != "" ? 1 : 0
+  rule      = aws_cloudwatch_event_rule.verify_backup_schedule[0].name
+  target_id = "BackupVerifyLambdaTarget"
+  arn       = aws_lambda_function.verify_function.arn
+
+  input = jsonencode({
+    source    = "eventbridge-schedule"
+    automated = true
+  })
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_verify" {
+  count         = var.verify_backup_schedule != "" ? 1 : 0
+  statement_id  = "AllowVerifyExecutionFromEventBridge"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.verify_function.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.verify_backup_schedule[0].arn
+}
+
+# ============================================================================
+# Archivador de DynamoDB Streams (backups incrementales)
+# ============================================================================
+
+locals {
+  # Streams disponibles por tabla (definidos en main.tf)
+  backup_table_streams = {
+    tandas            = aws_dynamodb_table.tandas.stream_arn
+    participantes     = aws_dynamodb_table.participantes.stream_arn
+    pagos             = aws_dynamodb_table.pagos.stream_arn
+    links_registro    = aws_dynamodb_table.links_registro.stream_arn
+    notificaciones_v2 = aws_dynamodb_table.notificaciones_v2.stream_arn
+    usuarios_admin    = aws_dynamodb_table.usuarios_admin.stream_arn
+  }
+
+  # Tablas respaldadas con delta_source = "stream"
+  backup_stream_tables = {
+    for table in var.tables_config : table.name => local.backup_table_streams[table.name]
+    if table.delta_source == "stream"
+  }
+}
+
+# Mismo paquete que el backup, otro handler
+resource "aws_lambda_function" "stream_archive_function" {
+  count            = length(local.backup_stream_tables) > 0 ? 1 : 0
+  filename         = data.archive_file.backup_lambda_zip.output_path
+  function_name    = "tandas-dynamodb-stream-archive-${var.environment}"
+  role            = aws_iam_role.backup_lambda_role.arn
+  handler         = "backup_function.stream_archive_handler"
+  source_code_hash = data.archive_file.backup_lambda_zip.output_base64sha256
+  runtime         = "python3.12"
+  # Debe ser menor que STREAM_ARCHIVE_SETTLE_SECONDS (ver backup_function)
+  timeout         = 60
+  memory_size     = 256
+
+  environment {
+    variables = {
+      BACKUP_BUCKET  = aws_s3_bucket.backup_bucket.id
+      ENVIRONMENT    = var.environment
+      TABLES_CONFIG  = jsonencode(var.tables_config)
+    }
+  }
+
+  tags = {
+    Name        = "TandasMX Stream Archive Function"
+    Environment = var.environment
+  }
+}
+
+resource "aws_cloudwatch_log_group" "stream_archive_lambda_logs" {
+  count             = length(local.backup_stream_tables) > 0 ? 1 : 0
+  name              = "/aws/lambda/${aws_lambda_function.stream_archive_function[0].function_name}"
+  retention_in_days = 30
+
+  tags = {
+    Name        = "TandasMX Stream Archive Lambda Logs"
+    Environment = var.environment
+  }
+}
+
+resource "aws_lambda_event_source_mapping" "stream_archive" {
+  for_each                           = local.backup_stream_tables
+  event_source_arn                   = each.value
+  function_name                      = aws_lambda_function.stream_archive_function[0].arn
+  starting_position                  = "TRIM_HORIZON"
+  batch_size                         = var.stream_archive_batch_size
+  maximum_batching_window_in_seconds = 60
+  maximum_retry_attempts             = -1
+}
+
 # ============================================================================
 # CloudWatch Alarms para Monitoreo
 # ============================================================================
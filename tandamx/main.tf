@@ -44,6 +44,10 @@ resource "aws_dynamodb_table" "tandas" {
     projection_type = "ALL"
   }
   
+  # Stream para los backups incrementales (backup_function.stream_archive_handler)
+  stream_enabled   = true
+  stream_view_type = "NEW_IMAGE"
+
   tags = {
     Name        = "tandas"
     Environment = "dev"
@@ -69,6 +73,11 @@ resource "aws_dynamodb_table" "participantes" {
     type = "S"
   }
   
+  # Stream para mantener las vistas por tanda (lambda_vistas) y para los
+  # backups incrementales
+  stream_enabled   = true
+  stream_view_type = "NEW_IMAGE"
+
   tags = {
     Name        = "participantes"
     Environment = "dev"
@@ -94,6 +103,11 @@ resource "aws_dynamodb_table" "pagos" {
     type = "S"
   }
   
+  # Stream para mantener las vistas por tanda (lambda_vistas) y para los
+  # backups incrementales
+  stream_enabled   = true
+  stream_view_type = "NEW_IMAGE"
+
   tags = {
     Name        = "pagos"
     Environment = "dev"
@@ -102,7 +116,11 @@ resource "aws_dynamodb_table" "pagos" {
 }
 
 
-# Tabla notificaciones
+# Tabla notificaciones (LEGADO)
+# Solo hash key id: cada notificación sobrescribía la anterior de la tanda.
+# Se conserva sin cambios de esquema (cambiar la key reemplazaría la tabla
+# con sus datos); las Lambdas ya escriben en notificaciones_v2. Se elimina
+# cuando termine la migración (ver lambda_notificaciones/migrar_notificaciones.py).
 resource "aws_dynamodb_table" "notificaciones" {
   name           = "notificaciones"
   billing_mode   = "PAY_PER_REQUEST"
@@ -121,6 +139,36 @@ resource "aws_dynamodb_table" "notificaciones" {
 }
 
 
+# Tabla notificaciones_v2
+# Una fila por notificación: sort key con prefijo de fecha (orden de envío)
+resource "aws_dynamodb_table" "notificaciones_v2" {
+  name           = "notificaciones_v2"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "id"
+  range_key      = "notificacionId"
+  
+  attribute {
+    name = "id"
+    type = "S"
+  }
+
+  attribute {
+    name = "notificacionId"
+    type = "S"
+  }
+  
+  # Stream para los backups incrementales (backup_function.stream_archive_handler)
+  stream_enabled   = true
+  stream_view_type = "NEW_IMAGE"
+
+  tags = {
+    Name        = "notificaciones_v2"
+    Environment = "dev"
+    Project     = "notificaciones"
+  }
+}
+
+
 # Tabla usuarios_admin
 resource "aws_dynamodb_table" "usuarios_admin" {
   name           = "usuarios_admin"
@@ -144,6 +192,10 @@ resource "aws_dynamodb_table" "usuarios_admin" {
     projection_type = "ALL"
   }
   
+  # Stream para los backups incrementales (backup_function.stream_archive_handler)
+  stream_enabled   = true
+  stream_view_type = "NEW_IMAGE"
+
   tags = {
     Name        = "usuarios_admin"
     Environment = "dev"
@@ -180,12 +232,133 @@ resource "aws_dynamodb_table" "links_registro" {
     enabled        = true
   }
 
+  # Stream para los backups incrementales (incluye las eliminaciones por TTL)
+  stream_enabled   = true
+  stream_view_type = "NEW_IMAGE"
+
   tags = {
     Name        = "TandasLinksRegistro"
     Environment = var.environment
   }
 }
 
+# Tabla con los contadores precalculados de cada tanda (id = tandaId)
+resource "aws_dynamodb_table" "estadisticas_tandas" {
+  name           = "estadisticas_tandas"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "id"
+
+  attribute {
+    name = "id"
+    type = "S"
+  }
+
+  tags = {
+    Name        = "TandasEstadisticas"
+    Environment = var.environment
+  }
+}
+
+# Tabla con el avance de las eliminaciones en cascada (reanudables)
+resource "aws_dynamodb_table" "trabajos_eliminacion" {
+  name           = "trabajos_eliminacion"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "trabajoId"
+
+  attribute {
+    name = "trabajoId"
+    type = "S"
+  }
+
+  # TTL para auto-eliminación
+  ttl {
+    attribute_name = "ttl"
+    enabled        = true
+  }
+
+  tags = {
+    Name        = "TandasTrabajosEliminacion"
+    Environment = var.environment
+  }
+}
+
+# Tabla con la vista desnormalizada de cada tanda, mantenida desde los
+# streams de participantes y pagos: partición id = tandaId, un item por
+# entidad (seccion) más su '#meta'. Reemplaza a vistas_tandas (un item por
+# tanda, limitado a 400 KB); sus datos son derivados y lambda_vistas los
+# vuelve a sembrar, así que no hay nada que migrar.
+resource "aws_dynamodb_table" "vistas_tandas_v2" {
+  name           = "vistas_tandas_v2"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "id"
+  range_key      = "seccion"
+
+  attribute {
+    name = "id"
+    type = "S"
+  }
+
+  attribute {
+    name = "seccion"
+    type = "S"
+  }
+
+  # Las lápidas de entidades eliminadas expiran cuando el stream ya no
+  # puede reentregar eventos anteriores
+  ttl {
+    attribute_name = "ttl"
+    enabled        = true
+  }
+
+  tags = {
+    Name        = "TandasVistas"
+    Environment = var.environment
+  }
+}
+
+# Tabla con el estado de los recordatorios masivos (trabajos en cola)
+resource "aws_dynamodb_table" "trabajos_recordatorios" {
+  name           = "trabajos_recordatorios"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "jobId"
+
+  attribute {
+    name = "jobId"
+    type = "S"
+  }
+
+  # TTL para auto-eliminación
+  ttl {
+    attribute_name = "ttl"
+    enabled        = true
+  }
+
+  tags = {
+    Name        = "TandasTrabajosRecordatorios"
+    Environment = var.environment
+  }
+}
+
+
+# -------------------------------------------------------------------
+# Cola SQS para recordatorios masivos
+# -------------------------------------------------------------------
+resource "aws_sqs_queue" "recordatorios_dlq" {
+  name                      = "tandamx-recordatorios-dlq"
+  message_retention_seconds = 1209600 # 14 días
+}
+
+resource "aws_sqs_queue" "recordatorios" {
+  name                       = "tandamx-recordatorios"
+  visibility_timeout_seconds = 360 # 6x el timeout del worker
+  message_retention_seconds  = 86400
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.recordatorios_dlq.arn
+    maxReceiveCount     = 3
+  })
+}
+
 
 # -------------------------------------------------------------------
 # Rol para Lambda
@@ -252,6 +425,19 @@ resource "aws_iam_policy" "dynamodb_rw_policy" {
   policy = jsonencode({
     Version = "2012-10-17"
     Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:DescribeStream",
+          "dynamodb:GetRecords",
+          "dynamodb:GetShardIterator",
+          "dynamodb:ListStreams"
+        ]
+        Resource = [
+          aws_dynamodb_table.participantes.stream_arn,
+          aws_dynamodb_table.pagos.stream_arn
+        ]
+      },
       {
         Effect = "Allow"
         Action = [
@@ -274,10 +460,16 @@ resource "aws_iam_policy" "dynamodb_rw_policy" {
           "arn:aws:dynamodb:*:*:table/pagos/index/*",
           "arn:aws:dynamodb:*:*:table/notificaciones",
           "arn:aws:dynamodb:*:*:table/notificaciones/index/*",
+          "arn:aws:dynamodb:*:*:table/notificaciones_v2",
+          "arn:aws:dynamodb:*:*:table/notificaciones_v2/index/*",
           "arn:aws:dynamodb:*:*:table/usuarios_admin",
           "arn:aws:dynamodb:*:*:table/usuarios_admin/index/*",
           "arn:aws:dynamodb:*:*:table/links_registro",
-          "arn:aws:dynamodb:*:*:table/links_registro/index/*"
+          "arn:aws:dynamodb:*:*:table/links_registro/index/*",
+          "arn:aws:dynamodb:*:*:table/trabajos_recordatorios",
+          "arn:aws:dynamodb:*:*:table/estadisticas_tandas",
+          "arn:aws:dynamodb:*:*:table/vistas_tandas_v2",
+          "arn:aws:dynamodb:*:*:table/trabajos_eliminacion"
         ]
       }
     ]
@@ -292,6 +484,28 @@ resource "aws_iam_role_policy_attachment" "lambda_dynamodb_access" {
   policy_arn = aws_iam_policy.dynamodb_rw_policy.arn
 }
 
+# Policy para la cola de recordatorios (productor y worker)
+resource "aws_iam_role_policy" "lambda_sqs_policy" {
+  name = "lambda-sqs-tandamx-policy"
+  role = aws_iam_role.lambda_exec_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "sqs:SendMessage",
+          "sqs:ReceiveMessage",
+          "sqs:DeleteMessage",
+          "sqs:GetQueueAttributes"
+        ]
+        Resource = aws_sqs_queue.recordatorios.arn
+      }
+    ]
+  })
+}
+
 
 
 # ========================================
@@ -430,6 +644,13 @@ data "archive_file" "lambda_estadisticas" {
   output_path = "${path.module}/build/lambda_estadisticas.zip"
 }
 
+# Comprimir código de vistas
+data "archive_file" "lambda_vistas" {
+  type        = "zip"
+  source_dir = "${path.module}/src/lambdas/lambda_vistas"
+  output_path = "${path.module}/build/lambda_vistas.zip"
+}
+
 
 
 # -------------------------------------------------------------------
@@ -443,13 +664,17 @@ resource "aws_lambda_function" "lambda_auth" {
   source_code_hash = data.archive_file.lambda_auth.output_base64sha256
   runtime         = "python3.12"
   timeout         = 30
-  memory_size     = 256
+  # El CPU escala con la memoria: define cuánto tarda el hash de contraseñas
+  memory_size     = var.auth_lambda_memory
   
   environment {
     variables = {
       USUARIOS_TABLE    = "usuarios_admin"
       JWT_SECRET        = var.jwt_secret
       JWT_REFRESH_SECRET = var.jwt_refresh_secret
+      PASSWORD_HASH_ALGORITMO   = var.password_hash_algoritmo
+      PASSWORD_HASH_COSTO       = var.password_hash_costo
+      PASSWORD_HASH_OBJETIVO_MS = var.password_hash_objetivo_ms
     }
   }
   
@@ -462,6 +687,38 @@ resource "aws_lambda_function" "lambda_auth" {
   }
 }
 
+# -------------------------------------------------------------------
+# Lambda de calibración del hash de contraseñas (mismo paquete, otro
+# handler). calibrar_hash.py le cambia la memoria para medir el costo
+# por tamaño; no recibe tráfico.
+# -------------------------------------------------------------------
+resource "aws_lambda_function" "auth_calibrar_hash" {
+  filename         = data.archive_file.lambda_auth.output_path
+  function_name    = "lambda-auth-calibrar-hash"
+  role            = aws_iam_role.lambda_exec_role.arn
+  handler          = "calibrar_hash.lambda_handler"
+  source_code_hash = data.archive_file.lambda_auth.output_base64sha256
+  runtime         = "python3.12"
+  timeout         = 300
+  memory_size     = var.auth_lambda_memory
+
+  environment {
+    variables = {
+      PASSWORD_HASH_ALGORITMO   = var.password_hash_algoritmo
+      PASSWORD_HASH_OBJETIVO_MS = var.password_hash_objetivo_ms
+    }
+  }
+
+  # La memoria la mueve calibrar_hash.py durante la medición
+  lifecycle {
+    ignore_changes = [memory_size]
+  }
+
+  tags = {
+    Name = "lambda-auth-calibrar-hash"
+  }
+}
+
 
 
 # -------------------------------------------------------------------
@@ -483,8 +740,12 @@ resource "aws_lambda_function" "lambda_tandas" {
       USUARIOS_TABLE     = aws_dynamodb_table.usuarios_admin.name
       PARTICIPANTES_TABLE = aws_dynamodb_table.participantes.name
       PAGOS_TABLE        = aws_dynamodb_table.pagos.name
+      ESTADISTICAS_TABLE = aws_dynamodb_table.estadisticas_tandas.name
+      VISTAS_TABLE       = aws_dynamodb_table.vistas_tandas_v2.name
+      TRABAJOS_ELIMINACION_TABLE = aws_dynamodb_table.trabajos_eliminacion.name
       JWT_SECRET         = var.jwt_secret
       APP_URL            = var.app_url
+      DYNAMO_MAX_CONCURRENCIA = var.dynamo_max_concurrencia
     }
   }
 
@@ -515,6 +776,8 @@ resource "aws_lambda_function" "lambda_participantes" {
     variables = {
       TANDAS_TABLE       = aws_dynamodb_table.tandas.name
       PARTICIPANTES_TABLE = aws_dynamodb_table.participantes.name
+      PAGOS_TABLE        = aws_dynamodb_table.pagos.name
+      ESTADISTICAS_TABLE = aws_dynamodb_table.estadisticas_tandas.name
       JWT_SECRET         = var.jwt_secret
     }
   }
@@ -547,6 +810,8 @@ resource "aws_lambda_function" "lambda_pagos" {
       TANDAS_TABLE       = aws_dynamodb_table.tandas.name
       PARTICIPANTES_TABLE = aws_dynamodb_table.participantes.name
       PAGOS_TABLE        = aws_dynamodb_table.pagos.name
+      ESTADISTICAS_TABLE = aws_dynamodb_table.estadisticas_tandas.name
+      VISTAS_TABLE       = aws_dynamodb_table.vistas_tandas_v2.name
       JWT_SECRET         = var.jwt_secret
     }
   }
@@ -578,8 +843,12 @@ resource "aws_lambda_function" "lambda_notificaciones" {
     variables = {
       TANDAS_TABLE         = aws_dynamodb_table.tandas.name
       PARTICIPANTES_TABLE   = aws_dynamodb_table.participantes.name
-      NOTIFICACIONES_TABLE  = aws_dynamodb_table.notificaciones.name
+      NOTIFICACIONES_TABLE  = aws_dynamodb_table.notificaciones_v2.name
+      TRABAJOS_TABLE        = aws_dynamodb_table.trabajos_recordatorios.name
+      RECORDATORIOS_QUEUE_URL = aws_sqs_queue.recordatorios.url
       JWT_SECRET           = var.jwt_secret
+      SMS_TASA_POR_SEGUNDO = var.sms_tasa_por_segundo
+      SMS_MAX_WORKERS      = var.sms_max_workers
     }
   }
 
@@ -592,6 +861,159 @@ resource "aws_lambda_function" "lambda_notificaciones" {
   }
 }
 
+# -------------------------------------------------------------------
+# Lambda WORKER de recordatorios masivos (mismo paquete, otro handler)
+# -------------------------------------------------------------------
+resource "aws_lambda_function" "recordatorios_worker" {
+  filename         = data.archive_file.lambda_notificaciones.output_path
+  function_name    = "lambda-recordatorios-worker"
+  role            = aws_iam_role.lambda_exec_role.arn
+  handler          = "worker.lambda_handler"
+  source_code_hash = data.archive_file.lambda_notificaciones.output_base64sha256
+  runtime         = "python3.12"
+  timeout         = 60
+  memory_size     = 256
+  
+  environment {
+    variables = {
+      TANDAS_TABLE         = aws_dynamodb_table.tandas.name
+      PARTICIPANTES_TABLE   = aws_dynamodb_table.participantes.name
+      NOTIFICACIONES_TABLE  = aws_dynamodb_table.notificaciones_v2.name
+      TRABAJOS_TABLE        = aws_dynamodb_table.trabajos_recordatorios.name
+      JWT_SECRET           = var.jwt_secret
+      # La cuota de SNS se reparte entre los workers concurrentes
+      SMS_TASA_POR_SEGUNDO = var.sms_tasa_por_segundo / var.recordatorios_worker_concurrencia
+      SMS_MAX_WORKERS      = var.sms_max_workers
+    }
+  }
+
+  layers = [
+    aws_lambda_layer_version.auth_layer.arn
+  ]
+  
+  tags = {
+    Name = "lambda-recordatorios-worker"
+  }
+}
+
+resource "aws_lambda_event_source_mapping" "recordatorios_worker" {
+  event_source_arn        = aws_sqs_queue.recordatorios.arn
+  function_name           = aws_lambda_function.recordatorios_worker.arn
+  batch_size              = 10
+  function_response_types = ["ReportBatchItemFailures"]
+
+  scaling_config {
+    maximum_concurrency = var.recordatorios_worker_concurrencia
+  }
+}
+
+
+# -------------------------------------------------------------------
+# Lambda RECONCILIACIÓN de estadísticas (mismo paquete, otro handler)
+# -------------------------------------------------------------------
+resource "aws_lambda_function" "estadisticas_reconciliacion" {
+  filename         = data.archive_file.lambda_estadisticas.output_path
+  function_name    = "tanda_manager_estadisticas_reconciliacion"
+  role            = aws_iam_role.lambda_exec_role.arn
+  handler          = "reconciliacion.lambda_handler"
+  source_code_hash = data.archive_file.lambda_estadisticas.output_base64sha256
+  runtime         = "python3.12"
+  timeout         = 300
+  memory_size     = 256
+  
+  environment {
+    variables = {
+      TANDAS_TABLE       = aws_dynamodb_table.tandas.name
+      PARTICIPANTES_TABLE = aws_dynamodb_table.participantes.name
+      PAGOS_TABLE        = aws_dynamodb_table.pagos.name
+      ESTADISTICAS_TABLE = aws_dynamodb_table.estadisticas_tandas.name
+      JWT_SECRET         = var.jwt_secret
+    }
+  }
+
+  layers = [
+    aws_lambda_layer_version.auth_layer.arn
+  ]
+  
+  tags = {
+    Name = "tanda-manager-estadisticas-reconciliacion"
+  }
+}
+
+resource "aws_cloudwatch_event_rule" "estadisticas_reconciliacion" {
+  name                = "tandas-estadisticas-reconciliacion"
+  description         = "Reconstruye las estadísticas precalculadas y reporta desviaciones"
+  schedule_expression = var.reconciliacion_schedule
+  state               = "ENABLED"
+}
+
+resource "aws_cloudwatch_event_target" "estadisticas_reconciliacion" {
+  rule      = aws_cloudwatch_event_rule.estadisticas_reconciliacion.name
+  target_id = "EstadisticasReconciliacionTarget"
+  arn       = aws_lambda_function.estadisticas_reconciliacion.arn
+}
+
+resource "aws_lambda_permission" "estadisticas_reconciliacion" {
+  statement_id  = "AllowExecutionFromEventBridge"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.estadisticas_reconciliacion.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.estadisticas_reconciliacion.arn
+}
+
+
+# ========================================
+# LAMBDA: VISTAS (consumidor de DynamoDB Streams)
+# ========================================
+resource "aws_lambda_function" "lambda_vistas" {
+  filename         = data.archive_file.lambda_vistas.output_path
+  function_name    = "tanda_manager_vistas"
+  role            = aws_iam_role.lambda_exec_role.arn
+  handler          = "handler.lambda_handler"
+  source_code_hash = data.archive_file.lambda_vistas.output_base64sha256
+  runtime         = "python3.12"
+  timeout         = 60
+  memory_size     = 256
+  
+  environment {
+    variables = {
+      TANDAS_TABLE            = aws_dynamodb_table.tandas.name
+      PARTICIPANTES_TABLE     = aws_dynamodb_table.participantes.name
+      PAGOS_TABLE             = aws_dynamodb_table.pagos.name
+      VISTAS_TABLE            = aws_dynamodb_table.vistas_tandas_v2.name
+      DYNAMO_MAX_CONCURRENCIA = var.dynamo_max_concurrencia
+    }
+  }
+
+  layers = [
+    aws_lambda_layer_version.auth_layer.arn
+  ]
+  
+  tags = {
+    Name = "tanda-manager-vistas"
+  }
+}
+
+resource "aws_lambda_event_source_mapping" "vistas_participantes" {
+  event_source_arn                   = aws_dynamodb_table.participantes.stream_arn
+  function_name                      = aws_lambda_function.lambda_vistas.arn
+  starting_position                  = "TRIM_HORIZON"
+  batch_size                         = var.vistas_stream_batch_size
+  maximum_batching_window_in_seconds = 1
+  maximum_retry_attempts             = 10
+  function_response_types            = ["ReportBatchItemFailures"]
+}
+
+resource "aws_lambda_event_source_mapping" "vistas_pagos" {
+  event_source_arn                   = aws_dynamodb_table.pagos.stream_arn
+  function_name                      = aws_lambda_function.lambda_vistas.arn
+  starting_position                  = "TRIM_HORIZON"
+  batch_size                         = var.vistas_stream_batch_size
+  maximum_batching_window_in_seconds = 1
+  maximum_retry_attempts             = 10
+  function_response_types            = ["ReportBatchItemFailures"]
+}
+
 
 # ========================================
 # LAMBDA: AUTHORIZER
@@ -639,6 +1061,7 @@ resource "aws_lambda_function" "estadisticas" {
       TANDAS_TABLE       = aws_dynamodb_table.tandas.name
       PARTICIPANTES_TABLE = aws_dynamodb_table.participantes.name
       PAGOS_TABLE        = aws_dynamodb_table.pagos.name
+      ESTADISTICAS_TABLE = aws_dynamodb_table.estadisticas_tandas.name
       JWT_SECRET         = var.jwt_secret
     }
   }
@@ -994,6 +1417,14 @@ resource "aws_apigatewayv2_route" "notificaciones_recordatorio_masivo" {
   authorizer_id      = aws_apigatewayv2_authorizer.jwt.id
 }
 
+resource "aws_apigatewayv2_route" "notificaciones_recordatorio_masivo_estado" {
+  api_id    = aws_apigatewayv2_api.main.id
+  route_key = "GET /tandas/{tandaId}/notificaciones/recordatorio-masivo/{jobId}"
+  target    = "integrations/${aws_apigatewayv2_integration.notificaciones.id}"
+  authorization_type = "CUSTOM"
+  authorizer_id      = aws_apigatewayv2_authorizer.jwt.id
+}
+
 resource "aws_apigatewayv2_route" "notificaciones_obtener" {
   api_id    = aws_apigatewayv2_api.main.id
   route_key = "GET /tandas/{tandaId}/notificaciones"
@@ -1,6 +1,7 @@
 import React, { useState } from 'react';
 import { useNavigate } from 'react-router-dom'; // 🆕 Importar
 import { User, Mail, Phone, Trash2, AlertTriangle, Shield, ChevronLeft, X, Info } from 'lucide-react';
+import { eliminarHastaCompletar, MENSAJE_ELIMINACION_EN_PROGRESO } from '../utils/eliminacion';
 
 const API_BASE_URL = 'https://9l2vrevqm1.execute-api.us-east-1.amazonaws.com/dev';
 
@@ -12,6 +13,7 @@ export default function ConfiguracionAppView({ userData, onAccountDeleted }) {
   const [confirmacionTexto, setConfirmacionTexto] = useState('');
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
+  const [eliminacionEnProgreso, setEliminacionEnProgreso] = useState(false);
 
   const handleEliminarCuenta = async () => {
     if (confirmacionTexto !== 'ELIMINAR') {
@@ -24,21 +26,30 @@ export default function ConfiguracionAppView({ userData, onAccountDeleted }) {
 
     try {
       const token = localStorage.getItem('authToken');
-      const response = await fetch(`${API_BASE_URL}/auth/account`, {
-        method: 'DELETE',
-        headers: {
-          'Content-Type': 'application/json',
-          'Authorization': `Bearer ${token}`
-        }
-      });
 
-      const data = await response.json();
+      // La eliminación responde 202 mientras sigue en progreso: se repite con backoff
+      const { response, data, enProgreso } = await eliminarHastaCompletar(
+        () => fetch(`${API_BASE_URL}/auth/account`, {
+          method: 'DELETE',
+          headers: {
+            'Content-Type': 'application/json',
+            'Authorization': `Bearer ${token}`
+          }
+        }),
+        () => setEliminacionEnProgreso(true)
+      );
+
+      // Sigue en progreso: el modal queda abierto para continuarla
+      if (enProgreso) {
+        return;
+      }
 
       if (!response.ok) {
-        throw new Error(data.error?.message || 'Error al eliminar la cuenta');
+        throw new Error(data?.error?.message || 'Error al eliminar la cuenta');
       }
 
-      if (data.success) {
+      setEliminacionEnProgreso(false);
+      if (data?.success) {
         localStorage.clear();
         onAccountDeleted();
       }
@@ -269,6 +280,13 @@ export default function ConfiguracionAppView({ userData, onAccountDeleted }) {
                 </div>
               )}
 
+              {/* Eliminación en progreso */}
+              {eliminacionEnProgreso && !loading && !error && (
+                <div className="mb-4 p-3 bg-amber-50 border-2 border-amber-200 rounded-xl">
+                  <p className="text-xs md:text-sm text-amber-800 font-semibold">{MENSAJE_ELIMINACION_EN_PROGRESO}</p>
+                </div>
+              )}
+
               {/* Botones */}
               <div className="flex flex-col-reverse sm:flex-row gap-2 sm:gap-3">
                 <button
@@ -276,6 +294,7 @@ export default function ConfiguracionAppView({ userData, onAccountDeleted }) {
                     setShowDeleteModal(false);
                     setConfirmacionTexto('');
                     setError(null);
+                    setEliminacionEnProgreso(false);
                   }}
                   className="flex-1 px-4 md:px-6 py-2.5 md:py-3 bg-gray-200 hover:bg-gray-300 text-gray-800 rounded-xl font-semibold transition-all text-sm md:text-base"
                   disabled={loading}
@@ -290,12 +309,12 @@ export default function ConfiguracionAppView({ userData, onAccountDeleted }) {
                   {loading ? (
                     <>
                       <div className="w-4 h-4 md:w-5 md:h-5 border-2 border-white border-t-transparent rounded-full animate-spin"></div>
-                      Eliminando...
+                      {eliminacionEnProgreso ? 'Sigue eliminando...' : 'Eliminando...'}
                     </>
                   ) : (
                     <>
                       <Trash2 className="w-4 h-4 md:w-5 md:h-5" />
-                      Eliminar Cuenta
+                      {eliminacionEnProgreso ? 'Continuar eliminación' : 'Eliminar Cuenta'}
                     </>
                   )}
                 </button>
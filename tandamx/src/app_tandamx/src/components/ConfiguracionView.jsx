@@ -6,6 +6,7 @@ import {
   exportarCalendarioComoImagen,
   enviarCalendarioComoImagen
 } from '../utils/tandaExport';
+import { eliminarHastaCompletar, MENSAJE_ELIMINACION_EN_PROGRESO } from '../utils/eliminacion';
 
 
 const API_BASE_URL = 'https://9l2vrevqm1.execute-api.us-east-1.amazonaws.com/dev';
@@ -28,6 +29,7 @@ export default function ConfiguracionView({ tandaData, setTandaData, loadAdminDa
   const [success, setSuccess] = useState(null);
   const [showDeleteModal, setShowDeleteModal] = useState(false);
   const [confirmacionTexto, setConfirmacionTexto] = useState('');
+  const [eliminacionEnProgreso, setEliminacionEnProgreso] = useState(false);
 
   const esCumpleañera = tandaData?.frecuencia === 'cumpleaños';
 
@@ -179,25 +181,34 @@ export default function ConfiguracionView({ tandaData, setTandaData, loadAdminDa
 
     try {
       const token = localStorage.getItem('authToken');
-      const response = await fetch(
-        `${API_BASE_URL}/tandas/${tandaData.tandaId}`,
-        {
-          method: 'DELETE',
-          headers: {
-            'Authorization': `Bearer ${token}`
+
+      // La eliminación responde 202 mientras sigue en progreso: se repite con backoff
+      const { response, data, enProgreso } = await eliminarHastaCompletar(
+        () => fetch(
+          `${API_BASE_URL}/tandas/${tandaData.tandaId}`,
+          {
+            method: 'DELETE',
+            headers: {
+              'Authorization': `Bearer ${token}`
+            }
           }
-        }
+        ),
+        () => setEliminacionEnProgreso(true)
       );
 
-      const data = await response.json();
+      // Sigue en progreso: el modal queda abierto para continuarla
+      if (enProgreso) {
+        return;
+      }
 
       if (!response.ok) {
-        throw new Error(data.error?.message || 'Error al eliminar tanda');
+        throw new Error(data?.error?.message || 'Error al eliminar tanda');
       }
 
-      if (data.success) {
+      if (data?.success) {
         setShowDeleteModal(false);
         setConfirmacionTexto('');
+        setEliminacionEnProgreso(false);
         setSuccess('✅ Tanda eliminada exitosamente');
         
         setTimeout(() => {
@@ -684,6 +695,7 @@ export default function ConfiguracionView({ tandaData, setTandaData, loadAdminDa
                     setShowDeleteModal(false);
                     setConfirmacionTexto('');
                     setError(null);
+                    setEliminacionEnProgreso(false);
                   }}
                   className="p-2 hover:bg-gray-100 rounded-lg transition-colors flex-shrink-0"
                 >
@@ -725,12 +737,19 @@ export default function ConfiguracionView({ tandaData, setTandaData, loadAdminDa
                 </div>
               )}
 
+              {eliminacionEnProgreso && !loading && !error && (
+                <div className="mb-4 p-3 bg-amber-50 border border-amber-300 rounded-xl">
+                  <p className="text-xs md:text-sm text-amber-800">{MENSAJE_ELIMINACION_EN_PROGRESO}</p>
+                </div>
+              )}
+
               <div className="flex flex-col-reverse sm:flex-row gap-2 sm:gap-3">
                 <button
                   onClick={() => {
                     setShowDeleteModal(false);
                     setConfirmacionTexto('');
                     setError(null);
+                    setEliminacionEnProgreso(false);
                   }}
                   disabled={loading}
                   className="flex-1 px-4 md:px-6 py-2.5 md:py-3 bg-gray-200 hover:bg-gray-300 text-gray-800 rounded-xl font-semibold transition-all disabled:opacity-50 text-sm md:text-base"
@@ -745,12 +764,12 @@ export default function ConfiguracionView({ tandaData, setTandaData, loadAdminDa
                   {loading ? (
                     <>
                       <div className="w-4 h-4 md:w-5 md:h-5 border-2 border-white border-t-transparent rounded-full animate-spin"></div>
-                      Eliminando...
+                      {eliminacionEnProgreso ? 'Sigue eliminando...' : 'Eliminando...'}
                     </>
                   ) : (
                     <>
                       <Trash2 className="w-4 h-4 md:w-5 md:h-5" />
-                      Eliminar Permanentemente
+                      {eliminacionEnProgreso ? 'Continuar eliminación' : 'Eliminar Permanentemente'}
                     </>
                   )}
                 </button>
@@ -5,6 +5,7 @@ import {
   calcularRondaActual,
   obtenerFechaHoyISO 
 } from '../utils/tandaCalculos';
+import { eliminarHastaCompletar, MENSAJE_ELIMINACION_EN_PROGRESO } from '../utils/eliminacion';
 
 export default function InicioView({ tandas, setActiveView, onSeleccionarTanda, onCrearNueva, onEliminarTanda, loading = false }) {
   console.log('🎬 InicioView INICIADO');
@@ -23,6 +24,7 @@ export default function InicioView({ tandas, setActiveView, onSeleccionarTanda,
   const [showDeleteModal, setShowDeleteModal] = React.useState(false);
   const [tandaToDelete, setTandaToDelete] = React.useState(null);
   const [isDeleting, setIsDeleting] = React.useState(false);
+  const [eliminacionEnProgreso, setEliminacionEnProgreso] = React.useState(false);
 
   // 🆕 MOSTRAR LOADING MIENTRAS SE CARGAN LAS TANDAS
   if (loading) {
@@ -472,31 +474,34 @@ export default function InicioView({ tandas, setActiveView, onSeleccionarTanda,
 
       console.log('🗑️ Eliminando tanda:', tandaToDelete.tandaId);
       
-      const response = await fetch(`${API_BASE_URL}/tandas/${tandaToDelete.tandaId}`, {
-        method: 'DELETE',
-        headers: headers
-      });
+      // La eliminación responde 202 mientras sigue en progreso: se repite con backoff
+      const { response, data, enProgreso } = await eliminarHastaCompletar(
+        () => fetch(`${API_BASE_URL}/tandas/${tandaToDelete.tandaId}`, {
+          method: 'DELETE',
+          headers: headers
+        }),
+        (llamada) => {
+          console.log(`📥 Respuesta DELETE: 202 (llamada ${llamada})`);
+          setEliminacionEnProgreso(true);
+        }
+      );
 
-      console.log('📥 Respuesta DELETE:', response.status);
+      // Sigue en progreso: el modal queda abierto para continuarla
+      if (enProgreso) {
+        return;
+      }
 
       if (!response.ok) {
-        let errorMessage = `Error ${response.status} al eliminar la tanda`;
-        
-        try {
-          const errorData = await response.json();
-          errorMessage = errorData.error?.message || errorData.message || errorMessage;
-        } catch (e) {
-          // Si no se puede parsear el error, usar el mensaje por defecto
-        }
-        
+        // Si no se puede parsear el error, usar el mensaje por defecto
+        const errorMessage = data?.error?.message || data?.message || `Error ${response.status} al eliminar la tanda`;
         throw new Error(errorMessage);
       }
 
-      const data = await response.json();
       console.log('✅ Tanda eliminada exitosamente:', data);
 
       setShowDeleteModal(false);
       setTandaToDelete(null);
+      setEliminacionEnProgreso(false);
 
       if (onEliminarTanda) {
         try {
@@ -522,6 +527,7 @@ export default function InicioView({ tandas, setActiveView, onSeleccionarTanda,
   const handleCancelDelete = () => {
     setShowDeleteModal(false);
     setTandaToDelete(null);
+    setEliminacionEnProgreso(false);
   };
 
   return (
@@ -1104,6 +1110,12 @@ export default function InicioView({ tandas, setActiveView, onSeleccionarTanda,
                 </div>
               </div>
 
+              {eliminacionEnProgreso && !isDeleting && (
+                <div className="bg-amber-50 border-2 border-amber-200 rounded-xl p-3 mb-4">
+                  <p className="text-sm text-amber-800 font-semibold">{MENSAJE_ELIMINACION_EN_PROGRESO}</p>
+                </div>
+              )}
+
               <div className="flex flex-col sm:flex-row gap-3">
                 <button
                   type="button"
@@ -1122,12 +1134,12 @@ export default function InicioView({ tandas, setActiveView, onSeleccionarTanda,
                   {isDeleting ? (
                     <>
                       <div className="w-5 h-5 border-2 border-white border-t-transparent rounded-full animate-spin"></div>
-                      Eliminando...
+                      {eliminacionEnProgreso ? 'Sigue eliminando...' : 'Eliminando...'}
                     </>
                   ) : (
                     <>
                       <Trash2 className="w-5 h-5" />
-                      Eliminar Tanda
+                      {eliminacionEnProgreso ? 'Continuar eliminación' : 'Eliminar Tanda'}
                     </>
                   )}
                 </button>
@@ -0,0 +1,53 @@
+// src/utils/eliminacion.js
+
+/**
+ * Eliminaciones que el backend hace en varias llamadas (tanda, cuenta)
+ *
+ * El DELETE responde 202 mientras la eliminación sigue en progreso y la
+ * siguiente llamada continúa donde se quedó. Entre llamadas se espera con
+ * backoff (500 ms, duplicando hasta ESPERA_MAXIMA_MS) en lugar de repetir
+ * el DELETE de inmediato.
+ */
+
+// ==================== CONSTANTES ====================
+
+export const ESPERA_INICIAL_MS = 500;
+export const ESPERA_MAXIMA_MS = 8000;
+export const MAX_LLAMADAS_ELIMINACION = 20;
+
+export const MENSAJE_ELIMINACION_EN_PROGRESO =
+  'La eliminación sigue en progreso. Lo ya eliminado se conserva: pulsa "Continuar eliminación" para terminarla.';
+
+const esperar = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// ==================== ELIMINACIÓN ====================
+
+/**
+ * Repite la petición DELETE mientras responda 202.
+ *
+ * @param {() => Promise<Response>} peticion - Hace una llamada al DELETE
+ * @param {(llamada: number) => void} [alContinuar] - Se llama con cada 202
+ * @returns {Promise<{response: Response, data: object|null, enProgreso: boolean}>}
+ *   enProgreso es true si después de MAX_LLAMADAS_ELIMINACION llamadas la
+ *   eliminación todavía no termina (no es un error ni una eliminación completa)
+ */
+export const eliminarHastaCompletar = async (peticion, alContinuar) => {
+  let espera = ESPERA_INICIAL_MS;
+
+  for (let llamada = 1; ; llamada++) {
+    const response = await peticion();
+    const data = await response.json().catch(() => null);
+
+    if (response.status !== 202) {
+      return { response, data, enProgreso: false };
+    }
+
+    alContinuar?.(llamada);
+    if (llamada >= MAX_LLAMADAS_ELIMINACION) {
+      return { response, data, enProgreso: true };
+    }
+
+    await esperar(espera);
+    espera = Math.min(espera * 2, ESPERA_MAXIMA_MS);
+  }
+};
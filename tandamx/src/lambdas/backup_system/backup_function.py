@@ -7,16 +7,40 @@ y los almacena en S3 con estructura organizada por fecha y ambiente.
 Características:
 - Backup dinámico de múltiples tablas configurables
 - Compresión gzip para reducir costos de almacenamiento
+- Formato por partes: JSONL (un item por línea) en partes gzip de ~64 MB
+  sin comprimir, con un manifest por tabla (items, bytes, SHA256 y rango
+  de llaves de cada parte) para restaurar y validar parte por parte
 - Validación de integridad con checksums SHA256
 - Manejo de tipos Decimal de DynamoDB
 - Generación de manifests para auditoría
 - Notificaciones SNS de éxito/error
+- Backups incrementales (mode=incremental): solo los cambios desde el
+  último backup de la tabla, tomados del archivo de DynamoDB Streams
+  (incluye eliminaciones) o de un Scan filtrado por updatedAt; un
+  backup completo más sus deltas se reconstruye con merge_backups.py
+- Tablas en paralelo (MAX_PARALLEL_TABLES), de la más grande a la más
+  chica, con tiempo límite por tabla y throughput (items/s, MB/s) en
+  los resultados
+- Exportación opcional a Parquet (PARQUET_EXPORT) en los backups
+  completos: particionada por mes para análisis con Athena/DuckDB, con
+  pyarrow si está disponible o con el escritor de parquet_export.py
 
 Variables de Entorno Requeridas:
 - TABLES_CONFIG: JSON con configuración de tablas
 - BACKUP_BUCKET: Nombre del bucket S3 destino
 - ENVIRONMENT: Ambiente (production, staging, etc.)
 - SNS_TOPIC_ARN: ARN del topic SNS para notificaciones
+- BACKUP_CHUNK_SIZE_MB: Tamaño sin comprimir de cada parte (opcional, default 64)
+- BACKUP_WATERMARK_OVERLAP_SECONDS: Traslape de cada delta con el backup
+  anterior para tolerar desfase de relojes (opcional, default 300)
+- STREAM_ARCHIVE_SETTLE_SECONDS: Antigüedad mínima de un archivo del
+  stream para entrar en un delta (opcional, default 120)
+- MAX_PARALLEL_TABLES: Tablas respaldadas al mismo tiempo (opcional, default 4)
+- TABLE_TIMEOUT_SECONDS: Tiempo máximo por tabla; 0 = solo el límite de
+  la Lambda (opcional, default 0)
+- PARQUET_EXPORT: JSON {tabla: columna de fecha} de las tablas que además
+  se exportan a Parquet, particionadas por el mes de esa columna
+  (opcional, default sin exportación)
 
 Autor: Jose - Senior SOA Architect
 Versión: 1.0
@@ -25,22 +49,64 @@ Versión: 1.0
 import boto3
 import json
 import gzip
+import io
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from decimal import Decimal
 import hashlib
+import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Attr
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.config import Config
+from parquet_export import ParquetExport, ENGINE as PARQUET_ENGINE
 
-# Inicialización de clientes AWS
+# Tablas en paralelo: cada una es un hilo con su propio Scan
+MAX_PARALLEL_TABLES = max(1, int(os.environ.get('MAX_PARALLEL_TABLES', '4')))
+TABLE_TIMEOUT_SECONDS = int(os.environ.get('TABLE_TIMEOUT_SECONDS', '0'))
+
+# Tiempo que se reserva al final de la Lambda para el manifest y la notificación
+DEADLINE_MARGIN_SECONDS = 30
+
+# Inicialización de clientes AWS (los clientes se comparten entre hilos;
+# el resource de DynamoDB no es thread-safe, cada hilo crea el suyo)
 dynamodb = boto3.resource('dynamodb')
-s3 = boto3.client('s3')
+s3 = boto3.client('s3', config=Config(max_pool_connections=MAX_PARALLEL_TABLES * 2 + 2))
 sns = boto3.client('sns')
+_thread_local = threading.local()
 
 # Configuración desde variables de entorno
 TABLES_CONFIG = json.loads(os.environ['TABLES_CONFIG'])
 S3_BUCKET = os.environ['BACKUP_BUCKET']
 ENVIRONMENT = os.environ.get('ENVIRONMENT', 'production')
 SNS_TOPIC_ARN = os.environ.get('SNS_TOPIC_ARN')
+CHUNK_SIZE_BYTES = int(os.environ.get('BACKUP_CHUNK_SIZE_MB', '64')) * 1024 * 1024
+
+# Versión del formato por partes (el lector también acepta el JSON único anterior)
+MANIFEST_FORMAT = 'jsonl-chunks'
+MANIFEST_VERSION = 1
+
+# Backups incrementales
+# - latest/{tabla}.json apunta al último backup (completo o delta) de cada tabla
+# - streams/{tabla}/ guarda los registros del stream archivados por stream_archive_handler
+LATEST_PREFIX = f"{ENVIRONMENT}/latest"
+STREAM_ARCHIVE_PREFIX = f"{ENVIRONMENT}/streams"
+WATERMARK_OVERLAP_SECONDS = int(os.environ.get('BACKUP_WATERMARK_OVERLAP_SECONDS', '300'))
+ARCHIVE_SETTLE_SECONDS = int(os.environ.get('STREAM_ARCHIVE_SETTLE_SECONDS', '120'))
+ARCHIVE_TIMESTAMP_FORMAT = '%Y%m%dT%H%M%SZ'
+
+# Atributos que marcan un item como modificado (deltas por updatedAt);
+# las notificaciones, por ejemplo, solo llevan createdAt
+WATERMARK_ATTRIBUTES = ('updatedAt', 'createdAt')
+
+# Exportación a Parquet: fuera del prefijo del ambiente para que la regla
+# de Glacier no la alcance (se consulta, no solo se guarda)
+PARQUET_EXPORT = json.loads(os.environ.get('PARQUET_EXPORT') or '{}')
+PARQUET_PREFIX = f"analytics/{ENVIRONMENT}"
+
+deserializer = TypeDeserializer()
 
 
 class DecimalEncoder(json.JSONEncoder):
@@ -67,6 +133,10 @@ def lambda_handler(event, context):
         event (dict): Evento que dispara la función. Puede contener:
             - tables (list): Lista específica de tablas a respaldar (opcional)
             - date (str): Fecha del respaldo en formato YYYY-MM-DD (opcional)
+            - mode (str): 'full' (default) o 'incremental'. En modo
+              incremental cada tabla con delta_source respalda solo sus
+              cambios desde el último backup; si aún no tiene uno
+              completo, se toma completo
         context: Contexto de ejecución de Lambda
     
     Returns:
@@ -75,7 +145,8 @@ def lambda_handler(event, context):
     Ejemplo de event:
         {
             "date": "2025-01-24",
-            "tables": [{"name": "tandas", "pk": "tandaId"}]
+            "mode": "incremental",
+            "tables": [{"name": "tandas", "pk": "tandaId", "delta_source": "stream"}]
         }
     """
     
@@ -85,29 +156,34 @@ def lambda_handler(event, context):
     # Determinar tablas a respaldar (usar del evento o todas las configuradas)
     tables_to_backup = event.get('tables', TABLES_CONFIG)
     
+    # Backup completo o incremental
+    mode = event.get('mode', 'full')
+    
     # Estructura para almacenar resultados
     results = {
         'date': backup_date,
+        'mode': mode,
         'environment': ENVIRONMENT,
         'tables': [],
         'errors': [],
         'start_time': datetime.now().isoformat()
     }
     
+    # Límite de toda la ejecución (None si se invoca fuera de Lambda)
+    lambda_deadline = None
+    if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+        lambda_deadline = time.monotonic() + context.get_remaining_time_in_millis() / 1000 - DEADLINE_MARGIN_SECONDS
+    
     try:
-        # Procesar cada tabla configurada
-        for table_config in tables_to_backup:
-            try:
-                result = backup_table(table_config, backup_date)
-                results['tables'].append(result)
-                print(f"✓ Respaldo completado: {table_config['name']}")
-            except Exception as e:
-                error_msg = f"Error en {table_config['name']}: {str(e)}"
-                results['errors'].append(error_msg)
-                print(f"✗ {error_msg}")
-                # Continuar con las siguientes tablas aunque una falle
+        # Procesar las tablas en paralelo, la más grande primero; una
+        # tabla que falla no detiene a las demás
+        started = time.monotonic()
+        table_results, errors = run_table_backups(tables_to_backup, backup_date, mode, lambda_deadline)
+        results['tables'].extend(table_results)
+        results['errors'].extend(errors)
         
         results['end_time'] = datetime.now().isoformat()
+        results['duration_seconds'] = round(time.monotonic() - started, 2)
         
         # Guardar manifest con resumen del backup
         save_manifest(results, backup_date)
@@ -142,7 +218,131 @@ def lambda_handler(event, context):
         }
 
 
-def backup_table(table_config, backup_date):
+def run_table_backups(tables_to_backup, backup_date, mode, lambda_deadline=None):
+    """
+    Respalda las tablas con hasta MAX_PARALLEL_TABLES al mismo tiempo.
+    
+    Las tablas se ordenan de mayor a menor tamaño (DescribeTable): la más
+    grande marca la duración total, así que arranca primero y las chicas
+    llenan los huecos. Cada tabla tiene como límite TABLE_TIMEOUT_SECONDS
+    desde que empieza (si está configurado) y nunca más allá del tiempo
+    que le queda a la Lambda.
+    
+    Args:
+        tables_to_backup (list): Configuraciones de tabla (ver backup_table)
+        backup_date (str): Fecha del backup en formato YYYY-MM-DD
+        mode (str): 'full' o 'incremental'
+        lambda_deadline (float): time.monotonic() límite de la ejecución (opcional)
+    
+    Returns:
+        tuple: (resultados de las tablas respaldadas en el orden en que se
+                programaron, mensajes de error de las que fallaron)
+    """
+    ordered = plan_tables(tables_to_backup)
+    workers = min(MAX_PARALLEL_TABLES, len(ordered)) or 1
+    print(f"Respaldando {len(ordered)} tablas, {workers} en paralelo: "
+          f"{', '.join(config['name'] for config, _ in ordered)}")
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            (table_config, executor.submit(backup_one_table, table_config, backup_date, mode, lambda_deadline))
+            for table_config, _ in ordered
+        ]
+    
+    table_results = []
+    errors = []
+    for table_config, future in futures:
+        try:
+            table_results.append(future.result())
+            print(f"✓ Respaldo completado: {table_config['name']}")
+        except Exception as e:
+            error_msg = f"Error en {table_config['name']}: {str(e)}"
+            errors.append(error_msg)
+            print(f"✗ {error_msg}")
+    
+    return table_results, errors
+
+
+def plan_tables(tables_to_backup):
+    """
+    Ordena las tablas de mayor a menor según TableSizeBytes (aproximado,
+    DynamoDB lo actualiza cada ~6 horas).
+    
+    Returns:
+        list: Tuplas (table_config, tamaño en bytes); una tabla que no se
+              puede describir queda al final con tamaño 0 y su error
+              aparece al respaldarla
+    """
+    sized = []
+    for table_config in tables_to_backup:
+        try:
+            description = dynamodb.meta.client.describe_table(TableName=table_config['name'])['Table']
+            size = description.get('TableSizeBytes', 0)
+        except Exception as e:
+            print(f"⚠ No se pudo obtener el tamaño de {table_config['name']}: {str(e)}")
+            size = 0
+        sized.append((table_config, size))
+    
+    # sorted es estable: a igual tamaño se respeta el orden de la configuración
+    return sorted(sized, key=lambda entry: entry[1], reverse=True)
+
+
+def backup_one_table(table_config, backup_date, mode, lambda_deadline=None):
+    """
+    Respalda una tabla (completa o delta según el modo); corre en un hilo
+    del pool de run_table_backups.
+    
+    Raises:
+        TimeoutError: Si la tabla no termina antes de su tiempo límite
+    """
+    table_name = table_config['name']
+    deadline = lambda_deadline
+    if TABLE_TIMEOUT_SECONDS > 0:
+        table_deadline = time.monotonic() + TABLE_TIMEOUT_SECONDS
+        deadline = table_deadline if deadline is None else min(deadline, table_deadline)
+    
+    # Una tabla que espera turno puede quedarse sin tiempo antes de empezar
+    check_deadline(deadline, table_name)
+    
+    pointer = None
+    if mode == 'incremental' and table_config.get('delta_source'):
+        pointer = load_pointer(table_name)
+        if pointer is None:
+            print(f"{table_name} sin backup completo previo, se respalda completa")
+    
+    if pointer is not None:
+        return backup_table_delta(table_config, backup_date, pointer, deadline)
+    return backup_table(table_config, backup_date, deadline)
+
+
+def get_table(table_name):
+    """Tabla de DynamoDB con el resource del hilo actual"""
+    if not hasattr(_thread_local, 'dynamodb'):
+        _thread_local.dynamodb = boto3.session.Session().resource('dynamodb')
+    return _thread_local.dynamodb.Table(table_name)
+
+
+def check_deadline(deadline, table_name):
+    """
+    Los hilos no se pueden interrumpir desde afuera: cada ciclo de lectura
+    revisa el límite y, si ya pasó, aborta la tabla antes de subir su
+    manifest (las partes sueltas no forman un backup).
+    """
+    if deadline is not None and time.monotonic() > deadline:
+        raise TimeoutError(f"{table_name} excedió su tiempo límite de backup")
+
+
+def throughput(item_count, uncompressed_size, elapsed):
+    """Items/s, MB/s (sin comprimir) y duración redondeados para los resultados"""
+    elapsed = max(elapsed, 0.001)
+    return {
+        'duration_seconds': round(elapsed, 2),
+        'items_per_second': round(item_count / elapsed, 1),
+        'mb_per_second': round(uncompressed_size / 1024 / 1024 / elapsed, 2)
+    }
+
+
+def backup_table(table_config, backup_date, deadline=None):
     """
     Realiza el backup completo de una tabla DynamoDB.
     
@@ -155,60 +355,101 @@ def backup_table(table_config, backup_date):
                 "attributes": ["attr1", "attr2"] (opcional)
             }
         backup_date (str): Fecha del backup en formato YYYY-MM-DD
+        deadline (float): time.monotonic() límite para la tabla (opcional)
     
     Returns:
         dict: Metadata del backup incluyendo:
             - table_name: Nombre de la tabla
             - item_count: Cantidad de items respaldados
-            - s3_key: Ubicación del archivo en S3
-            - checksum: Hash SHA256 para validación
+            - s3_key: Ubicación del manifest de la tabla en S3
+            - checksum: SHA256 del manifest (que a su vez guarda el de cada parte)
             - tamaños comprimido y sin comprimir
+            - duración, items/s y MB/s
+    
+    Raises:
+        TimeoutError: Si se alcanza deadline antes de subir el manifest
     
     Process Flow:
-        1. Scan completo de la tabla con paginación
-        2. Construcción de metadata
-        3. Serialización a JSON con encoder personalizado
-        4. Compresión gzip
-        5. Cálculo de checksum
-        6. Upload a S3 con metadata
+        1. Scan de la tabla con paginación
+        2. Cada página se agrega a la parte en curso, un item por línea JSON
+        3. Al pasar de CHUNK_SIZE_BYTES la parte se comprime, se calcula su
+           checksum y se sube a S3; en memoria queda solo una parte
+        4. Al final se sube el manifest (sin él el backup no se restaura)
+    
+    Estructura en S3:
+        environment/year/week-NN/table-date/manifest.json
+        environment/year/week-NN/table-date/part-NNNNN.jsonl.gz
     """
     table_name = table_config['name']
-    table = dynamodb.Table(table_name)
+    table = get_table(table_name)
+    key_attributes = [k for k in (table_config.get('pk'), table_config.get('sk')) if k]
+    
+    year = backup_date.split('-')[0]
+    week = datetime.strptime(backup_date, '%Y-%m-%d').strftime('%W')
+    backup_prefix = f"{ENVIRONMENT}/{year}/week-{week}/{table_name}-{backup_date}"
     
     # === PASO 1: Scan de la tabla con paginación ===
-    items = []
     scan_kwargs = {}
     
     # Si se especifican atributos específicos, crear ProjectionExpression
     if table_config.get('attributes'):
         scan_kwargs['ProjectionExpression'] = ','.join(table_config['attributes'])
     
+    # Inicio del scan: los deltas siguientes empiezan aquí (menos el traslape)
+    started = datetime.utcnow()
+    clock = time.monotonic()
+    
     # Variables para manejar paginación
     done = False
     start_key = None
     item_count = 0
     
+    # Parte en curso y partes ya subidas
+    chunks = []
+    chunk = new_chunk()
+    
+    # Exportación a Parquet con las mismas páginas del scan (sin un segundo scan)
+    export = None
+    if table_name in PARQUET_EXPORT:
+        export = ParquetExport(key_attributes, PARQUET_EXPORT[table_name])
+    
     print(f"Iniciando scan de tabla {table_name}...")
     
     # Loop de paginación (DynamoDB limita a 1MB por scan)
     while not done:
+        check_deadline(deadline, table_name)
         if start_key:
             scan_kwargs['ExclusiveStartKey'] = start_key
         
         response = table.scan(**scan_kwargs)
         batch_items = response.get('Items', [])
-        items.extend(batch_items)
+        
+        # === PASO 2: Agregar la página a la parte en curso ===
+        if batch_items:
+            add_to_chunk(chunk, batch_items, key_attributes)
+            if export is not None:
+                export.add(batch_items)
+            if chunk['size'] >= CHUNK_SIZE_BYTES:
+                chunks.append(upload_chunk(chunk, backup_prefix, len(chunks), table_name, backup_date))
+                chunk = new_chunk()
         item_count += len(batch_items)
         
         # Obtener clave para siguiente página
         start_key = response.get('LastEvaluatedKey', None)
         done = start_key is None
         
-        print(f"  Scaneados {item_count} items...")
+        print(f"  {table_name}: scaneados {item_count} items...")
     
-    print(f"Scan completo: {item_count} items totales")
+    if chunk['items']:
+        chunks.append(upload_chunk(chunk, backup_prefix, len(chunks), table_name, backup_date))
+    
+    print(f"Scan completo: {item_count} items totales en {len(chunks)} partes")
+    
+    # === PASO 3: Construir metadata del backup ===
+    uncompressed_size = sum(c['size_bytes'] for c in chunks)
+    compressed_size = sum(c['compressed_size_bytes'] for c in chunks)
+    compression_ratio = (1 - compressed_size / uncompressed_size) * 100 if uncompressed_size else 0
     
-    # === PASO 2: Construir metadata del backup ===
     metadata = {
         'table_name': table_name,
         'backup_date': backup_date,
@@ -218,43 +459,401 @@ def backup_table(table_config, backup_date):
         'sk': table_config.get('sk'),
         'region': os.environ.get('AWS_REGION', 'us-east-1'),
         'timestamp': datetime.now().isoformat(),
-        'lambda_request_id': os.environ.get('AWS_REQUEST_ID', 'manual')
+        'scan_started': started.isoformat(),
+        'lambda_request_id': os.environ.get('AWS_REQUEST_ID', 'manual'),
+        'compressed_size': compressed_size,
+        'uncompressed_size': uncompressed_size,
+        'compression_ratio': round(compression_ratio, 2)
     }
     
-    # === PASO 3: Preparar estructura de datos completa ===
-    backup_data = {
-        'metadata': metadata,
-        'items': items
+    print(f"Compresión: {compression_ratio:.2f}% reducción")
+    
+    # === PASO 4: Subir el manifest de la tabla ===
+    check_deadline(deadline, table_name)
+    s3_key, checksum = upload_table_manifest(backup_prefix, 'full', metadata, chunks, compression_ratio)
+    
+    # === PASO 5: Apuntar los siguientes deltas a este backup ===
+    # Lo que cambió durante el scan se vuelve a capturar en el primer
+    # delta; aplicar de nuevo esos cambios en orden deja el mismo estado
+    since = started - timedelta(seconds=WATERMARK_OVERLAP_SECONDS)
+    save_pointer(table_name, {
+        'table_name': table_name,
+        'delta_source': table_config.get('delta_source'),
+        'base': s3_key,
+        'manifest': s3_key,
+        'sequence': 0,
+        'captured_until': datetime.utcnow().isoformat(),
+        'watermark': since.isoformat(),
+        'stream_cursor': f"{STREAM_ARCHIVE_PREFIX}/{table_name}/{since.strftime(ARCHIVE_TIMESTAMP_FORMAT)}"
+    })
+    
+    stats = throughput(item_count, uncompressed_size, time.monotonic() - clock)
+    print(f"✓ Backup de {table_name} completado en {stats['duration_seconds']}s "
+          f"({stats['items_per_second']} items/s, {stats['mb_per_second']} MB/s)")
+    
+    # === PASO 6: Exportación a Parquet (el backup ya quedó completo) ===
+    parquet = None
+    if export is not None:
+        try:
+            check_deadline(deadline, table_name)
+            parquet = export_parquet(export, table_name, backup_date)
+        except Exception as e:
+            # Un error aquí no invalida el backup JSON ya subido
+            parquet = {'error': str(e)}
+            print(f"⚠ Exportación Parquet de {table_name} falló: {str(e)}")
+        finally:
+            # Borra los temporales de /tmp (el contenedor se reutiliza)
+            export.close()
+    
+    # Retornar resumen del backup
+    return {
+        'table_name': table_name,
+        'type': 'full',
+        **({'parquet': parquet} if parquet else {}),
+        'item_count': item_count,
+        's3_key': s3_key,
+        's3_bucket': S3_BUCKET,
+        'chunks': len(chunks),
+        'checksum': checksum,
+        'size_compressed_mb': round(compressed_size / 1024 / 1024, 2),
+        'size_uncompressed_mb': round(uncompressed_size / 1024 / 1024, 2),
+        'compression_ratio': compression_ratio,
+        **stats
     }
+
+
+def backup_table_delta(table_config, backup_date, pointer, deadline=None):
+    """
+    Respalda solo los cambios de una tabla desde su último backup.
+    
+    Args:
+        table_config (dict): Configuración de la tabla; delta_source indica
+            de dónde salen los cambios:
+                - "stream": archivo del DynamoDB Stream (puts y deletes)
+                - "updatedAt": Scan filtrado por WATERMARK_ATTRIBUTES (solo
+                  puts: un item eliminado no deja rastro en la tabla)
+        backup_date (str): Fecha del backup en formato YYYY-MM-DD
+        pointer (dict): Contenido de latest/{tabla}.json (ver load_pointer)
+        deadline (float): time.monotonic() límite para la tabla (opcional)
     
-    # === PASO 4: Serializar a JSON con encoder personalizado ===
-    print(f"Serializando datos a JSON...")
-    json_data = json.dumps(backup_data, cls=DecimalEncoder, ensure_ascii=False)
+    Returns:
+        dict: Metadata del delta (mismas llaves que backup_table más puts/deletes)
     
-    # === PASO 5: Comprimir con gzip ===
-    print(f"Comprimiendo datos...")
-    compressed_data = gzip.compress(json_data.encode('utf-8'))
+    Raises:
+        ValueError: Si delta_source no es "stream" ni "updatedAt"
+        TimeoutError: Si se alcanza deadline antes de subir el manifest
     
-    # === PASO 6: Calcular checksum para validación ===
-    checksum = hashlib.sha256(compressed_data).hexdigest()
-    metadata['checksum'] = checksum
-    metadata['compressed_size'] = len(compressed_data)
-    metadata['uncompressed_size'] = len(json_data)
+    Cada línea de las partes es un cambio:
+        {"op": "put", "key": {...}, "item": {...}}
+        {"op": "delete", "key": {...}}
+    y el manifest (type "delta") guarda el backup completo base y el
+    manifest anterior (parent); merge_backups.py recorre esa cadena para
+    reconstruir la tabla.
     
-    # Calcular ratio de compresión
-    compression_ratio = (1 - len(compressed_data) / len(json_data)) * 100
-    metadata['compression_ratio'] = round(compression_ratio, 2)
+    Estructura en S3:
+        environment/year/week-NN/table-date/delta-HHMMSS/manifest.json
+        environment/year/week-NN/table-date/delta-HHMMSS/part-NNNNN.jsonl.gz
+    """
+    table_name = table_config['name']
+    key_attributes = [k for k in (table_config.get('pk'), table_config.get('sk')) if k]
+    delta_source = table_config['delta_source']
+    started = datetime.utcnow()
+    clock = time.monotonic()
     
-    print(f"Compresión: {compression_ratio:.2f}% reducción")
+    # === PASO 1: Obtener los cambios desde el último backup ===
+    if delta_source == 'stream':
+        changes, position = collect_stream_changes(table_config, key_attributes, pointer, deadline)
+    elif delta_source == 'updatedAt':
+        changes, position = scan_updated_items(table_config, key_attributes, pointer, started, deadline)
+    else:
+        raise ValueError(f"delta_source no soportado en {table_name}: {delta_source}")
     
-    # === PASO 7: Determinar ruta en S3 ===
-    # Estructura: environment/year/week-NN/table-date.json.gz
     year = backup_date.split('-')[0]
     week = datetime.strptime(backup_date, '%Y-%m-%d').strftime('%W')
-    s3_key = f"{ENVIRONMENT}/{year}/week-{week}/{table_name}-{backup_date}.json.gz"
+    backup_prefix = f"{ENVIRONMENT}/{year}/week-{week}/{table_name}-{backup_date}/delta-{started.strftime('%H%M%S')}"
+    
+    # === PASO 2: Escribir los cambios en partes (mismo formato que el completo) ===
+    chunks = []
+    chunk = new_chunk()
+    page_size = 1000
+    for start in range(0, len(changes), page_size):
+        add_to_chunk(chunk, changes[start:start + page_size], [])
+        if chunk['size'] >= CHUNK_SIZE_BYTES:
+            chunks.append(upload_chunk(chunk, backup_prefix, len(chunks), table_name, backup_date))
+            chunk = new_chunk()
+    
+    if chunk['items']:
+        chunks.append(upload_chunk(chunk, backup_prefix, len(chunks), table_name, backup_date))
+    
+    deletes = sum(1 for change in changes if change['op'] == 'delete')
+    print(f"Delta de {table_name}: {len(changes) - deletes} puts, {deletes} deletes en {len(chunks)} partes")
+    
+    # === PASO 3: Manifest del delta, encadenado al backup anterior ===
+    uncompressed_size = sum(c['size_bytes'] for c in chunks)
+    compressed_size = sum(c['compressed_size_bytes'] for c in chunks)
+    compression_ratio = (1 - compressed_size / uncompressed_size) * 100 if uncompressed_size else 0
+    
+    metadata = {
+        'table_name': table_name,
+        'backup_date': backup_date,
+        'item_count': len(changes),
+        'puts': len(changes) - deletes,
+        'deletes': deletes,
+        'environment': ENVIRONMENT,
+        'pk': table_config.get('pk'),
+        'sk': table_config.get('sk'),
+        'region': os.environ.get('AWS_REGION', 'us-east-1'),
+        'timestamp': datetime.now().isoformat(),
+        'lambda_request_id': os.environ.get('AWS_REQUEST_ID', 'manual'),
+        'compressed_size': compressed_size,
+        'uncompressed_size': uncompressed_size,
+        'compression_ratio': round(compression_ratio, 2),
+        'delta_source': delta_source,
+        'deletes_captured': delta_source == 'stream',
+        'base': pointer['base'],
+        'parent': pointer['manifest'],
+        'sequence': pointer['sequence'] + 1,
+        'captured_from': pointer['captured_until'],
+        'captured_until': position['captured_until']
+    }
+    
+    check_deadline(deadline, table_name)
+    s3_key, checksum = upload_table_manifest(backup_prefix, 'delta', metadata, chunks, compression_ratio)
+    
+    # === PASO 4: Mover el apuntador (solo después de subir el manifest) ===
+    save_pointer(table_name, {
+        **pointer,
+        **position,
+        'delta_source': delta_source,
+        'manifest': s3_key,
+        'sequence': metadata['sequence']
+    })
+    
+    stats = throughput(len(changes), uncompressed_size, time.monotonic() - clock)
+    print(f"✓ Delta de {table_name} completado en {stats['duration_seconds']}s "
+          f"({stats['items_per_second']} cambios/s, {stats['mb_per_second']} MB/s)")
+    
+    return {
+        'table_name': table_name,
+        'type': 'delta',
+        'item_count': len(changes),
+        'puts': metadata['puts'],
+        'deletes': deletes,
+        's3_key': s3_key,
+        's3_bucket': S3_BUCKET,
+        'chunks': len(chunks),
+        'checksum': checksum,
+        'size_compressed_mb': round(compressed_size / 1024 / 1024, 2),
+        'size_uncompressed_mb': round(uncompressed_size / 1024 / 1024, 2),
+        'compression_ratio': compression_ratio,
+        **stats
+    }
+
+
+def collect_stream_changes(table_config, key_attributes, pointer, deadline=None):
+    """
+    Lee el archivo del stream desde el cursor del apuntador y deja el
+    último cambio de cada llave (el de SequenceNumber más alto).
+    
+    Solo se leen archivos con más de ARCHIVE_SETTLE_SECONDS de antigüedad:
+    dos invocaciones del archivador pueden terminar en desorden, y un
+    archivo con nombre anterior al cursor ya no se volvería a leer.
     
-    # === PASO 8: Subir a S3 con metadata ===
-    print(f"Subiendo a S3: {s3_key}")
+    Returns:
+        tuple: (lista de cambios, {'stream_cursor', 'captured_until'})
+    """
+    table_name = table_config['name']
+    projection = set(table_config['attributes']) if table_config.get('attributes') else None
+    prefix = f"{STREAM_ARCHIVE_PREFIX}/{table_name}/"
+    cutoff = datetime.utcnow() - timedelta(seconds=ARCHIVE_SETTLE_SECONDS)
+    cutoff_stamp = cutoff.strftime(ARCHIVE_TIMESTAMP_FORMAT)
+    cursor = pointer.get('stream_cursor') or prefix
+    
+    changes = {}
+    archive_objects = 0
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=prefix, StartAfter=cursor):
+        contents = page.get('Contents', [])
+        settled = [obj for obj in contents if obj['Key'][len(prefix):len(prefix) + len(cutoff_stamp)] <= cutoff_stamp]
+        
+        for obj in settled:
+            check_deadline(deadline, table_name)
+            body = s3.get_object(Bucket=S3_BUCKET, Key=obj['Key'])['Body'].read()
+            for line in gzip.decompress(body).decode('utf-8').splitlines():
+                if not line:
+                    continue
+                change = json.loads(line)
+                key_id = json.dumps([change['key'].get(k) for k in key_attributes])
+                current = changes.get(key_id)
+                # El stream entrega al menos una vez: gana la secuencia más alta
+                if current is None or int(change['seq']) > int(current['seq']):
+                    if projection and change.get('item') is not None:
+                        change['item'] = {k: v for k, v in change['item'].items() if k in projection}
+                    changes[key_id] = change
+            cursor = obj['Key']
+            archive_objects += 1
+        
+        # Las llaves van en orden: lo que sigue es más reciente que el corte
+        if len(settled) < len(contents):
+            break
+    
+    print(f"  Leídos {archive_objects} archivos del stream de {table_name}: {len(changes)} llaves con cambios")
+    
+    return list(changes.values()), {
+        'stream_cursor': cursor,
+        'captured_until': cutoff.isoformat()
+    }
+
+
+def scan_updated_items(table_config, key_attributes, pointer, started, deadline=None):
+    """
+    Scan de los items con updatedAt/createdAt posterior a la marca de agua.
+    
+    El Scan sigue leyendo (y cobrando) la tabla completa, pero solo
+    regresa y guarda los items modificados; las eliminaciones no se
+    detectan, por eso el manifest lleva deletes_captured = False.
+    
+    Returns:
+        tuple: (lista de cambios, {'watermark', 'captured_until'})
+    """
+    table = get_table(table_config['name'])
+    watermark = pointer['watermark']
+    
+    condition = Attr(WATERMARK_ATTRIBUTES[0]).gt(watermark)
+    for attribute in WATERMARK_ATTRIBUTES[1:]:
+        condition = condition | Attr(attribute).gt(watermark)
+    
+    scan_kwargs = {'FilterExpression': condition}
+    if table_config.get('attributes'):
+        scan_kwargs['ProjectionExpression'] = ','.join(table_config['attributes'])
+    
+    changes = []
+    while True:
+        check_deadline(deadline, table_config['name'])
+        response = table.scan(**scan_kwargs)
+        for item in response.get('Items', []):
+            changes.append({
+                'op': 'put',
+                'key': {k: item.get(k) for k in key_attributes},
+                'item': item
+            })
+        
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    
+    print(f"  {len(changes)} items modificados desde {watermark}")
+    
+    return changes, {
+        'watermark': (started - timedelta(seconds=WATERMARK_OVERLAP_SECONDS)).isoformat(),
+        'captured_until': started.isoformat()
+    }
+
+
+def upload_table_manifest(backup_prefix, backup_type, metadata, chunks, compression_ratio):
+    """
+    Sube el manifest de la tabla (se sube al final: sin él el backup no se restaura).
+    
+    Returns:
+        tuple: (key del manifest en S3, SHA256 del manifest)
+    """
+    manifest_body = json.dumps({
+        'format': MANIFEST_FORMAT,
+        'version': MANIFEST_VERSION,
+        'type': backup_type,
+        'metadata': metadata,
+        'chunks': chunks
+    }, cls=DecimalEncoder, ensure_ascii=False, indent=2).encode('utf-8')
+    checksum = hashlib.sha256(manifest_body).hexdigest()
+    s3_key = f"{backup_prefix}/manifest.json"
+    
+    print(f"Subiendo manifest a S3: {s3_key}")
+    s3.put_object(
+        Bucket=S3_BUCKET,
+        Key=s3_key,
+        Body=manifest_body,
+        ContentType='application/json',
+        Metadata={
+            'table-name': metadata['table_name'],
+            'backup-date': metadata['backup_date'],
+            'backup-type': backup_type,
+            'item-count': str(metadata['item_count']),
+            'chunk-count': str(len(chunks)),
+            'checksum': checksum,
+            'compression-ratio': str(compression_ratio)
+        },
+        StorageClass='STANDARD',
+        ServerSideEncryption='AES256'
+    )
+    
+    return s3_key, checksum
+
+
+def load_pointer(table_name):
+    """
+    Lee el apuntador al último backup de la tabla:
+        {table_name, delta_source, base, manifest, sequence,
+         captured_until, watermark, stream_cursor}
+    
+    Returns:
+        dict: Apuntador, o None si la tabla nunca tuvo un backup completo
+    """
+    try:
+        response = s3.get_object(Bucket=S3_BUCKET, Key=f"{LATEST_PREFIX}/{table_name}.json")
+    except s3.exceptions.NoSuchKey:
+        return None
+    return json.loads(response['Body'].read().decode('utf-8'))
+
+
+def save_pointer(table_name, pointer):
+    s3.put_object(
+        Bucket=S3_BUCKET,
+        Key=f"{LATEST_PREFIX}/{table_name}.json",
+        Body=json.dumps(pointer, indent=2).encode('utf-8'),
+        ContentType='application/json',
+        ServerSideEncryption='AES256'
+    )
+
+
+def new_chunk():
+    """Parte vacía: el gzip se escribe incrementalmente en memoria"""
+    buffer = io.BytesIO()
+    return {
+        'buffer': buffer,
+        'gzip': gzip.GzipFile(fileobj=buffer, mode='wb'),
+        'items': 0,
+        'size': 0,
+        'first_key': None,
+        'last_key': None
+    }
+
+
+def add_to_chunk(chunk, items, key_attributes):
+    """Agrega una página de items (una línea JSON cada uno) y actualiza el rango de llaves"""
+    encoder = DecimalEncoder(ensure_ascii=False)
+    lines = ''.join(encoder.encode(item) + '\n' for item in items).encode('utf-8')
+    chunk['gzip'].write(lines)
+    chunk['items'] += len(items)
+    chunk['size'] += len(lines)
+    
+    if chunk['first_key'] is None:
+        chunk['first_key'] = {k: items[0].get(k) for k in key_attributes}
+    chunk['last_key'] = {k: items[-1].get(k) for k in key_attributes}
+
+
+def upload_chunk(chunk, backup_prefix, index, table_name, backup_date):
+    """
+    Cierra el gzip de la parte, calcula su checksum y la sube a S3.
+    
+    Returns:
+        dict: Entrada del manifest (key, items, bytes, sha256, rango de llaves)
+    """
+    chunk['gzip'].close()
+    compressed_data = chunk['buffer'].getvalue()
+    checksum = hashlib.sha256(compressed_data).hexdigest()
+    s3_key = f"{backup_prefix}/part-{index:05d}.jsonl.gz"
+    
+    print(f"  Subiendo parte {index}: {s3_key} ({chunk['items']} items)")
     s3.put_object(
         Bucket=S3_BUCKET,
         Key=s3_key,
@@ -263,26 +862,69 @@ def backup_table(table_config, backup_date):
         Metadata={
             'table-name': table_name,
             'backup-date': backup_date,
-            'item-count': str(item_count),
-            'checksum': checksum,
-            'compression-ratio': str(compression_ratio)
+            'item-count': str(chunk['items']),
+            'checksum': checksum
         },
         StorageClass='STANDARD',
         ServerSideEncryption='AES256'
     )
     
-    print(f"✓ Backup completado exitosamente")
+    return {
+        'key': s3_key,
+        'items': chunk['items'],
+        'size_bytes': chunk['size'],
+        'compressed_size_bytes': len(compressed_data),
+        'sha256': checksum,
+        'first_key': chunk['first_key'],
+        'last_key': chunk['last_key']
+    }
+
+
+def export_parquet(export, table_name, backup_date):
+    """
+    Escribe y sube la exportación Parquet de una tabla, un archivo por mes
+    (cada archivo se sube desde /tmp y se borra antes de escribir el siguiente).
+    
+    Estructura en S3 (particiones estilo Hive, una foto por backup):
+        analytics/environment/table/snapshot=date/mes=YYYY-MM/part-00000.parquet
+    
+    Returns:
+        dict: Resumen (prefijo, archivos, filas, bytes, motor, esquema, duración)
+    """
+    clock = time.monotonic()
+    prefix = f"{PARQUET_PREFIX}/{table_name}/snapshot={backup_date}"
+    schema = export.infer_schema()
+    files = 0
+    size = 0
+    
+    for path, data, rows in export.files():
+        s3.put_object(
+            Bucket=S3_BUCKET,
+            Key=f"{prefix}/{path}",
+            Body=data,
+            ContentType='application/vnd.apache.parquet',
+            Metadata={
+                'table-name': table_name,
+                'backup-date': backup_date,
+                'row-count': str(rows)
+            },
+            ServerSideEncryption='AES256'
+        )
+        files += 1
+        size += os.fstat(data.fileno()).st_size
+    
+    elapsed = round(time.monotonic() - clock, 2)
+    print(f"✓ Parquet de {table_name}: {export.rows} filas en {files} archivos "
+          f"({size / 1024 / 1024:.2f} MB, {PARQUET_ENGINE}) en {elapsed}s")
     
-    # Retornar resumen del backup
     return {
-        'table_name': table_name,
-        'item_count': item_count,
-        's3_key': s3_key,
-        's3_bucket': S3_BUCKET,
-        'checksum': checksum,
-        'size_compressed_mb': round(len(compressed_data) / 1024 / 1024, 2),
-        'size_uncompressed_mb': round(len(json_data) / 1024 / 1024, 2),
-        'compression_ratio': compression_ratio
+        'prefix': prefix,
+        'files': files,
+        'rows': export.rows,
+        'size_mb': round(size / 1024 / 1024, 2),
+        'engine': PARQUET_ENGINE,
+        'schema': dict(schema),
+        'duration_seconds': elapsed
     }
 
 
@@ -350,18 +992,29 @@ def send_notification(results, critical=False):
     tables_summary = []
     for table_result in results.get('tables', []):
         tables_summary.append(
-            f"  • {table_result['table_name']}: "
+            f"  • {table_result['table_name']}"
+            f"{' (delta)' if table_result.get('type') == 'delta' else ''}: "
             f"{table_result['item_count']} items "
-            f"({table_result['size_compressed_mb']} MB comprimido)"
+            f"({table_result['size_compressed_mb']} MB comprimido, "
+            f"{table_result.get('duration_seconds', 'N/A')}s, "
+            f"{table_result.get('items_per_second', 'N/A')} items/s)"
         )
+        parquet = table_result.get('parquet')
+        if parquet:
+            tables_summary.append(
+                f"      Parquet: {parquet['error']}" if 'error' in parquet else
+                f"      Parquet: {parquet['files']} archivos, {parquet['size_mb']} MB ({parquet['prefix']}/)"
+            )
     
     # Construir mensaje
     message_parts = [
         f"Estado: {status}",
         f"Ambiente: {ENVIRONMENT}",
         f"Fecha backup: {results['date']}",
+        f"Modo: {results.get('mode', 'full')}",
         f"Hora inicio: {results.get('start_time', 'N/A')}",
         f"Hora fin: {results.get('end_time', 'N/A')}",
+        f"Duración: {results.get('duration_seconds', 'N/A')}s",
         "",
         f"Tablas procesadas ({len(results.get('tables', []))}):",
         *tables_summary,
@@ -406,4 +1059,66 @@ def send_notification(results, critical=False):
         )
         print("✓ Notificación SNS enviada")
     except Exception as e:
-        print(f"✗ Error enviando notificación SNS: {str(e)}")
\ No newline at end of file
+        print(f"✗ Error enviando notificación SNS: {str(e)}")
+
+
+def stream_archive_handler(event, context):
+    """
+    Handler del archivador de DynamoDB Streams (misma Lambda empaquetada,
+    otro handler). Guarda cada lote del stream en S3 para los backups
+    incrementales con delta_source = "stream".
+    
+    Args:
+        event (dict): Lote de registros del stream ({"Records": [...]})
+        context: Contexto de ejecución de Lambda
+    
+    Returns:
+        dict: {'archived': registros guardados}
+    
+    Estructura en S3 (el nombre empieza con la hora de escritura, así los
+    deltas leen en orden con StartAfter):
+        environment/streams/table/YYYYMMDDTHHMMSSZ-secuencia.jsonl.gz
+    
+    Si la escritura falla se lanza la excepción y el stream reintenta el
+    lote completo; un lote repetido se descarta al compactar por secuencia.
+    """
+    records_by_table = {}
+    for record in event.get('Records', []):
+        # 'arn:aws:dynamodb:...:table/pagos/stream/2025-...' -> 'pagos'
+        table_name = record['eventSourceARN'].split(':table/', 1)[1].split('/', 1)[0]
+        records_by_table.setdefault(table_name, []).append(record)
+    
+    encoder = DecimalEncoder(ensure_ascii=False)
+    for table_name, records in records_by_table.items():
+        lines = []
+        for record in records:
+            stream_data = record['dynamodb']
+            change = {
+                'op': 'delete' if record['eventName'] == 'REMOVE' else 'put',
+                'key': deserialize_image(stream_data['Keys']),
+                'seq': stream_data['SequenceNumber'],
+                'ts': stream_data.get('ApproximateCreationDateTime')
+            }
+            if change['op'] == 'put':
+                change['item'] = deserialize_image(stream_data['NewImage'])
+            lines.append(encoder.encode(change) + '\n')
+        
+        archive_key = (
+            f"{STREAM_ARCHIVE_PREFIX}/{table_name}/"
+            f"{datetime.utcnow().strftime(ARCHIVE_TIMESTAMP_FORMAT)}-{records[0]['dynamodb']['SequenceNumber']}.jsonl.gz"
+        )
+        s3.put_object(
+            Bucket=S3_BUCKET,
+            Key=archive_key,
+            Body=gzip.compress(''.join(lines).encode('utf-8')),
+            ContentType='application/gzip',
+            ServerSideEncryption='AES256'
+        )
+        print(f"✓ {len(records)} registros de {table_name} archivados: {archive_key}")
+    
+    return {'archived': sum(len(records) for records in records_by_table.values())}
+
+
+def deserialize_image(image):
+    """Imagen del stream ({'attr': {'S': ...}}) -> dict de Python (números como Decimal)"""
+    return {attribute: deserializer.deserialize(value) for attribute, value in image.items()}
@@ -0,0 +1,399 @@
+"""
+Reconstrucción de Snapshots a partir de Backups Incrementales
+
+Este script aplica un backup completo más sus deltas (backup_function con
+mode=incremental) y escribe el resultado como un backup completo en el
+formato por partes, listo para restore_backup.py.
+
+Características:
+- Recorre la cadena de manifests (cada delta apunta a su parent) desde el
+  delta pedido hasta el backup completo base
+- Punto en el tiempo: --until descarta los deltas capturados después
+- Estado intermedio en SQLite en disco: memoria constante sin importar el
+  tamaño de la tabla
+- Valida checksum y conteo de items de cada parte leída
+- Salida a S3 (prefijo) o a un directorio local
+- Aviso cuando un delta no registra eliminaciones (delta_source = updatedAt)
+
+Uso:
+    # Último estado respaldado de una tabla (apuntador latest/)
+    python merge_backups.py --bucket BUCKET --environment production --table pagos
+
+    # Estado a una hora específica
+    python merge_backups.py --bucket BUCKET --environment production --table pagos \
+        --until 2025-01-28T12:00:00
+
+    # Desde un delta específico, con salida local
+    python merge_backups.py --bucket BUCKET \
+        --manifest production/2025/week-04/pagos-2025-01-28/delta-030000/manifest.json \
+        --output ./snapshot-pagos
+
+    # Restaurar el snapshot (backup_prefix en la configuración de tablas)
+    python restore_backup.py --bucket BUCKET --date 2025-01-28 \
+        --tables '[{"name": "pagos", "backup_prefix": "production/merged/pagos-20250128T120000Z"}]'
+
+Autor: Jose - Senior SOA Architect
+Versión: 1.0
+"""
+
+import argparse
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from restore_backup import DynamoDBRestore
+
+# Mismo formato que escribe backup_function
+MANIFEST_FORMAT = 'jsonl-chunks'
+MANIFEST_VERSION = 1
+DEFAULT_CHUNK_SIZE_MB = 64
+
+# Filas por transacción al cargar el estado en SQLite
+MERGE_BATCH_SIZE = 5000
+
+
+class SnapshotOutput:
+    """Destino del snapshot: 's3://bucket/prefijo' o un directorio local"""
+
+    def __init__(self, location, s3_client):
+        self.s3_client = s3_client
+        if location.startswith('s3://'):
+            self.bucket, _, self.prefix = location[len('s3://'):].partition('/')
+            self.prefix = self.prefix.rstrip('/')
+        else:
+            self.bucket = None
+            self.prefix = location.rstrip('/')
+            os.makedirs(self.prefix, exist_ok=True)
+
+    def key(self, name):
+        return f"{self.prefix}/{name}"
+
+    def put(self, name, body, content_type, metadata):
+        if self.bucket is None:
+            with open(self.key(name), 'wb') as f:
+                f.write(body)
+            return
+
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=self.key(name),
+            Body=body,
+            ContentType=content_type,
+            Metadata=metadata,
+            StorageClass='STANDARD',
+            ServerSideEncryption='AES256'
+        )
+
+    def __str__(self):
+        return f"s3://{self.bucket}/{self.prefix}" if self.bucket else self.prefix
+
+
+class BackupMerger:
+    """
+    Reconstruye una tabla a partir de un backup completo y sus deltas.
+
+    La lectura (descarga en streaming y validación de cada parte) es la de
+    DynamoDBRestore; aquí solo se aplica la cadena y se escribe el snapshot.
+    """
+
+    def __init__(self, source_bucket, source_region='us-east-1'):
+        """
+        Args:
+            source_bucket (str): Bucket S3 donde están los backups
+            source_region (str): Región AWS del bucket S3
+        """
+        self.source_bucket = source_bucket
+        self.source = DynamoDBRestore(source_bucket, source_region=source_region)
+        self.s3_client = self.source.s3_client
+
+    def latest_manifest(self, environment, table_name):
+        """
+        Regresa el manifest más reciente de la tabla (apuntador latest/ que
+        mantiene backup_function).
+
+        Raises:
+            ValueError: Si la tabla no tiene apuntador
+        """
+        key = f"{environment}/latest/{table_name}.json"
+        try:
+            response = self.s3_client.get_object(Bucket=self.source_bucket, Key=key)
+        except self.s3_client.exceptions.NoSuchKey:
+            raise ValueError(f"❌ {table_name} no tiene backups incrementales ({key} no existe)")
+        return json.loads(response['Body'].read().decode('utf-8'))['manifest']
+
+    def resolve_chain(self, manifest_key, until=None):
+        """
+        Sigue los parent desde manifest_key hasta el backup completo base.
+
+        Args:
+            manifest_key (str): Manifest de un delta (o de un completo)
+            until (str): ISO 8601; se descartan los deltas con
+                captured_until posterior (opcional)
+
+        Returns:
+            list: [(key, manifest)] del backup base al último delta aplicado
+
+        Raises:
+            ValueError: Si falta un manifest de la cadena o el backup base
+                        es posterior a until
+        """
+        chain = []
+        key = manifest_key
+        while True:
+            manifest = self.source.download_manifest(key)
+            if manifest is None:
+                raise ValueError(f"❌ Manifest no encontrado en la cadena: {key}")
+            chain.append((key, manifest))
+            if manifest.get('type', 'full') != 'delta':
+                break
+            key = manifest['metadata']['parent']
+        chain.reverse()
+
+        if until:
+            base_time = chain[0][1]['metadata'].get('timestamp', '')
+            if base_time > until:
+                raise ValueError(f"❌ El backup base {chain[0][0]} es posterior a {until}")
+            chain = chain[:1] + [
+                (key, manifest) for key, manifest in chain[1:]
+                if manifest['metadata']['captured_until'] <= until
+            ]
+
+        return chain
+
+    def merge(self, chain, connection):
+        """
+        Aplica la cadena sobre la tabla 'state' (llave JSON -> item JSON).
+
+        Los cambios de un delta están compactados (uno por llave), así que
+        el orden dentro de un delta no importa; entre deltas se aplica en
+        el orden de la cadena.
+
+        Returns:
+            dict: Conteos {'base_items', 'puts', 'deletes'}
+        """
+        metadata = chain[0][1]['metadata']
+        key_attributes = [k for k in (metadata.get('pk'), metadata.get('sk')) if k]
+
+        def key_of(values):
+            return json.dumps([values.get(k) for k in key_attributes], ensure_ascii=False)
+
+        connection.execute('CREATE TABLE state (key TEXT PRIMARY KEY, item TEXT NOT NULL)')
+        counts = {'base_items': 0, 'puts': 0, 'deletes': 0}
+
+        # === Backup completo base ===
+        base_key, base = chain[0]
+        print(f"\n📦 Base: {base_key}")
+        items = itertools.chain.from_iterable(self.source.iter_chunk_items(c) for c in base['chunks'])
+        while True:
+            batch = list(itertools.islice(items, MERGE_BATCH_SIZE))
+            if not batch:
+                break
+            connection.executemany(
+                'INSERT OR REPLACE INTO state (key, item) VALUES (?, ?)',
+                [(key_of(item), json.dumps(item, ensure_ascii=False)) for item in batch]
+            )
+            connection.commit()
+            counts['base_items'] += len(batch)
+
+        # === Deltas en orden ===
+        for delta_key, delta in chain[1:]:
+            delta_metadata = delta['metadata']
+            print(f"\n🔁 Delta {delta_metadata['sequence']}: {delta_key} "
+                  f"({delta_metadata['puts']} puts, {delta_metadata['deletes']} deletes)")
+            if not delta_metadata.get('deletes_captured', True):
+                print(f"   ⚠️  Delta por {delta_metadata.get('delta_source')}: no registra eliminaciones, "
+                      f"los items eliminados siguen en el snapshot")
+
+            changes = itertools.chain.from_iterable(self.source.iter_chunk_items(c) for c in delta['chunks'])
+            while True:
+                batch = list(itertools.islice(changes, MERGE_BATCH_SIZE))
+                if not batch:
+                    break
+                for change in batch:
+                    if change['op'] == 'delete':
+                        connection.execute('DELETE FROM state WHERE key = ?', (key_of(change['key']),))
+                        counts['deletes'] += 1
+                    else:
+                        connection.execute(
+                            'INSERT OR REPLACE INTO state (key, item) VALUES (?, ?)',
+                            (key_of(change['key']), json.dumps(change['item'], ensure_ascii=False))
+                        )
+                        counts['puts'] += 1
+                connection.commit()
+
+        return counts
+
+    def export(self, chain, connection, output, chunk_size_bytes):
+        """
+        Escribe el estado como backup completo por partes (manifest al final).
+
+        Returns:
+            dict: Manifest del snapshot
+        """
+        base_metadata = chain[0][1]['metadata']
+        last_metadata = chain[-1][1]['metadata']
+        key_attributes = [k for k in (base_metadata.get('pk'), base_metadata.get('sk')) if k]
+        captured_until = last_metadata.get('captured_until') or last_metadata.get('timestamp')
+
+        chunks = []
+        lines = []
+        size = 0
+        first_key = None
+
+        def flush(last_key):
+            body = ''.join(lines).encode('utf-8')
+            compressed = gzip.compress(body)
+            checksum = hashlib.sha256(compressed).hexdigest()
+            name = f"part-{len(chunks):05d}.jsonl.gz"
+            output.put(name, compressed, 'application/gzip', {
+                'table-name': base_metadata['table_name'],
+                'item-count': str(len(lines)),
+                'checksum': checksum
+            })
+            print(f"   Parte {len(chunks)}: {output.key(name)} ({len(lines)} items)")
+            chunks.append({
+                'key': output.key(name),
+                'items': len(lines),
+                'size_bytes': len(body),
+                'compressed_size_bytes': len(compressed),
+                'sha256': checksum,
+                'first_key': dict(zip(key_attributes, json.loads(first_key))),
+                'last_key': dict(zip(key_attributes, json.loads(last_key)))
+            })
+
+        key = None
+        for key, item in connection.execute('SELECT key, item FROM state ORDER BY key'):
+            if first_key is None:
+                first_key = key
+            line = item + '\n'
+            lines.append(line)
+            size += len(line.encode('utf-8'))
+            if size >= chunk_size_bytes:
+                flush(key)
+                lines, size, first_key = [], 0, None
+        if lines:
+            flush(key)
+
+        item_count = sum(c['items'] for c in chunks)
+        manifest = {
+            'format': MANIFEST_FORMAT,
+            'version': MANIFEST_VERSION,
+            'type': 'full',
+            'metadata': {
+                **{k: base_metadata.get(k) for k in ('table_name', 'environment', 'pk', 'sk', 'region')},
+                'backup_date': captured_until[:10],
+                'item_count': item_count,
+                'timestamp': datetime.now().isoformat(),
+                'captured_until': captured_until,
+                'merged_from': [key for key, _ in chain],
+                'compressed_size': sum(c['compressed_size_bytes'] for c in chunks),
+                'uncompressed_size': sum(c['size_bytes'] for c in chunks)
+            },
+            'chunks': chunks
+        }
+
+        body = json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8')
+        output.put('manifest.json', body, 'application/json', {
+            'table-name': base_metadata['table_name'],
+            'backup-date': manifest['metadata']['backup_date'],
+            'backup-type': 'full',
+            'item-count': str(item_count),
+            'chunk-count': str(len(chunks)),
+            'checksum': hashlib.sha256(body).hexdigest()
+        })
+
+        return manifest
+
+
+def main():
+    """
+    Punto de entrada del script.
+    Resuelve la cadena de backups, la aplica y escribe el snapshot.
+    """
+    parser = argparse.ArgumentParser(
+        description='Reconstruir un snapshot desde un backup completo y sus deltas'
+    )
+    parser.add_argument('--bucket', required=True,
+                        help='Bucket S3 con los backups')
+    parser.add_argument('--source-region', default='us-east-1',
+                        help='Región del bucket')
+    parser.add_argument('--environment', default='production',
+                        help='Ambiente (production, staging, etc.)')
+    parser.add_argument('--table',
+                        help='Tabla a reconstruir (usa el último backup de latest/)')
+    parser.add_argument('--manifest',
+                        help='Manifest del delta (o completo) hasta el que se reconstruye')
+    parser.add_argument('--until',
+                        help='Descartar deltas capturados después de esta hora UTC (ISO 8601)')
+    parser.add_argument('--output',
+                        help='s3://bucket/prefijo o directorio local '
+                             '(default: s3://BUCKET/ENV/merged/tabla-hora)')
+    parser.add_argument('--chunk-size-mb', type=int, default=DEFAULT_CHUNK_SIZE_MB,
+                        help=f'Tamaño sin comprimir de cada parte (default: {DEFAULT_CHUNK_SIZE_MB})')
+    parser.add_argument('--work-dir',
+                        help='Directorio para la base SQLite temporal (default: el del sistema)')
+    args = parser.parse_args()
+
+    if not args.table and not args.manifest:
+        parser.error("Se requiere --table o --manifest")
+
+    merger = BackupMerger(args.bucket, source_region=args.source_region)
+    start_time = time.time()
+
+    try:
+        manifest_key = args.manifest or merger.latest_manifest(args.environment, args.table)
+        chain = merger.resolve_chain(manifest_key, until=args.until)
+    except ValueError as e:
+        print(str(e))
+        sys.exit(1)
+
+    table_name = chain[0][1]['metadata']['table_name']
+    last_metadata = chain[-1][1]['metadata']
+    captured_until = last_metadata.get('captured_until') or last_metadata.get('timestamp')
+    output_location = args.output or (
+        f"s3://{args.bucket}/{chain[0][1]['metadata'].get('environment', args.environment)}/merged/"
+        f"{table_name}-{datetime.fromisoformat(captured_until).strftime('%Y%m%dT%H%M%SZ')}"
+    )
+
+    print(f"\n{'=' * 70}")
+    print(f"🧩 Reconstrucción de {table_name}")
+    print(f"{'=' * 70}")
+    print(f"Base:     {chain[0][0]}")
+    print(f"Deltas:   {len(chain) - 1}")
+    print(f"Hasta:    {captured_until}")
+    print(f"Salida:   {output_location}")
+
+    with tempfile.TemporaryDirectory(dir=args.work_dir) as work_dir:
+        connection = sqlite3.connect(os.path.join(work_dir, 'state.db'))
+        try:
+            counts = merger.merge(chain, connection)
+            output = SnapshotOutput(output_location, merger.s3_client)
+            print(f"\n💾 Escribiendo snapshot en {output}")
+            manifest = merger.export(chain, connection, output, args.chunk_size_mb * 1024 * 1024)
+        except (OSError, EOFError, ValueError) as e:
+            print(f"\n❌ {str(e)}")
+            sys.exit(1)
+        finally:
+            connection.close()
+
+    print(f"\n{'=' * 70}")
+    print(f"✅ Snapshot listo en {time.time() - start_time:.2f}s")
+    print(f"{'=' * 70}")
+    print(f"Items base:   {counts['base_items']}")
+    print(f"Puts:         {counts['puts']}")
+    print(f"Deletes:      {counts['deletes']}")
+    print(f"Items finales: {manifest['metadata']['item_count']} en {len(manifest['chunks'])} partes")
+    if output.bucket:
+        print(f"\nPara restaurar: --tables '[{{\"name\": \"{table_name}\", "
+              f"\"backup_prefix\": \"{output.prefix}\"}}]'")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,558 @@
+"""
+Exportación de tablas DynamoDB a Parquet para análisis
+
+Convierte los items que lee el backup completo en archivos Parquet
+particionados por mes, para consultar el histórico (por ejemplo el total
+recaudado por mes) con Athena, DuckDB o pyarrow sin descomprimir y
+parsear los backups JSON completos.
+
+Características:
+- Esquema inferido de los datos: bool -> BOOLEAN, números enteros ->
+  INT64, números con decimales -> DOUBLE, texto -> STRING; sets, mapas,
+  listas y columnas con tipos mezclados se guardan como texto JSON
+- Particiones estilo Hive por mes de una columna de fecha
+  (mes=YYYY-MM/); los items sin fecha van a __HIVE_DEFAULT_PARTITION__
+- Memoria acotada: cada página del scan se escribe de inmediato a un
+  archivo temporal (JSONL gzip en /tmp) de su partición; al final cada
+  partición se convierte row group por row group. En memoria solo queda
+  el esquema y un row group
+- Filas ordenadas por llave (pk, sk) dentro de cada row group, con min/max
+  por columna: los filtros por id, ronda o fecha se resuelven leyendo solo
+  las particiones y row groups que pueden tener resultados
+- Codificación por diccionario en columnas con valores repetidos
+- Con pyarrow disponible (por ejemplo en un Lambda layer) se escribe con
+  pyarrow (snappy); sin él, con un escritor Parquet en Python puro (gzip)
+
+Autor: Jose - Senior SOA Architect
+Versión: 1.0
+"""
+
+import base64
+import gzip
+import json
+import os
+import re
+import struct
+import tempfile
+from decimal import Decimal
+from itertools import groupby
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+ENGINE = 'pyarrow' if pa is not None else 'python'
+
+# Filas por row group: cada uno lleva su min/max por columna y es lo que
+# se tiene en memoria al escribir una partición
+ROW_GROUP_ROWS = 20000
+
+# Archivos temporales por partición (en Lambda /tmp, ver ephemeral_storage)
+SPILL_DIR = os.environ.get('PARQUET_SPILL_DIR') or tempfile.gettempdir()
+
+# Partición de los items sin fecha (mismo nombre que usa Hive/Athena)
+DEFAULT_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+MONTH_PATTERN = re.compile(r'^(\d{4}-\d{2})')
+
+# Tipos lógicos del esquema inferido
+BOOLEAN = 'boolean'
+INT64 = 'int64'
+DOUBLE = 'double'
+STRING = 'string'
+
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+# Diccionario solo si los valores se repiten y caben en una página razonable
+DICTIONARY_MAX_VALUES = 65536
+
+
+# =========================================
+# Esquema
+# =========================================
+
+def value_kind(value):
+    """Clase de un valor de DynamoDB (ya deserializado) para inferir su columna"""
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, (Decimal, int, float)):
+        if isinstance(value, float) or value % 1 != 0:
+            return 'float'
+        return 'int' if INT64_MIN <= value <= INT64_MAX else 'float'
+    if isinstance(value, str):
+        return 'str'
+    return 'other'
+
+
+def column_type(kinds):
+    """Tipo Parquet de una columna según las clases de valores que tiene"""
+    if not kinds:
+        return STRING
+    if kinds == {'bool'}:
+        return BOOLEAN
+    if kinds == {'int'}:
+        return INT64
+    if kinds <= {'int', 'float'}:
+        return DOUBLE
+    return STRING
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value % 1 == 0 else float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    if hasattr(value, 'value'):
+        # boto3 Binary
+        value = value.value
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode('ascii')
+    raise TypeError(f"Tipo no soportado: {type(value).__name__}")
+
+
+def convert(value, kind):
+    """Valor de DynamoDB -> valor Python del tipo de la columna"""
+    if value is None:
+        return None
+    if kind == INT64:
+        return int(value)
+    if kind == DOUBLE:
+        return float(value)
+    if kind == BOOLEAN:
+        return value
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, default=_json_default, ensure_ascii=False, sort_keys=True)
+
+
+def spill_value(value):
+    """
+    Valor de DynamoDB -> valor JSON del archivo temporal. Para el tipo de
+    cualquier columna que pueda contener el valor, convert() da lo mismo
+    con el original que con éste.
+    """
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    if isinstance(value, (Decimal, int, float)):
+        if not isinstance(value, float) and value % 1 == 0:
+            return int(value)
+        return float(value)
+    # Sets, mapas, listas y binarios solo caben en columnas STRING
+    return json.dumps(value, default=_json_default, ensure_ascii=False, sort_keys=True)
+
+
+def partition_of(value):
+    """Mes (YYYY-MM) de una fecha ISO 8601, o la partición por defecto"""
+    match = MONTH_PATTERN.match(value) if isinstance(value, str) else None
+    return match.group(1) if match else DEFAULT_PARTITION
+
+
+class ParquetExport:
+    """
+    Exportación Parquet de una tabla mientras el backup la recorre.
+
+    add() escribe cada página a un archivo temporal por partición y solo
+    guarda en memoria las clases de valores de cada columna; files()
+    infiere el esquema (todas las particiones de la tabla comparten
+    columnas y tipos) y convierte cada partición un row group a la vez.
+    close() borra los temporales.
+    """
+
+    def __init__(self, key_attributes, partition_column, spill_dir=None):
+        """
+        Args:
+            key_attributes (list): pk y sk de la tabla (orden de las filas)
+            partition_column (str): Columna de fecha ISO 8601 para particionar por mes
+            spill_dir (str): Directorio de los temporales (default: SPILL_DIR)
+        """
+        self.key_attributes = list(key_attributes)
+        self.partition_column = partition_column
+        self.kinds = {name: set() for name in self.key_attributes}
+        self.rows = 0
+        # Se borra también si el backup falla y el objeto se descarta
+        self.spill = tempfile.TemporaryDirectory(prefix='parquet-', dir=spill_dir or SPILL_DIR)
+        self.partitions = {}
+
+    def _spill_file(self, month):
+        partition = self.partitions.get(month)
+        if partition is None:
+            path = os.path.join(self.spill.name, f"{month}.jsonl.gz")
+            partition = self.partitions[month] = {
+                'path': path,
+                'file': gzip.open(path, 'wb', compresslevel=1),
+                'rows': 0
+            }
+        return partition
+
+    def add(self, items):
+        """Escribe una página de items del scan a los temporales de sus particiones"""
+        lines = {}
+        for item in items:
+            row = {}
+            for name, value in item.items():
+                kinds = self.kinds.get(name)
+                if kinds is None:
+                    kinds = self.kinds[name] = set()
+                if value is not None:
+                    kinds.add(value_kind(value))
+                row[name] = spill_value(value)
+            month = partition_of(item.get(self.partition_column))
+            lines.setdefault(month, []).append(json.dumps(row, ensure_ascii=False))
+
+        for month, rows in lines.items():
+            partition = self._spill_file(month)
+            partition['file'].write(('\n'.join(rows) + '\n').encode('utf-8'))
+            partition['rows'] += len(rows)
+        self.rows += len(items)
+
+    def infer_schema(self):
+        """
+        Returns:
+            list: Tuplas (columna, tipo) con las llaves primero y el resto en
+                  el orden en que aparecieron
+        """
+        return [(name, column_type(kinds)) for name, kinds in self.kinds.items()]
+
+    def files(self, row_group_rows=ROW_GROUP_ROWS):
+        """
+        Escribe cada partición (en orden de mes) a un archivo temporal y lo
+        regresa abierto; se borra al pedir el siguiente.
+
+        Yields:
+            tuple: (ruta relativa 'mes=YYYY-MM/part-00000.parquet', archivo binario, filas)
+        """
+        schema = self.infer_schema()
+        sort_key = self.key_attributes
+        for month in sorted(self.partitions):
+            partition = self.partitions.pop(month)
+            partition['file'].close()
+            path = os.path.join(self.spill.name, f"{month}.parquet")
+
+            writer = open_writer(path, schema)
+            with gzip.open(partition['path'], 'rt', encoding='utf-8') as spill:
+                while True:
+                    rows = [json.loads(line) for _, line in zip(range(row_group_rows), spill)]
+                    if not rows:
+                        break
+                    rows.sort(key=lambda row: tuple(row.get(k) for k in sort_key))
+                    writer.write_row_group(
+                        [[convert(row.get(name), kind) for row in rows] for name, kind in schema],
+                        len(rows)
+                    )
+            writer.close()
+            os.remove(partition['path'])
+
+            try:
+                with open(path, 'rb') as data:
+                    yield f"mes={month}/part-00000.parquet", data, partition['rows']
+            finally:
+                os.remove(path)
+
+    def close(self):
+        """Cierra y borra los temporales"""
+        for partition in self.partitions.values():
+            partition['file'].close()
+        self.partitions = {}
+        self.spill.cleanup()
+
+
+def open_writer(path, schema):
+    """
+    Escritor Parquet por row groups: pyarrow (snappy) si está disponible,
+    si no el escritor en Python puro (gzip).
+
+    Args:
+        path (str): Archivo a escribir
+        schema (list): Tuplas (columna, tipo)
+    """
+    if pa is not None:
+        return PyarrowWriter(path, schema)
+    return ParquetWriter(open(path, 'wb'), schema)
+
+
+class PyarrowWriter:
+    """Misma interfaz que ParquetWriter sobre pyarrow.parquet.ParquetWriter"""
+
+    def __init__(self, path, schema):
+        types = {BOOLEAN: pa.bool_(), INT64: pa.int64(), DOUBLE: pa.float64(), STRING: pa.string()}
+        self.schema = pa.schema([(name, types[kind]) for name, kind in schema])
+        self.writer = pq.ParquetWriter(path, self.schema, compression='snappy',
+                                       use_dictionary=True, write_statistics=True)
+
+    def write_row_group(self, columns, num_rows):
+        arrays = [pa.array(values, type=field.type) for field, values in zip(self.schema, columns)]
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema), row_group_size=num_rows)
+
+    def close(self):
+        self.writer.close()
+
+
+# =========================================
+# Escritor Parquet en Python puro
+# =========================================
+# Subconjunto del formato suficiente para cualquier lector: columnas
+# planas OPTIONAL, páginas de datos v1, diccionario PLAIN + índices
+# RLE_DICTIONARY, niveles de definición RLE, compresión gzip y
+# estadísticas min/max por column chunk. Los metadatos van en Thrift
+# compact protocol (ver parquet.thrift en apache/parquet-format).
+
+# Tipos físicos
+_PHYSICAL = {BOOLEAN: 0, INT64: 2, DOUBLE: 5, STRING: 6}
+_CONVERTED_UTF8 = 0
+_OPTIONAL = 1
+
+# Codificaciones, páginas y compresión
+_PLAIN = 0
+_RLE = 3
+_RLE_DICTIONARY = 8
+_DATA_PAGE = 0
+_DICTIONARY_PAGE = 2
+_GZIP = 2
+
+# Tipos del Thrift compact protocol
+_T_TRUE = 1
+_T_I32 = 5
+_T_I64 = 6
+_T_BINARY = 8
+_T_LIST = 9
+_T_STRUCT = 12
+
+
+def _varint(n):
+    out = bytearray()
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+def _zigzag(n):
+    return _varint((n << 1) ^ (n >> 63))
+
+
+def _thrift_value(ttype, value):
+    if ttype in (_T_I32, _T_I64):
+        return _zigzag(value)
+    if ttype == _T_BINARY:
+        data = value.encode('utf-8') if isinstance(value, str) else value
+        return _varint(len(data)) + data
+    if ttype == _T_STRUCT:
+        return value
+    if ttype == _T_LIST:
+        element_type, elements = value
+        size = len(elements)
+        header = bytes([(size << 4) | element_type]) if size < 15 else bytes([0xF0 | element_type]) + _varint(size)
+        return header + b''.join(_thrift_value(element_type, element) for element in elements)
+    raise ValueError(f"Tipo Thrift no soportado: {ttype}")
+
+
+def _struct(*fields):
+    """Struct Thrift compact: fields son (id, tipo, valor) en orden de id; None se omite"""
+    out = bytearray()
+    last_id = 0
+    for field_id, ttype, value in fields:
+        if value is None:
+            continue
+        delta = field_id - last_id
+        if 0 < delta <= 15:
+            out.append((delta << 4) | ttype)
+        else:
+            out.append(ttype)
+            out += _zigzag(field_id)
+        if ttype != _T_TRUE:
+            out += _thrift_value(ttype, value)
+        last_id = field_id
+    out.append(0)
+    return bytes(out)
+
+
+def _rle_runs(values):
+    """Híbrido RLE/bit-packing con solo corridas RLE (bit width 1: niveles de definición)"""
+    return b''.join(_varint(len(list(run)) << 1) + bytes([value]) for value, run in groupby(values))
+
+
+def _bit_packed(values, bit_width):
+    """Híbrido RLE/bit-packing con una sola corrida bit-packed (índices del diccionario)"""
+    padded = list(values) + [0] * (-len(values) % 8)
+    out = bytearray(_varint(((len(padded) // 8) << 1) | 1))
+    if bit_width == 0:
+        return bytes(out)
+    # Bloques de 256 valores: enteros chicos, sin desplazar un entero gigante
+    for start in range(0, len(padded), 256):
+        block = padded[start:start + 256]
+        packed = 0
+        for value in reversed(block):
+            packed = (packed << bit_width) | value
+        out += packed.to_bytes(len(block) * bit_width // 8, 'little')
+    return bytes(out)
+
+
+def _plain(kind, values):
+    if kind == INT64:
+        return struct.pack(f'<{len(values)}q', *values)
+    if kind == DOUBLE:
+        return struct.pack(f'<{len(values)}d', *values)
+    if kind == BOOLEAN:
+        padded = list(values) + [False] * (-len(values) % 8)
+        return bytes(
+            sum(1 << bit for bit in range(8) if padded[i + bit])
+            for i in range(0, len(padded), 8)
+        )
+    encoded = [value.encode('utf-8') for value in values]
+    return b''.join(struct.pack('<I', len(data)) + data for data in encoded)
+
+
+def _stat(kind, value):
+    if kind == INT64:
+        return struct.pack('<q', value)
+    if kind == DOUBLE:
+        return struct.pack('<d', value)
+    if kind == BOOLEAN:
+        return bytes([value])
+    return value.encode('utf-8')
+
+
+class ParquetWriter:
+    """Escritor Parquet mínimo (sin dependencias) para columnas planas, un row group a la vez"""
+
+    def __init__(self, out, schema):
+        """
+        Args:
+            out: Archivo binario abierto (se cierra en close)
+            schema (list): Tuplas (columna, tipo)
+        """
+        self.out = out
+        self.schema = list(schema)
+        self.row_groups = []
+        self.num_rows = 0
+        self.out.write(b'PAR1')
+
+    def _page(self, page_type, data, header_field):
+        compressed = gzip.compress(data, compresslevel=6, mtime=0)
+        header = _struct(
+            (1, _T_I32, page_type),
+            (2, _T_I32, len(data)),
+            (3, _T_I32, len(compressed)),
+            header_field
+        )
+        offset = self.out.tell()
+        self.out.write(header)
+        self.out.write(compressed)
+        return offset, len(header) + len(data), len(header) + len(compressed)
+
+    def _column_chunk(self, name, kind, values):
+        """Escribe un column chunk (diccionario opcional + una página de datos)"""
+        present = [value for value in values if value is not None]
+        levels = _rle_runs([0 if value is None else 1 for value in values])
+        levels = struct.pack('<I', len(levels)) + levels
+
+        dictionary_offset = None
+        uncompressed = compressed = 0
+        distinct = {}
+        if kind != BOOLEAN:
+            for value in present:
+                if value not in distinct:
+                    distinct[value] = len(distinct)
+                    if len(distinct) > DICTIONARY_MAX_VALUES:
+                        break
+        use_dictionary = 0 < len(distinct) <= DICTIONARY_MAX_VALUES and len(distinct) < len(present)
+
+        if use_dictionary:
+            dictionary_offset, size, stored = self._page(
+                _DICTIONARY_PAGE, _plain(kind, list(distinct)),
+                (7, _T_STRUCT, _struct((1, _T_I32, len(distinct)), (2, _T_I32, _PLAIN)))
+            )
+            uncompressed += size
+            compressed += stored
+            bit_width = (len(distinct) - 1).bit_length()
+            data = bytes([bit_width]) + _bit_packed([distinct[value] for value in present], bit_width)
+            encoding = _RLE_DICTIONARY
+        else:
+            data = _plain(kind, present)
+            encoding = _PLAIN
+
+        data_offset, size, stored = self._page(
+            _DATA_PAGE, levels + data,
+            (5, _T_STRUCT, _struct(
+                (1, _T_I32, len(values)),
+                (2, _T_I32, encoding),
+                (3, _T_I32, _RLE),
+                (4, _T_I32, _RLE)
+            ))
+        )
+        uncompressed += size
+        compressed += stored
+
+        statistics = None
+        if present:
+            candidates = list(distinct) if use_dictionary else present
+            if kind == STRING:
+                encoded = [value.encode('utf-8') for value in candidates]
+                low, high = min(encoded), max(encoded)
+            else:
+                low, high = _stat(kind, min(candidates)), _stat(kind, max(candidates))
+            statistics = _struct(
+                (3, _T_I64, len(values) - len(present)),
+                (5, _T_BINARY, high),
+                (6, _T_BINARY, low)
+            )
+
+        encodings = [_PLAIN, _RLE] + ([_RLE_DICTIONARY] if use_dictionary else [])
+        metadata = _struct(
+            (1, _T_I32, _PHYSICAL[kind]),
+            (2, _T_LIST, (_T_I32, encodings)),
+            (3, _T_LIST, (_T_BINARY, [name])),
+            (4, _T_I32, _GZIP),
+            (5, _T_I64, len(values)),
+            (6, _T_I64, uncompressed),
+            (7, _T_I64, compressed),
+            (9, _T_I64, data_offset),
+            (11, _T_I64, dictionary_offset),
+            (12, _T_STRUCT, statistics)
+        )
+        chunk_offset = dictionary_offset if dictionary_offset is not None else data_offset
+        return _struct((2, _T_I64, chunk_offset), (3, _T_STRUCT, metadata)), uncompressed
+
+    def write_row_group(self, columns, num_rows):
+        """Escribe un row group; columns son los valores ya convertidos, en el orden del esquema"""
+        chunks = []
+        total_size = 0
+        for (name, kind), values in zip(self.schema, columns):
+            chunk, size = self._column_chunk(name, kind, values)
+            chunks.append(chunk)
+            total_size += size
+        self.row_groups.append(_struct(
+            (1, _T_LIST, (_T_STRUCT, chunks)),
+            (2, _T_I64, total_size),
+            (3, _T_I64, num_rows)
+        ))
+        self.num_rows += num_rows
+
+    def close(self):
+        """Escribe el footer y cierra el archivo"""
+        schema = [_struct((4, _T_BINARY, 'schema'), (5, _T_I32, len(self.schema)))]
+        for name, kind in self.schema:
+            schema.append(_struct(
+                (1, _T_I32, _PHYSICAL[kind]),
+                (3, _T_I32, _OPTIONAL),
+                (4, _T_BINARY, name),
+                (6, _T_I32, _CONVERTED_UTF8 if kind == STRING else None)
+            ))
+        # TypeDefinedOrder: los lectores usan min_value/max_value para filtrar
+        column_orders = [_struct((1, _T_STRUCT, _struct())) for _ in self.schema]
+        footer = _struct(
+            (1, _T_I32, 1),
+            (2, _T_LIST, (_T_STRUCT, schema)),
+            (3, _T_I64, self.num_rows),
+            (4, _T_LIST, (_T_STRUCT, self.row_groups)),
+            (6, _T_BINARY, 'tandamx parquet_export'),
+            (7, _T_LIST, (_T_STRUCT, column_orders))
+        )
+        self.out.write(footer)
+        self.out.write(struct.pack('<I', len(footer)))
+        self.out.write(b'PAR1')
+        self.out.close()
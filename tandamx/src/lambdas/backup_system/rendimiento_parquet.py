@@ -0,0 +1,235 @@
+"""
+Benchmark del "total recaudado por mes": backup JSON contra exportación Parquet
+
+Genera una tabla de pagos sintética (mismos atributos que registrar en
+lambda_pagos) y la escribe en los dos formatos del backup completo:
+
+- JSON: partes JSONL gzip, una línea por item como add_to_chunk
+- Parquet: ParquetExport (particiones mes=YYYY-MM por fechaPago), con
+  pyarrow o con el escritor en Python puro (--motor python)
+
+Después mide dos consultas sobre cada formato:
+
+- total_por_mes: SUM(monto) WHERE pagado GROUP BY mes
+- un_mes:        la misma suma solo para --mes (en Parquet se leen solo
+                 los archivos de esa partición; en JSON hay que leer todo)
+
+JSON se lee con gzip + json.loads, que es lo que cuesta analizar un backup
+hoy; Parquet con pyarrow.dataset (el mismo plan que haría DuckDB o Athena:
+solo las columnas mes, pagado y monto, y solo las particiones del filtro).
+Antes de reportar comprueba que las dos consultas dan los mismos totales.
+De cada consulta reporta la mediana de varias corridas. Leer Parquet
+requiere pyarrow.
+
+Uso:
+    python rendimiento_parquet.py
+    python rendimiento_parquet.py --pagos 500000 --corridas 3
+    python rendimiento_parquet.py --motor python --guardar parquet.json
+"""
+
+import os
+import json
+import gzip
+import random
+import argparse
+import platform
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+import parquet_export
+from parquet_export import ParquetExport
+
+try:
+    import pyarrow.dataset as ds
+except ImportError:
+    ds = None
+
+# Items por parte JSON (el backup corta por tamaño, ~64 MB sin comprimir)
+ITEMS_POR_PARTE = 100000
+
+
+def generar_pagos(cantidad, meses=24, semilla=11):
+    """Páginas de items como las regresa table.scan() (números en Decimal)"""
+    aleatorio = random.Random(semilla)
+    pagina = []
+    for i in range(cantidad):
+        mes = i * meses // cantidad
+        anio, mes = 2024 + mes // 12, mes % 12 + 1
+        fecha = f"{anio}-{mes:02d}-{aleatorio.randint(1, 28):02d}T{aleatorio.randint(0, 23):02d}:15:00"
+        participante = f"part_{aleatorio.getrandbits(40):010x}"
+        ronda = aleatorio.randint(1, 20)
+        pagina.append({
+            'id': f"tanda_{aleatorio.randint(1, 400):05d}",
+            'pagoId': f"{participante}_{ronda}",
+            'participanteId': participante,
+            'ronda': Decimal(ronda),
+            'pagado': aleatorio.random() < 0.8,
+            'monto': Decimal(aleatorio.choice(['500', '1000', '1500', '2000.50'])),
+            'fechaPago': fecha,
+            'metodoPago': aleatorio.choice(['efectivo', 'transferencia', 'tarjeta']),
+            'comprobante': '',
+            'notas': '',
+            'createdAt': fecha,
+            'updatedAt': fecha,
+            'exentoPago': False
+        })
+        if len(pagina) == 1000:
+            yield pagina
+            pagina = []
+    if pagina:
+        yield pagina
+
+
+def _numero(valor):
+    if isinstance(valor, Decimal):
+        return int(valor) if valor % 1 == 0 else float(valor)
+    raise TypeError(f'{type(valor).__name__} no es serializable')
+
+
+def escribir_json(cantidad, destino):
+    """return: lista de partes gzip (mismo formato de línea que add_to_chunk)"""
+    partes, parte, items = [], None, 0
+    for pagina in generar_pagos(cantidad):
+        for item in pagina:
+            if parte is None or items == ITEMS_POR_PARTE:
+                if parte:
+                    parte.close()
+                ruta = os.path.join(destino, f"part-{len(partes):05d}.jsonl.gz")
+                partes.append(ruta)
+                parte, items = gzip.open(ruta, 'wt', encoding='utf-8'), 0
+            parte.write(json.dumps(item, default=_numero, ensure_ascii=False) + '\n')
+            items += 1
+    parte.close()
+    return partes
+
+
+def escribir_parquet(cantidad, destino):
+    """return: lista de archivos mes=YYYY-MM/part-00000.parquet"""
+    export = ParquetExport(['id', 'pagoId'], 'fechaPago', spill_dir=destino)
+    archivos = []
+    try:
+        for pagina in generar_pagos(cantidad):
+            export.add(pagina)
+        for relativa, datos, _ in export.files():
+            ruta = os.path.join(destino, 'pagos', relativa)
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            with open(ruta, 'wb') as salida:
+                salida.write(datos.read())
+            archivos.append(ruta)
+    finally:
+        export.close()
+    return archivos
+
+
+def json_total_por_mes(partes, mes=None):
+    totales = defaultdict(Decimal)
+    for ruta in partes:
+        with gzip.open(ruta, 'rt', encoding='utf-8') as f:
+            for linea in f:
+                pago = json.loads(linea, parse_float=Decimal)
+                if not pago.get('pagado'):
+                    continue
+                pago_mes = pago.get('fechaPago', '')[:7]
+                if mes is None or pago_mes == mes:
+                    totales[pago_mes] += pago['monto']
+    return {m: round(float(t), 2) for m, t in sorted(totales.items())}
+
+
+def parquet_total_por_mes(raiz, mes=None):
+    dataset = ds.dataset(raiz, format='parquet', partitioning='hive')
+    filtro = ds.field('pagado') == True  # noqa: E712 (expresión de pyarrow)
+    if mes is not None:
+        filtro = filtro & (ds.field('mes') == mes)
+    tabla = dataset.to_table(columns=['mes', 'monto'], filter=filtro)
+    resumen = tabla.group_by('mes').aggregate([('monto', 'sum')]).to_pydict()
+    return {m: round(t, 2) for m, t in sorted(zip(resumen['mes'], resumen['monto_sum']))}
+
+
+def segundos(funcion, corridas):
+    """return: (mediana en segundos, resultado de la última corrida)"""
+    tiempos = []
+    for _ in range(corridas):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos), resultado
+
+
+def tamanio(rutas):
+    return sum(os.path.getsize(r) for r in rutas)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compara el total recaudado por mes sobre el backup JSON y la exportación Parquet'
+    )
+    parser.add_argument('--pagos', type=int, default=200000, help='Pagos a generar (default: 200000)')
+    parser.add_argument('--corridas', type=int, default=5, help='Corridas por consulta (default: 5)')
+    parser.add_argument('--mes', default='2025-06', help='Mes de la consulta un_mes (default: 2025-06)')
+    parser.add_argument('--motor', choices=['pyarrow', 'python'], default=parquet_export.ENGINE,
+                        help=f'Escritor Parquet (default: {parquet_export.ENGINE})')
+    parser.add_argument('--guardar', help='Archivo JSON donde guardar los resultados')
+    args = parser.parse_args()
+
+    if ds is None:
+        print("❌ Leer Parquet requiere pyarrow (pip install pyarrow)")
+        return 1
+    if args.motor == 'python':
+        # open_writer usa el escritor en Python puro cuando no hay pyarrow
+        parquet_export.pa = None
+
+    with tempfile.TemporaryDirectory(prefix='rendimiento-parquet-') as destino:
+        print(f"Python {platform.python_version()}, {args.pagos:,} pagos, Parquet con {args.motor}")
+
+        inicio = time.perf_counter()
+        partes = escribir_json(args.pagos, destino)
+        escritura_json = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        archivos = escribir_parquet(args.pagos, destino)
+        escritura_parquet = time.perf_counter() - inicio
+
+        print(f"JSON:    {len(partes)} partes, {tamanio(partes) / 1024 / 1024:.1f} MB, escrito en {escritura_json:.1f}s")
+        print(f"Parquet: {len(archivos)} archivos, {tamanio(archivos) / 1024 / 1024:.1f} MB, "
+              f"escrito en {escritura_parquet:.1f}s\n")
+
+        raiz = os.path.join(destino, 'pagos')
+        consultas = {
+            'total_por_mes': (lambda: json_total_por_mes(partes), lambda: parquet_total_por_mes(raiz)),
+            'un_mes': (lambda: json_total_por_mes(partes, args.mes),
+                       lambda: parquet_total_por_mes(raiz, args.mes)),
+        }
+
+        print(f"{'consulta':<14} {'JSON':>10} {'Parquet':>10} {'mejora':>8}")
+        resultados = {
+            'pagos': args.pagos,
+            'motor': args.motor,
+            'json_mb': round(tamanio(partes) / 1024 / 1024, 2),
+            'parquet_mb': round(tamanio(archivos) / 1024 / 1024, 2)
+        }
+        for nombre, (con_json, con_parquet) in consultas.items():
+            t_json, totales_json = segundos(con_json, args.corridas)
+            t_parquet, totales_parquet = segundos(con_parquet, args.corridas)
+            if totales_json != totales_parquet:
+                print(f"{nombre:<14} ❌ totales distintos: {totales_json} vs {totales_parquet}")
+                return 1
+            mejora = t_json / t_parquet
+            resultados[nombre] = {
+                'json_s': round(t_json, 4),
+                'parquet_s': round(t_parquet, 4),
+                'mejora': round(mejora, 1),
+                'meses': len(totales_json)
+            }
+            print(f"{nombre:<14} {t_json:>9.3f}s {t_parquet:>9.3f}s {mejora:>7.1f}x")
+
+    if args.guardar:
+        with open(args.guardar, 'w') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados guardados en {args.guardar}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -6,7 +6,11 @@ con soporte para cross-region y cross-account migrations.
 
 Características:
 - Restauración de múltiples tablas desde un backup específico
-- Validación de integridad con checksums
+- Lectura por partes (manifest + JSONL) y del formato anterior (.json.gz único)
+- Restauración en streaming: descarga, gunzip, parseo y escritura se
+  traslapan con memoria constante (backups de varios GB en una instancia chica)
+- Validación de integridad con checksums: cada parte se descarga a disco
+  y se valida (SHA256, CRC de gzip y conteo) antes de escribir sus items
 - Modo dry-run para validar antes de restaurar
 - Soporte para cross-region restore
 - Soporte para cross-account restore
@@ -33,9 +37,17 @@ Versión: 1.0
 """
 
 import boto3
+import io
+import os
 import json
 import gzip
 import argparse
+import itertools
+import queue
+import re
+import shutil
+import tempfile
+import threading
 from datetime import datetime
 from decimal import Decimal
 import hashlib
@@ -44,6 +56,162 @@ import sys
 import time
 
 
+# Lectura en streaming: bloques descargados por adelantado mientras se
+# descomprime y parsea
+STREAM_BLOCK_SIZE = 1024 * 1024
+STREAM_PREFETCH_BLOCKS = 8
+
+# Cada parte se descarga completa a disco y se valida antes de escribir
+# un solo item (una parte mide ~64 MB comprimida)
+SPOOL_DIR = os.environ.get('RESTORE_SPOOL_DIR') or tempfile.gettempdir()
+
+
+class S3StreamReader(io.RawIOBase):
+    """
+    Lee el body de un objeto S3 en un hilo aparte para que la descarga se
+    traslape con la descompresión y el parseo.
+    
+    Mantiene como máximo STREAM_PREFETCH_BLOCKS bloques de STREAM_BLOCK_SIZE
+    en espera y calcula el SHA256 de lo leído para validarlo al terminar.
+    """
+    
+    def __init__(self, body):
+        super().__init__()
+        self.blocks = queue.Queue(maxsize=STREAM_PREFETCH_BLOCKS)
+        self.stop = threading.Event()
+        self.sha256 = hashlib.sha256()
+        self.bytes_read = 0
+        self.current = b''
+        self.offset = 0
+        self.finished = False
+        self.thread = threading.Thread(target=self._download, args=(body,), daemon=True)
+        self.thread.start()
+    
+    def _put(self, block):
+        while not self.stop.is_set():
+            try:
+                self.blocks.put(block, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _download(self, body):
+        try:
+            while not self.stop.is_set():
+                block = body.read(STREAM_BLOCK_SIZE)
+                if not self._put(block) or not block:
+                    break
+        except Exception as e:
+            self._put(e)
+        finally:
+            body.close()
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        if self.offset == len(self.current):
+            if self.finished:
+                return 0
+            block = self.blocks.get()
+            if isinstance(block, Exception):
+                raise block
+            if not block:
+                self.finished = True
+                return 0
+            self.sha256.update(block)
+            self.bytes_read += len(block)
+            self.current = block
+            self.offset = 0
+        
+        count = min(len(buffer), len(self.current) - self.offset)
+        buffer[:count] = self.current[self.offset:self.offset + count]
+        self.offset += count
+        return count
+    
+    def close(self):
+        # Si el consumidor se detiene antes, liberar el hilo de descarga
+        self.stop.set()
+        super().close()
+
+
+class JsonStream:
+    """
+    Parser incremental de JSON sobre un stream de texto.
+    
+    Lee el texto por bloques y regresa un valor a la vez (por ejemplo cada
+    elemento de un arreglo), sin cargar el documento completo en memoria.
+    """
+    WHITESPACE = re.compile(r'\s*')
+    NUMBER_CHARS = frozenset('0123456789+-.eE')
+    
+    def __init__(self, text):
+        self.text = text
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+    
+    def _fill(self):
+        data = self.text.read(STREAM_BLOCK_SIZE)
+        if not data:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+    
+    def peek(self):
+        """Siguiente caracter que no es espacio ('' al final del stream)"""
+        while True:
+            self.pos = self.WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+    
+    def accept(self, char):
+        if self.peek() != char:
+            return False
+        self.pos += 1
+        return True
+    
+    def expect(self, char):
+        if not self.accept(char):
+            raise ValueError(f"JSON inválido: se esperaba '{char}' en la posición {self.pos}")
+    
+    def value(self):
+        """Lee un valor JSON completo (objeto, arreglo, cadena, número...)"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # Un número cortado por el final del bloque ('12' de '12.5')
+                # parece completo: confirmarlo con lo que sigue
+                if self.eof or (end < len(self.buffer) and self.buffer[end] not in self.NUMBER_CHARS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+    
+    def iter_array(self):
+        """Regresa los elementos de un arreglo uno por uno"""
+        self.expect('[')
+        if self.accept(']'):
+            return
+        while True:
+            yield self.value()
+            if not self.accept(','):
+                self.expect(']')
+                return
+    
+    def drain(self):
+        """Consume el resto del stream (para completar el checksum)"""
+        while self.text.read(STREAM_BLOCK_SIZE):
+            pass
+
+
 class DynamoDBRestore:
     """
     Clase principal para manejar restauración de backups DynamoDB.
@@ -121,8 +289,8 @@ class DynamoDBRestore:
             for obj in page.get('Contents', []):
                 key = obj['Key']
                 
-                # Filtrar solo archivos de backup comprimidos
-                if key.endswith('.json.gz'):
+                # Filtrar solo backups: manifest por tabla o archivo único anterior
+                if key.endswith('/manifest.json') or key.endswith('.json.gz'):
                     # Aplicar filtro de tabla si se especificó
                     if table_name is None or table_name in key:
                         backups.append({
@@ -136,31 +304,17 @@ class DynamoDBRestore:
         # Ordenar por fecha (más recientes primero)
         return sorted(backups, key=lambda x: x['last_modified'], reverse=True)
     
-    def download_and_validate_backup(self, s3_key):
+    def _open_stream(self, s3_key):
         """
-        Descarga un backup desde S3 y valida su integridad.
-        
-        Args:
-            s3_key (str): Key del objeto en S3
+        Abre un objeto de backup como texto en streaming:
+        descarga (hilo aparte) -> gunzip incremental -> UTF-8.
         
         Returns:
-            dict: Datos del backup deserializados
+            tuple: (reader con el SHA256, stream de texto, metadata S3)
         
         Raises:
-            ValueError: Si el checksum no coincide
-            
-        Process:
-            1. Descargar archivo comprimido de S3
-            2. Validar checksum SHA256
-            3. Descomprimir gzip
-            4. Parsear JSON
-            5. Retornar datos validados
+            ValueError: Si el objeto no existe
         """
-        print(f"📥 Descargando backup: {s3_key}")
-        
-        start_time = time.time()
-        
-        # === PASO 1: Descargar objeto desde S3 ===
         try:
             response = self.s3_client.get_object(
                 Bucket=self.source_bucket,
@@ -171,48 +325,222 @@ class DynamoDBRestore:
                 raise ValueError(f"❌ Backup no encontrado: {s3_key}")
             raise
         
-        compressed_data = response['Body'].read()
-        download_time = time.time() - start_time
+        reader = S3StreamReader(response['Body'])
+        binary = gzip.GzipFile(fileobj=io.BufferedReader(reader, buffer_size=STREAM_BLOCK_SIZE), mode='rb')
+        text = io.TextIOWrapper(binary, encoding='utf-8')
+        return reader, text, response.get('Metadata', {})
+    
+    def _validate_checksum(self, s3_key, reader, expected):
+        calculated_checksum = reader.sha256.hexdigest()
+        if calculated_checksum != expected:
+            raise ValueError(
+                f"❌ Checksum inválido en {s3_key}.\n"
+                f"   Esperado: {expected}\n"
+                f"   Calculado: {calculated_checksum}"
+            )
+    
+    def open_single_file_backup(self, s3_key):
+        """
+        Abre un backup del formato anterior ({'metadata', 'items'} en un solo
+        .json.gz) en streaming.
         
-        print(f"   ✓ Descargado: {len(compressed_data) / 1024 / 1024:.2f} MB "
-              f"en {download_time:.2f}s")
+        Args:
+            s3_key (str): Key del objeto en S3
+        
+        Returns:
+            dict: {'metadata', 'items'} donde items es un generador; al
+                  terminar de recorrerlo se valida el checksum SHA256
         
-        # === PASO 2: Validar checksum si existe ===
-        stored_checksum = response.get('Metadata', {}).get('checksum')
-        if stored_checksum:
-            calculated_checksum = hashlib.sha256(compressed_data).hexdigest()
+        Raises:
+            ValueError: Si el archivo no tiene 'metadata' antes de 'items'
+                        (así lo escribe backup_function) o el checksum no coincide
+        """
+        print(f"📥 Leyendo backup en streaming: {s3_key}")
+        
+        reader, text, s3_metadata = self._open_stream(s3_key)
+        parser = JsonStream(text)
+        
+        # === Leer hasta el arreglo de items (metadata va primero) ===
+        metadata = None
+        parser.expect('{')
+        while True:
+            key = parser.value()
+            parser.expect(':')
+            if key == 'items':
+                break
+            value = parser.value()
+            if key == 'metadata':
+                metadata = value
+            parser.expect(',')
+        
+        if metadata is None:
+            text.close()
+            reader.close()
+            raise ValueError(f"❌ Backup sin metadata antes de los items: {s3_key}")
+        
+        # Mostrar metadata del backup
+        print(f"\n   📊 Metadata del backup:")
+        print(f"      Tabla: {metadata.get('table_name')}")
+        print(f"      Fecha: {metadata.get('backup_date')}")
+        print(f"      Items: {metadata.get('item_count')}")
+        print(f"      Región origen: {metadata.get('region')}")
+        
+        def items():
+            start_time = time.time()
+            try:
+                yield from parser.iter_array()
+                parser.drain()
+            finally:
+                text.close()
+                reader.close()
             
-            if stored_checksum != calculated_checksum:
-                raise ValueError(
-                    f"❌ Checksum inválido.\n"
-                    f"   Esperado: {stored_checksum}\n"
-                    f"   Calculado: {calculated_checksum}"
-                )
-            print(f"   ✓ Checksum validado: {calculated_checksum[:16]}...")
-        else:
-            print("   ⚠️  No hay checksum en metadata, omitiendo validación")
+            stored_checksum = s3_metadata.get('checksum')
+            if stored_checksum:
+                self._validate_checksum(s3_key, reader, stored_checksum)
+                print(f"   ✓ Checksum validado: {stored_checksum[:16]}...")
+            else:
+                print("   ⚠️  No hay checksum en metadata, omitiendo validación")
+            
+            print(f"   ✓ Leído: {reader.bytes_read / 1024 / 1024:.2f} MB "
+                  f"en {time.time() - start_time:.2f}s")
         
-        # === PASO 3: Descomprimir ===
-        print("   Descomprimiendo...")
-        decompress_start = time.time()
-        json_data = gzip.decompress(compressed_data).decode('utf-8')
-        decompress_time = time.time() - decompress_start
+        return {'metadata': metadata, 'items': items()}
+    
+    def download_manifest(self, s3_key):
+        """
+        Descarga el manifest de un backup por partes.
         
-        print(f"   ✓ Descomprimido: {len(json_data) / 1024 / 1024:.2f} MB "
-              f"en {decompress_time:.2f}s")
+        Returns:
+            dict: Manifest ({'format', 'version', 'metadata', 'chunks'}),
+                  o None si la tabla no tiene backup por partes ese día
+        """
+        try:
+            response = self.s3_client.get_object(
+                Bucket=self.source_bucket,
+                Key=s3_key
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchKey':
+                return None
+            raise
         
-        # === PASO 4: Parsear JSON ===
-        backup_data = json.loads(json_data)
+        manifest = json.loads(response['Body'].read().decode('utf-8'))
         
         # Mostrar metadata del backup
-        metadata = backup_data.get('metadata', {})
+        metadata = manifest['metadata']
+        print(f"📑 Manifest: {s3_key}")
         print(f"\n   📊 Metadata del backup:")
         print(f"      Tabla: {metadata.get('table_name')}")
         print(f"      Fecha: {metadata.get('backup_date')}")
         print(f"      Items: {metadata.get('item_count')}")
+        print(f"      Partes: {len(manifest['chunks'])}")
         print(f"      Región origen: {metadata.get('region')}")
         
-        return backup_data
+        return manifest
+    
+    def _spool_chunk(self, chunk):
+        """
+        Descarga una parte a un archivo temporal (calculando su SHA256) y la
+        valida contra su entrada del manifest: checksum, CRC de gzip y
+        conteo de items.
+        
+        Args:
+            chunk (dict): Entrada del manifest (key, items, sha256, ...)
+        
+        Returns:
+            str: Ruta del archivo validado (el llamador lo borra)
+        
+        Raises:
+            ValueError: Si la parte no existe, está corrupta o incompleta
+        """
+        try:
+            response = self.s3_client.get_object(Bucket=self.source_bucket, Key=chunk['key'])
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchKey':
+                raise ValueError(f"❌ Parte no encontrada: {chunk['key']}")
+            raise
+        
+        reader = S3StreamReader(response['Body'])
+        spool = tempfile.NamedTemporaryFile(prefix='restore-', suffix='.jsonl.gz', dir=SPOOL_DIR, delete=False)
+        try:
+            with spool:
+                shutil.copyfileobj(reader, spool, STREAM_BLOCK_SIZE)
+            reader.close()
+            self._validate_checksum(chunk['key'], reader, chunk['sha256'])
+            
+            count = 0
+            try:
+                with gzip.open(spool.name, 'rt', encoding='utf-8') as text:
+                    for line in text:
+                        if line.strip():
+                            count += 1
+            except (OSError, EOFError, UnicodeDecodeError) as e:
+                raise ValueError(f"❌ Parte {chunk['key']} corrupta: {e}")
+            if count != chunk['items']:
+                raise ValueError(
+                    f"❌ Parte {chunk['key']} incompleta: "
+                    f"{count} de {chunk['items']} items"
+                )
+        except BaseException:
+            reader.close()
+            os.remove(spool.name)
+            raise
+        
+        print(f"   ✓ Parte validada: {chunk['key']} ({count} items, "
+              f"{reader.bytes_read / 1024 / 1024:.2f} MB)")
+        return spool.name
+    
+    def iter_chunk_items(self, chunk):
+        """
+        Regresa los items de una parte JSONL.
+        
+        La parte se descarga y valida completa antes de regresar el primer
+        item: una parte corrupta o alterada detiene la restauración sin
+        haber escrito nada de ella. En memoria solo hay un bloque; la parte
+        va a disco (SPOOL_DIR) y se borra al terminar.
+        
+        Args:
+            chunk (dict): Entrada del manifest (key, items, sha256, ...)
+        
+        Raises:
+            ValueError: Si el checksum, el gzip o el conteo de items no cuadran
+        """
+        path = self._spool_chunk(chunk)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as text:
+                for line in text:
+                    if line.strip():
+                        yield json.loads(line)
+        finally:
+            os.remove(path)
+    
+    def open_backup(self, backup_prefix):
+        """
+        Abre el backup de una tabla en cualquiera de los dos formatos.
+        
+        Args:
+            backup_prefix (str): environment/year/week-NN/table-date
+        
+        Returns:
+            dict: {'metadata', 'items'} donde items es un generador que
+                  descarga y valida las partes conforme se recorre
+        """
+        manifest = self.download_manifest(f"{backup_prefix}/manifest.json")
+        if manifest is not None and manifest.get('type') == 'delta':
+            raise ValueError(
+                f"❌ {backup_prefix} es un backup incremental; reconstruye la tabla "
+                f"con merge_backups.py y restaura el snapshot resultante"
+            )
+        if manifest is not None:
+            return {
+                'metadata': manifest['metadata'],
+                'items': itertools.chain.from_iterable(
+                    self.iter_chunk_items(chunk) for chunk in manifest['chunks']
+                )
+            }
+        
+        # Formato anterior: un solo JSON {'metadata', 'items'}
+        return self.open_single_file_backup(f"{backup_prefix}.json.gz")
     
     def restore_table(self, backup_data, target_table_name=None, 
                      dry_run=False, batch_size=25):
@@ -220,7 +548,7 @@ class DynamoDBRestore:
         Restaura una tabla desde datos de backup.
         
         Args:
-            backup_data (dict): Datos deserializados del backup
+            backup_data (dict): Backup abierto con open_backup ({'metadata', 'items'})
             target_table_name (str): Nombre destino (None = usar nombre original)
             dry_run (bool): Si True, solo valida sin escribir a DynamoDB
             batch_size (int): Tamaño de batch para batch_write (max 25)
@@ -236,7 +564,7 @@ class DynamoDBRestore:
             5. Retornar estadísticas
         """
         metadata = backup_data['metadata']
-        items = backup_data['items']
+        total_items = metadata['item_count']
         
         source_table = metadata['table_name']
         table_name = target_table_name or source_table
@@ -253,9 +581,17 @@ class DynamoDBRestore:
         
         # === Modo DRY RUN ===
         if dry_run:
-            print(f"\n✓ Validación exitosa. {len(items)} items listos para restaurar.")
+            # Descargar y validar todo el backup en streaming
+            preview = []
+            validated = 0
+            for item in backup_data['items']:
+                if len(preview) < 3:
+                    preview.append(item)
+                validated += 1
+            
+            print(f"\n✓ Validación exitosa. {validated} items listos para restaurar.")
             print(f"\n  Preview de primeros 3 items:")
-            for i, item in enumerate(items[:3], 1):
+            for i, item in enumerate(preview, 1):
                 item_str = json.dumps(item, default=str, ensure_ascii=False)
                 preview = item_str[:100] + '...' if len(item_str) > 100 else item_str
                 print(f"    {i}. {preview}")
@@ -263,7 +599,7 @@ class DynamoDBRestore:
             return {
                 'dry_run': True,
                 'table_name': table_name,
-                'items_to_restore': len(items),
+                'items_to_restore': validated,
                 'validation': 'passed'
             }
         
@@ -288,11 +624,11 @@ class DynamoDBRestore:
         
         restored_count = 0
         failed_items = []
-        total_batches = (len(items) + batch_size - 1) // batch_size
+        total_batches = (total_items + batch_size - 1) // batch_size
+        batch_index = 0
         
-        for batch_num in range(0, len(items), batch_size):
-            batch = items[batch_num:batch_num + batch_size]
-            batch_index = batch_num // batch_size + 1
+        for batch in self._iter_batches(backup_data['items'], batch_size):
+            batch_index += 1
             
             try:
                 # Usar batch_writer para escritura eficiente
@@ -304,10 +640,10 @@ class DynamoDBRestore:
                         restored_count += 1
                 
                 # Mostrar progreso
-                progress = (restored_count / len(items)) * 100
+                progress = (restored_count / total_items) * 100
                 print(f"   ✓ Batch {batch_index}/{total_batches}: "
                       f"{len(batch)} items | "
-                      f"Total: {restored_count}/{len(items)} ({progress:.1f}%)")
+                      f"Total: {restored_count}/{total_items} ({progress:.1f}%)")
                 
                 # Pequeña pausa para no saturar DynamoDB
                 if batch_index % 10 == 0:
@@ -321,10 +657,10 @@ class DynamoDBRestore:
         # === Generar resultado ===
         result = {
             'table_name': table_name,
-            'total_items': len(items),
+            'total_items': total_items,
             'restored_items': restored_count,
             'failed_items': len(failed_items),
-            'success_rate': round((restored_count / len(items)) * 100, 2)
+            'success_rate': round((restored_count / total_items) * 100, 2) if total_items else 100.0
         }
         
         # Guardar items fallidos si los hay
@@ -376,15 +712,17 @@ class DynamoDBRestore:
         # Procesar cada tabla
         for i, table_config in enumerate(tables_config, 1):
             table_name = table_config['name']
-            s3_key = f"{environment}/{year}/week-{week}/{table_name}-{backup_date}.json.gz"
+            # backup_prefix explícito (p. ej. un snapshot de merge_backups.py)
+            backup_prefix = table_config.get('backup_prefix') or \
+                f"{environment}/{year}/week-{week}/{table_name}-{backup_date}"
             
             try:
                 print(f"\n{'=' * 70}")
                 print(f"[{i}/{len(tables_config)}] Procesando: {table_name}")
                 print(f"{'=' * 70}")
                 
-                # Descargar y validar backup
-                backup_data = self.download_and_validate_backup(s3_key)
+                # Abrir backup (manifest por partes o archivo único)
+                backup_data = self.open_backup(backup_prefix)
                 
                 # Restaurar tabla
                 result = self.restore_table(
@@ -404,6 +742,14 @@ class DynamoDBRestore:
         
         return results
     
+    def _iter_batches(self, items, batch_size):
+        """Agrupa los items (un iterador en streaming) en batches de batch_size"""
+        while True:
+            batch = list(itertools.islice(items, batch_size))
+            if not batch:
+                return
+            yield batch
+    
     def _convert_floats_to_decimal(self, obj):
         """
         Convierte floats a Decimal recursivamente.
@@ -0,0 +1,711 @@
+"""
+Verificación de Backups DynamoDB sin Restaurar
+
+Este script (y Lambda) lee cada parte de los backups por partes en
+streaming y la valida contra su manifest, sin escribir nada en DynamoDB:
+la verificación cuesta lo que tarda en descargarse y descomprimirse el
+backup (segundos por GB), no lo que tarda una restauración.
+
+Características:
+- Checksum SHA256, bytes comprimidos/sin comprimir y conteo de items de
+  cada parte contra su entrada del manifest
+- Checksum del manifest contra el guardado en su metadata de S3
+- Cadena completa del último backup de cada tabla (apuntador latest/: el
+  backup completo base más sus deltas) o el backup completo de una fecha
+- Muestreo: N items al azar del backup completo (con los cambios de sus
+  deltas aplicados) se comparan con la tabla en vivo usando BatchGetItem;
+  un item que cambió después del backup (updatedAt/createdAt posterior al
+  scan o al último delta) no cuenta como diferencia
+- Todas las tablas y todas sus partes en paralelo
+- Reporte JSON por tabla (errores, muestreo, MB/s) en S3 o en archivo local
+- Notificación SNS con el resumen (modo Lambda)
+
+Uso:
+    # Último backup (base + deltas) de cada tabla
+    python verify_backup.py --bucket BUCKET --environment production --tables config.json
+
+    # Backup completo de una fecha, con 500 items de muestra
+    python verify_backup.py --bucket BUCKET --environment production --tables config.json \
+        --date 2025-01-26 --sample-size 500 --report reporte.json
+
+Como Lambda (handler verify_backup.lambda_handler), variables de entorno:
+- TABLES_CONFIG, BACKUP_BUCKET, ENVIRONMENT, SNS_TOPIC_ARN: las del backup
+- VERIFY_SAMPLE_SIZE: Items comparados con la tabla por backup (opcional, default 100)
+- VERIFY_WORKERS: Partes verificadas al mismo tiempo (opcional, default 8)
+El reporte se guarda en environment/verification/YYYY-MM-DD/verify-HHMMSS.json
+
+Autor: Jose - Senior SOA Architect
+Versión: 1.0
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+
+import boto3
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+
+# Lectura en streaming: bloques de 1 MB, sin guardar la parte en memoria
+STREAM_BLOCK_SIZE = 1024 * 1024
+GZIP_WBITS = 31  # zlib con encabezado gzip
+
+DEFAULT_SAMPLE_SIZE = 100
+DEFAULT_WORKERS = 8
+
+# BatchGetItem acepta hasta 100 llaves por llamada
+BATCH_GET_SIZE = 100
+BATCH_GET_RETRIES = 5
+
+# Atributos que marcan un item como modificado (mismos que backup_function)
+WATERMARK_ATTRIBUTES = ('updatedAt', 'createdAt')
+
+# Llaves de ejemplo que se guardan en el reporte por tabla
+MAX_REPORTED_KEYS = 10
+
+
+def normalize(value):
+    """
+    Deja un valor como lo escribe backup_function (DecimalEncoder):
+    Decimal entero -> int, Decimal con decimales -> float. Así un item
+    leído del backup y el mismo item leído de la tabla se comparan con ==.
+    """
+    if isinstance(value, Decimal):
+        return int(value) if value % 1 == 0 else float(value)
+    if isinstance(value, dict):
+        return {k: normalize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [normalize(v) for v in value]
+    return value
+
+
+class BackupVerifier:
+    """
+    Verifica backups por partes sin restaurarlos.
+
+    La lectura es independiente de DynamoDBRestore a propósito: aquí no se
+    parsea cada item (solo se cuentan líneas y se extraen las muestreadas),
+    que es lo que hace a la verificación mucho más rápida que un restore.
+    """
+
+    def __init__(self, source_bucket, source_region='us-east-1',
+                 workers=DEFAULT_WORKERS, sample_size=DEFAULT_SAMPLE_SIZE, seed=None):
+        """
+        Args:
+            source_bucket (str): Bucket S3 donde están los backups
+            source_region (str): Región del bucket y de las tablas
+            workers (int): Partes verificadas al mismo tiempo (todas las tablas)
+            sample_size (int): Items por backup completo comparados con la tabla
+            seed (int): Semilla del muestreo (opcional, para repetir una verificación)
+        """
+        self.source_bucket = source_bucket
+        self.workers = max(1, workers)
+        self.sample_size = sample_size
+        self.random = random.Random(seed)
+        pool = Config(max_pool_connections=self.workers + 4)
+        self.s3_client = boto3.client('s3', region_name=source_region, config=pool)
+        self.dynamodb_client = boto3.client('dynamodb', region_name=source_region, config=pool)
+        self.serializer = TypeSerializer()
+        self.deserializer = TypeDeserializer()
+        self.chunk_executor = ThreadPoolExecutor(max_workers=self.workers)
+
+    def close(self):
+        self.chunk_executor.shutdown(wait=True)
+
+    # =========================================
+    # Manifests
+    # =========================================
+
+    def load_manifest(self, s3_key):
+        """
+        Descarga un manifest y valida su SHA256 contra el de su metadata.
+
+        Returns:
+            tuple: (manifest, lista de errores)
+
+        Raises:
+            ValueError: Si el manifest no existe
+        """
+        try:
+            response = self.s3_client.get_object(Bucket=self.source_bucket, Key=s3_key)
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchKey':
+                raise ValueError(f"Manifest no encontrado: {s3_key}")
+            raise
+
+        body = response['Body'].read()
+        errors = []
+        stored_checksum = response.get('Metadata', {}).get('checksum')
+        if stored_checksum and hashlib.sha256(body).hexdigest() != stored_checksum:
+            errors.append(f"Checksum del manifest inválido: {s3_key}")
+
+        manifest = json.loads(body.decode('utf-8'))
+        declared = manifest['metadata'].get('item_count')
+        counted = sum(chunk['items'] for chunk in manifest['chunks'])
+        if declared is not None and declared != counted:
+            errors.append(f"{s3_key}: item_count {declared} pero las partes suman {counted}")
+
+        return manifest, errors
+
+    def latest_chain(self, environment, table_name):
+        """
+        Manifests del último backup de la tabla, del completo base al delta
+        más reciente (apuntador latest/ y los parent de cada delta).
+
+        Returns:
+            list: Keys de los manifests en orden de aplicación
+
+        Raises:
+            ValueError: Si la tabla no tiene apuntador
+        """
+        key = f"{environment}/latest/{table_name}.json"
+        try:
+            response = self.s3_client.get_object(Bucket=self.source_bucket, Key=key)
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchKey':
+                raise ValueError(f"{table_name} no tiene backups ({key} no existe)")
+            raise
+        pointer = json.loads(response['Body'].read().decode('utf-8'))
+
+        # Los deltas se enumeran desde el último hacia atrás con 'parent';
+        # aquí solo se necesitan las keys, los manifests se leen al verificar
+        chain = [pointer['manifest']]
+        while chain[-1] != pointer['base']:
+            manifest, _ = self.load_manifest(chain[-1])
+            parent = manifest['metadata'].get('parent')
+            if not parent:
+                break
+            chain.append(parent)
+        return list(reversed(chain))
+
+    @staticmethod
+    def dated_manifest(environment, table_name, backup_date):
+        """Manifest del backup completo de una fecha (ruta de backup_function)"""
+        year = backup_date.split('-')[0]
+        week = datetime.strptime(backup_date, '%Y-%m-%d').strftime('%W')
+        return f"{environment}/{year}/week-{week}/{table_name}-{backup_date}/manifest.json"
+
+    # =========================================
+    # Partes
+    # =========================================
+
+    def verify_chunk(self, chunk, sample_lines=(), keep_lines=False):
+        """
+        Descarga una parte en streaming: SHA256 de lo descargado, gunzip
+        incremental y conteo de líneas; solo las líneas muestreadas se
+        copian (sin parsear JSON).
+
+        Args:
+            chunk (dict): Entrada del manifest (key, items, sha256, ...)
+            sample_lines (iterable): Números de línea (base 0) a extraer
+            keep_lines (bool): Extraer todas las líneas (partes de un delta,
+                para aplicar sus cambios a la muestra)
+
+        Returns:
+            dict: {key, items, compressed_bytes, uncompressed_bytes,
+                   errors, samples}
+        """
+        targets = range(chunk['items']) if keep_lines else sorted(sample_lines)
+        next_target = 0
+        samples = []
+        sha256 = hashlib.sha256()
+        compressed = 0
+        uncompressed = 0
+        lines = 0
+        tail = b''
+        errors = []
+
+        def consume(data):
+            nonlocal lines, tail, next_target
+            newlines = data.count(b'\n')
+            if next_target < len(targets) and targets[next_target] < lines + newlines:
+                complete = (tail + data).split(b'\n')
+                tail = complete.pop()
+                while next_target < len(targets) and targets[next_target] < lines + len(complete):
+                    samples.append(complete[targets[next_target] - lines])
+                    next_target += 1
+                lines += len(complete)
+            else:
+                lines += newlines
+                tail = data[data.rfind(b'\n') + 1:] if newlines else tail + data
+
+        try:
+            response = self.s3_client.get_object(Bucket=self.source_bucket, Key=chunk['key'])
+            body = response['Body']
+            decompressor = zlib.decompressobj(wbits=GZIP_WBITS)
+            try:
+                while True:
+                    block = body.read(STREAM_BLOCK_SIZE)
+                    if not block:
+                        break
+                    sha256.update(block)
+                    compressed += len(block)
+                    data = decompressor.decompress(block)
+                    # Un gzip puede traer varios miembros concatenados
+                    while decompressor.eof and decompressor.unused_data:
+                        rest = decompressor.unused_data
+                        decompressor = zlib.decompressobj(wbits=GZIP_WBITS)
+                        data += decompressor.decompress(rest)
+                    uncompressed += len(data)
+                    consume(data)
+            finally:
+                body.close()
+
+            if not decompressor.eof:
+                errors.append(f"{chunk['key']}: gzip truncado")
+            # Última línea sin salto de línea (backup_function siempre lo escribe)
+            if tail.strip():
+                if next_target < len(targets) and targets[next_target] == lines:
+                    samples.append(tail)
+                lines += 1
+        except ClientError as e:
+            errors.append(f"{chunk['key']}: {e.response['Error']['Code']}")
+        except zlib.error as e:
+            errors.append(f"{chunk['key']}: gzip inválido ({e})")
+
+        if not errors:
+            if sha256.hexdigest() != chunk['sha256']:
+                errors.append(f"{chunk['key']}: checksum inválido")
+            if lines != chunk['items']:
+                errors.append(f"{chunk['key']}: {lines} items, el manifest dice {chunk['items']}")
+            if compressed != chunk.get('compressed_size_bytes', compressed):
+                errors.append(f"{chunk['key']}: {compressed} bytes, el manifest dice {chunk['compressed_size_bytes']}")
+            if uncompressed != chunk.get('size_bytes', uncompressed):
+                errors.append(f"{chunk['key']}: {uncompressed} bytes sin comprimir, el manifest dice {chunk['size_bytes']}")
+
+        return {
+            'key': chunk['key'],
+            'items': lines,
+            'compressed_bytes': compressed,
+            'uncompressed_bytes': uncompressed,
+            'errors': errors,
+            'samples': samples
+        }
+
+    def sample_positions(self, chunks):
+        """
+        Elige sample_size items al azar entre todas las partes.
+
+        Returns:
+            list: Por parte, el conjunto de números de línea a extraer
+        """
+        total = sum(chunk['items'] for chunk in chunks)
+        positions = sorted(self.random.sample(range(total), min(self.sample_size, total)))
+        per_chunk = [set() for _ in chunks]
+        index = 0
+        first_line = 0
+        for position in positions:
+            while position >= first_line + chunks[index]['items']:
+                first_line += chunks[index]['items']
+                index += 1
+            per_chunk[index].add(position - first_line)
+        return per_chunk
+
+    # =========================================
+    # Muestreo contra la tabla
+    # =========================================
+
+    def _batch_get(self, table_name, keys):
+        """BatchGetItem con reintentos de UnprocessedKeys; regresa los items en formato Python"""
+        found = []
+        request = {table_name: {'Keys': [{k: self.serializer.serialize(v) for k, v in key.items()} for key in keys]}}
+        for attempt in range(BATCH_GET_RETRIES + 1):
+            response = self.dynamodb_client.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(table_name, []):
+                found.append({k: self.deserializer.deserialize(v) for k, v in item.items()})
+            request = response.get('UnprocessedKeys') or {}
+            if not request:
+                return found
+            time.sleep(min(0.1 * 2 ** attempt, 2))
+        raise RuntimeError(f"BatchGetItem no procesó todas las llaves de {table_name}")
+
+    @staticmethod
+    def key_id(key):
+        """Llave como texto (mismo valor para el item del backup y el de la tabla)"""
+        return json.dumps(normalize(key), sort_keys=True)
+
+    def expected_items(self, key_attributes, sample_lines, delta_lines):
+        """
+        Estado esperado de los items muestreados: la línea del backup
+        completo con los cambios de los deltas aplicados en orden.
+
+        Returns:
+            dict: key_id -> (key, item); item es None si un delta lo eliminó
+        """
+        expected = {}
+        for line in sample_lines:
+            item = json.loads(line, parse_float=Decimal)
+            key = {k: item[k] for k in key_attributes}
+            expected[self.key_id(key)] = (key, item)
+
+        for line in delta_lines:
+            change = json.loads(line, parse_float=Decimal)
+            key_id = self.key_id(change['key'])
+            if key_id in expected:
+                key = expected[key_id][0]
+                expected[key_id] = (key, change['item'] if change['op'] == 'put' else None)
+        return expected
+
+    def compare_samples(self, table_config, expected, backup_time):
+        """
+        Compara los items muestreados con la tabla en vivo.
+
+        Args:
+            table_config (dict): Configuración de la tabla (name, pk, sk, attributes)
+            expected (dict): Resultado de expected_items
+            backup_time (str): Momento que refleja el backup (ISO 8601): inicio
+                del scan o fin del último delta
+
+        Returns:
+            dict: Conteos matched / changed_since_backup / missing / mismatched
+                  y las llaves que difieren sin haber cambiado después del backup
+        """
+        key_attributes = [k for k in (table_config.get('pk'), table_config.get('sk')) if k]
+        projection = set(table_config['attributes']) if table_config.get('attributes') else None
+
+        live = {}
+        entries = list(expected.values())
+        for start in range(0, len(entries), BATCH_GET_SIZE):
+            keys = [key for key, _ in entries[start:start + BATCH_GET_SIZE]]
+            for item in self._batch_get(table_config['name'], keys):
+                live[self.key_id({k: item.get(k) for k in key_attributes})] = item
+
+        result = {'sampled': len(expected), 'matched': 0, 'changed_since_backup': 0,
+                  'missing': 0, 'mismatched': 0, 'mismatched_keys': [], 'missing_keys': []}
+        for key_id, (key, item) in expected.items():
+            current = live.get(key_id)
+            if current is None:
+                if item is None:
+                    # Eliminado por un delta y ya no está en la tabla
+                    result['matched'] += 1
+                    continue
+                # Se eliminó después del backup o el backup tiene un item que no existe
+                result['missing'] += 1
+                if len(result['missing_keys']) < MAX_REPORTED_KEYS:
+                    result['missing_keys'].append(normalize(key))
+                continue
+            if projection:
+                current = {k: v for k, v in current.items() if k in projection}
+            if item is not None and normalize(current) == normalize(item):
+                result['matched'] += 1
+            elif any(str(current.get(attribute, '')) > backup_time for attribute in WATERMARK_ATTRIBUTES):
+                result['changed_since_backup'] += 1
+            else:
+                result['mismatched'] += 1
+                if len(result['mismatched_keys']) < MAX_REPORTED_KEYS:
+                    result['mismatched_keys'].append(normalize(key))
+        return result
+
+    # =========================================
+    # Tablas
+    # =========================================
+
+    def verify_table(self, table_config, environment, backup_date=None):
+        """
+        Verifica el backup de una tabla: todas sus partes en el pool
+        compartido y la muestra del backup completo (más sus deltas)
+        contra la tabla.
+
+        Args:
+            table_config (dict): Configuración de la tabla
+            environment (str): Ambiente
+            backup_date (str): Fecha del backup completo (YYYY-MM-DD); sin
+                fecha se verifica la cadena del apuntador latest/
+
+        Returns:
+            dict: Reporte de la tabla (status ok / warning / failed)
+        """
+        table_name = table_config['name']
+        start_time = time.time()
+        report = {
+            'table_name': table_name,
+            'status': 'ok',
+            'manifests': [],
+            'chunks': 0,
+            'items': 0,
+            'compressed_bytes': 0,
+            'uncompressed_bytes': 0,
+            'errors': [],
+            'samples': None
+        }
+
+        key_attributes = [k for k in (table_config.get('pk'), table_config.get('sk')) if k]
+        sample_lines = []
+        delta_lines = []
+        backup_time = ''
+
+        try:
+            if backup_date:
+                manifest_keys = [self.dated_manifest(environment, table_name, backup_date)]
+            else:
+                manifest_keys = self.latest_chain(environment, table_name)
+
+            for manifest_key in manifest_keys:
+                manifest, errors = self.load_manifest(manifest_key)
+                report['errors'].extend(errors)
+                chunks = manifest['chunks']
+                is_full = manifest.get('type', 'full') == 'full'
+
+                # El backup completo se muestrea; de los deltas (chicos) se
+                # extraen todos los cambios para aplicarlos a la muestra
+                sampling = bool(self.sample_size)
+                if is_full and sampling:
+                    positions = self.sample_positions(chunks)
+                else:
+                    positions = [()] * len(chunks)
+                futures = [
+                    self.chunk_executor.submit(self.verify_chunk, chunk, lines, sampling and not is_full)
+                    for chunk, lines in zip(chunks, positions)
+                ]
+                for future in futures:
+                    chunk_result = future.result()
+                    report['errors'].extend(chunk_result['errors'])
+                    report['items'] += chunk_result['items']
+                    report['compressed_bytes'] += chunk_result['compressed_bytes']
+                    report['uncompressed_bytes'] += chunk_result['uncompressed_bytes']
+                    (sample_lines if is_full else delta_lines).extend(chunk_result['samples'])
+                report['chunks'] += len(chunks)
+                report['manifests'].append({
+                    'key': manifest_key,
+                    'type': manifest.get('type', 'full'),
+                    'chunks': len(chunks),
+                    'items': manifest['metadata'].get('item_count')
+                })
+
+                metadata = manifest['metadata']
+                if is_full:
+                    backup_time = metadata.get('scan_started') or metadata.get('timestamp', '')
+                else:
+                    backup_time = metadata.get('captured_until', backup_time)
+
+            # Con una parte dañada la muestra no dice nada: se omite
+            if sample_lines and not report['errors']:
+                expected = self.expected_items(key_attributes, sample_lines, delta_lines)
+                report['samples'] = self.compare_samples(table_config, expected, backup_time)
+        except (ValueError, ClientError, RuntimeError) as e:
+            report['errors'].append(str(e))
+
+        elapsed = max(time.time() - start_time, 0.001)
+        report['duration_seconds'] = round(elapsed, 2)
+        report['mb_per_second'] = round(report['compressed_bytes'] / 1024 / 1024 / elapsed, 2)
+
+        if report['errors']:
+            report['status'] = 'failed'
+        elif report['samples'] and report['samples']['mismatched']:
+            report['status'] = 'warning'
+
+        icon = {'ok': '✅', 'warning': '⚠️', 'failed': '❌'}[report['status']]
+        print(f"{icon} {table_name}: {report['chunks']} partes, {report['items']} items, "
+              f"{report['compressed_bytes'] / 1024 / 1024:.2f} MB en {report['duration_seconds']}s "
+              f"({report['mb_per_second']} MB/s)")
+        for error in report['errors']:
+            print(f"   ✗ {error}")
+        if report['samples']:
+            samples = report['samples']
+            print(f"   Muestra: {samples['matched']}/{samples['sampled']} iguales, "
+                  f"{samples['changed_since_backup']} cambiaron después, "
+                  f"{samples['missing']} ya no existen, {samples['mismatched']} diferentes")
+
+        return report
+
+    def verify(self, tables_config, environment, backup_date=None):
+        """
+        Verifica todas las tablas en paralelo.
+
+        Returns:
+            dict: Reporte completo ({status, tables, ...}); status es el peor
+                  de las tablas
+        """
+        start_time = time.time()
+        started_at = datetime.utcnow().isoformat()
+        with ThreadPoolExecutor(max_workers=max(1, len(tables_config))) as executor:
+            tables = list(executor.map(
+                lambda table_config: self.verify_table(table_config, environment, backup_date),
+                tables_config
+            ))
+
+        statuses = {table['status'] for table in tables}
+        status = 'failed' if 'failed' in statuses else 'warning' if 'warning' in statuses else 'ok'
+        elapsed = max(time.time() - start_time, 0.001)
+        compressed_bytes = sum(table['compressed_bytes'] for table in tables)
+        return {
+            'bucket': self.source_bucket,
+            'environment': environment,
+            'backup_date': backup_date,
+            'started_at': started_at,
+            'duration_seconds': round(elapsed, 2),
+            'status': status,
+            'tables_verified': len(tables),
+            'tables_failed': sum(1 for table in tables if table['status'] == 'failed'),
+            'items': sum(table['items'] for table in tables),
+            'compressed_bytes': compressed_bytes,
+            'mb_per_second': round(compressed_bytes / 1024 / 1024 / elapsed, 2),
+            'tables': tables
+        }
+
+
+# =========================================
+# LAMBDA
+# =========================================
+
+def send_notification(sns_client, topic_arn, report, report_key):
+    """Publica el resumen del reporte en SNS"""
+    status_text = {'ok': '✅ OK', 'warning': '⚠️ CON DIFERENCIAS', 'failed': '❌ FALLIDA'}[report['status']]
+    lines = [
+        f"Verificación de backups: {status_text}",
+        f"Ambiente: {report['environment']}",
+        f"Backup: {report['backup_date'] or 'último (latest/)'}",
+        f"Duración: {report['duration_seconds']}s ({report['mb_per_second']} MB/s)",
+        "",
+        f"Tablas ({report['tables_verified']}):"
+    ]
+    for table in report['tables']:
+        samples = table['samples'] or {}
+        lines.append(
+            f"  • {table['table_name']}: {table['status']}, {table['items']} items, "
+            f"muestra {samples.get('matched', 0)}/{samples.get('sampled', 0)} iguales"
+        )
+        lines.extend(f"      ✗ {error}" for error in table['errors'][:5])
+    lines.extend(["", f"Reporte: s3://{report['bucket']}/{report_key}"])
+
+    sns_client.publish(
+        TopicArn=topic_arn,
+        Subject=f"[{report['status'].upper()}] Verificación de backups DynamoDB - {report['environment']}",
+        Message="\n".join(lines)
+    )
+
+
+def lambda_handler(event, context):
+    """
+    Verifica los backups de las tablas de TABLES_CONFIG.
+
+    Args:
+        event (dict): Puede contener:
+            - date (str): Verificar el backup completo de esa fecha (YYYY-MM-DD);
+              sin fecha se verifica el último backup de cada tabla
+            - tables (list): Configuración de tablas (default: TABLES_CONFIG)
+            - sample_size (int): Items comparados con la tabla por backup
+        context: Contexto de ejecución de Lambda
+
+    Returns:
+        dict: statusCode 200 (ok), 207 (diferencias en la muestra) o 500
+              (checksum, conteo o parte faltante) y el reporte
+    """
+    bucket = os.environ['BACKUP_BUCKET']
+    environment = os.environ.get('ENVIRONMENT', 'production')
+    tables_config = event.get('tables') or json.loads(os.environ['TABLES_CONFIG'])
+    sample_size = int(event.get('sample_size', os.environ.get('VERIFY_SAMPLE_SIZE', DEFAULT_SAMPLE_SIZE)))
+
+    verifier = BackupVerifier(
+        bucket,
+        source_region=os.environ.get('AWS_REGION', 'us-east-1'),
+        workers=int(os.environ.get('VERIFY_WORKERS', DEFAULT_WORKERS)),
+        sample_size=sample_size
+    )
+    try:
+        report = verifier.verify(tables_config, environment, event.get('date'))
+    finally:
+        verifier.close()
+
+    now = datetime.utcnow()
+    report_key = f"{environment}/verification/{now.strftime('%Y-%m-%d')}/verify-{now.strftime('%H%M%S')}.json"
+    verifier.s3_client.put_object(
+        Bucket=bucket,
+        Key=report_key,
+        Body=json.dumps(report, ensure_ascii=False, indent=2).encode('utf-8'),
+        ContentType='application/json',
+        ServerSideEncryption='AES256'
+    )
+    print(f"Reporte: s3://{bucket}/{report_key}")
+
+    topic_arn = os.environ.get('SNS_TOPIC_ARN')
+    if topic_arn:
+        try:
+            send_notification(boto3.client('sns'), topic_arn, report, report_key)
+        except Exception as e:
+            print(f"✗ Error enviando notificación SNS: {str(e)}")
+
+    return {
+        'statusCode': {'ok': 200, 'warning': 207, 'failed': 500}[report['status']],
+        'body': json.dumps(report, ensure_ascii=False, indent=2)
+    }
+
+
+# =========================================
+# CLI
+# =========================================
+
+def main():
+    """
+    Punto de entrada del script.
+    Verifica los backups de las tablas configuradas e imprime el resumen.
+    """
+    parser = argparse.ArgumentParser(
+        description='Verificar backups de DynamoDB en S3 sin restaurarlos'
+    )
+    parser.add_argument('--bucket', required=True,
+                        help='Bucket S3 con los backups')
+    parser.add_argument('--source-region', default='us-east-1',
+                        help='Región del bucket y de las tablas')
+    parser.add_argument('--environment', default='production',
+                        help='Ambiente (production, staging, etc.)')
+    parser.add_argument('--tables', required=True,
+                        help='Archivo JSON (o JSON directo) con configuración de tablas')
+    parser.add_argument('--date',
+                        help='Backup completo de esta fecha (YYYY-MM-DD); '
+                             'sin fecha: el último backup de cada tabla con sus deltas')
+    parser.add_argument('--sample-size', type=int, default=DEFAULT_SAMPLE_SIZE,
+                        help=f'Items comparados con la tabla en vivo, 0 = sin muestreo (default: {DEFAULT_SAMPLE_SIZE})')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Partes verificadas al mismo tiempo (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--seed', type=int,
+                        help='Semilla del muestreo (para repetir la misma muestra)')
+    parser.add_argument('--report',
+                        help='Archivo donde escribir el reporte JSON')
+    args = parser.parse_args()
+
+    try:
+        with open(args.tables, 'r') as f:
+            tables_config = json.load(f)
+    except FileNotFoundError:
+        tables_config = json.loads(args.tables)
+
+    print(f"\n{'=' * 70}")
+    print(f"🔎 Verificación de backups en {args.bucket}")
+    print(f"{'=' * 70}")
+    print(f"Ambiente: {args.environment}")
+    print(f"Backup:   {args.date or 'último (latest/)'}")
+    print(f"Tablas:   {len(tables_config)}\n")
+
+    verifier = BackupVerifier(args.bucket, source_region=args.source_region,
+                              workers=args.workers, sample_size=args.sample_size, seed=args.seed)
+    try:
+        report = verifier.verify(tables_config, args.environment, args.date)
+    finally:
+        verifier.close()
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"\n{'=' * 70}")
+    print(f"Resultado: {report['status'].upper()} en {report['duration_seconds']}s "
+          f"({report['compressed_bytes'] / 1024 / 1024:.2f} MB, {report['mb_per_second']} MB/s)")
+    print(f"{'=' * 70}")
+
+    if report['status'] == 'failed':
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+# ========================================
+# LAMBDA: calibrar_hash.py
+# Tiempo del hash de contraseñas por costo y por memoria de la Lambda
+# ========================================
+#
+# En Lambda el CPU es proporcional a la memoria configurada, así que el
+# costo de scrypt/PBKDF2 que cabe en el objetivo (p. ej. 50 ms por login)
+# depende del tamaño de la función. Ningún costo por debajo del piso de
+# contrasenas.py se recomienda; con menos de 512 MB scrypt ni siquiera
+# cabe con el piso y esa memoria se reporta como error.
+#
+# - lambda_handler: corre dentro de Lambda (función lambda-auth-calibrar-hash,
+#   mismo paquete que lambda_auth) y mide cada costo con el CPU que le toca
+# - main: desde una terminal cambia la memoria de esa función a cada valor
+#   de --memorias, la invoca y arma la tabla costo x memoria; al final
+#   deja la memoria como estaba
+#
+# Uso:
+#   python calibrar_hash.py --memorias 512,1024,1769,3008 --objetivo-ms 50
+#   python calibrar_hash.py --algoritmo pbkdf2-sha256 --reporte calibracion.json
+#   python calibrar_hash.py --local          # solo este equipo
+#
+# Con la tabla se eligen memory_size de lambda_auth y password_hash_costo.
+# Es la única calibración: lambda_auth usa el costo fijo del despliegue.
+
+import os
+import json
+import argparse
+
+from contrasenas import (
+    SCRYPT,
+    PBKDF2,
+    SCRYPT_LN_MIN,
+    ALGORITMO,
+    OBJETIVO_MS,
+    costo_minimo,
+    medir_ms,
+    memoria_scrypt,
+    ln_maximo
+)
+
+FUNCION_DEFAULT = 'lambda-auth-calibrar-hash'
+ITERACIONES_PBKDF2 = [600_000, 800_000, 1_000_000, 1_500_000, 2_000_000]
+
+def costos_default(algoritmo):
+    if algoritmo == SCRYPT:
+        return list(range(SCRYPT_LN_MIN, ln_maximo() + 1))
+    return ITERACIONES_PBKDF2
+
+def medir_costos(algoritmo, costos, objetivo_ms, repeticiones=3):
+    """
+    Mide cada costo en este CPU; se detiene cuando un costo tarda más de
+    4 veces el objetivo (los siguientes solo serían más lentos).
+
+    return: dict con las mediciones y el costo recomendado para objetivo_ms
+            (el piso si ni él cabe; entonces excedeObjetivo es True)
+    """
+    mediciones = []
+    for costo in costos:
+        ms = medir_ms(algoritmo, costo, repeticiones)
+        medicion = {'costo': costo, 'ms': round(ms, 1)}
+        if algoritmo == SCRYPT:
+            medicion['memoriaScryptMb'] = memoria_scrypt(costo) // (1024 * 1024)
+        mediciones.append(medicion)
+        if ms > objetivo_ms * 4:
+            break
+
+    minimo = costo_minimo(algoritmo)
+    dentro = [m for m in mediciones if m['costo'] >= minimo and m['ms'] <= objetivo_ms]
+    if dentro:
+        recomendado = dentro[-1]
+    else:
+        piso = next((m for m in mediciones if m['costo'] == minimo), None)
+        recomendado = piso or {'costo': minimo, 'ms': round(medir_ms(algoritmo, minimo, repeticiones), 1)}
+
+    return {
+        'memoriaLambdaMb': int(os.environ.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE', 0)) or None,
+        'algoritmo': algoritmo,
+        'objetivoMs': objetivo_ms,
+        'mediciones': mediciones,
+        'recomendado': recomendado,
+        'excedeObjetivo': recomendado['ms'] > objetivo_ms
+    }
+
+def lambda_handler(event, context):
+    """
+    Invocación directa: {"algoritmo": "scrypt", "objetivoMs": 50,
+    "costos": [17, 18]} (todo opcional).
+    """
+    event = event or {}
+    algoritmo = event.get('algoritmo', ALGORITMO)
+    objetivo_ms = float(event.get('objetivoMs', OBJETIVO_MS))
+    costos = event.get('costos') or costos_default(algoritmo)
+
+    resultado = medir_costos(algoritmo, costos, objetivo_ms)
+    print(f"🔐 Calibración {algoritmo} con {resultado['memoriaLambdaMb']} MB: "
+          f"costo {resultado['recomendado']['costo']} ({resultado['recomendado']['ms']} ms)"
+          f"{' ⚠️ más lento que el objetivo' if resultado['excedeObjetivo'] else ''}")
+    return resultado
+
+# ========================================
+# CLI: barrido de memorias
+# ========================================
+
+def medir_en_lambda(cliente, funcion, memoria_mb, payload):
+    """Cambia la memoria de la función, espera a que aplique y la invoca"""
+    cliente.update_function_configuration(FunctionName=funcion, MemorySize=memoria_mb)
+    cliente.get_waiter('function_updated').wait(FunctionName=funcion)
+
+    respuesta = cliente.invoke(FunctionName=funcion, Payload=json.dumps(payload).encode())
+    cuerpo = json.loads(respuesta['Payload'].read())
+    if respuesta.get('FunctionError'):
+        raise RuntimeError(f"{memoria_mb} MB: {cuerpo.get('errorMessage', cuerpo)}")
+    return cuerpo
+
+def imprimir_tabla(resultados, algoritmo):
+    memorias = [r['memoriaLambdaMb'] or 'local' for r in resultados]
+    costos = sorted({m['costo'] for r in resultados for m in r['mediciones']})
+    etiqueta = 'ln' if algoritmo == SCRYPT else 'iteraciones'
+
+    print(f"\n{etiqueta:>12} " + ''.join(f"{str(m) + ' MB' if m != 'local' else m:>12}" for m in memorias))
+    for costo in costos:
+        fila = f"{costo:>12} "
+        for r in resultados:
+            ms = next((m['ms'] for m in r['mediciones'] if m['costo'] == costo), None)
+            fila += f"{(str(ms) + ' ms') if ms is not None else '-':>12}"
+        print(fila)
+    print(f"{'recomendado':>12} " + ''.join(
+        f"{str(r['recomendado']['costo']) + ('*' if r['excedeObjetivo'] else ''):>12}" for r in resultados
+    ))
+    if any(r['excedeObjetivo'] for r in resultados):
+        print("\n* El costo mínimo tarda más que el objetivo con esa memoria")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Mide el hash de contraseñas por costo y memoria de Lambda'
+    )
+    parser.add_argument('--funcion', default=FUNCION_DEFAULT,
+                        help=f'Función de calibración (default: {FUNCION_DEFAULT})')
+    parser.add_argument('--memorias', default='512,1024,1769,3008',
+                        help='Memorias a probar en MB, separadas por coma (default: 512,1024,1769,3008)')
+    parser.add_argument('--algoritmo', default=ALGORITMO, choices=[SCRYPT, PBKDF2],
+                        help=f'Algoritmo (default: {ALGORITMO})')
+    parser.add_argument('--objetivo-ms', type=float, default=OBJETIVO_MS,
+                        help=f'Tiempo objetivo por hash en ms (default: {OBJETIVO_MS:g})')
+    parser.add_argument('--region', default=os.environ.get('AWS_REGION', 'us-east-1'),
+                        help='Región de la función')
+    parser.add_argument('--local', action='store_true',
+                        help='Medir solo en este equipo, sin invocar Lambda')
+    parser.add_argument('--reporte', help='Archivo JSON donde guardar los resultados')
+    args = parser.parse_args()
+
+    resultados = []
+    if args.local:
+        resultados.append(medir_costos(args.algoritmo, costos_default(args.algoritmo), args.objetivo_ms))
+    else:
+        import boto3
+
+        cliente = boto3.client('lambda', region_name=args.region)
+        original = cliente.get_function_configuration(FunctionName=args.funcion)['MemorySize']
+        payload = {'algoritmo': args.algoritmo, 'objetivoMs': args.objetivo_ms}
+        try:
+            for memoria in (int(m) for m in args.memorias.split(',')):
+                print(f"⏱️  {args.funcion} con {memoria} MB...")
+                try:
+                    resultados.append(medir_en_lambda(cliente, args.funcion, memoria, payload))
+                except RuntimeError as e:
+                    # p. ej. scrypt con el costo mínimo no cabe en esa memoria
+                    print(f"❌ {e}")
+        finally:
+            cliente.update_function_configuration(FunctionName=args.funcion, MemorySize=original)
+            print(f"↩️  Memoria restaurada a {original} MB")
+
+    imprimir_tabla(resultados, args.algoritmo)
+
+    if args.reporte:
+        with open(args.reporte, 'w') as f:
+            json.dump(resultados, f, indent=2)
+        print(f"\n💾 Resultados guardados en {args.reporte}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+# ========================================
+# contrasenas.py
+# Hash de contraseñas con costo configurable (scrypt / PBKDF2 de hashlib)
+# ========================================
+#
+# Formato guardado en passwordHash (estilo PHC, con versión y parámetros):
+#
+#   $scrypt$v=1$ln=17,r=8,p=1$<sal b64>$<hash b64>
+#   $pbkdf2-sha256$v=1$i=600000$<sal b64>$<hash b64>
+#
+# Los hashes anteriores (SHA-256 sin sal, 64 caracteres hex) se siguen
+# aceptando; verificar_password regresa el hash nuevo para que login lo
+# guarde (rehash transparente). Igual cuando el algoritmo o el costo
+# configurados suben.
+#
+# migrar_hashes_legado.py envuelve los SHA-256 legado sin esperar al login:
+# guarda scrypt(sha256hex(password)) con el parámetro pre=sha256
+#
+#   $scrypt$v=1$ln=17,r=8,p=1,pre=sha256$<sal b64>$<hash b64>
+#
+# y el siguiente login lo cambia por el hash directo. Todo 401 (usuario
+# inexistente, legado, envuelto o actual) cuesta una derivación, para que
+# el tiempo de respuesta no delate qué emails están registrados.
+#
+# Configuración (variables de entorno):
+# - PASSWORD_HASH_ALGORITMO: scrypt (default) o pbkdf2-sha256
+# - PASSWORD_HASH_COSTO: log2(n) para scrypt, iteraciones para PBKDF2.
+#   Vacío: el mínimo del algoritmo. Es fijo por despliegue: el costo no se
+#   calibra en el login (todos los contenedores usan el mismo y no hay
+#   rehash de ida y vuelta); calibrar_hash.py lo mide aparte
+# - PASSWORD_HASH_OBJETIVO_MS: tiempo objetivo para calibrar_hash.py
+#
+# Piso de seguridad (OWASP): scrypt n >= 2^17 (128 MB con r=8) y PBKDF2-SHA256
+# >= 600,000 iteraciones. PASSWORD_HASH_COSTO menor falla al importar; si
+# scrypt no cabe en la memoria de la Lambda, calibrar_hash.py lo reporta.
+#
+# El CPU de Lambda escala con la memoria: el mismo costo tarda ~7 veces
+# más con 256 MB que con 1769 MB. calibrar_hash.py mide el tiempo por
+# costo y memoria para fijar PASSWORD_HASH_COSTO y el tamaño de la Lambda.
+
+import base64
+import hashlib
+import hmac
+import os
+import time
+
+SCRYPT = 'scrypt'
+PBKDF2 = 'pbkdf2-sha256'
+VERSION = 1
+
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_LN_MIN = 17
+SCRYPT_LN_MAX = 20
+PBKDF2_ITERACIONES_MIN = 600_000
+SAL_BYTES = 16
+HASH_BYTES = 32
+PREVIO_SHA256 = 'sha256'
+
+ALGORITMO = os.environ.get('PASSWORD_HASH_ALGORITMO', SCRYPT)
+COSTO = os.environ.get('PASSWORD_HASH_COSTO', '')
+OBJETIVO_MS = float(os.environ.get('PASSWORD_HASH_OBJETIVO_MS', '50'))
+
+if ALGORITMO not in (SCRYPT, PBKDF2):
+    raise ValueError(f"PASSWORD_HASH_ALGORITMO no soportado: {ALGORITMO}")
+
+def costo_minimo(algoritmo):
+    """Piso de seguridad del algoritmo"""
+    return SCRYPT_LN_MIN if algoritmo == SCRYPT else PBKDF2_ITERACIONES_MIN
+
+if COSTO and int(COSTO) < costo_minimo(ALGORITMO):
+    raise ValueError(f"PASSWORD_HASH_COSTO={COSTO} es menor al mínimo de {ALGORITMO} "
+                     f"({costo_minimo(ALGORITMO)})")
+
+_costo_actual = int(COSTO) if COSTO else costo_minimo(ALGORITMO)
+
+def _b64(datos):
+    return base64.b64encode(datos).decode('ascii').rstrip('=')
+
+def _de_b64(texto):
+    return base64.b64decode(texto + '=' * (-len(texto) % 4))
+
+def memoria_scrypt(ln, r=SCRYPT_R):
+    """Bytes que usa scrypt: 128 * r * n"""
+    return 128 * r * (1 << ln)
+
+def _derivar(algoritmo, costo, password, sal):
+    if algoritmo == SCRYPT:
+        memoria = memoria_scrypt(costo)
+        return hashlib.scrypt(password, salt=sal, n=1 << costo, r=SCRYPT_R, p=SCRYPT_P,
+                              maxmem=memoria + 1024 * 1024, dklen=HASH_BYTES)
+    return hashlib.pbkdf2_hmac('sha256', password, sal, costo, dklen=HASH_BYTES)
+
+def _formatear(algoritmo, costo, sal, derivado, previo=None):
+    if algoritmo == SCRYPT:
+        parametros = f"ln={costo},r={SCRYPT_R},p={SCRYPT_P}"
+    else:
+        parametros = f"i={costo}"
+    if previo:
+        parametros += f",pre={previo}"
+    return f"${algoritmo}$v={VERSION}${parametros}${_b64(sal)}${_b64(derivado)}"
+
+def _sha256_legado(password_bytes):
+    """Entrada de un hash envuelto: el SHA-256 hex que guardaba el formato legado"""
+    return hashlib.sha256(password_bytes).hexdigest().encode('ascii')
+
+def _parsear(guardado):
+    """
+    return: (algoritmo, costo, sal, hash, previo) o None si no es un hash
+            de este módulo; previo es 'sha256' en los hashes envueltos
+    """
+    partes = guardado.split('$')
+    if len(partes) != 6 or partes[0] != '' or partes[2] != f"v={VERSION}":
+        return None
+    algoritmo = partes[1]
+    try:
+        parametros = dict(p.split('=', 1) for p in partes[3].split(','))
+        if algoritmo == SCRYPT:
+            if (int(parametros['r']), int(parametros['p'])) != (SCRYPT_R, SCRYPT_P):
+                return None
+            costo = int(parametros['ln'])
+        elif algoritmo == PBKDF2:
+            costo = int(parametros['i'])
+        else:
+            return None
+        previo = parametros.get('pre')
+        if previo not in (None, PREVIO_SHA256):
+            return None
+        return algoritmo, costo, _de_b64(partes[4]), _de_b64(partes[5]), previo
+    except (KeyError, ValueError):
+        return None
+
+def _es_legado(guardado):
+    return len(guardado) == 64 and all(c in '0123456789abcdef' for c in guardado)
+
+# ========================================
+# MEDICIÓN Y CALIBRACIÓN
+# ========================================
+
+def medir_ms(algoritmo, costo, repeticiones=3):
+    """Tiempo de un hash (el mejor de varias repeticiones, en ms)"""
+    sal = os.urandom(SAL_BYTES)
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        _derivar(algoritmo, costo, b'calibracion', sal)
+        ms = (time.perf_counter() - inicio) * 1000
+        mejor = ms if mejor is None else min(mejor, ms)
+    return mejor
+
+def ln_maximo():
+    """
+    scrypt no debe usar más de 1/4 de la memoria de la Lambda.
+
+    Si ni el piso (SCRYPT_LN_MIN) cabe lanza RuntimeError: con menos
+    memoria no se puede guardar un hash con el costo mínimo.
+    """
+    memoria_mb = os.environ.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE')
+    if not memoria_mb:
+        return SCRYPT_LN_MAX
+    limite = int(memoria_mb) * 1024 * 1024 // 4
+    if memoria_scrypt(SCRYPT_LN_MIN) > limite:
+        raise RuntimeError(
+            f"scrypt ln={SCRYPT_LN_MIN} usa {memoria_scrypt(SCRYPT_LN_MIN) // (1024 * 1024)} MB: "
+            f"la Lambda necesita al menos {memoria_scrypt(SCRYPT_LN_MIN) * 4 // (1024 * 1024)} MB "
+            f"(tiene {memoria_mb} MB)"
+        )
+    ln = SCRYPT_LN_MIN
+    while ln < SCRYPT_LN_MAX and memoria_scrypt(ln + 1) <= limite:
+        ln += 1
+    return ln
+
+def costo_actual():
+    """Costo configurado (PASSWORD_HASH_COSTO) o el mínimo del algoritmo"""
+    return _costo_actual
+
+# ========================================
+# API
+# ========================================
+
+def hash_password(password, costo=None):
+    """
+    return: hash con sal, algoritmo y costo, listo para passwordHash
+    """
+    if costo is None:
+        costo = costo_actual()
+    if costo < costo_minimo(ALGORITMO):
+        raise ValueError(f"Costo {costo} menor al mínimo de {ALGORITMO} ({costo_minimo(ALGORITMO)})")
+    sal = os.urandom(SAL_BYTES)
+    return _formatear(ALGORITMO, costo, sal, _derivar(ALGORITMO, costo, password.encode('utf-8'), sal))
+
+def envolver_legado(guardado):
+    """
+    Hash SHA-256 legado -> scrypt/PBKDF2 de ese SHA-256 (sin conocer el
+    password). Para migrar_hashes_legado.py.
+
+    return: hash envuelto listo para passwordHash
+    """
+    if not _es_legado(guardado):
+        raise ValueError("No es un hash SHA-256 legado")
+    costo = costo_actual()
+    sal = os.urandom(SAL_BYTES)
+    derivado = _derivar(ALGORITMO, costo, guardado.encode('ascii'), sal)
+    return _formatear(ALGORITMO, costo, sal, derivado, PREVIO_SHA256)
+
+def necesita_rehash(guardado):
+    """True si el hash es legado, envuelto o de un algoritmo/costo menor al configurado"""
+    datos = _parsear(guardado) if guardado else None
+    if datos is None:
+        return True
+    algoritmo, costo, previo = datos[0], datos[1], datos[4]
+    return previo is not None or algoritmo != ALGORITMO or costo < costo_actual()
+
+def verificar_password(password, guardado):
+    """
+    Compara la contraseña contra el passwordHash guardado (formato nuevo,
+    envuelto o SHA-256 legado).
+
+    Sin hash guardado (usuario inexistente) o con uno legado se calcula
+    una derivación de todos modos, para que la respuesta tarde lo mismo que
+    con un hash actual y no delate qué emails existen.
+
+    return: (válida, hash nuevo a guardar o None)
+    """
+    password_bytes = password.encode('utf-8')
+    datos = _parsear(guardado) if guardado else None
+
+    if datos is not None:
+        algoritmo, costo, sal, esperado, previo = datos
+        entrada = _sha256_legado(password_bytes) if previo else password_bytes
+        valida = hmac.compare_digest(_derivar(algoritmo, costo, entrada, sal), esperado)
+    elif guardado and _es_legado(guardado):
+        valida = hmac.compare_digest(_sha256_legado(password_bytes).decode('ascii'), guardado)
+        _derivar(ALGORITMO, costo_actual(), password_bytes, os.urandom(SAL_BYTES))
+    else:
+        hash_password(password)
+        return False, None
+
+    if valida and necesita_rehash(guardado):
+        return True, hash_password(password)
+    return valida, None
@@ -5,12 +5,18 @@
 
 import json
 import boto3
-import hashlib
 import jwt
 import os
 from datetime import datetime, timedelta
 from decimal import Decimal
 from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+from dynamo_utils import query_completa, eliminar_en_lote
+from tokens_verificados import usuario_del_evento
+from eliminacion_cascada import Plazo, paso, ejecutar_cascada, finalizar_trabajo
+from contrasenas import hash_password, verificar_password
+from vistas_tandas import llave_meta
 
 #custom error
 from exception.custom_http_exception import CustomError
@@ -33,17 +39,8 @@ def cors_headers():
     }
 
 def extract_user_id(event):
-    """Extrae el userId del token JWT"""
-    try:
-        auth_header = event['headers'].get('Authorization') or event['headers'].get('authorization')
-        if not auth_header:
-            return None
-        
-        token = auth_header.replace('Bearer ', '')
-        payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
-        return payload['id']
-    except:
-        return None
+    """userId del contexto del authorizer; en rutas públicas, del token (verificado con cache)"""
+    return usuario_del_evento(event, JWT_SECRET)
 
 def convert_decimals(obj):
     """
@@ -69,9 +66,6 @@ def response(status_code, body):
         'body': json.dumps(body, default=str)
     }
 
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
 def generate_token(user_id, email, expires_in_hours=1):
     payload = {
         'id': user_id,
@@ -106,27 +100,22 @@ def login(event, context):
             })
         
         # Buscar usuario por email usando GSI
-        result = usuarios_table.query(
+        usuarios = query_completa(
+            usuarios_table,
             IndexName='email-index',
             KeyConditionExpression='email = :email',
-            ExpressionAttributeValues={':email': email}
+            ExpressionAttributeValues={':email': email},
+            limite=1
         )
-        print(f'result: {result}')
-        
-        if not result.get('Items'):
-            return response(401, {
-                'success': False,
-                'error': {
-                    'code': 'INVALID_CREDENTIALS',
-                    'message': 'Email o contraseña incorrectos'
-                }
-            })
-        
-        usuario = result['Items'][0]
+        print(f'usuarios encontrados: {len(usuarios)}')
         
-        # Verificar password
-        hashed_password = hash_password(password)
-        if usuario['passwordHash'] != hashed_password:
+        # Verificar password (sin usuario también se calcula un hash, para
+        # que el tiempo de respuesta no delate qué emails están registrados)
+        usuario = usuarios[0] if usuarios else None
+        password_valido, nuevo_hash = verificar_password(
+            password, usuario.get('passwordHash') if usuario else None
+        )
+        if not password_valido:
             return response(401, {
                 'success': False,
                 'error': {
@@ -142,12 +131,8 @@ def login(event, context):
         print(f'refresh_token: {refresh_token}')
         print(f'usuario: {usuario}')
         
-        # Actualizar lastLogin
-        usuarios_table.update_item(
-            Key={'id': usuario['id']},
-            UpdateExpression='SET lastLogin = :now',
-            ExpressionAttributeValues={':now': datetime.utcnow().isoformat()}
-        )
+        # Actualizar lastLogin (y el hash si era legado o de menor costo)
+        actualizar_login(usuario, nuevo_hash)
         
         return response(200, {
             'success': True,
@@ -171,6 +156,39 @@ def login(event, context):
             }
         })
 
+def actualizar_login(usuario, nuevo_hash):
+    """
+    Guarda lastLogin y, si verificar_password regresó un hash nuevo, lo
+    reemplaza en el mismo update. La condición evita pisar un password que
+    cambió mientras tanto; en ese caso solo se guarda lastLogin.
+    """
+    now = datetime.utcnow().isoformat()
+
+    if nuevo_hash:
+        try:
+            usuarios_table.update_item(
+                Key={'id': usuario['id']},
+                UpdateExpression='SET lastLogin = :now, passwordHash = :nuevo',
+                ConditionExpression='passwordHash = :anterior',
+                ExpressionAttributeValues={
+                    ':now': now,
+                    ':nuevo': nuevo_hash,
+                    ':anterior': usuario['passwordHash']
+                }
+            )
+            print(f"🔐 passwordHash actualizado al formato actual: {usuario['id']}")
+            return
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            print(f"⚠️ passwordHash cambió durante el login, no se reemplaza: {usuario['id']}")
+
+    usuarios_table.update_item(
+        Key={'id': usuario['id']},
+        UpdateExpression='SET lastLogin = :now',
+        ExpressionAttributeValues={':now': now}
+    )
+
 # ========================================
 # HANDLER: REGISTER
 # ========================================
@@ -192,13 +210,15 @@ def register(event, context):
             })
         
         # Verificar si el email ya existe
-        result = usuarios_table.query(
+        existentes = query_completa(
+            usuarios_table,
             IndexName='email-index',
             KeyConditionExpression='email = :email',
-            ExpressionAttributeValues={':email': email}
+            ExpressionAttributeValues={':email': email},
+            limite=1
         )
         
-        if result.get('Items'):
+        if existentes:
             return response(400, {
                 'success': False,
                 'error': {
@@ -336,6 +356,7 @@ def eliminar_usuario(event, context):
     - Todas las tandas creadas por el usuario
     - Todos los participantes de esas tandas
     - Todos los pagos de esas tandas
+    - Todas las notificaciones de esas tandas
     - Todos los links de registro de esas tandas
     """
     
@@ -353,92 +374,64 @@ def eliminar_usuario(event, context):
         
         print(f"🗑️ Iniciando eliminación de cuenta para usuario: {user_id}")
         
-        # Contadores para el reporte
-        contadores = {
-            'tandas_eliminadas': 0,
-            'participantes_eliminados': 0,
-            'pagos_eliminados': 0,
-            'links_eliminados': 0
-        }
-        
-        # 1. Obtener todas las tandas del usuario
+        # 1. Obtener todas las tandas del usuario (solo ids)
         print(f"📊 Buscando tandas del usuario {user_id}...")
         tandas_table = dynamodb.Table('tandas')
-        tandas_response = tandas_table.query(
+        tandas = query_completa(
+            tandas_table,
             IndexName='adminId-index',  # Asegúrate de tener este GSI
-            KeyConditionExpression=Key('adminId').eq(user_id)
+            KeyConditionExpression=Key('adminId').eq(user_id),
+            proyeccion=['id']
         )
-        
-        tandas = tandas_response.get('Items', [])
         print(f"✅ Encontradas {len(tandas)} tandas para eliminar")
         
-        # 2. Para cada tanda, eliminar todos los datos relacionados
+        # 2. Vaciar participantes, pagos, notificaciones y links de todas las
+        # tandas en paralelo y por lotes. Si se acaba el tiempo se guarda el
+        # avance y se responde 202; la siguiente llamada continúa.
         participantes_table = dynamodb.Table('participantes')
         pagos_table = dynamodb.Table('pagos')
+        notificaciones_table = dynamodb.Table('notificaciones_v2')
         links_table = dynamodb.Table('links_registro')
+        trabajos_eliminacion_table = dynamodb.Table('trabajos_eliminacion')
+        
+        pasos = []
         for tanda in tandas:
             tanda_id = tanda['id']
-            print(f"🗑️ Procesando tanda: {tanda_id}")
-            
-            # 2a. Eliminar participantes de esta tanda
-            participantes_response = participantes_table.query(
-                KeyConditionExpression=Key('id').eq(tanda_id)
-            )
-            
-            participantes = participantes_response.get('Items', [])
-            print(f"  👥 Eliminando {len(participantes)} participantes...")
-            
-            for participante in participantes:
-                participantes_table.delete_item(
-                    Key={
-                        'id': tanda_id,
-                        'participanteId': participante['participanteId']
-                    }
-                )
-                contadores['participantes_eliminados'] += 1
-            
-            # 2b. Eliminar pagos de esta tanda
-            pagos_response = pagos_table.query(
-                KeyConditionExpression=Key('id').eq(tanda_id)
-            )
-            
-            pagos = pagos_response.get('Items', [])
-            print(f"  💰 Eliminando {len(pagos)} pagos...")
-            
-            for pago in pagos:
-                pagos_table.delete_item(
-                    Key={
-                        'id': pago['id'],
-                        'pagoId': pago['pagoId']
-                    }
-                )
-                contadores['pagos_eliminados'] += 1
-            
-            # 2c. Eliminar links de registro de esta tanda
-            links_response = links_table.query(
-                IndexName='tandaId-index',  # Asegúrate de tener este GSI
-                KeyConditionExpression=Key('tandaId').eq(tanda_id)
-            )
-            
-            links = links_response.get('Items', [])
-            print(f"  🔗 Eliminando {len(links)} links de registro...")
-            
-            for link in links:
-                links_table.delete_item(
-                    Key={
-                        'token': link['token']
-                    }
-                )
-                contadores['links_eliminados'] += 1
-            
-            # 2d. Eliminar la tanda
-            tandas_table.delete_item(
-                Key={
-                    'id': tanda_id
+            condicion = Key('id').eq(tanda_id)
+            pasos += [
+                paso(f'participantes#{tanda_id}', participantes_table, ['id', 'participanteId'], condicion, contador='participantes_eliminados'),
+                paso(f'pagos#{tanda_id}', pagos_table, ['id', 'pagoId'], condicion, contador='pagos_eliminados'),
+                paso(f'notificaciones#{tanda_id}', notificaciones_table, ['id', 'notificacionId'], condicion, contador='notificaciones_eliminadas'),
+                paso(f'links#{tanda_id}', links_table, ['token'], Key('tandaId').eq(tanda_id), indice='tandaId-index', contador='links_eliminados')
+            ]
+        
+        trabajo_id = f'usuario#{user_id}'
+        completo, contadores = ejecutar_cascada(
+            dynamodb,
+            trabajos_eliminacion_table,
+            trabajo_id,
+            pasos,
+            Plazo(context)
+        )
+        
+        if not completo:
+            return response(202, {
+                'success': True,
+                'message': 'Eliminación en progreso, vuelve a llamar para continuar',
+                'data': {
+                    'userId': user_id,
+                    'completo': False,
+                    'eliminados': contadores
                 }
-            )
-            contadores['tandas_eliminadas'] += 1
-            print(f"  ✅ Tanda {tanda_id} eliminada completamente")
+            })
+        
+        # 2b. Eliminar las tandas, sus estadísticas precalculadas y sus vistas
+        llaves_tandas = [{'id': tanda['id']} for tanda in tandas]
+        for nombre_tabla in ('tandas', 'estadisticas_tandas'):
+            eliminar_en_lote(dynamodb, nombre_tabla, llaves_tandas)
+        eliminar_en_lote(dynamodb, 'vistas_tandas_v2', [llave_meta(tanda['id']) for tanda in tandas])
+        contadores['tandas_eliminadas'] = len(tandas)
+        print(f"  ✅ {len(tandas)} tandas eliminadas completamente")
         
         # 3. Eliminar el usuario
         print(f"🗑️ Eliminando usuario {user_id}...")
@@ -449,6 +442,7 @@ def eliminar_usuario(event, context):
         )
         
         print(f"✅ Usuario {user_id} eliminado completamente")
+        finalizar_trabajo(trabajos_eliminacion_table, trabajo_id)
         
         # Preparar respuesta
         response_body = {
@@ -456,6 +450,7 @@ def eliminar_usuario(event, context):
             'message': 'Cuenta eliminada exitosamente',
             'data': {
                 'userId': user_id,
+                'completo': True,
                 'eliminados': contadores,
                 'timestamp': datetime.utcnow().isoformat()
             }
@@ -627,18 +622,17 @@ def find_user_by_email(email):
     """
     try:
         
-        # Escanear la tabla buscando el email
-        response = usuarios_table.scan(
+        # Consultar el GSI por email (el scan con filtro solo revisaba la primera página)
+        usuarios = query_completa(
+            usuarios_table,
             IndexName='email-index',
-            FilterExpression='email = :email',
-            ExpressionAttributeValues={
-                ':email': email
-            }
+            KeyConditionExpression=Key('email').eq(email),
+            limite=1
         )
         
          # Verificar si se encontró el usuario
-        if response.get('Items') and len(response['Items']) > 0:
-            user = convert_decimals(response['Items'][0])
+        if usuarios:
+            user = convert_decimals(usuarios[0])
             print(f"✅ Usuario encontrado: {user.get('id')}")
             return user
         
@@ -0,0 +1,87 @@
+# ========================================
+# SCRIPT: migrar_hashes_legado.py
+# Envuelve los passwordHash SHA-256 legado de usuarios_admin
+# ========================================
+#
+# Un SHA-256 sin sal se verifica en microsegundos: mientras quede alguno,
+# quien lo obtenga de la tabla lo rompe rápido. Este script reemplaza cada
+# uno por scrypt(sha256hex) (ver envolver_legado en contrasenas.py) sin
+# conocer el password; el siguiente login lo cambia por el hash directo.
+#
+# Correr con el mismo PASSWORD_HASH_ALGORITMO y PASSWORD_HASH_COSTO que
+# lambda_auth (si no, login rehashea otra vez):
+#   PASSWORD_HASH_COSTO=17 python migrar_hashes_legado.py --dry-run
+#   PASSWORD_HASH_COSTO=17 python migrar_hashes_legado.py
+#
+# El update es condicional al hash leído: un usuario que cambia su
+# password o inicia sesión mientras tanto no se pisa. Se puede correr otra
+# vez; los ya envueltos no se tocan.
+
+import argparse
+
+import boto3
+from botocore.exceptions import ClientError
+
+from contrasenas import ALGORITMO, costo_actual, envolver_legado, _es_legado
+
+def migrar(usuarios, dry_run=False):
+    """
+    return: dict con los contadores del resumen
+    """
+    resumen = {'leidos': 0, 'envueltos': 0, 'cambiaron': 0, 'sin_legado': 0}
+    kwargs = {'ProjectionExpression': 'id, passwordHash'}
+
+    while True:
+        pagina = usuarios.scan(**kwargs)
+        for usuario in pagina.get('Items', []):
+            resumen['leidos'] += 1
+            anterior = usuario.get('passwordHash')
+            if not anterior or not _es_legado(anterior):
+                resumen['sin_legado'] += 1
+                continue
+
+            if dry_run:
+                resumen['envueltos'] += 1
+                continue
+
+            try:
+                usuarios.update_item(
+                    Key={'id': usuario['id']},
+                    UpdateExpression='SET passwordHash = :nuevo',
+                    ConditionExpression='passwordHash = :anterior',
+                    ExpressionAttributeValues={
+                        ':nuevo': envolver_legado(anterior),
+                        ':anterior': anterior
+                    }
+                )
+                resumen['envueltos'] += 1
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                resumen['cambiaron'] += 1
+
+        if 'LastEvaluatedKey' not in pagina:
+            return resumen
+        kwargs['ExclusiveStartKey'] = pagina['LastEvaluatedKey']
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Envuelve los passwordHash SHA-256 legado con scrypt/PBKDF2'
+    )
+    parser.add_argument('--tabla', default='usuarios_admin', help='Tabla de usuarios (default: usuarios_admin)')
+    parser.add_argument('--region', default=None, help='Región de AWS')
+    parser.add_argument('--dry-run', action='store_true', help='Solo contar, sin escribir')
+    args = parser.parse_args()
+
+    dynamodb = boto3.resource('dynamodb', region_name=args.region)
+    print(f"🔐 {args.tabla}: SHA-256 legado → {ALGORITMO} costo {costo_actual()}"
+          f"{' (dry run)' if args.dry_run else ''}")
+    resumen = migrar(dynamodb.Table(args.tabla), args.dry_run)
+
+    print(f"✅ Leídos: {resumen['leidos']}")
+    print(f"   - Envueltos: {resumen['envueltos']}")
+    print(f"   - Cambiaron durante la migración: {resumen['cambiaron']}")
+    print(f"   - Sin hash legado: {resumen['sin_legado']}")
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,6 @@
-import hashlib
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+from contrasenas import hash_password
 
+# Usa PASSWORD_HASH_COSTO (o el mínimo del algoritmo): correr con el mismo
+# costo que la Lambda (password_hash_costo) para que login no lo rehashee
 hashed_password = hash_password('welcome01')
-print(f'hashed_password: {hashed_password}', flush=True)
\ No newline at end of file
+print(f'hashed_password: {hashed_password}', flush=True)
@@ -8,6 +8,8 @@ import json
 import jwt
 import os
 
+from tokens_verificados import verificar_token
+
 JWT_SECRET = os.environ['JWT_SECRET']
 
 def handler(event, context):
@@ -30,9 +32,9 @@ def handler(event, context):
         # Remover "Bearer " si existe
         token = token.replace('Bearer ', '')
         
-        # Verificar token
+        # Verificar token (los ya verificados en este contenedor salen del cache)
         try:
-            payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+            payload = verificar_token(token, JWT_SECRET)
             user_id = payload.get('id')
             email = payload.get('email')
             
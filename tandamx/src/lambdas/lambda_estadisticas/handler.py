@@ -6,10 +6,16 @@
 import json
 import boto3
 import os
-import jwt
 from datetime import datetime, timedelta, timezone
 from decimal import Decimal
 
+from dynamo_utils import cargar_pagos_tanda, query_completa
+from tokens_verificados import usuario_del_evento
+from agregados_pagos import resumir_pagos, resumen_de, distribucion_pagos
+from estadisticas_materializadas import (
+    leer_estadisticas, reconstruir_estadisticas, distribucion_desde_estadisticas, recaudado_desde
+)
+
 #custom error
 from exception.custom_http_exception import CustomError
 from exception.custom_http_exception import CustomClientError
@@ -19,6 +25,7 @@ dynamodb = boto3.resource('dynamodb')
 tandas_table = dynamodb.Table(os.environ['TANDAS_TABLE'])
 participantes_table = dynamodb.Table(os.environ['PARTICIPANTES_TABLE'])
 pagos_table = dynamodb.Table(os.environ['PAGOS_TABLE'])
+estadisticas_table = dynamodb.Table(os.environ['ESTADISTICAS_TABLE'])
 
 JWT_SECRET = os.environ['JWT_SECRET']
 
@@ -45,15 +52,8 @@ class DecimalEncoder(json.JSONEncoder):
         return super(DecimalEncoder, self).default(obj)
 
 def extract_user_id(event):
-    try:
-        auth_header = event['headers'].get('Authorization') or event['headers'].get('authorization')
-        if not auth_header:
-            return None
-        token = auth_header.replace('Bearer ', '')
-        payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
-        return payload['id']
-    except:
-        return None
+    """userId del contexto del authorizer; en rutas públicas, del token (verificado con cache)"""
+    return usuario_del_evento(event, JWT_SECRET)
 
 def verificar_permisos_tanda(tanda_id, user_id):
     result = tandas_table.get_item(Key={'id': tanda_id})
@@ -63,6 +63,16 @@ def verificar_permisos_tanda(tanda_id, user_id):
         return False, None
     return True, result['Item']
 
+def fuentes_estadisticas(tanda_id):
+    """Pagos y participantes de los que se reconstruyen los contadores"""
+    participantes = query_completa(
+        participantes_table,
+        KeyConditionExpression='id = :tandaId',
+        ExpressionAttributeValues={':tandaId': tanda_id},
+        proyeccion=['participanteId']
+    )
+    return cargar_pagos_tanda(pagos_table, tanda_id), participantes
+
 # ========================================
 # HANDLER: OBTENER ESTADÍSTICAS
 # ========================================
@@ -91,11 +101,11 @@ def obtener_estadisticas(event, context):
         print(f'Es tanda cumpleañera: {es_cumpleañera}')
         
         # Obtener participantes
-        participantes_result = participantes_table.query(
+        participantes = query_completa(
+            participantes_table,
             KeyConditionExpression='id = :tandaId',
             ExpressionAttributeValues={':tandaId': tanda_id}
         )
-        participantes = participantes_result.get('Items', [])
         print(f'Total participantes: {len(participantes)}')
         
         # 🆕 ORDENAR PARTICIPANTES SEGÚN TIPO DE TANDA
@@ -116,44 +126,35 @@ def obtener_estadisticas(event, context):
             # Ordenar por número asignado
             participantes.sort(key=lambda p: p.get('numeroAsignado', 999))
         
-        # Obtener pagos
-        pagos_result = pagos_table.query(
-            KeyConditionExpression='id = :tandaId',
-            ExpressionAttributeValues={':tandaId': tanda_id}
-        )
-        pagos = pagos_result.get('Items', [])
-        print(f'Total pagos: {len(pagos)}')
-        
         # Calcular estadísticas
         total_participantes = len(participantes)
         ronda_actual = int(tanda['rondaActual'])
         total_rondas = int(tanda['totalRondas'])
         monto_por_ronda = float(tanda['montoPorRonda'])
         
-        # Calcular estado de cada participante
-        participantes_al_corriente = 0
-        participantes_atrasados = 0
-        participantes_adelantados = 0
+        # Contadores de pagos precalculados (un solo get_item)
+        estadisticas = leer_estadisticas(estadisticas_table, tanda_id)
+        if estadisticas is None:
+            # Tanda sin contadores reconstruidos (nueva, o anterior al
+            # despliegue con solo ADDs parciales): se construyen desde los pagos
+            print('Sin estadísticas materializadas, reconstruyendo desde pagos...')
+            reconstruir_estadisticas(
+                estadisticas_table,
+                tanda_id,
+                lambda: fuentes_estadisticas(tanda_id),
+                monto_por_ronda
+            )
+            estadisticas = leer_estadisticas(estadisticas_table, tanda_id)
+        print(f"Total pagos realizados: {estadisticas['totalPagados']}")
         
-        for participante in participantes:
-            pagos_participante = [
-                p for p in pagos 
-                if p['participanteId'] == participante['participanteId'] and p.get('pagado', False)
-            ]
-            pagos_realizados = len(pagos_participante)
-            pagos_esperados = ronda_actual - 1
-            
-            if pagos_realizados >= pagos_esperados:
-                participantes_al_corriente += 1
-            elif pagos_realizados < pagos_esperados:
-                participantes_atrasados += 1
-            
-            if pagos_realizados > pagos_esperados:
-                participantes_adelantados += 1
+        # Estado de cada participante
+        distribucion = distribucion_desde_estadisticas(estadisticas, participantes, ronda_actual)
+        participantes_al_corriente = distribucion['al_corriente']
+        participantes_atrasados = distribucion['atrasados']
+        participantes_adelantados = distribucion['adelantados']
         
         # Total recaudado
-        pagos_realizados = [p for p in pagos if p.get('pagado', False)]
-        total_recaudado = sum(float(p.get('monto', monto_por_ronda)) for p in pagos_realizados)
+        total_recaudado = estadisticas['totalRecaudado']
         
         # 🆕 TOTAL ESPERADO SEGÚN TIPO DE TANDA
         if es_cumpleañera:
@@ -247,34 +248,8 @@ def obtener_estadisticas(event, context):
                 except Exception as e:
                     print(f"Error calculando fecha estimada: {e}")
         
-        # Pagos último mes (UTC aware)
-        hace_un_mes = datetime.now(timezone.utc) - timedelta(days=30)
-
-        print('Procesando pagos del último mes...')
-        def parse_fecha_pago(fecha_str):
-            if not fecha_str:
-                return None
-            try:
-                # Convierte ISO con Z a UTC aware
-                if fecha_str.endswith('Z'):
-                    fecha_str = fecha_str.replace('Z', '+00:00')
-                fecha = datetime.fromisoformat(fecha_str)
-                # Asegurar que sea aware
-                if fecha.tzinfo is None:
-                    fecha = fecha.replace(tzinfo=timezone.utc)
-                return fecha
-            except Exception as e:
-                print(f"Error parseando fecha: {fecha_str}, error: {e}")
-                return None
-
-        pagos_ultimo_mes = sum(
-            float(p.get('monto', 0))
-            for p in pagos_realizados
-            if (
-                parse_fecha_pago(p.get('fechaPago')) is not None
-                and parse_fecha_pago(p.get('fechaPago')) > hace_un_mes
-            )
-        )
+        # Pagos último mes (contadores diarios)
+        pagos_ultimo_mes = recaudado_desde(estadisticas, 30)
         
         # Promedio por ronda
         pagos_promedio_por_ronda = total_recaudado / max(ronda_actual - 1, 1)
@@ -346,17 +321,32 @@ def generar_reporte(event, context):
             })
         
         # Obtener todos los datos
-        participantes_result = participantes_table.query(
+        participantes = query_completa(
+            participantes_table,
             KeyConditionExpression='id = :tandaId',
             ExpressionAttributeValues={':tandaId': tanda_id}
         )
-        participantes = participantes_result.get('Items', [])
         
-        pagos_result = pagos_table.query(
-            KeyConditionExpression='id = :tandaId',
-            ExpressionAttributeValues={':tandaId': tanda_id}
-        )
-        pagos = pagos_result.get('Items', [])
+        pagos = cargar_pagos_tanda(pagos_table, tanda_id)
+        
+        ronda_actual = int(tanda['rondaActual'])
+        monto_por_ronda = float(tanda['montoPorRonda'])
+        resumen_pagos = resumir_pagos(pagos, ronda_actual, monto_por_ronda)
+        pagos_esperados = max(0, ronda_actual - 1)
+        
+        participantes_reporte = []
+        for p in sorted(participantes, key=lambda x: x['numeroAsignado']):
+            resumen = resumen_de(resumen_pagos, p['participanteId'])
+            participantes_reporte.append({
+                'participanteId': p['participanteId'],
+                'nombre': p['nombre'],
+                'telefono': p['telefono'],
+                'email': p.get('email', ''),
+                'numeroAsignado': int(p['numeroAsignado']),
+                'pagosRealizados': resumen['pagados'],
+                'totalPagado': round(resumen['recaudado'], 2),
+                'estado': 'al_corriente' if resumen['pagados'] >= pagos_esperados else 'atrasado'
+            })
         
         # Construir reporte
         reporte = {
@@ -369,16 +359,13 @@ def generar_reporte(event, context):
                 'fechaInicio': tanda['fechaInicio'],
                 'status': tanda.get('status', 'active')
             },
-            'participantes': [
-                {
-                    'participanteId': p['participanteId'],
-                    'nombre': p['nombre'],
-                    'telefono': p['telefono'],
-                    'email': p.get('email', ''),
-                    'numeroAsignado': int(p['numeroAsignado'])
-                }
-                for p in sorted(participantes, key=lambda x: x['numeroAsignado'])
-            ],
+            'participantes': participantes_reporte,
+            'resumen': {
+                'totalRecaudado': round(resumen_pagos['totalRecaudado'], 2),
+                'totalPagos': resumen_pagos['totalPagados'],
+                'pagosUltimoMes': round(resumen_pagos['pagosUltimoMes'], 2),
+                'distribucionPagos': distribucion_pagos(resumen_pagos, participantes, ronda_actual)
+            },
             'pagos': [
                 {
                     'pagoId': pg['pagoId'],
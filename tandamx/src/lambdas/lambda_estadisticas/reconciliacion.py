@@ -0,0 +1,71 @@
+# ========================================
+# LAMBDA: reconciliacion.py
+# Reconstruye las estadísticas precalculadas y reporta desviaciones
+# ========================================
+
+import json
+
+from dynamo_utils import iterar_scan
+from estadisticas_materializadas import reconstruir_estadisticas
+
+from handler import (
+    tandas_table,
+    estadisticas_table,
+    fuentes_estadisticas,
+    DecimalEncoder
+)
+
+def reconciliar_tanda(tanda_id, monto_por_ronda=0, solo_reportar=False):
+    """Recalcula los contadores de una tanda desde sus pagos y participantes"""
+    return reconstruir_estadisticas(
+        estadisticas_table,
+        tanda_id,
+        lambda: fuentes_estadisticas(tanda_id),
+        monto_por_ronda,
+        solo_reportar=solo_reportar
+    )
+
+def lambda_handler(event, context):
+    """
+    Invocado por EventBridge (todas las tandas) o manualmente con
+    {"tandaId": "..."} para una sola. Con {"soloReportar": true} no
+    corrige, solo reporta.
+    """
+    event = event or {}
+    solo_reportar = bool(event.get('soloReportar', False))
+
+    if event.get('tandaId'):
+        tanda = tandas_table.get_item(Key={'id': event['tandaId']}).get('Item')
+        tandas = [tanda] if tanda else []
+    else:
+        tandas = iterar_scan(tandas_table, proyeccion=['id', 'montoPorRonda'])
+
+    revisadas = 0
+    con_desviacion = []
+
+    for tanda in tandas:
+        revisadas += 1
+        try:
+            desviaciones = reconciliar_tanda(
+                tanda['id'],
+                tanda.get('montoPorRonda', 0),
+                solo_reportar
+            )
+        except Exception as e:
+            print(f"❌ Error reconciliando tanda {tanda['id']}: {str(e)}")
+            con_desviacion.append({'tandaId': tanda['id'], 'error': str(e)})
+            continue
+
+        if desviaciones:
+            print(f"⚠️ Desviación en tanda {tanda['id']}: {json.dumps(desviaciones, cls=DecimalEncoder)}")
+            con_desviacion.append({'tandaId': tanda['id'], 'desviaciones': desviaciones})
+
+    resumen = {
+        'tandasRevisadas': revisadas,
+        'tandasConDesviacion': len(con_desviacion),
+        'soloReportar': solo_reportar,
+        'detalle': con_desviacion
+    }
+    print(f"📊 Reconciliación: {json.dumps(resumen, cls=DecimalEncoder)}")
+
+    return json.loads(json.dumps(resumen, cls=DecimalEncoder))
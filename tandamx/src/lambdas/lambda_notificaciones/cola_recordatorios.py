@@ -0,0 +1,99 @@
+# ========================================
+# MÓDULO: cola_recordatorios.py
+# Cola de recordatorios masivos: SQS en AWS, en memoria solo para pruebas
+# locales (RECORDATORIOS_COLA_EN_MEMORIA=1)
+# ========================================
+
+import os
+import json
+import uuid
+from collections import deque
+
+# SendMessageBatch acepta máximo 10 mensajes por llamada
+MAX_MENSAJES_SQS = 10
+
+class ColaSQS:
+    """Publica mensajes en la cola SQS de recordatorios"""
+    def __init__(self, queue_url, sqs=None):
+        import boto3
+        self.queue_url = queue_url
+        self.sqs = sqs or boto3.client('sqs')
+
+    def encolar(self, mensajes):
+        fallidos = []
+        for inicio in range(0, len(mensajes), MAX_MENSAJES_SQS):
+            lote = mensajes[inicio:inicio + MAX_MENSAJES_SQS]
+            resultado = self.sqs.send_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[
+                    {'Id': str(i), 'MessageBody': json.dumps(mensaje)}
+                    for i, mensaje in enumerate(lote)
+                ]
+            )
+            fallidos.extend(resultado.get('Failed', []))
+
+        if fallidos:
+            raise RuntimeError(f"No se pudieron encolar {len(fallidos)} mensajes: {fallidos[0].get('Message')}")
+
+class ColaEnMemoria:
+    """
+    Sustituto local de SQS. drenar() entrega los mensajes al worker en
+    lotes con el mismo formato del event source mapping y reencola los
+    que el worker reporta en batchItemFailures (hasta max_intentos; los
+    que se agotan pasan a dlq).
+    """
+    def __init__(self, max_intentos=3):
+        self.mensajes = deque()
+        self.dlq = []
+        self.max_intentos = max_intentos
+
+    def encolar(self, mensajes):
+        for mensaje in mensajes:
+            self.mensajes.append({
+                'messageId': str(uuid.uuid4()),
+                'body': json.dumps(mensaje),
+                'intentos': 0
+            })
+
+    def drenar(self, procesar_lote, tamano_lote=MAX_MENSAJES_SQS):
+        while self.mensajes:
+            lote = [self.mensajes.popleft() for _ in range(min(tamano_lote, len(self.mensajes)))]
+            evento = {
+                'Records': [
+                    {'messageId': m['messageId'], 'body': m['body'], 'eventSource': 'aws:sqs'}
+                    for m in lote
+                ]
+            }
+            resultado = procesar_lote(evento, None) or {}
+            fallidos = {f['itemIdentifier'] for f in resultado.get('batchItemFailures', [])}
+
+            for mensaje in lote:
+                if mensaje['messageId'] not in fallidos:
+                    continue
+                mensaje['intentos'] += 1
+                if mensaje['intentos'] < self.max_intentos:
+                    self.mensajes.append(mensaje)
+                else:
+                    self.dlq.append(mensaje)
+
+_cola = None
+
+def obtener_cola():
+    """
+    Cola SQS de RECORDATORIOS_QUEUE_URL. La cola en memoria solo se usa si
+    se pide explícitamente con RECORDATORIOS_COLA_EN_MEMORIA=1: dentro de
+    Lambda nadie la drena y los trabajos se quedarían en_cola para siempre.
+    """
+    global _cola
+    if _cola is None:
+        queue_url = os.environ.get('RECORDATORIOS_QUEUE_URL')
+        if queue_url:
+            _cola = ColaSQS(queue_url)
+        elif os.environ.get('RECORDATORIOS_COLA_EN_MEMORIA') == '1':
+            _cola = ColaEnMemoria()
+        else:
+            raise RuntimeError(
+                'RECORDATORIOS_QUEUE_URL no está configurada '
+                '(RECORDATORIOS_COLA_EN_MEMORIA=1 para usar la cola en memoria en pruebas locales)'
+            )
+    return _cola
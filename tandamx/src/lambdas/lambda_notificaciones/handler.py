@@ -6,10 +6,18 @@
 import json
 import boto3
 import os
-import jwt
-from datetime import datetime
+import time
+import uuid
+import threading
+from datetime import datetime, timedelta
 from decimal import Decimal
 
+from boto3.dynamodb.conditions import Key, Attr
+from botocore.exceptions import ClientError
+from dynamo_utils import query_completa, parametros_paginacion, leer_pagina
+from tokens_verificados import usuario_del_evento
+from cola_recordatorios import obtener_cola
+
 #custom error
 from exception.custom_http_exception import CustomError
 from exception.custom_http_exception import CustomClientError
@@ -20,9 +28,17 @@ sns = boto3.client('sns')
 tandas_table = dynamodb.Table(os.environ['TANDAS_TABLE'])
 participantes_table = dynamodb.Table(os.environ['PARTICIPANTES_TABLE'])
 notificaciones_table = dynamodb.Table(os.environ['NOTIFICACIONES_TABLE'])
+trabajos_table = dynamodb.Table(os.environ['TRABAJOS_TABLE'])
 
 JWT_SECRET = os.environ['JWT_SECRET']
 
+# Envío masivo: SNS limita los SMS por segundo a nivel cuenta (20/s por defecto)
+SMS_TASA_POR_SEGUNDO = float(os.environ.get('SMS_TASA_POR_SEGUNDO', '20'))
+SMS_MAX_WORKERS = int(os.environ.get('SMS_MAX_WORKERS', '10'))
+
+# Días que se conserva el estado de un trabajo de recordatorios (TTL)
+TRABAJOS_DIAS_RETENCION = int(os.environ.get('TRABAJOS_DIAS_RETENCION', '7'))
+
 # Utilidades
 def cors_headers():
     return {
@@ -46,15 +62,8 @@ class DecimalEncoder(json.JSONEncoder):
         return super(DecimalEncoder, self).default(obj)
 
 def extract_user_id(event):
-    try:
-        auth_header = event['headers'].get('Authorization') or event['headers'].get('authorization')
-        if not auth_header:
-            return None
-        token = auth_header.replace('Bearer ', '')
-        payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
-        return payload['id']
-    except:
-        return None
+    """userId del contexto del authorizer; en rutas públicas, del token (verificado con cache)"""
+    return usuario_del_evento(event, JWT_SECRET)
 
 def generate_short_id():
     import random
@@ -99,10 +108,35 @@ def enviar_sms(telefono, mensaje):
         print(f"Error enviando SMS: {str(e)}")
         return False, str(e)
 
-def registrar_notificacion(tanda_id, participante_id, mensaje, canal, estado, error=None):
-    """Registra la notificación en DynamoDB"""
-    notificacion_id = f"notif_{generate_short_id()}"
-    timestamp = datetime.utcnow().isoformat()
+class LimitadorTasa:
+    """
+    Limita la tasa de llamadas compartida entre hilos: cada llamada a
+    esperar() reserva el siguiente turno libre y duerme hasta alcanzarlo.
+    """
+    def __init__(self, tasa_por_segundo):
+        self.intervalo = 1.0 / tasa_por_segundo if tasa_por_segundo > 0 else 0
+        self.siguiente = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def esperar(self):
+        with self.lock:
+            ahora = time.monotonic()
+            turno = max(self.siguiente, ahora)
+            self.siguiente = turno + self.intervalo
+        if turno > ahora:
+            time.sleep(turno - ahora)
+
+def generar_notificacion_id(ahora=None):
+    """El prefijo de fecha hace que el sort key ordene las notificaciones por envío"""
+    ahora = ahora or datetime.utcnow()
+    return f"notif_{ahora.strftime('%Y%m%d%H%M%S%f')}_{generate_short_id()}"
+
+def construir_notificacion(tanda_id, participante_id, mensaje, canal, estado, error=None, job_id=None,
+                           notificacion_id=None):
+    """Arma el item de notificación para DynamoDB"""
+    ahora = datetime.utcnow()
+    timestamp = ahora.isoformat()
+    notificacion_id = notificacion_id or generar_notificacion_id(ahora)
     
     notificacion = {
         'id': tanda_id,
@@ -119,9 +153,146 @@ def registrar_notificacion(tanda_id, participante_id, mensaje, canal, estado, er
     if error:
         notificacion['error'] = error
     
+    if job_id:
+        notificacion['jobId'] = job_id
+    
+    return notificacion
+
+def registrar_notificacion(tanda_id, participante_id, mensaje, canal, estado, error=None, job_id=None,
+                           notificacion_id=None):
+    """Registra la notificación en DynamoDB (con notificacion_id fijo, repetirla la sobrescribe)"""
+    notificacion = construir_notificacion(
+        tanda_id, participante_id, mensaje, canal, estado, error, job_id, notificacion_id
+    )
     notificaciones_table.put_item(Item=notificacion)
     
-    return notificacion_id
+    return notificacion['notificacionId']
+
+def crear_trabajo(tanda_id, user_id, total):
+    """Registra un trabajo de recordatorios masivos con sus contadores en cero"""
+    ahora = datetime.utcnow()
+    trabajo = {
+        'jobId': f"job_{uuid.uuid4().hex}",
+        'tandaId': tanda_id,
+        'adminId': user_id,
+        'total': total,
+        'procesados': 0,
+        'enviados': 0,
+        'fallidos': 0,
+        'createdAt': ahora.isoformat(),
+        'updatedAt': ahora.isoformat(),
+        'ttl': int((ahora + timedelta(days=TRABAJOS_DIAS_RETENCION)).timestamp())
+    }
+    trabajos_table.put_item(Item=trabajo)
+    return trabajo
+
+# ========================================
+# ENVÍOS DEL TRABAJO (idempotencia)
+# ========================================
+# SQS entrega cada mensaje al menos una vez. Por cada destinatario se
+# guarda un item "jobId#participanteId" en la tabla de trabajos, con
+# put condicional, ANTES de enviar el SMS; una entrega repetida encuentra
+# el item y no vuelve a enviar. El item guarda también el resultado, el
+# notificacionId a usar y si ya se sumó a los contadores del trabajo.
+
+def clave_envio(job_id, participante_id):
+    return f"{job_id}#{participante_id}"
+
+def reclamar_envio(job_id, participante_id):
+    """
+    Registra que el envío a este destinatario va a intentarse.
+
+    return: (item del envío, True si este intento lo reclamó; False si ya
+            existía de una entrega anterior)
+    """
+    ahora = datetime.utcnow()
+    envio = {
+        'jobId': clave_envio(job_id, participante_id),
+        'estado': 'enviando',
+        'notificacionId': generar_notificacion_id(ahora),
+        'createdAt': ahora.isoformat(),
+        'ttl': int((ahora + timedelta(days=TRABAJOS_DIAS_RETENCION)).timestamp())
+    }
+    try:
+        trabajos_table.put_item(Item=envio, ConditionExpression='attribute_not_exists(jobId)')
+        return envio, True
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+    existente = trabajos_table.get_item(Key={'jobId': envio['jobId']}, ConsistentRead=True)['Item']
+    return existente, False
+
+def guardar_resultado_envio(envio, exito, mensaje, error=None):
+    """
+    Guarda el resultado del envío. Solo el primero que lo guarda gana (si
+    dos entregas del mismo mensaje corren a la vez, ambas usan el mismo).
+
+    return: item del envío con el resultado guardado
+    """
+    try:
+        return trabajos_table.update_item(
+            Key={'jobId': envio['jobId']},
+            UpdateExpression='SET estado = :estado, mensaje = :mensaje, #error = :error',
+            ConditionExpression='estado = :enviando',
+            ExpressionAttributeNames={'#error': 'error'},
+            ExpressionAttributeValues={
+                ':estado': 'enviado' if exito else 'fallido',
+                ':mensaje': mensaje,
+                ':error': error,
+                ':enviando': 'enviando'
+            },
+            ReturnValues='ALL_NEW'
+        )['Attributes']
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+    return trabajos_table.get_item(Key={'jobId': envio['jobId']}, ConsistentRead=True)['Item']
+
+def registrar_resultado_trabajo(job_id, envio):
+    """
+    Suma el resultado de un destinatario a los contadores del trabajo una
+    sola vez: el envío se marca como contado en la misma transacción.
+    """
+    exito = envio['estado'] == 'enviado'
+    try:
+        dynamodb.meta.client.transact_write_items(TransactItems=[
+            {
+                'Update': {
+                    'TableName': trabajos_table.name,
+                    'Key': {'jobId': envio['jobId']},
+                    'UpdateExpression': 'SET contado = :si',
+                    'ConditionExpression': 'attribute_not_exists(contado)',
+                    'ExpressionAttributeValues': {':si': True}
+                }
+            },
+            {
+                'Update': {
+                    'TableName': trabajos_table.name,
+                    'Key': {'jobId': job_id},
+                    'UpdateExpression': 'ADD procesados :uno, enviados :enviado, fallidos :fallido SET updatedAt = :now',
+                    'ExpressionAttributeValues': {
+                        ':uno': 1,
+                        ':enviado': 1 if exito else 0,
+                        ':fallido': 0 if exito else 1,
+                        ':now': datetime.utcnow().isoformat()
+                    }
+                }
+            }
+        ])
+    except ClientError as e:
+        codigo = e.response['Error']['Code']
+        razones = e.response.get('CancellationReasons') or [{}]
+        if codigo != 'TransactionCanceledException' or razones[0].get('Code') != 'ConditionalCheckFailed':
+            raise
+        print(f"ℹ️ Envío {envio['jobId']} ya contado")
+
+def estado_trabajo(trabajo):
+    procesados = int(trabajo.get('procesados', 0))
+    if procesados == 0:
+        return 'en_cola'
+    if procesados < int(trabajo['total']):
+        return 'en_proceso'
+    return 'completado'
 
 # ========================================
 # HANDLER: ENVIAR RECORDATORIO INDIVIDUAL
@@ -262,65 +433,30 @@ def enviar_recordatorio_masivo(event, context):
         
         canal = body.get('canal', 'sms')
         
-        # Enviar a cada participante
-        enviados = 0
-        fallidos = 0
-        detalles = []
-        
-        for participante_id in participante_ids:
-            # Obtener participante
-            participante = participantes_table.get_item(
-                Key={'id': tanda_id, 'participanteId': participante_id}
-            )
-            
-            if not participante.get('Item'):
-                fallidos += 1
-                detalles.append({
-                    'participanteId': participante_id,
-                    'estado': 'fallido',
-                    'error': 'Participante no encontrado'
-                })
-                continue
-            
-            participante = participante['Item']
-            
-            # Personalizar mensaje con nombre
-            mensaje_personalizado = f"Hola {participante['nombre']}, {mensaje}"
-            
-            # Enviar SMS
-            exito, resultado = enviar_sms(participante['telefono'], mensaje_personalizado)
-            
-            # Registrar notificación
-            estado = 'enviado' if exito else 'fallido'
-            error = None if exito else resultado
-            
-            notificacion_id = registrar_notificacion(
-                tanda_id,
-                participante_id,
-                mensaje_personalizado,
-                canal,
-                estado,
-                error
-            )
-            
-            if exito:
-                enviados += 1
-            else:
-                fallidos += 1
-            
-            detalles.append({
+        # Un mensaje por destinatario; el worker los procesa en lotes.
+        # La cola se obtiene antes de crear el trabajo: sin cola configurada
+        # no queda un trabajo en_cola que nadie va a procesar.
+        cola = obtener_cola()
+        participante_ids = list(dict.fromkeys(participante_ids))
+        trabajo = crear_trabajo(tanda_id, user_id, len(participante_ids))
+        
+        cola.encolar([
+            {
+                'jobId': trabajo['jobId'],
+                'tandaId': tanda_id,
                 'participanteId': participante_id,
-                'estado': estado,
-                'notificacionId': notificacion_id,
-                'error': error
-            })
+                'mensaje': mensaje,
+                'canal': canal
+            }
+            for participante_id in participante_ids
+        ])
         
-        return response(200, {
+        return response(202, {
             'success': True,
             'data': {
-                'notificacionesEnviadas': enviados,
-                'notificacionesFallidas': fallidos,
-                'detalles': detalles
+                'jobId': trabajo['jobId'],
+                'estado': estado_trabajo(trabajo),
+                'total': trabajo['total']
             }
         })
         
@@ -331,6 +467,56 @@ def enviar_recordatorio_masivo(event, context):
             'error': {'code': 'INTERNAL_SERVER_ERROR', 'message': 'Error al enviar recordatorios'}
         })
 
+# ========================================
+# HANDLER: ESTADO DE RECORDATORIO MASIVO
+# ========================================
+def obtener_estado_masivo(event, context):
+    try:
+        user_id = extract_user_id(event)
+        if not user_id:
+            return response(401, {
+                'success': False,
+                'error': {'code': 'UNAUTHORIZED', 'message': 'Token inválido'}
+            })
+        
+        tanda_id = event['pathParameters']['tandaId']
+        job_id = event['pathParameters']['jobId']
+        
+        trabajo = trabajos_table.get_item(Key={'jobId': job_id}).get('Item')
+        if not trabajo or trabajo.get('tandaId') != tanda_id:
+            return response(404, {
+                'success': False,
+                'error': {'code': 'NOT_FOUND', 'message': 'Trabajo no encontrado'}
+            })
+        
+        if trabajo['adminId'] != user_id:
+            return response(403, {
+                'success': False,
+                'error': {'code': 'FORBIDDEN', 'message': 'Sin permisos'}
+            })
+        
+        return response(200, {
+            'success': True,
+            'data': {
+                'jobId': job_id,
+                'tandaId': tanda_id,
+                'estado': estado_trabajo(trabajo),
+                'total': trabajo['total'],
+                'procesados': trabajo.get('procesados', 0),
+                'enviados': trabajo.get('enviados', 0),
+                'fallidos': trabajo.get('fallidos', 0),
+                'createdAt': trabajo['createdAt'],
+                'updatedAt': trabajo['updatedAt']
+            }
+        })
+        
+    except Exception as e:
+        print(f"Error en obtener estado de recordatorio masivo: {str(e)}")
+        return response(500, {
+            'success': False,
+            'error': {'code': 'INTERNAL_SERVER_ERROR', 'message': 'Error al obtener estado'}
+        })
+
 # ========================================
 # HANDLER: OBTENER HISTORIAL DE NOTIFICACIONES
 # ========================================
@@ -357,17 +543,29 @@ def obtener(event, context):
         query_params = event.get('queryStringParameters') or {}
         participante_id = query_params.get('participanteId')
         
-        # Obtener notificaciones
-        notificaciones_result = notificaciones_table.query(
-            KeyConditionExpression='id = :tandaId',
-            ExpressionAttributeValues={':tandaId': tanda_id}
-        )
-        
-        notificaciones = notificaciones_result.get('Items', [])
-        
-        # Aplicar filtros
+        # Obtener notificaciones (más recientes primero por sort key)
+        consulta = {
+            'KeyConditionExpression': Key('id').eq(tanda_id),
+            'ScanIndexForward': False
+        }
         if participante_id:
-            notificaciones = [n for n in notificaciones if n['participanteId'] == participante_id]
+            consulta['FilterExpression'] = Attr('participanteId').eq(participante_id)
+        
+        try:
+            limite, cursor = parametros_paginacion(query_params)
+            if limite:
+                notificaciones, next_cursor = leer_pagina(
+                    notificaciones_table, limite, cursor,
+                    particion={'id': tanda_id},
+                    **consulta
+                )
+            else:
+                notificaciones, next_cursor = query_completa(notificaciones_table, **consulta), None
+        except ValueError as e:
+            return response(400, {
+                'success': False,
+                'error': {'code': 'INVALID_PAGINATION', 'message': str(e)}
+            })
         
         # Ordenar por fecha (más recientes primero)
         notificaciones.sort(key=lambda x: x['fechaEnvio'], reverse=True)
@@ -376,7 +574,8 @@ def obtener(event, context):
             'success': True,
             'data': {
                 'notificaciones': notificaciones,
-                'total': len(notificaciones)
+                'total': len(notificaciones),
+                'nextCursor': next_cursor
             }
         })
         
@@ -402,6 +601,10 @@ def lambda_handler(event, context):
             print('Enviar recordatorio masivo')
             return enviar_recordatorio_masivo(event,context)
         
+        elif routeKey == 'GET /tandas/{tandaId}/notificaciones/recordatorio-masivo/{jobId}':
+            print('Consultar estado de recordatorio masivo')
+            return obtener_estado_masivo(event,context)
+        
         elif routeKey == 'GET /tandas/{tandaId}/notificaciones':
             print('Consultar notificaciones')
             return obtener(event,context)    
@@ -0,0 +1,124 @@
+# ========================================
+# SCRIPT: migrar_notificaciones.py
+# Copia la tabla notificaciones (legado) a notificaciones_v2
+# ========================================
+#
+# La tabla notificaciones solo tiene hash key id (tandaId), así que guarda
+# una notificación por tanda. Cambiar su esquema en Terraform reemplazaría
+# la tabla y borraría los datos; en su lugar se creó notificaciones_v2
+# (id + notificacionId) y las Lambdas ya escriben ahí.
+#
+# Pasos del despliegue:
+#   1. Respaldo bajo demanda de la tabla legado:
+#        aws dynamodb create-backup --table-name notificaciones \
+#            --backup-name notificaciones-pre-v2
+#   2. terraform apply (crea notificaciones_v2 y cambia las Lambdas; la
+#      tabla legado no se modifica)
+#   3. python migrar_notificaciones.py --dry-run
+#      python migrar_notificaciones.py
+#   4. Comparar el resumen (migradas + ya migradas + tanda eliminada =
+#      leídas). El script se puede correr otra vez sin duplicar nada.
+#   5. En un cambio aparte: quitar aws_dynamodb_table.notificaciones de
+#      main.tf y su entrada de tables_config.
+#
+# El notificacionId legado (notif_<id corto>) no ordena por fecha; se
+# reescribe con el prefijo de fechaEnvio que usa construir_notificacion
+# y el original queda en notificacionIdLegado.
+
+import re
+import argparse
+from datetime import datetime
+
+import boto3
+from botocore.exceptions import ClientError
+
+PATRON_ID_V2 = re.compile(r'^notif_\d{20}_')
+
+def id_v2(item):
+    """
+    return: notificacionId con prefijo de fecha (el mismo si ya lo tiene)
+    """
+    original = item['notificacionId']
+    if PATRON_ID_V2.match(original):
+        return original
+    fecha = datetime.fromisoformat(item.get('fechaEnvio') or item['createdAt'])
+    sufijo = original[len('notif_'):] if original.startswith('notif_') else original
+    return f"notif_{fecha.strftime('%Y%m%d%H%M%S%f')}_{sufijo}"
+
+def migrar(origen, destino, tandas, dry_run=False):
+    """
+    Recorre la tabla legado y escribe cada notificación en la nueva con
+    put condicional (no sobrescribe lo que ya existe).
+
+    return: dict con los contadores del resumen
+    """
+    resumen = {'leidas': 0, 'migradas': 0, 'ya_migradas': 0, 'tanda_eliminada': 0}
+    existe_tanda = {}
+    kwargs = {}
+
+    while True:
+        pagina = origen.scan(**kwargs)
+        for item in pagina.get('Items', []):
+            resumen['leidas'] += 1
+            tanda_id = item['id']
+
+            # Una tanda eliminada durante la migración ya no debe tener notificaciones
+            if tanda_id not in existe_tanda:
+                existe_tanda[tanda_id] = 'Item' in tandas.get_item(
+                    Key={'id': tanda_id}, ProjectionExpression='id'
+                )
+            if not existe_tanda[tanda_id]:
+                resumen['tanda_eliminada'] += 1
+                continue
+
+            nuevo = dict(item)
+            nuevo['notificacionId'] = id_v2(item)
+            if nuevo['notificacionId'] != item['notificacionId']:
+                nuevo['notificacionIdLegado'] = item['notificacionId']
+
+            if dry_run:
+                resumen['migradas'] += 1
+                continue
+
+            try:
+                destino.put_item(
+                    Item=nuevo,
+                    ConditionExpression='attribute_not_exists(notificacionId)'
+                )
+                resumen['migradas'] += 1
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                resumen['ya_migradas'] += 1
+
+        if 'LastEvaluatedKey' not in pagina:
+            return resumen
+        kwargs['ExclusiveStartKey'] = pagina['LastEvaluatedKey']
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Copia la tabla notificaciones (legado) a notificaciones_v2'
+    )
+    parser.add_argument('--origen', default='notificaciones', help='Tabla legado (default: notificaciones)')
+    parser.add_argument('--destino', default='notificaciones_v2', help='Tabla nueva (default: notificaciones_v2)')
+    parser.add_argument('--tandas', default='tandas', help='Tabla de tandas (default: tandas)')
+    parser.add_argument('--region', default=None, help='Región de AWS')
+    parser.add_argument('--dry-run', action='store_true', help='Solo contar, sin escribir')
+    args = parser.parse_args()
+
+    dynamodb = boto3.resource('dynamodb', region_name=args.region)
+    print(f"🔄 {args.origen} → {args.destino}{' (dry run)' if args.dry_run else ''}")
+    resumen = migrar(
+        dynamodb.Table(args.origen),
+        dynamodb.Table(args.destino),
+        dynamodb.Table(args.tandas),
+        args.dry_run
+    )
+
+    print(f"✅ Leídas: {resumen['leidas']}")
+    print(f"   - Migradas: {resumen['migradas']}")
+    print(f"   - Ya migradas: {resumen['ya_migradas']}")
+    print(f"   - Omitidas (tanda eliminada): {resumen['tanda_eliminada']}")
+
+if __name__ == '__main__':
+    main()
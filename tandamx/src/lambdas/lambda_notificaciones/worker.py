@@ -0,0 +1,109 @@
+# ========================================
+# LAMBDA: worker.py
+# Consume la cola de recordatorios masivos (SQS) y envía los SMS
+# ========================================
+
+import json
+
+from dynamo_utils import obtener_en_lote, consultar_en_paralelo
+
+from handler import (
+    dynamodb,
+    participantes_table,
+    enviar_sms,
+    registrar_notificacion,
+    reclamar_envio,
+    guardar_resultado_envio,
+    registrar_resultado_trabajo,
+    LimitadorTasa,
+    SMS_TASA_POR_SEGUNDO,
+    SMS_MAX_WORKERS
+)
+
+def procesar_mensaje(mensaje, participantes, limitador):
+    """
+    Envía el SMS de un destinatario y registra el resultado.
+    Cualquier excepción hace que el mensaje se reporte como fallido y
+    SQS lo vuelva a entregar (entrega al menos una vez).
+
+    El envío se reclama antes de mandar el SMS: en una entrega repetida
+    (p. ej. falló un registro después del envío) el SMS no sale otra vez,
+    solo se completan los registros pendientes.
+    """
+    job_id = mensaje['jobId']
+    envio, nuevo = reclamar_envio(job_id, mensaje['participanteId'])
+    if envio.get('contado'):
+        return
+
+    if nuevo:
+        participante = participantes.get((mensaje['tandaId'], mensaje['participanteId']))
+        if participante:
+            mensaje_personalizado = f"Hola {participante['nombre']}, {mensaje['mensaje']}"
+            limitador.esperar()
+            exito, resultado = enviar_sms(participante['telefono'], mensaje_personalizado)
+            error = None if exito else resultado
+        else:
+            mensaje_personalizado = mensaje['mensaje']
+            exito, error = False, 'Participante no encontrado'
+        envio = guardar_resultado_envio(envio, exito, mensaje_personalizado, error)
+    elif envio['estado'] == 'enviando':
+        # Un intento anterior reclamó el envío y no guardó el resultado: el
+        # SMS pudo haber salido, así que no se reenvía
+        envio = guardar_resultado_envio(
+            envio, False, mensaje['mensaje'], 'Envío sin confirmar (intento anterior interrumpido)'
+        )
+
+    registrar_notificacion(
+        mensaje['tandaId'],
+        mensaje['participanteId'],
+        envio['mensaje'],
+        mensaje.get('canal', 'sms'),
+        envio['estado'],
+        envio.get('error'),
+        job_id=job_id,
+        notificacion_id=envio['notificacionId']
+    )
+    registrar_resultado_trabajo(job_id, envio)
+
+def lambda_handler(event, context):
+    registros = []
+    for registro in event.get('Records', []):
+        try:
+            registros.append((registro['messageId'], json.loads(registro['body'])))
+        except (KeyError, ValueError) as e:
+            # Un mensaje mal formado nunca va a procesarse; no se reintenta
+            print(f"❌ Mensaje inválido {registro.get('messageId')}: {str(e)}")
+
+    # Todos los participantes del lote en un solo BatchGetItem
+    participantes = {
+        (p['id'], p['participanteId']): p
+        for p in obtener_en_lote(
+            dynamodb,
+            participantes_table.name,
+            [{'id': m['tandaId'], 'participanteId': m['participanteId']} for _, m in registros],
+            proyeccion=['id', 'participanteId', 'nombre', 'telefono']
+        )
+    }
+
+    limitador = LimitadorTasa(SMS_TASA_POR_SEGUNDO)
+
+    def procesar(registro):
+        message_id, mensaje = registro
+        try:
+            procesar_mensaje(mensaje, participantes, limitador)
+            return None
+        except Exception as e:
+            print(f"❌ Error procesando mensaje {message_id}: {str(e)}")
+            return message_id
+
+    fallidos = [
+        message_id
+        for message_id in consultar_en_paralelo(procesar, registros, max_workers=SMS_MAX_WORKERS)
+        if message_id
+    ]
+    print(f"✅ Lote procesado: {len(registros) - len(fallidos)} ok, {len(fallidos)} fallidos")
+
+    # Respuesta parcial: SQS solo reintenta los mensajes reportados
+    return {
+        'batchItemFailures': [{'itemIdentifier': message_id} for message_id in fallidos]
+    }
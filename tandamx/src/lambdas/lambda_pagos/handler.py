@@ -6,9 +6,15 @@
 import json
 import boto3
 import os
-import jwt
 from datetime import datetime
 from decimal import Decimal
+from boto3.dynamodb.conditions import Key
+
+from dynamo_utils import cargar_pagos_tanda, query_completa
+from tokens_verificados import usuario_del_evento
+from agregados_pagos import resumir_pagos, resumen_de
+from estadisticas_materializadas import cambio_pago, aplicar_delta
+from vistas_tandas import leer_vista, marcar_escritura, COLECCION_PAGOS
 
 #custom error
 from exception.custom_http_exception import CustomError
@@ -18,6 +24,8 @@ dynamodb = boto3.resource('dynamodb')
 tandas_table = dynamodb.Table(os.environ['TANDAS_TABLE'])
 participantes_table = dynamodb.Table(os.environ['PARTICIPANTES_TABLE'])
 pagos_table = dynamodb.Table(os.environ['PAGOS_TABLE'])
+estadisticas_table = dynamodb.Table(os.environ['ESTADISTICAS_TABLE'])
+vistas_table = dynamodb.Table(os.environ['VISTAS_TABLE'])
 
 JWT_SECRET = os.environ['JWT_SECRET']
 
@@ -44,24 +52,31 @@ class DecimalEncoder(json.JSONEncoder):
         return super(DecimalEncoder, self).default(obj)
 
 def extract_user_id(event):
-    try:
-        auth_header = event['headers'].get('Authorization') or event['headers'].get('authorization')
-        if not auth_header:
-            return None
-        token = auth_header.replace('Bearer ', '')
-        payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
-        return payload['id']
-    except:
-        return None
+    """userId del contexto del authorizer; en rutas públicas, del token (verificado con cache)"""
+    return usuario_del_evento(event, JWT_SECRET)
 
-def verificar_permisos_tanda(tanda_id, user_id):
-    result = tandas_table.get_item(Key={'id': tanda_id})
+def verificar_permisos_tanda(tanda_id, user_id, consistente=False):
+    result = tandas_table.get_item(Key={'id': tanda_id}, ConsistentRead=consistente)
     if not result.get('Item'):
         return False, None
     if result['Item']['adminId'] != user_id:
         return False, None
     return True, result['Item']
 
+def actualizar_estadisticas(tanda_id, pago_anterior, pago_nuevo, monto_por_ronda=0):
+    """
+    Refleja el cambio de un pago en los contadores de la tanda (ADD atómico).
+    Si falla no se interrumpe la operación: la reconciliación corrige la desviación.
+    """
+    try:
+        aplicar_delta(
+            estadisticas_table,
+            tanda_id,
+            cambio_pago(pago_anterior, pago_nuevo, monto_por_ronda)
+        )
+    except Exception as e:
+        print(f"⚠️ Error actualizando estadísticas de tanda {tanda_id}: {str(e)}")
+
 # ========================================
 # HANDLER: REGISTRAR PAGO
 # ========================================
@@ -128,7 +143,9 @@ def registrar(event, context):
             'exentoPago': body.get('exentoPago', False)
         }
         
-        pagos_table.put_item(Item=pago)
+        anterior = pagos_table.put_item(Item=pago, ReturnValues='ALL_OLD').get('Attributes')
+        marcar_escritura(tandas_table, tanda_id, COLECCION_PAGOS)
+        actualizar_estadisticas(tanda_id, anterior, pago, tanda['montoPorRonda'])
         pago['tandaId']=tanda_id
         
         return response(201, {
@@ -160,7 +177,7 @@ def actualizar(event, context):
         body = json.loads(event['body'])
         
         # Verificar permisos
-        tiene_permisos, _ = verificar_permisos_tanda(tanda_id, user_id)
+        tiene_permisos, tanda = verificar_permisos_tanda(tanda_id, user_id)
         if not tiene_permisos:
             return response(403, {
                 'success': False,
@@ -202,12 +219,20 @@ def actualizar(event, context):
             update_expression += ", exentoPago = :exentoPago"
             expression_values[':exentoPago'] = body['exentoPago']
         
-        # Actualizar
-        pagos_table.update_item(
+        # Actualizar (el valor anterior permite calcular el cambio en los contadores)
+        anterior = pagos_table.update_item(
             Key={'id': tanda_id, 'pagoId': pago_id},
             UpdateExpression=update_expression,
-            ExpressionAttributeValues=expression_values
-        )
+            ExpressionAttributeValues=expression_values,
+            ReturnValues='ALL_OLD'
+        ).get('Attributes')
+        marcar_escritura(tandas_table, tanda_id, COLECCION_PAGOS)
+        
+        nuevo = dict(anterior or {})
+        for campo in ('pagado', 'fechaPago'):
+            if campo in body:
+                nuevo[campo] = body[campo]
+        actualizar_estadisticas(tanda_id, anterior, nuevo, tanda['montoPorRonda'])
         
         return response(200, {
             'success': True,
@@ -251,13 +276,12 @@ def obtener(event, context):
         participante_id = query_params.get('participanteId')
         ronda = query_params.get('ronda')
         
-        # Obtener pagos
-        pagos_result = pagos_table.query(
-            KeyConditionExpression='id = :tandaId',
-            ExpressionAttributeValues={':tandaId': tanda_id}
-        )
+        # Obtener pagos (si se filtra por participante, solo se lee su rango de pagoId)
+        condicion = Key('id').eq(tanda_id)
+        if participante_id:
+            condicion = condicion & Key('pagoId').begins_with(f"{participante_id}_")
         
-        pagos = pagos_result.get('Items', [])
+        pagos = query_completa(pagos_table, KeyConditionExpression=condicion)
         #for pago in pagos:
         #    pago['tandaId'] = tanda_id
         
@@ -302,74 +326,62 @@ def obtener_matriz(event, context):
         
         tanda_id = event['pathParameters']['tandaId']
         
-        # Verificar permisos
-        tiene_permisos, tanda = verificar_permisos_tanda(tanda_id, user_id)
+        # Verificar permisos (lectura consistente: trae las marcas de
+        # escritura con las que leer_vista decide si la vista está al día)
+        tiene_permisos, tanda = verificar_permisos_tanda(tanda_id, user_id, consistente=True)
         if not tiene_permisos:
             return response(403, {
                 'success': False,
                 'error': {'code': 'FORBIDDEN', 'message': 'Sin permisos'}
             })
         
-        # Obtener participantes
-        participantes_result = participantes_table.query(
-            KeyConditionExpression='id = :tandaId',
-            ExpressionAttributeValues={':tandaId': tanda_id}
-        )
-        
-        # Obtener pagos
-        pagos_result = pagos_table.query(
-            KeyConditionExpression='id = :tandaId',
-            ExpressionAttributeValues={':tandaId': tanda_id}
-        )
-        
-        # Diccionario de pagos: participante_ronda
-        pagos_dict = {}
-        for pago in pagos_result.get('Items', []):
-            key = f"{pago['participanteId']}_{int(pago['ronda'])}"
-            pagos_dict[key] = {
-                'pagado': pago.get('pagado', False),
-                'fechaPago': pago.get('fechaPago'),
-                'exentoPago': pago.get('exentoPago',False),
-                'metodoPago': pago.get('metodoPago'),
-                'monto': pago.get('monto'),
-                'notas': pago.get('notas')
-            }
+        # Participantes y pagos desde la vista de la tanda (un query);
+        # si no tiene vista completa o al día, desde sus tablas
+        vista = leer_vista(vistas_table, tanda_id, tanda)
+        if vista:
+            participantes, pagos = vista
+        else:
+            participantes = query_completa(
+                participantes_table,
+                KeyConditionExpression='id = :tandaId',
+                ExpressionAttributeValues={':tandaId': tanda_id}
+            )
+            pagos = cargar_pagos_tanda(pagos_table, tanda_id)
         
         ronda_actual = int(tanda['rondaActual'])
         total_rondas = int(tanda['totalRondas'])
         
+        # Pagos agregados por participante y ronda (una sola pasada)
+        resumen_pagos = resumir_pagos(pagos, ronda_actual)
+        
         matriz = []
         
         for participante in sorted(
-            participantes_result.get('Items', []),
+            participantes,
             key=lambda x: x['numeroAsignado']
         ):
             pagos_participante = {}
-            pagos_realizados = 0
-            pagos_adelantados = 0
+            resumen = resumen_de(resumen_pagos, participante['participanteId'])
+            pagos_realizados = resumen['pagadosHastaRonda']
+            pagos_adelantados = resumen['adelantados']
+            
+            pagos_por_ronda = resumen['rondas']
             
             for ronda in range(1, total_rondas + 1):
-                key = f"{participante['participanteId']}_{ronda}"
-                pago_info = pagos_dict.get(
-                    key,
+                pago_info = pagos_por_ronda.get(
+                    ronda,
                     {'pagado': False, 'fechaPago': None}
                 )
                 
                 pagos_participante[str(ronda)] = {
-                    'pagado': pago_info['pagado'],
-                    'fechaPago': pago_info['fechaPago'],
+                    'pagado': pago_info.get('pagado', False),
+                    'fechaPago': pago_info.get('fechaPago'),
                     'esFuturo': ronda > ronda_actual,
                     'exentoPago': pago_info.get('exentoPago',False),
                     'metodoPago': pago_info.get('metodoPago'),
                     'monto': pago_info.get('monto'),
                     'notas': pago_info.get('notas')
                 }
-                
-                if pago_info['pagado']:
-                    if ronda <= ronda_actual:
-                        pagos_realizados += 1
-                    else:
-                        pagos_adelantados += 1
             
             # Pagos esperados hasta la ronda pasada
             pagos_esperados = max(0, ronda_actual - 1)
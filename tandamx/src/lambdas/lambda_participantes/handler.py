@@ -6,10 +6,17 @@
 import json
 import boto3
 import os
-import jwt
 from datetime import datetime
 from decimal import Decimal
 import uuid
+from boto3.dynamodb.conditions import Key
+
+from dynamo_utils import iterar_query, query_completa, parametros_paginacion, leer_pagina
+from tokens_verificados import usuario_del_evento
+from estadisticas_materializadas import (
+    PREFIJO_PARTICIPANTE, delta_pago, sumar_deltas, aplicar_delta
+)
+from vistas_tandas import marcar_escritura, COLECCION_PARTICIPANTES, COLECCION_PAGOS
 
 #custom error
 from exception.custom_http_exception import CustomError
@@ -19,7 +26,8 @@ dynamodb = boto3.resource('dynamodb')
 tandas_table = dynamodb.Table(os.environ['TANDAS_TABLE'])
 participantes_table = dynamodb.Table(os.environ['PARTICIPANTES_TABLE'])
 LINKS_TABLE = 'links_registro'
-pagos_table = 'pagos'
+pagos_table = dynamodb.Table(os.environ['PAGOS_TABLE'])
+estadisticas_table = dynamodb.Table(os.environ['ESTADISTICAS_TABLE'])
 
 JWT_SECRET = os.environ['JWT_SECRET']
 
@@ -52,22 +60,24 @@ class DecimalEncoder(json.JSONEncoder):
         return super(DecimalEncoder, self).default(obj)
 
 def extract_user_id(event):
-    try:
-        auth_header = event['headers'].get('Authorization') or event['headers'].get('authorization')
-        if not auth_header:
-            return None
-        token = auth_header.replace('Bearer ', '')
-        payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
-        print(f'payload token: {payload}')
-        return payload['id']
-    except:
-        return None
+    """userId del contexto del authorizer; en rutas públicas, del token (verificado con cache)"""
+    return usuario_del_evento(event, JWT_SECRET)
 
 def generate_short_id():
     import random
     import string
     return ''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
 
+def actualizar_estadisticas(tanda_id, delta, remover=()):
+    """
+    Aplica un delta a los contadores de la tanda (ADD atómico).
+    Si falla no se interrumpe la operación: la reconciliación corrige la desviación.
+    """
+    try:
+        aplicar_delta(estadisticas_table, tanda_id, delta, remover)
+    except Exception as e:
+        print(f"⚠️ Error actualizando estadísticas de tanda {tanda_id}: {str(e)}")
+
 def verificar_permisos_tanda(tanda_id, user_id):
     """Verifica que el usuario sea dueño de la tanda"""
     result = tandas_table.get_item(Key={'id': tanda_id})
@@ -144,13 +154,12 @@ def agregar(event, context):
                 })
         
         # Obtener participantes existentes
-        participantes_result = participantes_table.query(
+        participantes_existentes = query_completa(
+            participantes_table,
             KeyConditionExpression='id = :tandaId',
             ExpressionAttributeValues={':tandaId': tanda_id}
         )
-        print(f'participantes_result: {participantes_result}')
-        
-        participantes_existentes = participantes_result.get('Items', [])
+        print(f'participantes_existentes: {len(participantes_existentes)}')
         
         # 🆕 CALCULAR NÚMERO ASIGNADO
         if es_cumpleañera:
@@ -194,6 +203,8 @@ def agregar(event, context):
             participante['fechaCumpleaños'] = body['fechaCumpleaños']
         
         participantes_table.put_item(Item=participante)
+        marcar_escritura(tandas_table, tanda_id, COLECCION_PARTICIPANTES)
+        actualizar_estadisticas(tanda_id, {'totalParticipantes': 1})
         
         # 🆕 SI ES CUMPLEAÑERA, RECALCULAR NÚMEROS DE TODOS LOS PARTICIPANTES
         if es_cumpleañera:
@@ -338,6 +349,8 @@ def recalcular_numeros_cumpleañera(tanda_id, todos_participantes):
             print(f"✅ Actualizado participante {p['participanteId']} a número {numero_nuevo}")
         except Exception as e:
             print(f"❌ Error actualizando participante {p['participanteId']}: {e}")
+    
+    marcar_escritura(tandas_table, tanda_id, COLECCION_PARTICIPANTES)
 
 # ========================================
 # HANDLER: LISTAR PARTICIPANTES
@@ -346,22 +359,36 @@ def listar(event, context):
     try:
         tanda_id = event['pathParameters']['tandaId']
         
-        # Obtener participantes
-        result = participantes_table.query(
-            KeyConditionExpression='id = :tandaId',
-            ExpressionAttributeValues={':tandaId': tanda_id}
-        )
-        
-        participantes = result.get('Items', [])
+        # Obtener participantes (todos, o una página si viene ?limit=&cursor=)
+        consulta = {
+            'KeyConditionExpression': 'id = :tandaId',
+            'ExpressionAttributeValues': {':tandaId': tanda_id}
+        }
+        try:
+            limite, cursor = parametros_paginacion(event.get('queryStringParameters'))
+            if limite:
+                participantes, next_cursor = leer_pagina(
+                    participantes_table, limite, cursor,
+                    particion={'id': tanda_id},
+                    **consulta
+                )
+            else:
+                participantes, next_cursor = query_completa(participantes_table, **consulta), None
+        except ValueError as e:
+            return response(400, {
+                'success': False,
+                'error': {'code': 'INVALID_PAGINATION', 'message': str(e)}
+            })
         
-        # Ordenar por número asignado
+        # Ordenar por número asignado (dentro de la página cuando se pagina)
         participantes.sort(key=lambda x: x['numeroAsignado'])
         
         return response(200, {
             'success': True,
             'data': {
                 'participantes': participantes,
-                'total': len(participantes)
+                'total': len(participantes),
+                'nextCursor': next_cursor
             }
         })
         
@@ -434,12 +461,13 @@ def actualizar(event, context):
         else:
             # Para tandas normales, validar número duplicado si se está cambiando
             if 'numeroAsignado' in body:
-                participantes_result = participantes_table.query(
+                # Se recorre página por página y se corta al encontrar el duplicado
+                for p in iterar_query(
+                    participantes_table,
                     KeyConditionExpression='id = :tandaId',
-                    ExpressionAttributeValues={':tandaId': tanda_id}
-                )
-                
-                for p in participantes_result.get('Items', []):
+                    ExpressionAttributeValues={':tandaId': tanda_id},
+                    proyeccion=['participanteId', 'numeroAsignado']
+                ):
                     if (p['participanteId'] != participante_id and 
                         p['numeroAsignado'] == int(body['numeroAsignado'])):
                         return response(400, {
@@ -464,12 +492,11 @@ def actualizar(event, context):
                 
                 # 🆕 CALCULAR EL NUEVO NÚMERO BASADO EN LA FECHA DE CUMPLEAÑOS
                 
-                participantes_result = participantes_table.query(
-                        KeyConditionExpression='id = :tandaId',
-                        ExpressionAttributeValues={':tandaId': tanda_id}
-                    )
-                    
-                todos_participantes = participantes_result.get('Items', [])
+                todos_participantes = query_completa(
+                    participantes_table,
+                    KeyConditionExpression='id = :tandaId',
+                    ExpressionAttributeValues={':tandaId': tanda_id}
+                )
                     
                 # Crear lista temporal con la nueva fecha
                 participantes_temp = []
@@ -542,6 +569,7 @@ def actualizar(event, context):
             update_params['ExpressionAttributeNames'] = expression_names
         
         participantes_table.update_item(**update_params)
+        marcar_escritura(tandas_table, tanda_id, COLECCION_PARTICIPANTES)
         
         # 🆕 SI CAMBIÓ EL NÚMERO, RECALCULAR TODOS LOS NÚMEROS DE LOS DEMÁS PARTICIPANTES
         numeros_recalculados = False
@@ -550,12 +578,11 @@ def actualizar(event, context):
             numeros_recalculados = True
             
             # Obtener todos los participantes actualizados (incluye el que acabamos de actualizar)
-            participantes_result = participantes_table.query(
+            todos_participantes = query_completa(
+                participantes_table,
                 KeyConditionExpression='id = :tandaId',
                 ExpressionAttributeValues={':tandaId': tanda_id}
             )
-            
-            todos_participantes = participantes_result.get('Items', [])
             recalcular_numeros_cumpleañera(tanda_id, todos_participantes)
         elif fecha_cumpleaños_cambio and numero_nuevo_calculado == numero_anterior:
             print(f"📅 Fecha de cumpleaños cambió pero el número se mantiene en {numero_anterior}")
@@ -625,13 +652,21 @@ def eliminar(event, context):
             })
         
         # 🆕 ELIMINAR TODOS LOS PAGOS ASOCIADOS AL PARTICIPANTE
-        pagos_eliminados = eliminar_pagos_participante(tanda_id, participante_id)
+        pagos_eliminados = eliminar_pagos_participante(
+            tanda_id, participante_id, tanda.get('montoPorRonda', 0)
+        )
         print(f"🗑️ Eliminados {pagos_eliminados} pagos del participante {participante_id}")
         
         # Eliminar participante
         participantes_table.delete_item(
             Key={'id': tanda_id, 'participanteId': participante_id}
         )
+        marcar_escritura(tandas_table, tanda_id, COLECCION_PARTICIPANTES)
+        actualizar_estadisticas(
+            tanda_id,
+            {'totalParticipantes': -1},
+            remover=[f"{PREFIJO_PARTICIPANTE}{participante_id}"]
+        )
         print(f"✅ Participante {participante_id} eliminado")
         
         # 🆕 SI ES TANDA CUMPLEAÑERA, RECALCULAR NÚMEROS DE LOS RESTANTES
@@ -639,13 +674,12 @@ def eliminar(event, context):
             print(f"📅 Tanda cumpleañera detectada, recalculando números...")
             
             # Obtener participantes restantes
-            participantes_result = participantes_table.query(
+            participantes_restantes = query_completa(
+                participantes_table,
                 KeyConditionExpression='id = :tandaId',
                 ExpressionAttributeValues={':tandaId': tanda_id}
             )
             
-            participantes_restantes = participantes_result.get('Items', [])
-            
             if participantes_restantes:
                 recalcular_numeros_cumpleañera(tanda_id, participantes_restantes)
                 print(f"✅ Números recalculados para {len(participantes_restantes)} participantes restantes")
@@ -671,29 +705,34 @@ def eliminar(event, context):
 
 
 # 🆕 FUNCIÓN AUXILIAR: Eliminar todos los pagos de un participante
-def eliminar_pagos_participante(tanda_id, participante_id):
+def eliminar_pagos_participante(tanda_id, participante_id, monto_por_ronda=0):
     """
-    Elimina todos los pagos asociados a un participante.
+    Elimina todos los pagos asociados a un participante y descuenta los
+    pagados de las estadísticas de la tanda.
     Los pagos tienen pagoId con formato: <participanteId>_<num_pago>
     
     Args:
         tanda_id: ID de la tanda
         participante_id: ID del participante
+        monto_por_ronda: monto a descontar si un pago no tiene monto
     
     Returns:
         int: Cantidad de pagos eliminados
     """
     try:
-        # Consultar todos los pagos de la tanda
-        pagos_result = pagos_table.query(
-            KeyConditionExpression='id = :tandaId',
-            ExpressionAttributeValues={':tandaId': tanda_id}
+        # Consultar solo el rango de pagoId del participante (solo llaves)
+        pagos = iterar_query(
+            pagos_table,
+            KeyConditionExpression=(
+                Key('id').eq(tanda_id) &
+                Key('pagoId').begins_with(f"{participante_id}_")
+            ),
+            proyeccion=['pagoId']
         )
-        
-        pagos = pagos_result.get('Items', [])
         pagos_eliminados = 0
+        deltas = []
         
-        # Filtrar y eliminar pagos que pertenecen al participante
+        # Eliminar pagos que pertenecen al participante
         for pago in pagos:
             pago_id = pago.get('pagoId', '')
             
@@ -701,17 +740,22 @@ def eliminar_pagos_participante(tanda_id, participante_id):
             # Formato esperado: <participanteId>_<num_pago>
             if pago_id.startswith(f"{participante_id}_"):
                 try:
-                    pagos_table.delete_item(
+                    eliminado = pagos_table.delete_item(
                         Key={
                             'id': tanda_id,
                             'pagoId': pago_id
-                        }
-                    )
+                        },
+                        ReturnValues='ALL_OLD'
+                    ).get('Attributes')
+                    deltas.append(delta_pago(eliminado, -1, monto_por_ronda))
                     pagos_eliminados += 1
                     print(f"  🗑️ Pago eliminado: {pago_id}")
                 except Exception as e:
                     print(f"  ❌ Error eliminando pago {pago_id}: {e}")
         
+        if pagos_eliminados:
+            marcar_escritura(tandas_table, tanda_id, COLECCION_PAGOS)
+        actualizar_estadisticas(tanda_id, sumar_deltas(*deltas))
         return pagos_eliminados
         
     except Exception as e:
@@ -927,15 +971,14 @@ def registro_publico_participante(event, context):
                 }
         
         # Obtener participantes existentes
-        response = participantes_table.query(            
+        participantes_existentes = query_completa(
+            participantes_table,
             KeyConditionExpression='id = :tandaId',
             ExpressionAttributeValues={
                 ':tandaId': link['tandaId']
             }
         )
         
-        participantes_existentes = response.get('Items', [])
-        
         # 🆕 CALCULAR NÚMERO ASIGNADO PARA TANDA CUMPLEAÑERA
         if es_cumpleañera:
             numero_asignado = calcular_numero_automatico_cumpleañera(
@@ -1008,6 +1051,7 @@ def registro_publico_participante(event, context):
             
             # Insertar participante en la tabla
             participantes_table.put_item(Item=participante)
+            actualizar_estadisticas(link['tandaId'], {'totalParticipantes': 1})
             
             nuevos_participantes.append({
                 'participanteId': participante_id,
@@ -1017,17 +1061,18 @@ def registro_publico_participante(event, context):
                 'fechaCumpleaños': fecha_cumpleaños if fecha_cumpleaños else None
             })
         
+        marcar_escritura(tandas_table, link['tandaId'], COLECCION_PARTICIPANTES)
+        
         # 🆕 SI ES TANDA CUMPLEAÑERA, RECALCULAR NÚMEROS DE TODOS
         if es_cumpleañera:
             # Obtener todos los participantes actualizados (incluyendo los nuevos)
-            response = participantes_table.query(            
+            todos_participantes = query_completa(
+                participantes_table,
                 KeyConditionExpression='id = :tandaId',
                 ExpressionAttributeValues={
                     ':tandaId': link['tandaId']
                 }
             )
-            
-            todos_participantes = response.get('Items', [])
             recalcular_numeros_cumpleañera(link['tandaId'], todos_participantes)
             
             # Obtener el número actualizado del participante recién creado
@@ -6,13 +6,19 @@
 import json
 import boto3
 import os
-import jwt
 from datetime import datetime, timedelta, timezone, date
 from decimal import Decimal
 from boto3.dynamodb.conditions import Key
 import uuid
 import calendar
 
+from dynamo_utils import (
+    cargar_pagos_tanda, agrupar_pagos, iterar_query, query_completa, consultar_en_paralelo,
+    parametros_paginacion, leer_pagina
+)
+from tokens_verificados import usuario_del_evento
+from vistas_tandas import leer_vista, llave_meta
+from eliminacion_cascada import Plazo, paso, ejecutar_cascada, finalizar_trabajo
 
 #custom error
 from exception.custom_http_exception import CustomError
@@ -23,7 +29,10 @@ tandas_table = dynamodb.Table(os.environ['TANDAS_TABLE'])
 usuarios_table = dynamodb.Table(os.environ['USUARIOS_TABLE'])
 participantes_table = dynamodb.Table(os.environ['PARTICIPANTES_TABLE'])
 pagos_table = dynamodb.Table(os.environ['PAGOS_TABLE'])
-notificaciones_table = dynamodb.Table('notificaciones')
+notificaciones_table = dynamodb.Table('notificaciones_v2')
+estadisticas_table = dynamodb.Table(os.environ['ESTADISTICAS_TABLE'])
+vistas_table = dynamodb.Table(os.environ['VISTAS_TABLE'])
+trabajos_eliminacion_table = dynamodb.Table(os.environ['TRABAJOS_ELIMINACION_TABLE'])
 LINKS_TABLE = 'links_registro'
 
 JWT_SECRET = os.environ['JWT_SECRET']
@@ -76,17 +85,8 @@ def calcular_fecha_inicio(fecha_str: str) -> str:
     return fecha_inicio.isoformat()
 
 def extract_user_id(event):
-    """Extrae el userId del token JWT"""
-    try:
-        auth_header = event['headers'].get('Authorization') or event['headers'].get('authorization')
-        if not auth_header:
-            return None
-        
-        token = auth_header.replace('Bearer ', '')
-        payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
-        return payload['id']
-    except:
-        return None
+    """userId del contexto del authorizer; en rutas públicas, del token (verificado con cache)"""
+    return usuario_del_evento(event, JWT_SECRET)
 
 def generate_short_id():
     """Genera un ID corto único"""
@@ -94,105 +94,14 @@ def generate_short_id():
     import string
     return ''.join(random.choices(string.ascii_lowercase + string.digits, k=9))
 
-def eliminar_participantes(tanda_id):
-    """Elimina todos los participantes de una tanda"""
-    try:
-        print(f"🔄 Eliminando participantes de tanda: {tanda_id}")
-        
-        # Buscar todos los participantes
-        resultado = participantes_table.query(
-            KeyConditionExpression=Key('id').eq(tanda_id)
-        )
-        
-        participantes = resultado.get('Items', [])
-        count = len(participantes)
-        
-        if count == 0:
-            print(f"✓ No hay participantes que eliminar")
-            return 0
-        
-        # Eliminar cada participante
-        for participante in participantes:
-            participantes_table.delete_item(
-                Key={
-                    'id': tanda_id,
-                    'participanteId': participante['participanteId']
-                }
-            )
-        
-        print(f"✓ {count} participantes eliminados")
-        return count
-        
-    except Exception as e:
-        print(f"❌ Error eliminando participantes: {str(e)}")
-        raise
-
-
-def eliminar_pagos(tanda_id):
-    """Elimina todos los pagos de una tanda"""
-    try:
-        print(f"🔄 Eliminando pagos de tanda: {tanda_id}")
-        
-        # Buscar todos los pagos
-        resultado = pagos_table.query(
-            KeyConditionExpression=Key('id').eq(tanda_id)
-        )
-        
-        pagos = resultado.get('Items', [])
-        count = len(pagos)
-        
-        if count == 0:
-            print(f"✓ No hay pagos que eliminar")
-            return 0
-        
-        # Eliminar cada pago
-        for pago in pagos:
-            pagos_table.delete_item(
-                Key={
-                    'id': tanda_id,
-                    'pagoId': pago['pagoId']
-                }
-            )
-        
-        print(f"✓ {count} pagos eliminados")
-        return count
-        
-    except Exception as e:
-        print(f"❌ Error eliminando pagos: {str(e)}")
-        raise
-
-
-def eliminar_notificaciones(tanda_id):
-    """Elimina todas las notificaciones de una tanda"""
-    try:
-        print(f"🔄 Eliminando notificaciones de tanda: {tanda_id}")
-        
-        # Buscar todas las notificaciones
-        resultado = notificaciones_table.query(
-            KeyConditionExpression=Key('id').eq(tanda_id)
-        )
-        
-        notificaciones = resultado.get('Items', [])
-        count = len(notificaciones)
-        
-        if count == 0:
-            print(f"✓ No hay notificaciones que eliminar")
-            return 0
-        
-        # Eliminar cada notificación
-        for notificacion in notificaciones:
-            notificaciones_table.delete_item(
-                Key={
-                    'id': tanda_id
-                }
-            )
-        
-        print(f"✓ {count} notificaciones eliminadas")
-        return count
-        
-    except Exception as e:
-        print(f"❌ Error eliminando notificaciones: {str(e)}")
-        raise
+def pasos_eliminacion_tanda(tanda_id):
+    """Particiones a vaciar antes de eliminar la tanda (se ejecutan en paralelo)"""
+    condicion = Key('id').eq(tanda_id)
+    return [
+        paso(f'participantes#{tanda_id}', participantes_table, ['id', 'participanteId'], condicion, contador='participantes'),
+        paso(f'pagos#{tanda_id}', pagos_table, ['id', 'pagoId'], condicion, contador='pagos'),
+        paso(f'notificaciones#{tanda_id}', notificaciones_table, ['id', 'notificacionId'], condicion, contador='notificaciones')
+    ]
 
 
 def actualizar_usuario_admin(user_id, tanda_id):
@@ -251,10 +160,18 @@ def eliminar_tanda(tanda_id):
             print(f"⚠️ Tanda no encontrada: {tanda_id}")
             return False
         
-        # Eliminar tanda
+        # Eliminar tanda, sus estadísticas precalculadas y su vista (el
+        # '#meta'; los items de participantes y pagos los quita lambda_vistas
+        # con los REMOVE de la cascada)
         tandas_table.delete_item(
             Key={'id': tanda_id}
         )
+        estadisticas_table.delete_item(
+            Key={'id': tanda_id}
+        )
+        vistas_table.delete_item(
+            Key=llave_meta(tanda_id)
+        )
         
         print(f"✓ Tanda eliminada")
         return True
@@ -361,8 +278,9 @@ def obtener(event, context):
     try:
         tanda_id = event['pathParameters']['tandaId']
         
-        # Obtener tanda
-        result = tandas_table.get_item(Key={'id': tanda_id})
+        # Obtener tanda (lectura consistente: trae las marcas de escritura
+        # con las que leer_vista decide si la vista ya está al día)
+        result = tandas_table.get_item(Key={'id': tanda_id}, ConsistentRead=True)
         print(f'result: {result}')
         
         if not result.get('Item'):
@@ -376,30 +294,29 @@ def obtener(event, context):
         
         tanda = result['Item']
         
-        # Obtener participantes
-        participantes_result = participantes_table.query(
-            KeyConditionExpression='id = :tandaId',
-            ExpressionAttributeValues={':tandaId': tanda_id}
-        )
+        # Participantes y pagos desde la vista de la tanda (un query);
+        # si no tiene vista completa o al día, desde sus tablas
+        vista = leer_vista(vistas_table, tanda_id, tanda)
+        if vista:
+            participantes, pagos = vista
+        else:
+            participantes = query_completa(
+                participantes_table,
+                KeyConditionExpression='id = :tandaId',
+                ExpressionAttributeValues={':tandaId': tanda_id}
+            )
+            pagos = cargar_pagos_tanda(pagos_table, tanda_id)
         
-        participantes = participantes_result.get('Items', [])
+        # 3. Agrupar los pagos de la tanda por participante y ronda
+        pagos_agrupados = agrupar_pagos(pagos)
         
-        # 3. Para cada participante, obtener sus pagos
         for participante in participantes:
             participante_id = participante['participanteId']
             
-            # Consultar pagos del participante
-            pagos_response = pagos_table.query(
-                            KeyConditionExpression=
-                                Key('id').eq(tanda_id) &
-                                Key('pagoId').begins_with(participante_id)
-                        )
-            
             # Estructurar pagos por ronda
             pagos_por_ronda = {}
-            for pago in pagos_response.get('Items', []):
-                ronda = str(pago['ronda'])  # Convertir a string
-                pagos_por_ronda[ronda] = {
+            for ronda, pago in pagos_agrupados.get(participante_id, {}).items():
+                pagos_por_ronda[str(ronda)] = {
                     'pagado': pago.get('pagado', False),
                     'fechaPago': pago.get('fechaPago', ''),
                     'monto': float(pago.get('monto', 0)),
@@ -522,27 +439,48 @@ def listar(event, context):
                 }
             })
         
-        # 1️⃣ Obtener tandas del admin
-        result = tandas_table.query(
-            IndexName='adminId-index',
-            KeyConditionExpression='adminId = :adminId',
-            ExpressionAttributeValues={':adminId': user_id}
+        # 1️⃣ Obtener tandas del admin (todas, o una página si viene ?limit=&cursor=)
+        consulta = {
+            'IndexName': 'adminId-index',
+            'KeyConditionExpression': 'adminId = :adminId',
+            'ExpressionAttributeValues': {':adminId': user_id}
+        }
+        try:
+            limite, cursor = parametros_paginacion(event.get('queryStringParameters'))
+            if limite:
+                tandas_items, next_cursor = leer_pagina(
+                    tandas_table, limite, cursor,
+                    particion={'adminId': user_id},
+                    **consulta
+                )
+            else:
+                tandas_items, next_cursor = query_completa(tandas_table, **consulta), None
+        except ValueError as e:
+            return response(400, {
+                'success': False,
+                'error': {
+                    'code': 'INVALID_PAGINATION',
+                    'message': str(e)
+                }
+            })
+        
+        # 2️⃣ Obtener participantes de todas las tandas en paralelo (mismo orden)
+        participantes_por_tanda = consultar_en_paralelo(
+            lambda tanda: query_completa(
+                participantes_table,
+                KeyConditionExpression='id = :tandaId',
+                ExpressionAttributeValues={':tandaId': tanda['id']}
+            ),
+            tandas_items
         )
         
-        tandas_items = result.get('Items', [])
         tandas_response = []
         
-        # 2️⃣ Para cada tanda, obtener participantes
-        for tanda in tandas_items:
+        for tanda, participantes_items in zip(tandas_items, participantes_por_tanda):
             tanda_id = tanda['id']
             
-            participantes_result = participantes_table.query(
-                KeyConditionExpression='id = :tandaId',
-                ExpressionAttributeValues={':tandaId': tanda_id}
-            )
-            
             participantes = []
-            for p in participantes_result.get('Items', []):
+            for p in participantes_items:
                 participantes.append({
                     'participanteId': p['participanteId'],
                     'nombre': p['nombre'],
@@ -574,7 +512,8 @@ def listar(event, context):
         return response(200, {
             'success': True,
             'data': {
-                'tandas': tandas_response
+                'tandas': tandas_response,
+                'nextCursor': next_cursor
             }
         })
         
@@ -649,8 +588,9 @@ def obtener_link_vigente(event, context):
         # Tabla
         links_table = dynamodb.Table(LINKS_TABLE)
         
-        # Buscar links de esta tanda
-        response = links_table.query(
+        # Buscar links de esta tanda (se recorren página por página)
+        links = iterar_query(
+            links_table,
             IndexName='tandaId-index',
             KeyConditionExpression='tandaId = :tandaId',
             FilterExpression='userId = :userId',
@@ -660,30 +600,13 @@ def obtener_link_vigente(event, context):
             }
         )
         
-        print(f'link disponibles: {response}')
-        
-        links = response.get('Items', [])
-        
-        if not links:
-            return {
-                'statusCode': 404,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                    'Content-Type': 'application/json'
-                },
-                'body': json.dumps({
-                    'success': False,
-                    'error': {
-                        'message': 'No hay links activos para esta tanda'
-                    }
-                })
-            }
-        
         # Verificar si algún link no ha expirado
         ahora = datetime.now(timezone.utc)
         link_vigente = None
+        hay_links = False
         
         for link in links:
+            hay_links = True
             expiracion_raw = link['expiracion']
             if isinstance(expiracion_raw, Decimal):
                 # Asumimos epoch (segundos)
@@ -699,6 +622,21 @@ def obtener_link_vigente(event, context):
                 link_vigente = link
                 break
         
+        if not hay_links:
+            return {
+                'statusCode': 404,
+                'headers': {
+                    'Access-Control-Allow-Origin': '*',
+                    'Content-Type': 'application/json'
+                },
+                'body': json.dumps({
+                    'success': False,
+                    'error': {
+                        'message': 'No hay links activos para esta tanda'
+                    }
+                })
+            }
+        
         if not link_vigente:
             return {
                 'statusCode': 404,
@@ -809,28 +747,41 @@ def eliminar_tanda_con_dependencias(event,context):
         print("🗑️  INICIANDO PROCESO DE ELIMINACIÓN")
         print("="*50)
         
+        # Pasos 1-3: Eliminar participantes, pagos y notificaciones (en
+        # paralelo, por lotes). Si se acaba el tiempo se guarda el avance y
+        # se responde 202; la siguiente llamada continúa donde se quedó.
+        trabajo_id = f'tanda#{tanda_id}'
+        completo, contadores = ejecutar_cascada(
+            dynamodb,
+            trabajos_eliminacion_table,
+            trabajo_id,
+            pasos_eliminacion_tanda(tanda_id),
+            Plazo(context)
+        )
+        
         estadisticas = {
-            'participantes': 0,
-            'pagos': 0,
-            'notificaciones': 0,
+            **contadores,
             'tanda': False,
             'usuario': False
         }
         
-        # Paso 1: Eliminar participantes
-        estadisticas['participantes'] = eliminar_participantes(tanda_id)
-        
-        # Paso 2: Eliminar pagos
-        estadisticas['pagos'] = eliminar_pagos(tanda_id)
-        
-        # Paso 3: Eliminar notificaciones
-        estadisticas['notificaciones'] = eliminar_notificaciones(tanda_id)
+        if not completo:
+            return response(202, {
+                'success': True,
+                'message': 'Eliminación en progreso, vuelve a llamar para continuar',
+                'data': {
+                    'tandaId': tanda_id,
+                    'completo': False,
+                    'estadisticas': estadisticas
+                }
+            })
         
         # Paso 4: Actualizar usuario_admin
         estadisticas['usuario'] = actualizar_usuario_admin(user_id, tanda_id)
         
         # Paso 5: Eliminar tanda
         estadisticas['tanda'] = eliminar_tanda(tanda_id)
+        finalizar_trabajo(trabajos_eliminacion_table, trabajo_id)
         
         print("\n" + "="*50)
         print("✅ PROCESO COMPLETADO")
@@ -849,6 +800,7 @@ def eliminar_tanda_con_dependencias(event,context):
             'message': 'Tanda eliminada exitosamente',
             'data': {
                 'tandaId': tanda_id,
+                'completo': True,
                 'estadisticas': estadisticas
             }
         })
@@ -967,16 +919,16 @@ def obtener_datos_registro(event, context):
         
         tanda = response['Item']
         
-        # Obtener participantes de la tabla participantes
-        response = participantes_table.query(
+        # Obtener participantes de la tabla participantes (solo datos públicos)
+        participantes = query_completa(
+            participantes_table,
             KeyConditionExpression='id = :tandaId',
             ExpressionAttributeValues={
                 ':tandaId': link['tandaId']
-            }
+            },
+            proyeccion=['numeroAsignado', 'nombre']
         )
         
-        participantes = response.get('Items', [])
-        
         # Preparar lista simplificada de participantes (solo número asignado)
         participantes_publicos = [
             {
@@ -0,0 +1,395 @@
+# ========================================
+# LAMBDA: vistas_handler.py
+# Consume los DynamoDB Streams de participantes y pagos y mantiene la
+# vista desnormalizada de cada tanda (tabla vistas_tandas_v2)
+# ========================================
+
+import os
+import boto3
+from datetime import datetime, timedelta
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+
+from dynamo_utils import iterar_query, consultar_en_paralelo, obtener_en_lote
+from vistas_tandas import (
+    version_de,
+    seccion_de,
+    llave_meta,
+    atributo_aplicado,
+    VERSION_SEMILLA,
+    COLECCION_PARTICIPANTES,
+    COLECCION_PAGOS,
+    LLAVES_COLECCION,
+    ESTADO_SEMBRANDO,
+    ESTADO_COMPLETA,
+    ESTADO_NO_SOPORTADA
+)
+
+dynamodb = boto3.resource('dynamodb')
+tandas_table = dynamodb.Table(os.environ['TANDAS_TABLE'])
+participantes_table = dynamodb.Table(os.environ['PARTICIPANTES_TABLE'])
+pagos_table = dynamodb.Table(os.environ['PAGOS_TABLE'])
+vistas_table = dynamodb.Table(os.environ['VISTAS_TABLE'])
+
+# El stream conserva 24 h de eventos: una lápida más vieja ya no evita nada
+LAPIDA_HORAS = int(os.environ.get('VISTAS_LAPIDA_HORAS', '48'))
+
+# Entidades que una siembra escribe dentro del tiempo de la Lambda
+VISTAS_MAX_ENTIDADES = int(os.environ.get('VISTAS_MAX_ENTIDADES', '10000'))
+
+# Tabla de origen (nombre en el ARN del stream) -> colección en la vista
+COLECCIONES = {
+    participantes_table.name: COLECCION_PARTICIPANTES,
+    pagos_table.name: COLECCION_PAGOS
+}
+TABLAS_ORIGEN = {
+    COLECCION_PARTICIPANTES: participantes_table,
+    COLECCION_PAGOS: pagos_table
+}
+
+deserializador = TypeDeserializer()
+
+# ========================================
+# LECTURA DE REGISTROS DEL STREAM
+# ========================================
+def tabla_de_registro(registro):
+    """'arn:aws:dynamodb:...:table/pagos/stream/2025-...' -> 'pagos'"""
+    return registro['eventSourceARN'].split(':table/', 1)[1].split('/', 1)[0]
+
+def deserializar(imagen):
+    return {atributo: deserializador.deserialize(valor) for atributo, valor in imagen.items()}
+
+def cambio_de_registro(registro):
+    """
+    Convierte un registro del stream en un cambio sobre la vista:
+    {tandaId, coleccion, entidadId, version, datos (None si se eliminó), secuencia}
+    """
+    coleccion = COLECCIONES.get(tabla_de_registro(registro))
+    if coleccion is None:
+        return None
+
+    dynamo = registro['dynamodb']
+    llaves = deserializar(dynamo['Keys'])
+    datos = None
+    if registro['eventName'] != 'REMOVE':
+        datos = deserializar(dynamo['NewImage'])
+        datos.pop('id', None)
+
+    return {
+        'tandaId': llaves['id'],
+        'coleccion': coleccion,
+        'entidadId': llaves[LLAVES_COLECCION[coleccion]],
+        'version': version_de(dynamo['SequenceNumber']),
+        'datos': datos,
+        'secuencia': dynamo['SequenceNumber']
+    }
+
+def hora_aplicada(registros, inicio):
+    """
+    Hora hasta la que un lote deja la vista al día: cuando empezó, o poco
+    después del registro más nuevo si es anterior (un lote reintentado
+    trae registros viejos y no cubre lo escrito mientras tanto).
+    ApproximateCreationDateTime viene redondeado hacia abajo al segundo.
+    """
+    creaciones = [r['dynamodb']['ApproximateCreationDateTime']
+                  for r in registros if 'ApproximateCreationDateTime' in r.get('dynamodb', {})]
+    if not creaciones:
+        return inicio
+    return min(inicio, datetime.utcfromtimestamp(float(max(creaciones)) + 1).isoformat())
+
+def compactar(cambios):
+    """
+    Deja un solo cambio por entidad (el de versión más alta) y recuerda
+    la secuencia más baja de cada entidad para reportar fallos parciales.
+    """
+    por_entidad = {}
+    for cambio in cambios:
+        llave = (cambio['tandaId'], cambio['coleccion'], cambio['entidadId'])
+        actual = por_entidad.get(llave)
+        if actual is None:
+            por_entidad[llave] = {**cambio, 'primeraVersion': cambio['version'], 'primeraSecuencia': cambio['secuencia']}
+            continue
+        if cambio['version'] < actual['primeraVersion']:
+            actual['primeraVersion'] = cambio['version']
+            actual['primeraSecuencia'] = cambio['secuencia']
+        if cambio['version'] > actual['version']:
+            actual.update(cambio)
+    return list(por_entidad.values())
+
+# ========================================
+# ESCRITURA EN LA VISTA
+# ========================================
+def _es_error(e, codigo):
+    return isinstance(e, ClientError) and e.response['Error']['Code'] == codigo
+
+def _es_item_muy_grande(e):
+    """ValidationException por el límite de 400 KB (otras validaciones son errores reales)"""
+    return _es_error(e, 'ValidationException') and 'item size' in e.response['Error'].get('Message', '').lower()
+
+def leer_metas(tanda_ids):
+    """return: {tandaId: item '#meta'} de las tandas que ya tienen vista"""
+    metas = obtener_en_lote(dynamodb, vistas_table.name, [llave_meta(t) for t in tanda_ids])
+    return {meta['id']: meta for meta in metas}
+
+def iniciar_vista(tanda_id):
+    """Crea el '#meta' de la vista en estado sembrando (no pisa uno existente)"""
+    vistas_table.update_item(
+        Key=llave_meta(tanda_id),
+        UpdateExpression='SET estado = if_not_exists(estado, :sembrando), updatedAt = :now',
+        ExpressionAttributeValues={':sembrando': ESTADO_SEMBRANDO, ':now': datetime.utcnow().isoformat()}
+    )
+
+def marcar_no_soportada(tanda_id, motivo):
+    """Los lectores consultan las tablas y los cambios de la tanda se descartan"""
+    vistas_table.update_item(
+        Key=llave_meta(tanda_id),
+        UpdateExpression='SET estado = :estado, motivo = :motivo, updatedAt = :now',
+        ExpressionAttributeValues={
+            ':estado': ESTADO_NO_SOPORTADA,
+            ':motivo': motivo,
+            ':now': datetime.utcnow().isoformat()
+        }
+    )
+    print(f"⚠️ Vista de tanda {tanda_id} no soportada: {motivo}")
+
+def marcar_aplicado(tanda_id, colecciones, inicio):
+    """
+    Registra en '#meta' que los cambios de las colecciones escritos antes
+    de 'inicio' (ver hora_aplicada) ya están en la vista. Con esto
+    leer_vista decide si puede servir una lectura después de escribir.
+    """
+    nombres, condiciones = {}, ['estado = :completa']
+    for i, coleccion in enumerate(sorted(colecciones)):
+        nombres[f'#a{i}'] = atributo_aplicado(coleccion)
+        condiciones.append(f'(attribute_not_exists(#a{i}) OR #a{i} < :inicio)')
+    try:
+        vistas_table.update_item(
+            Key=llave_meta(tanda_id),
+            UpdateExpression='SET ' + ', '.join(f'{n} = :inicio' for n in nombres),
+            ConditionExpression=' AND '.join(condiciones),
+            ExpressionAttributeNames=nombres,
+            ExpressionAttributeValues={':inicio': inicio, ':completa': ESTADO_COMPLETA}
+        )
+    except ClientError as e:
+        # La vista dejó de estar completa o un lote posterior ya avanzó la marca
+        if not _es_error(e, 'ConditionalCheckFailedException'):
+            raise
+
+def escribir_entidad(tanda_id, coleccion, entidad_id, version, datos):
+    """
+    Escribe el item de una entidad solo si 'version' es más nueva que la
+    guardada; así un evento duplicado o atrasado no tiene efecto. Una
+    eliminación deja una lápida que expira por TTL.
+
+    return: 'aplicado' | 'descartado' | 'no_cabe' (la entidad pasa de 400 KB)
+    """
+    valores = {':version': version, ':now': datetime.utcnow().isoformat()}
+    if datos is None:
+        expresion = 'SET #v = :version, eliminado = :verdadero, #ttl = :ttl, updatedAt = :now REMOVE datos'
+        valores[':verdadero'] = True
+        valores[':ttl'] = int((datetime.utcnow() + timedelta(hours=LAPIDA_HORAS)).timestamp())
+    else:
+        expresion = 'SET #v = :version, datos = :datos, updatedAt = :now REMOVE eliminado, #ttl'
+        valores[':datos'] = datos
+
+    try:
+        vistas_table.update_item(
+            Key={'id': tanda_id, 'seccion': seccion_de(coleccion, entidad_id)},
+            UpdateExpression=expresion,
+            ConditionExpression='attribute_not_exists(#v) OR #v < :version',
+            ExpressionAttributeNames={'#v': 'version', '#ttl': 'ttl'},
+            ExpressionAttributeValues=valores
+        )
+    except ClientError as e:
+        if _es_error(e, 'ConditionalCheckFailedException'):
+            return 'descartado'
+        if _es_item_muy_grande(e):
+            return 'no_cabe'
+        raise
+
+    return 'aplicado'
+
+def aplicar_cambio(cambio, estado_vista):
+    """
+    Aplica un cambio compactado según el estado de la vista de su tanda
+    (None: la tanda ya no existe, p. ej. por su eliminación en cascada).
+
+    return: 'aplicado' | 'descartado' | 'no_cabe'
+    """
+    if estado_vista in (None, ESTADO_NO_SOPORTADA):
+        # Sin tanda o sin vista en uso no se escribe nada; un REMOVE solo
+        # borra el item que haya quedado de la entidad
+        if cambio['datos'] is None:
+            vistas_table.delete_item(
+                Key={'id': cambio['tandaId'], 'seccion': seccion_de(cambio['coleccion'], cambio['entidadId'])}
+            )
+        return 'descartado'
+
+    return escribir_entidad(
+        cambio['tandaId'], cambio['coleccion'], cambio['entidadId'],
+        cambio['version'], cambio['datos']
+    )
+
+def sembrar_vista(tanda_id, inicio):
+    """
+    Copia a la vista el estado actual de las tablas con la versión semilla
+    (cualquier evento del stream la supera) y la marca como completa. Las
+    tablas se leen después de 'inicio': la vista queda aplicada hasta ahí.
+    Idempotente: se puede repetir si una siembra anterior quedó a medias.
+    Una tanda con más de VISTAS_MAX_ENTIDADES entidades no se siembra (no
+    alcanzaría el tiempo de la Lambda) y su vista queda no soportada.
+    """
+    entidades = []
+    for coleccion, tabla in TABLAS_ORIGEN.items():
+        for item in iterar_query(tabla, KeyConditionExpression=Key('id').eq(tanda_id)):
+            if len(entidades) >= VISTAS_MAX_ENTIDADES:
+                marcar_no_soportada(tanda_id, f"más de {VISTAS_MAX_ENTIDADES} entidades para sembrar")
+                return
+            datos = {atributo: valor for atributo, valor in item.items() if atributo != 'id'}
+            entidades.append((coleccion, item[LLAVES_COLECCION[coleccion]], datos))
+
+    resultados = consultar_en_paralelo(
+        lambda e: escribir_entidad(tanda_id, e[0], e[1], VERSION_SEMILLA, e[2]),
+        entidades
+    )
+    if 'no_cabe' in resultados:
+        marcar_no_soportada(tanda_id, 'una entidad no cabe en un item de la vista')
+        return
+
+    try:
+        vistas_table.update_item(
+            Key=llave_meta(tanda_id),
+            UpdateExpression='SET estado = :completa, #ap = :inicio, #ag = :inicio, updatedAt = :now',
+            ConditionExpression='estado = :sembrando',
+            ExpressionAttributeNames={
+                '#ap': atributo_aplicado(COLECCION_PARTICIPANTES),
+                '#ag': atributo_aplicado(COLECCION_PAGOS)
+            },
+            ExpressionAttributeValues={
+                ':completa': ESTADO_COMPLETA,
+                ':sembrando': ESTADO_SEMBRANDO,
+                ':inicio': inicio,
+                ':now': datetime.utcnow().isoformat()
+            }
+        )
+    except ClientError as e:
+        # Otro lote la marcó no soportada mientras tanto
+        if not _es_error(e, 'ConditionalCheckFailedException'):
+            raise
+        return
+    print(f"🌱 Vista sembrada: tanda {tanda_id} ({len(entidades)} entidades)")
+
+# ========================================
+# HANDLER: LOTE DEL STREAM
+# ========================================
+def estados_de_vistas(tanda_ids):
+    """
+    Estado de la vista de cada tanda del lote. Una tanda sin vista la
+    obtiene en estado sembrando si todavía existe; si no, queda en None.
+
+    return: {tandaId: estado | None}
+    """
+    estados = {tanda_id: meta.get('estado') for tanda_id, meta in leer_metas(tanda_ids).items()}
+
+    sin_vista = [tanda_id for tanda_id in tanda_ids if tanda_id not in estados]
+    existentes = {
+        tanda['id']
+        for tanda in obtener_en_lote(dynamodb, tandas_table.name, [{'id': t} for t in sin_vista], proyeccion=['id'])
+    }
+    for tanda_id in sin_vista:
+        if tanda_id in existentes:
+            iniciar_vista(tanda_id)
+            estados[tanda_id] = ESTADO_SEMBRANDO
+        else:
+            estados[tanda_id] = None
+    return estados
+
+def procesar_registros(registros):
+    """
+    Procesa un lote de registros del stream.
+
+    return: {'aplicados', 'descartados', 'fallidos', 'primeraSecuenciaFallida'}
+    """
+    # Antes de leer nada: lo que lea la siembra incluye lo escrito hasta
+    # 'inicio'; los cambios del stream, hasta hora_aplicada
+    inicio = datetime.utcnow().isoformat()
+    aplicado_hasta = hora_aplicada(registros, inicio)
+    cambios = [c for c in (cambio_de_registro(r) for r in registros) if c]
+    compactados = compactar(cambios)
+    estados = estados_de_vistas({c['tandaId'] for c in compactados})
+
+    def procesar(cambio):
+        try:
+            return cambio, aplicar_cambio(cambio, estados[cambio['tandaId']]), None
+        except Exception as e:
+            return cambio, None, e
+
+    contadores = {'aplicados': 0, 'descartados': 0, 'fallidos': 0}
+    primera_fallida = None
+    no_caben = set()
+    con_fallas = set()
+
+    for cambio, resultado, error in consultar_en_paralelo(procesar, compactados):
+        if error is not None:
+            print(f"❌ Error aplicando {cambio['coleccion']} {cambio['entidadId']} de tanda {cambio['tandaId']}: {str(error)}")
+            contadores['fallidos'] += 1
+            con_fallas.add((cambio['tandaId'], cambio['coleccion']))
+            if primera_fallida is None or cambio['primeraVersion'] < primera_fallida[0]:
+                primera_fallida = (cambio['primeraVersion'], cambio['primeraSecuencia'])
+            continue
+
+        contadores['aplicados' if resultado == 'aplicado' else 'descartados'] += 1
+        if resultado == 'no_cabe':
+            no_caben.add(cambio['tandaId'])
+
+    # Una entidad que no cabe no es un fallo que se arregle reintentando:
+    # la vista deja de usarse y el stream sigue avanzando
+    for tanda_id in no_caben:
+        marcar_no_soportada(tanda_id, 'una entidad no cabe en un item de la vista')
+
+    # Colecciones que este lote dejó al día en cada vista completa; una con
+    # fallas se reintenta y su marca avanza en ese reintento
+    aplicadas = {}
+    for cambio in compactados:
+        tanda_id = cambio['tandaId']
+        if estados[tanda_id] == ESTADO_COMPLETA and tanda_id not in no_caben:
+            aplicadas.setdefault(tanda_id, set()).add(cambio['coleccion'])
+    for tanda_id, colecciones in aplicadas.items():
+        colecciones = {c for c in colecciones if (tanda_id, c) not in con_fallas}
+        if not colecciones:
+            continue
+        try:
+            marcar_aplicado(tanda_id, colecciones, aplicado_hasta)
+        except Exception as e:
+            # Los lectores de la tanda siguen en las tablas hasta el
+            # siguiente lote o VISTAS_RETRASO_MAX_SEGUNDOS
+            print(f"⚠️ Error marcando aplicada la vista de tanda {tanda_id}: {str(e)}")
+
+    for tanda_id, estado in estados.items():
+        if estado != ESTADO_SEMBRANDO or tanda_id in no_caben:
+            continue
+        try:
+            sembrar_vista(tanda_id, inicio)
+        except Exception as e:
+            # La vista queda sembrando (los lectores consultan las tablas)
+            # y el siguiente evento de la tanda vuelve a intentar la siembra
+            print(f"⚠️ Error sembrando vista de tanda {tanda_id}: {str(e)}")
+
+    contadores['primeraSecuenciaFallida'] = primera_fallida[1] if primera_fallida else None
+    return contadores
+
+def lambda_handler(event, context):
+    registros = event.get('Records', [])
+    resultado = procesar_registros(registros)
+
+    print(
+        f"✅ Lote de {len(registros)} registros: {resultado['aplicados']} aplicados, "
+        f"{resultado['descartados']} descartados, {resultado['fallidos']} fallidos"
+    )
+
+    # Respuesta parcial: el stream reintenta desde la primera secuencia fallida
+    # (lo ya aplicado se vuelve a entregar y se descarta por versión)
+    if resultado['primeraSecuenciaFallida']:
+        return {'batchItemFailures': [{'itemIdentifier': resultado['primeraSecuenciaFallida']}]}
+    return {'batchItemFailures': []}
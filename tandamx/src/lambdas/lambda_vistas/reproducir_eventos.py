@@ -0,0 +1,117 @@
+"""
+Reproduce eventos grabados de DynamoDB Streams contra lambda_vistas
+
+Sirve para probar localmente (DynamoDB Local o una cuenta de pruebas) que
+el consumidor es idempotente y tolera eventos fuera de orden: reparte los
+registros en lotes, opcionalmente los duplica y los desordena, invoca el
+handler y al final compara cada vista contra las tablas de origen.
+
+El archivo de entrada puede ser un evento de Lambda ({"Records": [...]}),
+una lista de registros o JSONL (un registro por línea), por ejemplo lo
+que regresa `aws dynamodbstreams get-records`.
+
+Uso:
+    export TANDAS_TABLE=tandas PARTICIPANTES_TABLE=participantes PAGOS_TABLE=pagos VISTAS_TABLE=vistas_tandas_v2
+    export AWS_ENDPOINT_URL=http://localhost:8000   # DynamoDB Local
+
+    python reproducir_eventos.py eventos.json
+    python reproducir_eventos.py eventos.json --lote 25 --duplicar --desordenar --semilla 7
+    python reproducir_eventos.py eventos.json --verificar
+"""
+
+import json
+import random
+import argparse
+
+from boto3.dynamodb.conditions import Key
+
+from dynamo_utils import query_completa
+from vistas_tandas import leer_vista
+
+import handler
+
+
+def cargar_registros(ruta):
+    with open(ruta) as f:
+        contenido = f.read()
+
+    try:
+        datos = json.loads(contenido)
+    except ValueError:
+        # JSONL: un registro por línea
+        return [json.loads(linea) for linea in contenido.splitlines() if linea.strip()]
+
+    return datos['Records'] if isinstance(datos, dict) else datos
+
+
+def armar_lotes(registros, tamano_lote, duplicar=False, desordenar=False, semilla=None):
+    aleatorio = random.Random(semilla)
+    registros = list(registros)
+
+    if duplicar:
+        # Reentrega al menos una vez: cada registro puede llegar dos veces
+        registros += [r for r in registros if aleatorio.random() < 0.5]
+    if desordenar:
+        aleatorio.shuffle(registros)
+
+    return [registros[i:i + tamano_lote] for i in range(0, len(registros), tamano_lote)]
+
+
+def verificar_vistas(tandas):
+    """Compara la vista de cada tanda contra el contenido actual de las tablas"""
+    diferencias = {}
+    for tanda_id in sorted(tandas):
+        vista = leer_vista(handler.vistas_table, tanda_id)
+        if vista is None:
+            diferencias[tanda_id] = 'sin vista completa'
+            continue
+
+        esperados = tuple(
+            query_completa(tabla, KeyConditionExpression=Key('id').eq(tanda_id))
+            for tabla in (handler.participantes_table, handler.pagos_table)
+        )
+        if json.dumps(vista, sort_keys=True, default=str) != json.dumps(esperados, sort_keys=True, default=str):
+            diferencias[tanda_id] = (
+                f"participantes {len(vista[0])}/{len(esperados[0])}, "
+                f"pagos {len(vista[1])}/{len(esperados[1])}"
+            )
+    return diferencias
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Reproduce eventos grabados de DynamoDB Streams contra lambda_vistas'
+    )
+    parser.add_argument('archivo', help='Evento, lista de registros o JSONL grabado')
+    parser.add_argument('--lote', type=int, default=100, help='Registros por invocación (default: 100)')
+    parser.add_argument('--duplicar', action='store_true', help='Reentregar registros al azar')
+    parser.add_argument('--desordenar', action='store_true', help='Desordenar los registros')
+    parser.add_argument('--semilla', type=int, help='Semilla para duplicar/desordenar')
+    parser.add_argument('--verificar', action='store_true', help='Comparar las vistas contra las tablas')
+    args = parser.parse_args()
+
+    registros = cargar_registros(args.archivo)
+    lotes = armar_lotes(registros, args.lote, args.duplicar, args.desordenar, args.semilla)
+    print(f"📼 {len(registros)} registros grabados, {sum(len(l) for l in lotes)} a reproducir en {len(lotes)} lotes")
+
+    tandas = set()
+    fallidos = 0
+    for lote in lotes:
+        tandas.update(c['tandaId'] for c in map(handler.cambio_de_registro, lote) if c)
+        resultado = handler.lambda_handler({'Records': lote}, None)
+        fallidos += len(resultado['batchItemFailures'])
+
+    print(f"{'✅' if not fallidos else '❌'} Lotes con fallos: {fallidos}")
+
+    if args.verificar:
+        diferencias = verificar_vistas(tandas)
+        for tanda_id, detalle in diferencias.items():
+            print(f"⚠️ Tanda {tanda_id}: {detalle}")
+        print(f"🔍 {len(tandas) - len(diferencias)}/{len(tandas)} vistas coinciden con las tablas")
+        return 1 if diferencias or fallidos else 0
+
+    return 1 if fallidos else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,231 @@
+"""
+Mide el costo de importación (cold start) de cada módulo handler
+
+Cada Lambda paga al arrancar la importación de su handler y de todo lo
+que éste importa (boto3, la capa auth_layer, jwt...). Este script importa
+cada módulo en un proceso nuevo con `python -X importtime`, con la capa
+en el path igual que en Lambda, y reporta la mediana de varias corridas
+junto con las importaciones directas más pesadas.
+
+Con --guardar se escribe una línea base; con --comparar se compara contra
+una línea base y el script termina con código 1 si algún módulo empeora
+más que la tolerancia, para poder correrlo antes de cada despliegue.
+
+Un módulo que lee variables de entorno al importarse recibe valores de
+relleno (las tablas no se tocan al importar); --env permite dar valores
+reales si hacen falta.
+
+Uso:
+    pip install -r requirements.txt
+    python tiempo_importacion.py
+    python tiempo_importacion.py --corridas 10 --modulo lambda_auth/handler.py
+    python tiempo_importacion.py --sin-pyc          # el código propio sin .pyc, como el zip de Lambda
+    python tiempo_importacion.py --guardar base.json
+    python tiempo_importacion.py --comparar base.json --tolerancia 20
+"""
+
+import os
+import re
+import sys
+import json
+import shutil
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+LAMBDAS_DIR = os.path.dirname(os.path.abspath(__file__))
+LAYER_DIR = os.path.join(LAMBDAS_DIR, '..', 'layers', 'auth_layer', 'python')
+
+# Variables que los módulos parsean como JSON al importarse
+ENV_JSON = {
+    'TABLES_CONFIG': '[]',
+    'PARQUET_EXPORT': '{}',
+}
+
+PATRON_ENV = re.compile(r"os\.environ\[['\"](\w+)['\"]\]")
+PATRON_HANDLER = re.compile(r"^def \w*handler\(event, context\)", re.MULTILINE)
+# "import time:  self | cumulative | [espacios]módulo"
+PATRON_LINEA = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+def modulos_handler(filtro=None):
+    """
+    Módulos de primer nivel de cada Lambda que definen un handler
+    (handler.py, worker.py, backup_function.py...).
+
+    return: lista de (carpeta de la Lambda, nombre del módulo)
+    """
+    modulos = []
+    for carpeta in sorted(os.listdir(LAMBDAS_DIR)):
+        ruta_carpeta = os.path.join(LAMBDAS_DIR, carpeta)
+        if not os.path.isdir(ruta_carpeta) or carpeta.startswith(('.', '__')):
+            continue
+        for archivo in sorted(os.listdir(ruta_carpeta)):
+            if not archivo.endswith('.py'):
+                continue
+            if filtro and f"{carpeta}/{archivo}" not in filtro:
+                continue
+            with open(os.path.join(ruta_carpeta, archivo), encoding='utf-8') as f:
+                if PATRON_HANDLER.search(f.read()):
+                    modulos.append((carpeta, archivo[:-3]))
+    return modulos
+
+
+def entorno_para(ruta_carpeta, ruta_capa, extra):
+    """Entorno del proceso: la capa en el path y relleno para las variables requeridas"""
+    env = dict(os.environ)
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    env['PYTHONPATH'] = os.pathsep.join([ruta_carpeta, ruta_capa])
+
+    for archivo in os.listdir(ruta_carpeta):
+        if archivo.endswith('.py'):
+            with open(os.path.join(ruta_carpeta, archivo), encoding='utf-8') as f:
+                for nombre in PATRON_ENV.findall(f.read()):
+                    env.setdefault(nombre, ENV_JSON.get(nombre, 'importtime'))
+
+    env.update(extra)
+    return env
+
+
+def medir_una_vez(python, ruta_carpeta, modulo, env):
+    """
+    Importa el módulo en un proceso nuevo con -X importtime.
+
+    return: (microsegundos totales, {importación directa: microsegundos})
+    """
+    resultado = subprocess.run([python, '-X', 'importtime', '-c', f'import {modulo}'],
+                               cwd=ruta_carpeta, env=env, capture_output=True, text=True)
+
+    if resultado.returncode != 0:
+        error = resultado.stderr.strip().splitlines()[-1] if resultado.stderr.strip() else 'sin salida'
+        raise RuntimeError(error)
+
+    # El módulo aparece al final, después de todo lo que importó; sus
+    # importaciones directas son las líneas con un nivel más de sangría
+    lineas = [PATRON_LINEA.match(l) for l in resultado.stderr.splitlines()]
+    lineas = [m for m in lineas if m]
+    total = 0
+    directas = {}
+    for i, m in enumerate(lineas):
+        if m.group(4) == modulo and len(m.group(3)) == 0:
+            total = int(m.group(2))
+            inicio = i
+            while inicio > 0 and len(lineas[inicio - 1].group(3)) > 0:
+                inicio -= 1
+            for hija in lineas[inicio:i]:
+                if len(hija.group(3)) == 2:
+                    directas[hija.group(4)] = int(hija.group(2))
+            break
+    return total, directas
+
+
+def medir(python, carpeta, modulo, corridas, extra_env, sin_pyc):
+    """
+    return: dict con la mediana, mínimo y máximo en ms y las 3
+            importaciones directas más pesadas (mediana en ms)
+    """
+    ruta_carpeta = os.path.join(LAMBDAS_DIR, carpeta)
+    ruta_capa = os.path.abspath(LAYER_DIR)
+    copia = None
+    if sin_pyc:
+        # En Lambda /var/task y /opt son de solo lectura: si el zip no trae
+        # .pyc el código de la función y de la capa se compila en cada cold
+        # start (la librería estándar y boto3 del runtime sí traen .pyc).
+        # Copia sin __pycache__ y sin escribir .pyc para medir eso.
+        copia = tempfile.TemporaryDirectory()
+        sin_cache = shutil.ignore_patterns('__pycache__')
+        ruta_carpeta = shutil.copytree(ruta_carpeta, os.path.join(copia.name, carpeta), ignore=sin_cache)
+        ruta_capa = shutil.copytree(ruta_capa, os.path.join(copia.name, 'python'), ignore=sin_cache)
+
+    env = entorno_para(ruta_carpeta, ruta_capa, extra_env)
+    if sin_pyc:
+        env['PYTHONDONTWRITEBYTECODE'] = '1'
+    else:
+        # Una corrida que no se cuenta deja los .pyc al día
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+    totales = []
+    directas = {}
+    try:
+        if not sin_pyc:
+            medir_una_vez(python, ruta_carpeta, modulo, env)
+        for _ in range(corridas):
+            total, hijas = medir_una_vez(python, ruta_carpeta, modulo, env)
+            totales.append(total)
+            for nombre, us in hijas.items():
+                directas.setdefault(nombre, []).append(us)
+    finally:
+        if copia:
+            copia.cleanup()
+
+    pesadas = sorted(((statistics.median(v), k) for k, v in directas.items()), reverse=True)[:3]
+    return {
+        'mediana_ms': round(statistics.median(totales) / 1000, 1),
+        'min_ms': round(min(totales) / 1000, 1),
+        'max_ms': round(max(totales) / 1000, 1),
+        'mas_pesadas': [[nombre, round(us / 1000, 1)] for us, nombre in pesadas],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Mide el tiempo de importación (cold start) de cada módulo handler'
+    )
+    parser.add_argument('--corridas', type=int, default=5, help='Procesos por módulo (default: 5)')
+    parser.add_argument('--modulo', action='append',
+                        help='Solo este módulo, p. ej. lambda_auth/handler.py (se puede repetir)')
+    parser.add_argument('--python', default=sys.executable,
+                        help='Intérprete a usar (default: el actual; debe tener boto3)')
+    parser.add_argument('--sin-pyc', action='store_true',
+                        help='Medir sin .pyc del código de la función y la capa (compila en cada corrida)')
+    parser.add_argument('--env', action='append', default=[],
+                        help='Variable de entorno NOMBRE=valor para los módulos (se puede repetir)')
+    parser.add_argument('--guardar', help='Archivo JSON donde guardar los resultados')
+    parser.add_argument('--comparar', help='Archivo JSON con una línea base')
+    parser.add_argument('--tolerancia', type=float, default=20,
+                        help='Porcentaje de aumento permitido contra la línea base (default: 20)')
+    args = parser.parse_args()
+
+    extra_env = dict(v.split('=', 1) for v in args.env)
+    base = {}
+    if args.comparar:
+        with open(args.comparar) as f:
+            base = json.load(f)
+
+    resultados = {}
+    empeoraron = []
+    print(f"{'módulo':<42} {'mediana':>9} {'min':>7} {'max':>7}   más pesadas")
+    for carpeta, modulo in modulos_handler(args.modulo):
+        nombre = f"{carpeta}/{modulo}.py"
+        try:
+            r = medir(args.python, carpeta, modulo, args.corridas, extra_env, args.sin_pyc)
+        except RuntimeError as e:
+            print(f"{nombre:<42} ❌ {e}")
+            continue
+        resultados[nombre] = r
+
+        pesadas = ', '.join(f"{n} {ms}" for n, ms in r['mas_pesadas'])
+        linea = f"{nombre:<42} {r['mediana_ms']:>7} ms {r['min_ms']:>7} {r['max_ms']:>7}   {pesadas}"
+        anterior = base.get(nombre)
+        if anterior:
+            cambio = (r['mediana_ms'] - anterior['mediana_ms']) / anterior['mediana_ms'] * 100
+            linea += f"   ({cambio:+.0f}% vs base)"
+            if cambio > args.tolerancia:
+                empeoraron.append(nombre)
+                linea += ' ⚠️'
+        print(linea)
+
+    if args.guardar:
+        with open(args.guardar, 'w') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados guardados en {args.guardar}")
+
+    if empeoraron:
+        print(f"\n⚠️ Importación más lenta que la base (> {args.tolerancia:g}%): {', '.join(empeoraron)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,112 @@
+# ========================================
+# LAYER: agregados_pagos.py
+# Agregación de pagos de una tanda en una sola pasada
+# ========================================
+
+from datetime import datetime, timedelta, timezone
+
+def parse_fecha_pago(fecha_str):
+    """Convierte fechaPago (ISO, con o sin Z) a datetime UTC aware; None si no es válida"""
+    if not fecha_str:
+        return None
+    try:
+        if fecha_str.endswith('Z'):
+            fecha_str = fecha_str.replace('Z', '+00:00')
+        fecha = datetime.fromisoformat(fecha_str)
+        if fecha.tzinfo is None:
+            fecha = fecha.replace(tzinfo=timezone.utc)
+        return fecha
+    except Exception as e:
+        print(f"Error parseando fecha: {fecha_str}, error: {e}")
+        return None
+
+def _resumen_participante():
+    return {
+        'rondas': {},            # {ronda (int): pago}
+        'pagados': 0,            # pagos marcados como pagados (todas las rondas)
+        'pagadosHastaRonda': 0,  # pagados en rondas <= ronda actual
+        'adelantados': 0,        # pagados en rondas futuras
+        'recaudado': 0.0
+    }
+
+def resumir_pagos(pagos, ronda_actual, monto_por_ronda=0, desde=None):
+    """
+    Recorre los pagos de una tanda una sola vez (O(N)) y acumula:
+    - por participante: pagos por ronda, conteos de pagados y recaudado
+    - totales: recaudado, pagos marcados y monto pagado desde 'desde'
+
+    desde: datetime aware a partir del cual se suma pagosUltimoMes
+           (por defecto, hace 30 días)
+
+    return: {
+        'participantes': {participanteId: resumen},
+        'totalRecaudado': float,
+        'totalPagados': int,
+        'pagosUltimoMes': float
+    }
+    """
+    if desde is None:
+        desde = datetime.now(timezone.utc) - timedelta(days=30)
+
+    participantes = {}
+    total_recaudado = 0.0
+    total_pagados = 0
+    pagos_ultimo_mes = 0.0
+
+    for pago in pagos:
+        participante_id = pago['participanteId']
+        ronda = int(pago['ronda'])
+
+        resumen = participantes.get(participante_id)
+        if resumen is None:
+            resumen = participantes[participante_id] = _resumen_participante()
+        resumen['rondas'][ronda] = pago
+
+        if not pago.get('pagado', False):
+            continue
+
+        monto = float(pago.get('monto', monto_por_ronda))
+        resumen['pagados'] += 1
+        resumen['recaudado'] += monto
+        if ronda <= ronda_actual:
+            resumen['pagadosHastaRonda'] += 1
+        else:
+            resumen['adelantados'] += 1
+
+        total_pagados += 1
+        total_recaudado += monto
+
+        # fechaPago se parsea una sola vez por pago
+        fecha = parse_fecha_pago(pago.get('fechaPago'))
+        if fecha is not None and fecha > desde:
+            pagos_ultimo_mes += float(pago.get('monto', 0))
+
+    return {
+        'participantes': participantes,
+        'totalRecaudado': total_recaudado,
+        'totalPagados': total_pagados,
+        'pagosUltimoMes': pagos_ultimo_mes
+    }
+
+def resumen_de(resumen_pagos, participante_id):
+    """Resumen de un participante; vacío si no tiene pagos registrados"""
+    return resumen_pagos['participantes'].get(participante_id) or _resumen_participante()
+
+def distribucion_pagos(resumen_pagos, participantes, ronda_actual):
+    """
+    Cuenta participantes al corriente, atrasados y adelantados según los
+    pagos realizados contra los esperados (ronda_actual - 1). O(P).
+    """
+    pagos_esperados = ronda_actual - 1
+    distribucion = {'al_corriente': 0, 'atrasados': 0, 'adelantados': 0}
+
+    for participante in participantes:
+        pagados = resumen_de(resumen_pagos, participante['participanteId'])['pagados']
+        if pagados >= pagos_esperados:
+            distribucion['al_corriente'] += 1
+        else:
+            distribucion['atrasados'] += 1
+        if pagados > pagos_esperados:
+            distribucion['adelantados'] += 1
+
+    return distribucion
@@ -0,0 +1,293 @@
+# ========================================
+# LAYER: dynamo_utils.py
+# Utilidades compartidas de acceso a DynamoDB
+# ========================================
+
+import os
+import json
+import time
+import base64
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+
+from boto3.dynamodb.conditions import Key
+
+# Máximo de consultas simultáneas contra DynamoDB por invocación
+MAX_CONCURRENCIA = int(os.environ.get('DYNAMO_MAX_CONCURRENCIA', '8'))
+
+# Tamaño de página para los listados paginados por cursor
+LIMITE_PAGINA_DEFAULT = int(os.environ.get('LIMITE_PAGINA_DEFAULT', '50'))
+LIMITE_PAGINA_MAX = int(os.environ.get('LIMITE_PAGINA_MAX', '100'))
+
+# Límite de llaves por llamada de BatchGetItem / BatchWriteItem
+MAX_LLAVES_BATCH_GET = 100
+MAX_ITEMS_BATCH_WRITE = 25
+MAX_REINTENTOS_BATCH = 5
+
+
+def iterar_query(table, proyeccion=None, limite=None, **kwargs):
+    """
+    Recorre un query página por página siguiendo LastEvaluatedKey y
+    regresa los items uno a uno, sin acumular la partición en memoria.
+
+    proyeccion: lista de atributos a leer (ProjectionExpression)
+    limite: máximo de items a regresar; deja de leer páginas al alcanzarlo
+    kwargs: parámetros normales de Table.query
+
+    El consumidor puede cortar la iteración en cualquier momento (break)
+    y no se piden más páginas a DynamoDB.
+    """
+    return _iterar_paginas(table.query, proyeccion, limite, kwargs)
+
+
+def iterar_scan(table, proyeccion=None, limite=None, **kwargs):
+    """Igual que iterar_query pero recorriendo la tabla completa con Scan"""
+    return _iterar_paginas(table.scan, proyeccion, limite, kwargs)
+
+
+def _iterar_paginas(operacion, proyeccion, limite, kwargs):
+    if proyeccion:
+        nombres = dict(kwargs.get('ExpressionAttributeNames', {}))
+        alias = []
+        for i, atributo in enumerate(proyeccion):
+            nombres[f'#proy{i}'] = atributo
+            alias.append(f'#proy{i}')
+        kwargs['ProjectionExpression'] = ', '.join(alias)
+        kwargs['ExpressionAttributeNames'] = nombres
+
+    restantes = limite
+    if restantes is not None and restantes <= 0:
+        return
+
+    while True:
+        if restantes is not None:
+            kwargs['Limit'] = restantes
+
+        resultado = operacion(**kwargs)
+        for item in resultado.get('Items', []):
+            yield item
+            if restantes is not None:
+                restantes -= 1
+                if restantes <= 0:
+                    return
+
+        last_key = resultado.get('LastEvaluatedKey')
+        if not last_key:
+            return
+        kwargs['ExclusiveStartKey'] = last_key
+
+
+def _decimal_json(obj):
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    raise TypeError
+
+
+def codificar_cursor(last_key):
+    """Convierte un LastEvaluatedKey en un cursor opaco (base64 url-safe)"""
+    if not last_key:
+        return None
+    crudo = json.dumps(last_key, default=_decimal_json, separators=(',', ':'))
+    return base64.urlsafe_b64encode(crudo.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """
+    Convierte un cursor opaco de regreso a ExclusiveStartKey.
+    Lanza ValueError si el cursor no es válido.
+    """
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        crudo = base64.urlsafe_b64decode((cursor + relleno).encode('ascii'))
+        llave = json.loads(crudo, parse_float=Decimal, parse_int=Decimal)
+    except Exception:
+        raise ValueError('Cursor inválido')
+
+    if not isinstance(llave, dict) or not llave:
+        raise ValueError('Cursor inválido')
+    return llave
+
+
+def parametros_paginacion(query_params):
+    """
+    Lee 'limit' y 'cursor' de los queryStringParameters.
+
+    return: (limite, cursor). limite es None cuando el cliente no pidió
+    paginación (se conserva la respuesta completa de siempre).
+    Lanza ValueError si los parámetros no son válidos.
+    """
+    query_params = query_params or {}
+    limite = query_params.get('limit')
+    cursor = query_params.get('cursor') or None
+
+    if limite is None:
+        return (LIMITE_PAGINA_DEFAULT if cursor else None), cursor
+
+    try:
+        limite = int(limite)
+    except (TypeError, ValueError):
+        raise ValueError('El parámetro limit debe ser un número entero')
+
+    if limite < 1 or limite > LIMITE_PAGINA_MAX:
+        raise ValueError(f'El parámetro limit debe estar entre 1 y {LIMITE_PAGINA_MAX}')
+
+    return limite, cursor
+
+
+def leer_pagina(table, limite, cursor=None, particion=None, **kwargs):
+    """
+    Lee una página de un query a partir de un cursor opaco.
+
+    limite: máximo de items de la página
+    cursor: cursor regresado por la página anterior (o None)
+    particion: llaves fijas del query ({'id': tandaId}); el cursor debe
+               coincidir con ellas para no saltar a otra partición
+    kwargs: parámetros normales de Table.query
+
+    return: (items, next_cursor). next_cursor es None en la última página.
+    """
+    if cursor:
+        inicio = decodificar_cursor(cursor)
+        for llave, valor in (particion or {}).items():
+            if inicio.get(llave) != valor:
+                raise ValueError('Cursor inválido')
+        kwargs['ExclusiveStartKey'] = inicio
+
+    items = []
+    while True:
+        # Con FilterExpression una página puede traer menos items; se sigue
+        # leyendo hasta completar el límite o terminar la partición
+        kwargs['Limit'] = limite - len(items)
+        resultado = table.query(**kwargs)
+        items.extend(resultado.get('Items', []))
+
+        last_key = resultado.get('LastEvaluatedKey')
+        if not last_key or len(items) >= limite:
+            break
+        kwargs['ExclusiveStartKey'] = last_key
+
+    return items, codificar_cursor(last_key)
+
+
+def query_completa(table, **kwargs):
+    """Ejecuta un query siguiendo LastEvaluatedKey hasta leer toda la partición"""
+    return list(iterar_query(table, **kwargs))
+
+
+def cargar_pagos_tanda(pagos_table, tanda_id):
+    """
+    Obtiene todos los pagos de una tanda leyendo la partición id = tandaId
+    una sola vez (con paginación), en lugar de un query por participante.
+    """
+    return query_completa(
+        pagos_table,
+        KeyConditionExpression=Key('id').eq(tanda_id)
+    )
+
+
+def agrupar_pagos(pagos):
+    """
+    Agrupa los pagos en memoria por participante y ronda.
+
+    return: {participanteId: {ronda (int): pago}}
+    """
+    agrupados = {}
+    for pago in pagos:
+        agrupados.setdefault(pago['participanteId'], {})[int(pago['ronda'])] = pago
+    return agrupados
+
+
+def consultar_en_paralelo(funcion, argumentos, max_workers=None):
+    """
+    Ejecuta funcion(arg) para cada argumento en un pool de hilos acotado
+    y regresa los resultados en el mismo orden de los argumentos.
+
+    Los hilos comparten el recurso boto3 del módulo que llama; las
+    operaciones de Table (query/get_item) delegan en el cliente de bajo
+    nivel, que es thread-safe.
+    """
+    argumentos = list(argumentos)
+    if not argumentos:
+        return []
+
+    workers = min(max_workers or MAX_CONCURRENCIA, len(argumentos))
+    if workers <= 1:
+        return [funcion(arg) for arg in argumentos]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(funcion, argumentos))
+
+
+def obtener_en_lote(dynamodb, nombre_tabla, llaves, proyeccion=None):
+    """
+    Lee varios items por llave primaria con BatchGetItem (bloques de 100)
+    y reintenta UnprocessedKeys con backoff exponencial.
+
+    dynamodb: recurso boto3.resource('dynamodb')
+    llaves: lista de dicts con la llave completa; los duplicados se ignoran
+    proyeccion: lista de atributos a leer (opcional)
+
+    return: lista de items (sin orden garantizado)
+    """
+    unicas = []
+    vistas = set()
+    for llave in llaves:
+        firma = tuple(sorted(llave.items()))
+        if firma not in vistas:
+            vistas.add(firma)
+            unicas.append(llave)
+
+    items = []
+    for inicio in range(0, len(unicas), MAX_LLAVES_BATCH_GET):
+        solicitud = {'Keys': unicas[inicio:inicio + MAX_LLAVES_BATCH_GET]}
+        if proyeccion:
+            solicitud['ProjectionExpression'] = ', '.join(f'#proy{i}' for i in range(len(proyeccion)))
+            solicitud['ExpressionAttributeNames'] = {
+                f'#proy{i}': atributo for i, atributo in enumerate(proyeccion)
+            }
+
+        pendientes = {nombre_tabla: solicitud}
+        intento = 0
+        while pendientes:
+            resultado = dynamodb.batch_get_item(RequestItems=pendientes)
+            items.extend(resultado.get('Responses', {}).get(nombre_tabla, []))
+
+            pendientes = resultado.get('UnprocessedKeys') or {}
+            if pendientes:
+                intento += 1
+                if intento > MAX_REINTENTOS_BATCH:
+                    raise RuntimeError(f'BatchGetItem sin procesar en {nombre_tabla} tras {MAX_REINTENTOS_BATCH} reintentos')
+                time.sleep(min(0.05 * (2 ** intento), 1.0))
+
+    return items
+
+
+def eliminar_en_lote(dynamodb, nombre_tabla, llaves):
+    """
+    Elimina varios items por llave primaria con BatchWriteItem (bloques de
+    25) y reintenta UnprocessedItems con backoff exponencial.
+
+    dynamodb: recurso boto3.resource('dynamodb')
+    llaves: lista de dicts con la llave completa (sin duplicados)
+
+    return: número de items eliminados
+    """
+    for inicio in range(0, len(llaves), MAX_ITEMS_BATCH_WRITE):
+        pendientes = {
+            nombre_tabla: [
+                {'DeleteRequest': {'Key': llave}}
+                for llave in llaves[inicio:inicio + MAX_ITEMS_BATCH_WRITE]
+            ]
+        }
+        intento = 0
+        while pendientes:
+            resultado = dynamodb.batch_write_item(RequestItems=pendientes)
+
+            pendientes = resultado.get('UnprocessedItems') or {}
+            if pendientes:
+                intento += 1
+                if intento > MAX_REINTENTOS_BATCH:
+                    raise RuntimeError(f'BatchWriteItem sin procesar en {nombre_tabla} tras {MAX_REINTENTOS_BATCH} reintentos')
+                time.sleep(min(0.05 * (2 ** intento), 1.0))
+
+    return len(llaves)
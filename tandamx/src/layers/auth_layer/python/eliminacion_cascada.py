@@ -0,0 +1,138 @@
+# ========================================
+# LAYER: eliminacion_cascada.py
+# Eliminación en cascada por lotes, en paralelo y reanudable
+# ========================================
+#
+# Una eliminación es una lista de pasos; cada paso vacía una partición
+# (query paginado de solo llaves + BatchWriteItem de 25 en 25). Los pasos
+# corren en paralelo y su avance se guarda en la tabla trabajos_eliminacion:
+# si a la Lambda se le acaba el tiempo, la siguiente llamada con el mismo
+# trabajoId retoma solo los pasos pendientes. Los items padre (tanda,
+# usuario) se eliminan al final, así una llamada repetida los sigue
+# encontrando.
+
+import os
+from datetime import datetime, timedelta
+
+from dynamo_utils import (
+    iterar_query,
+    consultar_en_paralelo,
+    eliminar_en_lote,
+    MAX_ITEMS_BATCH_WRITE
+)
+
+# Tiempo que se deja libre antes del timeout para guardar el avance
+MARGEN_TIEMPO_MS = int(os.environ.get('ELIMINACION_MARGEN_MS', '5000'))
+
+# Un trabajo abandonado se borra solo (TTL)
+TTL_TRABAJO_DIAS = 7
+
+class Plazo:
+    """Tiempo restante de la invocación; sin context no hay límite"""
+    def __init__(self, context, margen_ms=MARGEN_TIEMPO_MS):
+        self.context = context
+        self.margen_ms = margen_ms
+
+    def agotado(self):
+        if self.context is None or not hasattr(self.context, 'get_remaining_time_in_millis'):
+            return False
+        return self.context.get_remaining_time_in_millis() < self.margen_ms
+
+def paso(nombre, table, llaves, condicion, indice=None, contador=None):
+    """
+    nombre: identificador único del paso dentro del trabajo
+    llaves: atributos de la llave primaria de la tabla
+    condicion: KeyConditionExpression de la partición a vaciar
+    indice: GSI a consultar (opcional)
+    contador: nombre del contador en el resumen (por defecto, la tabla)
+    """
+    return {
+        'nombre': nombre,
+        'tabla': table,
+        'llaves': llaves,
+        'condicion': condicion,
+        'indice': indice,
+        'contador': contador or table.name
+    }
+
+def vaciar_particion(dynamodb, paso, plazo):
+    """
+    Elimina todos los items de la partición del paso.
+
+    return: (eliminados, completo); completo=False si se agotó el plazo
+    """
+    if plazo.agotado():
+        return 0, False
+
+    kwargs = {'KeyConditionExpression': paso['condicion']}
+    if paso['indice']:
+        kwargs['IndexName'] = paso['indice']
+
+    eliminados = 0
+    bloque = []
+    for item in iterar_query(paso['tabla'], proyeccion=paso['llaves'], **kwargs):
+        bloque.append({llave: item[llave] for llave in paso['llaves']})
+        if len(bloque) == MAX_ITEMS_BATCH_WRITE:
+            eliminados += eliminar_en_lote(dynamodb, paso['tabla'].name, bloque)
+            bloque = []
+            if plazo.agotado():
+                return eliminados, False
+
+    if bloque:
+        eliminados += eliminar_en_lote(dynamodb, paso['tabla'].name, bloque)
+    return eliminados, True
+
+def cargar_trabajo(trabajos_table, trabajo_id):
+    """return: (pasos completados, contadores acumulados)"""
+    item = trabajos_table.get_item(Key={'trabajoId': trabajo_id}).get('Item') or {}
+    contadores = {nombre: int(valor) for nombre, valor in item.get('contadores', {}).items()}
+    return set(item.get('completados', [])), contadores
+
+def guardar_trabajo(trabajos_table, trabajo_id, completados, contadores):
+    trabajos_table.put_item(Item={
+        'trabajoId': trabajo_id,
+        'completados': sorted(completados),
+        'contadores': contadores,
+        'updatedAt': datetime.utcnow().isoformat(),
+        'ttl': int((datetime.utcnow() + timedelta(days=TTL_TRABAJO_DIAS)).timestamp())
+    })
+
+def finalizar_trabajo(trabajos_table, trabajo_id):
+    trabajos_table.delete_item(Key={'trabajoId': trabajo_id})
+
+def ejecutar_cascada(dynamodb, trabajos_table, trabajo_id, pasos, plazo):
+    """
+    Ejecuta en paralelo los pasos que el trabajo aún no completó y guarda
+    el avance si alguno quedó pendiente o falló.
+
+    return: (completo, contadores acumulados de todas las llamadas)
+    """
+    completados, contadores = cargar_trabajo(trabajos_table, trabajo_id)
+    for p in pasos:
+        contadores.setdefault(p['contador'], 0)
+    pendientes = [p for p in pasos if p['nombre'] not in completados]
+
+    def ejecutar(p):
+        try:
+            return p, vaciar_particion(dynamodb, p, plazo), None
+        except Exception as e:
+            return p, (0, False), e
+
+    error = None
+    for p, (eliminados, completo), e in consultar_en_paralelo(ejecutar, pendientes):
+        contadores[p['contador']] += eliminados
+        if completo:
+            completados.add(p['nombre'])
+        if e is not None:
+            print(f"❌ Error en paso {p['nombre']}: {str(e)}")
+            error = error or e
+
+    completo = all(p['nombre'] in completados for p in pasos)
+    if not completo:
+        guardar_trabajo(trabajos_table, trabajo_id, completados, contadores)
+        print(f"⏸️ Trabajo {trabajo_id}: {len(completados)}/{len(pasos)} pasos completos, avance guardado")
+
+    if error is not None:
+        raise error
+
+    return completo, contadores
@@ -0,0 +1,233 @@
+# ========================================
+# LAYER: estadisticas_materializadas.py
+# Contadores precalculados por tanda (tabla estadisticas_tandas)
+# ========================================
+#
+# Un item por tanda (id = tandaId) con atributos planos que se mantienen
+# con ADD atómicos en cada escritura:
+#   totalRecaudado, totalPagados, totalParticipantes
+#   ronda#<n>            pagos marcados como pagados en la ronda n
+#   participante#<id>    pagos marcados como pagados del participante
+#   dia#<YYYY-MM-DD>     monto pagado ese día (para pagosUltimoMes)
+#
+# Los ADD solo son exactos sobre un item que ya se construyó desde cero:
+# reconstruir_estadisticas le pone reconciliadoAt. Un item sin él (p. ej.
+# el que crea el primer ADD de una tanda anterior al despliegue) solo
+# tiene deltas parciales y leer_estadisticas no lo usa.
+
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from botocore.exceptions import ClientError
+
+from agregados_pagos import parse_fecha_pago
+
+PREFIJO_RONDA = 'ronda#'
+PREFIJO_PARTICIPANTE = 'participante#'
+PREFIJO_DIA = 'dia#'
+
+# Reintentos de reconstruir_estadisticas cuando un ADD llega en medio
+INTENTOS_RECONSTRUIR = 5
+
+def delta_pago(pago, signo=1, monto_por_ronda=0):
+    """Contribución de un pago a los contadores (vacía si no está pagado)"""
+    if not pago or not pago.get('pagado', False):
+        return {}
+
+    delta = {
+        'totalRecaudado': signo * Decimal(str(pago.get('monto', monto_por_ronda))),
+        'totalPagados': signo,
+        f"{PREFIJO_RONDA}{int(pago['ronda'])}": signo,
+        f"{PREFIJO_PARTICIPANTE}{pago['participanteId']}": signo
+    }
+
+    fecha = parse_fecha_pago(pago.get('fechaPago'))
+    if fecha is not None:
+        delta[f"{PREFIJO_DIA}{fecha.date().isoformat()}"] = signo * Decimal(str(pago.get('monto', 0)))
+
+    return delta
+
+def sumar_deltas(*deltas):
+    """Combina varios deltas en uno y descarta los que suman cero"""
+    total = {}
+    for delta in deltas:
+        for atributo, valor in delta.items():
+            total[atributo] = total.get(atributo, 0) + valor
+    return {atributo: valor for atributo, valor in total.items() if valor != 0}
+
+def cambio_pago(anterior, nuevo, monto_por_ronda=0):
+    """Delta de reemplazar el pago 'anterior' (o None) por 'nuevo' (o None)"""
+    return sumar_deltas(
+        delta_pago(anterior, -1, monto_por_ronda),
+        delta_pago(nuevo, 1, monto_por_ronda)
+    )
+
+def aplicar_delta(stats_table, tanda_id, delta, remover=()):
+    """
+    Aplica un delta al item de la tanda con un solo update_item (ADD
+    atómico). 'remover' son atributos a eliminar (REMOVE); no se suman.
+    """
+    delta = {a: v for a, v in delta.items() if a not in remover}
+    if not delta and not remover:
+        return
+
+    nombres = {}
+    valores = {':now': datetime.utcnow().isoformat()}
+    expresion = 'SET updatedAt = :now'
+
+    if delta:
+        adds = []
+        for i, (atributo, valor) in enumerate(delta.items()):
+            nombres[f'#a{i}'] = atributo
+            valores[f':v{i}'] = valor
+            adds.append(f'#a{i} :v{i}')
+        expresion += ' ADD ' + ', '.join(adds)
+
+    if remover:
+        removes = []
+        for i, atributo in enumerate(remover):
+            nombres[f'#r{i}'] = atributo
+            removes.append(f'#r{i}')
+        expresion += ' REMOVE ' + ', '.join(removes)
+
+    kwargs = {
+        'Key': {'id': tanda_id},
+        'UpdateExpression': expresion,
+        'ExpressionAttributeValues': valores
+    }
+    if nombres:
+        kwargs['ExpressionAttributeNames'] = nombres
+    stats_table.update_item(**kwargs)
+
+def calcular_contadores(pagos, participantes, monto_por_ronda=0):
+    """Contadores desde cero a partir de las particiones de pagos y participantes"""
+    contadores = sumar_deltas(*(delta_pago(p, 1, monto_por_ronda) for p in pagos))
+    contadores['totalParticipantes'] = len(participantes)
+    return contadores
+
+def _contadores_de_item(item):
+    return {
+        atributo: valor
+        for atributo, valor in item.items()
+        if atributo not in ('id', 'updatedAt', 'reconciliadoAt')
+    }
+
+def comparar_contadores(esperados, actuales):
+    """Diferencias {atributo: {'esperado', 'actual'}}; un atributo faltante vale 0"""
+    desviaciones = {}
+    for atributo in set(esperados) | set(actuales):
+        esperado = esperados.get(atributo, 0)
+        actual = actuales.get(atributo, 0)
+        if esperado != actual:
+            desviaciones[atributo] = {'esperado': esperado, 'actual': actual}
+    return desviaciones
+
+def reconstruir_estadisticas(stats_table, tanda_id, cargar, monto_por_ronda=0, solo_reportar=False):
+    """
+    Recalcula los contadores desde cero, los compara con el item guardado
+    y lo reemplaza si hay desviación o si nunca se había reconstruido (a
+    menos que solo_reportar).
+
+    El item se lee antes que los pagos y el put es condicional al
+    updatedAt leído: si un ADD llega en medio el put falla y se vuelve a
+    leer todo. Un pago escrito antes de la lectura cuyo ADD llega después
+    del put se cuenta dos veces; la reconciliación nocturna lo corrige.
+
+    cargar: función sin argumentos que regresa (pagos, participantes)
+
+    return: desviaciones encontradas (vacío si todo cuadra)
+    """
+    for intento in range(1, INTENTOS_RECONSTRUIR + 1):
+        actual = stats_table.get_item(Key={'id': tanda_id}, ConsistentRead=True).get('Item') or {}
+        pagos, participantes = cargar()
+        esperados = calcular_contadores(pagos, participantes, monto_por_ronda)
+        desviaciones = comparar_contadores(esperados, _contadores_de_item(actual))
+
+        if solo_reportar or not (desviaciones or 'reconciliadoAt' not in actual):
+            return desviaciones
+
+        if actual:
+            condicion = {
+                'ConditionExpression': 'updatedAt = :leido',
+                'ExpressionAttributeValues': {':leido': actual.get('updatedAt')}
+            }
+        else:
+            condicion = {'ConditionExpression': 'attribute_not_exists(id)'}
+
+        ahora = datetime.utcnow().isoformat()
+        try:
+            stats_table.put_item(
+                Item={'id': tanda_id, **esperados, 'updatedAt': ahora, 'reconciliadoAt': ahora},
+                **condicion
+            )
+            return desviaciones
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            print(f"🔁 Estadísticas de {tanda_id} cambiaron al reconstruir (intento {intento})")
+
+    raise RuntimeError(f"No se pudieron reconstruir las estadísticas de {tanda_id}: "
+                       f"cambiaron en {INTENTOS_RECONSTRUIR} intentos")
+
+def leer_estadisticas(stats_table, tanda_id):
+    """
+    Lee el item de contadores de una tanda con un solo get_item.
+
+    return: None si la tanda aún no tiene contadores reconstruidos (sin
+    item o sin reconciliadoAt: hay que llamar a reconstruir_estadisticas), o
+    {
+        'totalRecaudado': float, 'totalPagados': int, 'totalParticipantes': int,
+        'pagadosPorRonda': {ronda: int},
+        'pagadosPorParticipante': {participanteId: int},
+        'recaudadoPorDia': {'YYYY-MM-DD': float}
+    }
+    """
+    item = stats_table.get_item(Key={'id': tanda_id}).get('Item')
+    if not item or 'reconciliadoAt' not in item:
+        return None
+
+    estadisticas = {
+        'totalRecaudado': float(item.get('totalRecaudado', 0)),
+        'totalPagados': int(item.get('totalPagados', 0)),
+        'totalParticipantes': int(item.get('totalParticipantes', 0)),
+        'pagadosPorRonda': {},
+        'pagadosPorParticipante': {},
+        'recaudadoPorDia': {}
+    }
+
+    for atributo, valor in item.items():
+        if atributo.startswith(PREFIJO_RONDA):
+            estadisticas['pagadosPorRonda'][int(atributo[len(PREFIJO_RONDA):])] = int(valor)
+        elif atributo.startswith(PREFIJO_PARTICIPANTE):
+            estadisticas['pagadosPorParticipante'][atributo[len(PREFIJO_PARTICIPANTE):]] = int(valor)
+        elif atributo.startswith(PREFIJO_DIA):
+            estadisticas['recaudadoPorDia'][atributo[len(PREFIJO_DIA):]] = float(valor)
+
+    return estadisticas
+
+def distribucion_desde_estadisticas(estadisticas, participantes, ronda_actual):
+    """
+    Participantes al corriente, atrasados y adelantados a partir de los
+    conteos por participante (los que no aparecen llevan 0 pagos). O(P).
+    """
+    pagos_esperados = ronda_actual - 1
+    conteos = estadisticas['pagadosPorParticipante']
+
+    distribucion = {'al_corriente': 0, 'atrasados': 0, 'adelantados': 0}
+    for participante in participantes:
+        pagados = conteos.get(participante['participanteId'], 0)
+        if pagados >= pagos_esperados:
+            distribucion['al_corriente'] += 1
+        else:
+            distribucion['atrasados'] += 1
+        if pagados > pagos_esperados:
+            distribucion['adelantados'] += 1
+    return distribucion
+
+def recaudado_desde(estadisticas, dias=30):
+    """Monto pagado en los últimos 'dias' días según los contadores diarios"""
+    limite = (datetime.now(timezone.utc) - timedelta(days=dias)).date().isoformat()
+    return sum(
+        monto for dia, monto in estadisticas['recaudadoPorDia'].items()
+        if dia > limite
+    )
@@ -25,7 +25,8 @@ from .exceptions import (
     PyJWKSetError,
     PyJWTError,
 )
-from .jwks_client import PyJWKClient
+from .fast_hs256 import FastHS256Verifier
+from .jwks_client import AsyncRefreshingJWKClient, PyJWKClient, RefreshingJWKClient
 
 __version__ = "2.8.0"
 
@@ -46,8 +47,11 @@ __all__ = [
     "PyJWS",
     "PyJWT",
     "PyJWKClient",
+    "RefreshingJWKClient",
+    "AsyncRefreshingJWKClient",
     "PyJWK",
     "PyJWKSet",
+    "FastHS256Verifier",
     "decode",
     "encode",
     "get_unverified_header",
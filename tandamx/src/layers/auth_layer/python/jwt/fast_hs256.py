@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import binascii
+import hashlib
+import hmac
+import json
+import time
+from base64 import urlsafe_b64decode
+from collections.abc import Iterable
+from datetime import timedelta
+from typing import Any
+
+from .algorithms import HMACAlgorithm
+from .api_jwt import PyJWT
+from .exceptions import (
+    DecodeError,
+    ExpiredSignatureError,
+    ImmatureSignatureError,
+    InvalidAlgorithmError,
+    InvalidIssuedAtError,
+    InvalidSignatureError,
+    MissingRequiredClaimError,
+)
+
+# Distinct header segments remembered per verifier (a service issues one or two)
+_MAX_CACHED_HEADERS = 16
+
+
+def _b64decode(segment: bytes) -> bytes:
+    return urlsafe_b64decode(segment + b"=" * (-len(segment) % 4))
+
+
+class FastHS256Verifier:
+    """
+    Verifier for HS256 tokens signed with a single secret.
+
+    Equivalent to ``jwt.decode(token, key, algorithms=["HS256"], ...)``
+    with the same options, audience, issuer and leeway, raising the same
+    exceptions with the same messages, but with the per-call work done once:
+
+    - the key is validated (``HMACAlgorithm.prepare_key``) and its HMAC
+      state is built at construction; each call only copies it
+    - the algorithm is pinned, there is no registry lookup
+    - options are merged once and reduced to flags
+    - parsed headers are remembered by their encoded segment
+    - exp/nbf/iat use ``time.time()`` instead of building a datetime
+    """
+
+    def __init__(
+        self,
+        key: str | bytes,
+        *,
+        options: dict[str, Any] | None = None,
+        audience: str | Iterable[str] | None = None,
+        issuer: str | None = None,
+        leeway: float | timedelta = 0,
+    ) -> None:
+        self._key = HMACAlgorithm(HMACAlgorithm.SHA256).prepare_key(key)
+        self._hmac = hmac.new(self._key, digestmod=hashlib.sha256)
+
+        options = dict(options or {})
+        if not options.get("verify_signature", True):
+            raise ValueError(
+                "FastHS256Verifier always verifies the signature; "
+                "use jwt.decode() for unverified tokens."
+            )
+        self._options = {**PyJWT._get_default_options(), **options}
+        self._require = tuple(self._options["require"])
+        self._verify_iat = self._options["verify_iat"]
+        self._verify_nbf = self._options["verify_nbf"]
+        self._verify_exp = self._options["verify_exp"]
+        self._verify_iss = self._options["verify_iss"]
+        self._verify_aud = self._options["verify_aud"]
+
+        if audience is not None and not isinstance(audience, (str, Iterable)):
+            raise TypeError("audience must be a string, iterable or None")
+        self._audience = audience
+        self._issuer = issuer
+        self._leeway = (
+            leeway.total_seconds() if isinstance(leeway, timedelta) else leeway
+        )
+        # aud/iss checks are rare and intricate: reuse PyJWT's own
+        self._claims = PyJWT()
+        self._headers: dict[bytes, dict[str, Any]] = {}
+
+    def decode(self, jwt: str | bytes) -> dict[str, Any]:
+        return self.decode_complete(jwt, _copy_header=False)["payload"]
+
+    def decode_complete(
+        self, jwt: str | bytes, *, _copy_header: bool = True
+    ) -> dict[str, Any]:
+        # --- api_jws._load ---
+        if isinstance(jwt, str):
+            jwt = jwt.encode("utf-8")
+
+        if not isinstance(jwt, bytes):
+            raise DecodeError(f"Invalid token type. Token must be a {bytes}")
+
+        try:
+            signing_input, crypto_segment = jwt.rsplit(b".", 1)
+            header_segment, payload_segment = signing_input.split(b".", 1)
+        except ValueError as err:
+            raise DecodeError("Not enough segments") from err
+
+        header = self._headers.get(header_segment)
+        if header is None:
+            header = self._load_header(header_segment)
+
+        try:
+            payload = _b64decode(payload_segment)
+        except (TypeError, binascii.Error) as err:
+            raise DecodeError("Invalid payload padding") from err
+
+        try:
+            signature = _b64decode(crypto_segment)
+        except (TypeError, binascii.Error) as err:
+            raise DecodeError("Invalid crypto padding") from err
+
+        # --- api_jws.decode_complete / _verify_signature ---
+        if header.get("b64", True) is False:
+            raise DecodeError(
+                'It is required that you pass in a value for the "detached_payload" argument to decode a message having the b64 header set to false.'
+            )
+
+        try:
+            alg = header["alg"]
+        except KeyError:
+            raise InvalidAlgorithmError("Algorithm not specified")
+
+        if alg != "HS256":
+            raise InvalidAlgorithmError("The specified alg value is not allowed")
+
+        mac = self._hmac.copy()
+        mac.update(signing_input)
+        if not hmac.compare_digest(signature, mac.digest()):
+            raise InvalidSignatureError("Signature verification failed")
+
+        # --- api_jwt._decode_payload ---
+        try:
+            claims = json.loads(payload)
+        except ValueError as e:
+            raise DecodeError(f"Invalid payload string: {e}")
+        if not isinstance(claims, dict):
+            raise DecodeError("Invalid payload string: must be a json object")
+
+        self._validate_claims(claims)
+
+        return {
+            "payload": claims,
+            "header": dict(header) if _copy_header else header,
+            "signature": signature,
+        }
+
+    def _load_header(self, header_segment: bytes) -> dict[str, Any]:
+        try:
+            header_data = _b64decode(header_segment)
+        except (TypeError, binascii.Error) as err:
+            raise DecodeError("Invalid header padding") from err
+
+        try:
+            header = json.loads(header_data)
+        except ValueError as e:
+            raise DecodeError(f"Invalid header string: {e}") from e
+
+        if not isinstance(header, dict):
+            raise DecodeError("Invalid header string: must be a json object")
+
+        if len(self._headers) < _MAX_CACHED_HEADERS:
+            self._headers[header_segment] = header
+        return header
+
+    def _validate_claims(self, payload: dict[str, Any]) -> None:
+        for claim in self._require:
+            if payload.get(claim) is None:
+                raise MissingRequiredClaimError(claim)
+
+        now = time.time()
+        leeway = self._leeway
+
+        if self._verify_iat and "iat" in payload:
+            try:
+                iat = int(payload["iat"])
+            except ValueError:
+                raise InvalidIssuedAtError("Issued At claim (iat) must be an integer.")
+            if iat > (now + leeway):
+                raise ImmatureSignatureError("The token is not yet valid (iat)")
+
+        if self._verify_nbf and "nbf" in payload:
+            try:
+                nbf = int(payload["nbf"])
+            except ValueError:
+                raise DecodeError("Not Before claim (nbf) must be an integer.")
+            if nbf > (now + leeway):
+                raise ImmatureSignatureError("The token is not yet valid (nbf)")
+
+        if self._verify_exp and "exp" in payload:
+            try:
+                exp = int(payload["exp"])
+            except ValueError:
+                raise DecodeError("Expiration Time claim (exp) must be an" " integer.")
+            if exp <= (now - leeway):
+                raise ExpiredSignatureError("Signature has expired")
+
+        if self._verify_iss and self._issuer is not None:
+            self._claims._validate_iss(payload, self._issuer)
+
+        if self._verify_aud and (self._audience is not None or payload.get("aud")):
+            self._claims._validate_aud(
+                payload, self._audience, strict=self._options.get("strict_aud", False)
+            )
@@ -1,15 +1,38 @@
+from __future__ import annotations
+
 import json
-import urllib.request
+import threading
+import time
 from functools import lru_cache
-from ssl import SSLContext
-from typing import Any, Dict, List, Optional
-from urllib.error import URLError
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional
 
 from .api_jwk import PyJWK, PyJWKSet
 from .api_jwt import decode_complete as decode_token
 from .exceptions import PyJWKClientConnectionError, PyJWKClientError
 from .jwk_set_cache import JWKSetCache
 
+if TYPE_CHECKING:
+    import asyncio
+    from ssl import SSLContext
+
+
+def _fetch_json(
+    uri: str, headers: Dict[str, Any], timeout: float, ssl_context: Optional["SSLContext"]
+) -> Any:
+    # urllib.request pulls in http.client, email and ssl: import it when
+    # the keys are fetched, not when jwt is imported
+    import urllib.request
+    from urllib.error import URLError
+
+    try:
+        r = urllib.request.Request(url=uri, headers=headers)
+        with urllib.request.urlopen(r, timeout=timeout, context=ssl_context) as response:
+            return json.load(response)
+    except (URLError, TimeoutError) as e:
+        raise PyJWKClientConnectionError(
+            f'Fail to fetch data from the url, err: "{e}"'
+        )
+
 
 class PyJWKClient:
     def __init__(
@@ -21,7 +44,7 @@ class PyJWKClient:
         lifespan: int = 300,
         headers: Optional[Dict[str, Any]] = None,
         timeout: int = 30,
-        ssl_context: Optional[SSLContext] = None,
+        ssl_context: Optional["SSLContext"] = None,
     ):
         if headers is None:
             headers = {}
@@ -50,16 +73,7 @@ class PyJWKClient:
     def fetch_data(self) -> Any:
         jwk_set: Any = None
         try:
-            r = urllib.request.Request(url=self.uri, headers=self.headers)
-            with urllib.request.urlopen(
-                r, timeout=self.timeout, context=self.ssl_context
-            ) as response:
-                jwk_set = json.load(response)
-        except (URLError, TimeoutError) as e:
-            raise PyJWKClientConnectionError(
-                f'Fail to fetch data from the url, err: "{e}"'
-            )
-        else:
+            jwk_set = _fetch_json(self.uri, self.headers, self.timeout, self.ssl_context)
             return jwk_set
         finally:
             if self.jwk_set_cache is not None:
@@ -122,3 +136,302 @@ class PyJWKClient:
                 break
 
         return signing_key
+
+
+class _RefreshingJWKClientBase:
+    """
+    Shared state of RefreshingJWKClient and AsyncRefreshingJWKClient.
+
+    The signing keys of the last fetched JWK Set are kept in a dict by
+    ``kid``. Their age decides what a lookup does:
+
+    - younger than ``lifespan``: served from the dict
+    - up to ``lifespan + max_stale``: served from the dict while one
+      refresh runs in the background (stale-while-revalidate)
+    - older, or never fetched: the lookup waits for a refresh
+
+    Only one fetch runs at a time; lookups that need keys while it runs
+    wait for that same fetch. A ``kid`` that is not in the set triggers a
+    refresh (keys get rotated), at most once every
+    ``min_refresh_interval`` seconds so unknown ``kid`` values cannot be
+    used to hammer the endpoint. A failed background refresh keeps the
+    current keys and is retried after ``min_refresh_interval``.
+    """
+
+    def __init__(
+        self,
+        uri: str,
+        lifespan: float = 300,
+        max_stale: float = 3600,
+        min_refresh_interval: float = 30,
+        headers: Optional[Dict[str, Any]] = None,
+        timeout: float = 30,
+        ssl_context: Optional["SSLContext"] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if lifespan <= 0:
+            raise PyJWKClientError(
+                f'Lifespan must be greater than 0, the input is "{lifespan}"'
+            )
+        if max_stale < 0:
+            raise PyJWKClientError(
+                f'max_stale must not be negative, the input is "{max_stale}"'
+            )
+        self.uri = uri
+        self.lifespan = lifespan
+        self.max_stale = max_stale
+        self.min_refresh_interval = min_refresh_interval
+        self.headers = headers if headers is not None else {}
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+        self.clock = clock
+
+        # Replaced as a whole on each refresh, so readers need no lock
+        self._keys: Dict[str, PyJWK] = {}
+        self._fetched_at: Optional[float] = None
+        self._last_attempt: Optional[float] = None
+        self.last_error: Optional[Exception] = None
+
+    def _fetch_blocking(self) -> Any:
+        return _fetch_json(self.uri, self.headers, self.timeout, self.ssl_context)
+
+    @staticmethod
+    def _index(data: Any) -> Dict[str, PyJWK]:
+        if not isinstance(data, dict):
+            raise PyJWKClientError("The JWKS endpoint did not return a JSON object")
+
+        keys = {
+            key.key_id: key
+            for key in PyJWKSet.from_dict(data).keys
+            if key.public_key_use in ["sig", None] and key.key_id
+        }
+        if not keys:
+            raise PyJWKClientError("The JWKS endpoint did not contain any signing keys")
+        return keys
+
+    def _store(self, keys: Dict[str, PyJWK]) -> None:
+        self._keys = keys
+        self._fetched_at = self.clock()
+        self.last_error = None
+
+    def _needs_wait(self, now: float) -> bool:
+        """There are no keys, or they are too old to be served."""
+        return (
+            self._fetched_at is None
+            or now - self._fetched_at >= self.lifespan + self.max_stale
+        )
+
+    def _is_stale(self, now: float) -> bool:
+        return self._fetched_at is not None and now - self._fetched_at >= self.lifespan
+
+    def _may_refresh(self, now: float) -> bool:
+        return (
+            self._last_attempt is None
+            or now - self._last_attempt >= self.min_refresh_interval
+        )
+
+    @staticmethod
+    def _no_key(kid: str) -> PyJWKClientError:
+        return PyJWKClientError(f'Unable to find a signing key that matches: "{kid}"')
+
+    @staticmethod
+    def _kid_from_jwt(token: str) -> str:
+        unverified = decode_token(token, options={"verify_signature": False})
+        return unverified["header"].get("kid")
+
+
+class _Flight:
+    """A fetch in progress: the thread that runs it publishes the keys or
+    the error, the others wait on it."""
+
+    def __init__(self) -> None:
+        self._done = threading.Event()
+        self._keys: Optional[Dict[str, PyJWK]] = None
+        self._error: Optional[Exception] = None
+
+    def set_result(self, keys: Dict[str, PyJWK]) -> None:
+        self._keys = keys
+        self._done.set()
+
+    def set_exception(self, error: Exception) -> None:
+        self._error = error
+        self._done.set()
+
+    def result(self) -> Dict[str, PyJWK]:
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        assert self._keys is not None
+        return self._keys
+
+
+class RefreshingJWKClient(_RefreshingJWKClientBase):
+    """
+    JWKS client for threaded code: keys indexed by ``kid``, refreshed in a
+    background thread when stale and fetched by one thread at a time.
+
+    On AWS Lambda the background thread is frozen with the execution
+    environment between invocations; a refresh started near the end of
+    one invocation finishes in the next one.
+    """
+
+    def __init__(self, uri: str, **kwargs: Any):
+        super().__init__(uri, **kwargs)
+        self._lock = threading.Lock()
+        self._flight: Optional[_Flight] = None
+
+    def fetch_data(self) -> Any:
+        return self._fetch_blocking()
+
+    def refresh(self) -> Dict[str, PyJWK]:
+        """Fetches the JWK Set now (or waits for the fetch in progress)."""
+        flight = self._refresh(background=False, rate_limited=False)
+        assert flight is not None
+        return flight.result()
+
+    def _refresh(
+        self, background: bool, rate_limited: bool
+    ) -> Optional[_Flight]:
+        with self._lock:
+            if self._flight is not None:
+                return self._flight
+            now = self.clock()
+            if rate_limited and not self._may_refresh(now):
+                return None
+            flight = self._flight = _Flight()
+            self._last_attempt = now
+
+        if background:
+            threading.Thread(
+                target=self._run, args=(flight,), name="jwks-refresh", daemon=True
+            ).start()
+        else:
+            self._run(flight)
+        return flight
+
+    def _run(self, flight: _Flight) -> None:
+        try:
+            keys = self._index(self.fetch_data())
+        except Exception as e:
+            self.last_error = e
+            with self._lock:
+                self._flight = None
+            flight.set_exception(e)
+        else:
+            self._store(keys)
+            with self._lock:
+                self._flight = None
+            flight.set_result(keys)
+
+    def get_signing_key(self, kid: str) -> PyJWK:
+        now = self.clock()
+        if self._needs_wait(now):
+            self.refresh()
+        elif self._is_stale(now):
+            self._refresh(background=True, rate_limited=True)
+
+        signing_key = self._keys.get(kid)
+        if signing_key is None:
+            # Possibly a rotated key: join the fetch in progress or start one
+            flight = self._refresh(background=False, rate_limited=True)
+            if flight is not None:
+                signing_key = flight.result().get(kid)
+            if signing_key is None:
+                raise self._no_key(kid)
+
+        return signing_key
+
+    def get_signing_key_from_jwt(self, token: str) -> PyJWK:
+        return self.get_signing_key(self._kid_from_jwt(token))
+
+
+class AsyncRefreshingJWKClient(_RefreshingJWKClientBase):
+    """
+    asyncio version of RefreshingJWKClient: the refresh is a task shared by
+    every coroutine that needs it, and stale keys are refreshed by a task
+    nobody waits for. Use one instance per event loop.
+
+    ``fetch_data`` runs the urllib request in the default executor;
+    override it (or pass ``fetcher``) to use an async HTTP client.
+    asyncio is imported on first use, like urllib, to keep it out of
+    ``import jwt``.
+    """
+
+    def __init__(
+        self,
+        uri: str,
+        fetcher: Optional[Callable[[], Awaitable[Any]]] = None,
+        **kwargs: Any,
+    ):
+        super().__init__(uri, **kwargs)
+        self._fetcher = fetcher
+        self._flight: Optional["asyncio.Task[Dict[str, PyJWK]]"] = None
+
+    async def fetch_data(self) -> Any:
+        if self._fetcher is not None:
+            return await self._fetcher()
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._fetch_blocking)
+
+    async def refresh(self) -> Dict[str, PyJWK]:
+        """Fetches the JWK Set now (or waits for the fetch in progress)."""
+        import asyncio
+
+        flight = self._refresh(rate_limited=False)
+        assert flight is not None
+        # A cancelled caller must not cancel the fetch the others wait for
+        return await asyncio.shield(flight)
+
+    def _refresh(self, rate_limited: bool) -> Optional["asyncio.Task[Dict[str, PyJWK]]"]:
+        import asyncio
+
+        if self._flight is not None:
+            return self._flight
+        now = self.clock()
+        if rate_limited and not self._may_refresh(now):
+            return None
+        self._last_attempt = now
+        self._flight = asyncio.ensure_future(self._run())
+        # Background refreshes are never awaited: retrieve their error here
+        # so asyncio does not log it as never retrieved
+        self._flight.add_done_callback(
+            lambda task: task.cancelled() or task.exception()
+        )
+        return self._flight
+
+    async def _run(self) -> Dict[str, PyJWK]:
+        try:
+            keys = self._index(await self.fetch_data())
+        except Exception as e:
+            self.last_error = e
+            raise
+        else:
+            self._store(keys)
+            return keys
+        finally:
+            self._flight = None
+
+    async def get_signing_key(self, kid: str) -> PyJWK:
+        import asyncio
+
+        now = self.clock()
+        if self._needs_wait(now):
+            await self.refresh()
+        elif self._is_stale(now):
+            self._refresh(rate_limited=True)
+
+        signing_key = self._keys.get(kid)
+        if signing_key is None:
+            # Possibly a rotated key: join the fetch in progress or start one
+            flight = self._refresh(rate_limited=True)
+            if flight is not None:
+                signing_key = (await asyncio.shield(flight)).get(kid)
+            if signing_key is None:
+                raise self._no_key(kid)
+
+        return signing_key
+
+    async def get_signing_key_from_jwt(self, token: str) -> PyJWK:
+        return await self.get_signing_key(self._kid_from_jwt(token))
@@ -0,0 +1,145 @@
+# ========================================
+# LAYER: tokens_verificados.py
+# Cache de tokens JWT ya verificados (por contenedor Lambda)
+# ========================================
+#
+# Un contenedor atiende muchas llamadas del mismo usuario con el mismo
+# token: la firma y los claims se verifican la primera vez y las
+# siguientes solo se busca el token en memoria.
+#
+# - La llave es el SHA-256 del token (el token no se guarda)
+# - Cada entrada vence en min(exp, ahora + TTL): un token expirado nunca
+#   sale del cache, se vuelve a verificar y PyJWT lanza el error de siempre
+# - LRU acotado a MAX_TOKENS entradas
+# - Un cache por secreto y algoritmos: un token verificado con otro
+#   secreto (refresh) no cuenta como verificado para este
+# - Los tokens inválidos no se guardan
+# - Con solo HS256 la verificación usa jwt.FastHS256Verifier (llave
+#   preparada una vez, mismas excepciones que jwt.decode)
+#
+# Las rutas con authorizer ya traen el usuario verificado en
+# requestContext.authorizer.lambda (ver lambda_authorizer); usuario_del_evento
+# lo toma de ahí y solo verifica el token en las rutas públicas.
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+
+TTL_SEGUNDOS = int(os.environ.get('TOKEN_CACHE_TTL_SECONDS', '300'))
+MAX_TOKENS = int(os.environ.get('TOKEN_CACHE_MAX_SIZE', '1024'))
+
+class CacheTokens:
+    """LRU con vencimiento por entrada; seguro entre hilos"""
+
+    def __init__(self, ttl=TTL_SEGUNDOS, maximo=MAX_TOKENS, reloj=time.time):
+        self.ttl = ttl
+        self.maximo = maximo
+        self.reloj = reloj
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, llave):
+        """return: claims guardados, o None si no están o ya vencieron"""
+        ahora = self.reloj()
+        with self._lock:
+            entrada = self._entradas.get(llave)
+            if entrada is None or entrada[0] <= ahora:
+                if entrada is not None:
+                    del self._entradas[llave]
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(llave)
+            self.aciertos += 1
+            return entrada[1]
+
+    def guardar(self, llave, claims):
+        vence = self.reloj() + self.ttl
+        exp = claims.get('exp')
+        if isinstance(exp, (int, float)):
+            vence = min(vence, exp)
+        with self._lock:
+            self._entradas[llave] = (vence, claims)
+            self._entradas.move_to_end(llave)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def __len__(self):
+        return len(self._entradas)
+
+_verificadores = {}
+_verificadores_lock = threading.Lock()
+
+def _verificador_de(secreto, algoritmos):
+    """return: (cache, función que verifica un token) para el secreto y algoritmos"""
+    llave = (hashlib.sha256(secreto.encode('utf-8')).digest(), algoritmos)
+    verificador = _verificadores.get(llave)
+    if verificador is None:
+        if algoritmos == ('HS256',):
+            decodificar = jwt.FastHS256Verifier(secreto).decode
+        else:
+            def decodificar(token):
+                return jwt.decode(token, secreto, algorithms=list(algoritmos))
+        with _verificadores_lock:
+            verificador = _verificadores.setdefault(llave, (CacheTokens(), decodificar))
+    return verificador
+
+def verificar_token(token, secreto, algoritmos=('HS256',)):
+    """
+    jwt.decode con cache de los tokens válidos.
+
+    return: claims del token
+    raises: las mismas excepciones de jwt.decode (ExpiredSignatureError,
+            InvalidTokenError, ...)
+    """
+    cache, decodificar = _verificador_de(secreto, tuple(algoritmos))
+    llave = hashlib.sha256(token.encode('utf-8')).digest()
+
+    claims = cache.obtener(llave)
+    if claims is None:
+        claims = decodificar(token)
+        cache.guardar(llave, claims)
+    # Copia: quien la reciba puede modificarla sin tocar el cache
+    return dict(claims)
+
+def token_del_evento(event):
+    """Token Bearer del header Authorization (o None)"""
+    headers = event.get('headers') or {}
+    auth_header = headers.get('Authorization') or headers.get('authorization')
+    if not auth_header:
+        return None
+    return auth_header.replace('Bearer ', '')
+
+def claims_del_authorizer(event):
+    """Contexto que dejó el Lambda authorizer (payload 2.0), o None en rutas públicas"""
+    authorizer = (event.get('requestContext') or {}).get('authorizer') or {}
+    contexto = authorizer.get('lambda')
+    return contexto if contexto and contexto.get('userId') else None
+
+def usuario_del_evento(event, secreto):
+    """
+    userId de la llamada: del authorizer si la ruta lo tiene; si no, del
+    token verificado (con cache).
+
+    return: userId, o None si no hay token o no es válido
+    """
+    contexto = claims_del_authorizer(event)
+    if contexto:
+        return contexto['userId']
+
+    token = token_del_evento(event)
+    if not token:
+        return None
+    try:
+        return verificar_token(token, secreto).get('id')
+    except jwt.InvalidTokenError:
+        return None
@@ -0,0 +1,146 @@
+# ========================================
+# LAYER: vistas_tandas.py
+# Vista desnormalizada por tanda (tabla vistas_tandas_v2)
+# ========================================
+#
+# Una partición por tanda (id = tandaId), mantenida por lambda_vistas a
+# partir de los DynamoDB Streams de participantes y pagos. Un item por
+# entidad, así ninguna tanda se topa con el límite de 400 KB por item:
+#   seccion '#meta'                        estado de la vista (sale primero en el query)
+#   seccion 'participantes#<participanteId>'  {'version', 'datos' | 'eliminado'}
+#   seccion 'pagos#<pagoId>'                  {'version', 'datos' | 'eliminado'}
+#
+# Estados de '#meta':
+#   sembrando     la vista se está llenando con el estado previo de las tablas
+#   completa      los lectores pueden usarla
+#   no_soportada  una entidad no cupo en un item; los lectores consultan
+#                 las tablas y lambda_vistas ya no la mantiene
+#
+# 'version' es el SequenceNumber del último evento aplicado, rellenado con
+# ceros para compararlo como cadena. Los eliminados quedan como lápida para
+# que un evento viejo reentregado no los reviva; la lápida expira por TTL
+# cuando el stream ya no puede reentregar eventos anteriores.
+#
+# Leer lo propio: el stream aplica los cambios con retraso, así que una
+# lectura justo después de escribir no debe salir de la vista. Quien
+# escribe en participantes o pagos marca la tanda con la hora de la
+# escritura ('escritura<Coleccion>At', ver marcar_escritura) y
+# lambda_vistas guarda en '#meta' la hora en que empezó el último lote que
+# aplicó completo para esa colección ('aplicado<Coleccion>At'). La vista
+# solo se usa si, para las dos colecciones, lo aplicado no es anterior a
+# lo escrito; si no, el lector consulta las tablas. Pasado
+# VISTAS_RETRASO_MAX_SEGUNDOS desde la escritura se usa de todos modos,
+# para que un cambio aplicado en un lote que empezó antes de marcar la
+# tanda no la deje consultando las tablas para siempre.
+
+import os
+from datetime import datetime, timedelta
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+from dynamo_utils import iterar_query
+
+ANCHO_VERSION = 40
+VERSION_SEMILLA = '0' * ANCHO_VERSION
+
+COLECCION_PARTICIPANTES = 'participantes'
+COLECCION_PAGOS = 'pagos'
+
+LLAVES_COLECCION = {
+    COLECCION_PARTICIPANTES: 'participanteId',
+    COLECCION_PAGOS: 'pagoId'
+}
+
+SECCION_META = '#meta'
+
+ESTADO_SEMBRANDO = 'sembrando'
+ESTADO_COMPLETA = 'completa'
+ESTADO_NO_SOPORTADA = 'no_soportada'
+
+RETRASO_MAX_SEGUNDOS = int(os.environ.get('VISTAS_RETRASO_MAX_SEGUNDOS', '300'))
+
+def version_de(sequence_number):
+    """SequenceNumber del stream comparable como cadena"""
+    return str(sequence_number).zfill(ANCHO_VERSION)
+
+def seccion_de(coleccion, entidad_id):
+    return f"{coleccion}#{entidad_id}"
+
+def llave_meta(tanda_id):
+    return {'id': tanda_id, 'seccion': SECCION_META}
+
+def atributo_escritura(coleccion):
+    """Atributo de la tanda con la hora de la última escritura en la colección"""
+    return f"escritura{coleccion.capitalize()}At"
+
+def atributo_aplicado(coleccion):
+    """Atributo de '#meta' con la hora hasta la que la vista aplicó la colección"""
+    return f"aplicado{coleccion.capitalize()}At"
+
+def marcar_escritura(tandas_table, tanda_id, coleccion):
+    """
+    Registra en la tanda que se acaba de escribir en la colección; hasta
+    que lambda_vistas la aplique, leer_vista regresa None.
+    """
+    try:
+        tandas_table.update_item(
+            Key={'id': tanda_id},
+            UpdateExpression='SET #escritura = :now',
+            ConditionExpression='attribute_exists(id)',
+            ExpressionAttributeNames={'#escritura': atributo_escritura(coleccion)},
+            ExpressionAttributeValues={':now': datetime.utcnow().isoformat()}
+        )
+    except ClientError as e:
+        # La tanda se eliminó mientras tanto: no hay vista que leer
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+def vista_al_dia(meta, tanda, ahora=None):
+    """
+    return: True si la vista ya aplicó las últimas escrituras de la tanda
+            en las dos colecciones (o si pasó el retraso máximo)
+    """
+    if not tanda:
+        return True
+    ahora = ahora or datetime.utcnow()
+    limite = (ahora - timedelta(seconds=RETRASO_MAX_SEGUNDOS)).isoformat()
+
+    for coleccion in LLAVES_COLECCION:
+        escritura = tanda.get(atributo_escritura(coleccion))
+        if not escritura or escritura <= limite:
+            continue
+        if meta.get(atributo_aplicado(coleccion), '') < escritura:
+            return False
+    return True
+
+def leer_vista(vistas_table, tanda_id, tanda=None):
+    """
+    Lee la vista de una tanda con un query a su partición.
+
+    tanda: item de la tabla tandas; con él la vista solo se usa si ya
+           aplicó las últimas escrituras (ver vista_al_dia)
+
+    return: (participantes, pagos) con la misma forma que los items de sus
+            tablas (ordenados por llave de rango), o None si la tanda no
+            tiene vista completa o al día y hay que consultar las tablas.
+    """
+    items = iterar_query(vistas_table, KeyConditionExpression=Key('id').eq(tanda_id))
+
+    # '#meta' ordena antes que cualquier entidad: si la vista no está
+    # completa o al día no se leen más páginas
+    meta = next(items, None)
+    if not meta or meta['seccion'] != SECCION_META or meta.get('estado') != ESTADO_COMPLETA:
+        return None
+    if not vista_al_dia(meta, tanda):
+        return None
+
+    entidades = {COLECCION_PARTICIPANTES: [], COLECCION_PAGOS: []}
+    for item in items:
+        if item.get('eliminado'):
+            continue
+        coleccion, entidad_id = item['seccion'].split('#', 1)
+        llave = LLAVES_COLECCION[coleccion]
+        entidades[coleccion].append({**item.get('datos', {}), 'id': tanda_id, llave: entidad_id})
+
+    return entidades[COLECCION_PARTICIPANTES], entidades[COLECCION_PAGOS]
@@ -0,0 +1,316 @@
+"""
+Comprueba RefreshingJWKClient y AsyncRefreshingJWKClient contra un JWKS local
+
+Levanta un ThreadingHTTPServer en 127.0.0.1 que sirve un JWK Set (llaves
+HS256 'oct', sin cryptography) con retraso, llaves y fallas configurables,
+y cuenta cada petición. Los clientes usan un reloj falso, así que la
+vigencia (lifespan), la ventana stale (max_stale) y el intervalo mínimo
+entre refrescos se recorren sin esperar. Con la copia de jwt de la capa
+auth_layer comprueba, para el cliente con hilos y el de asyncio:
+
+- single-flight: muchas búsquedas con el cache frío hacen una petición
+- llaves vigentes: se sirven sin peticiones
+- stale-while-revalidate: con llaves viejas la búsqueda no espera el
+  refresco (que corre una sola vez en segundo plano) y la llave rotada
+  aparece después
+- kid desconocido: a lo más un refresco por min_refresh_interval
+- endpoint caído: se siguen sirviendo las llaves viejas, el refresco se
+  reintenta después del intervalo y pasado max_stale se lanza el error
+- (asyncio) cancelar a quien espera no cancela la petición compartida
+
+Cada comprobación imprime ✅ o ❌; el script termina con código 1 si
+alguna falla. Está fuera de auth_layer/ para no subirlo con la capa.
+
+Uso:
+    python comprobar_jwks.py
+    python comprobar_jwks.py --retraso 0.5 --concurrencia 100
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import asyncio
+import argparse
+import platform
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LAYER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'auth_layer', 'python')
+sys.path.insert(0, LAYER_DIR)
+
+import jwt  # la copia de la capa, no la instalada
+
+LIFESPAN = 300
+MAX_STALE = 3600
+INTERVALO = 30
+
+# Una búsqueda que no espera el refresco tarda mucho menos que esto
+SIN_ESPERA_MS = 50
+
+fallas = []
+
+
+def comprobar(descripcion, condicion, detalle=''):
+    print(f"  {'✅' if condicion else '❌'} {descripcion}{f' ({detalle})' if detalle else ''}")
+    if not condicion:
+        fallas.append(descripcion)
+
+
+class RelojFalso:
+    """Reemplaza time.monotonic en los clientes"""
+
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+    def avanzar(self, segundos):
+        self.ahora += segundos
+
+
+class ServidorJWKS:
+    """JWKS en un hilo aparte; llaves, retraso y falla se cambian en caliente"""
+
+    def __init__(self):
+        self.kids = ['k1']
+        self.retraso = 0.0
+        self.falla = False
+        self.peticiones = 0
+        self._lock = threading.Lock()
+
+        servidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with servidor._lock:
+                    servidor.peticiones += 1
+                time.sleep(servidor.retraso)
+                if servidor.falla:
+                    self.send_error(500)
+                    return
+                cuerpo = json.dumps({'keys': [jwk(kid) for kid in servidor.kids]}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        self.http = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+        self.http.daemon_threads = True
+        self.uri = f"http://127.0.0.1:{self.http.server_port}/.well-known/jwks.json"
+        threading.Thread(target=self.http.serve_forever, daemon=True).start()
+
+    def reiniciar(self):
+        self.kids, self.retraso, self.falla, self.peticiones = ['k1'], 0.0, False, 0
+
+    def cerrar(self):
+        self.http.shutdown()
+        self.http.server_close()
+
+
+def jwk(kid):
+    secreto = f'secreto-{kid}'.encode()
+    return {'kty': 'oct', 'kid': kid, 'use': 'sig', 'alg': 'HS256',
+            'k': base64.urlsafe_b64encode(secreto).rstrip(b'=').decode()}
+
+
+def esperar(condicion, limite=5.0):
+    """Espera (en tiempo real) a que un refresco en segundo plano termine"""
+    fin = time.monotonic() + limite
+    while not condicion() and time.monotonic() < fin:
+        time.sleep(0.01)
+
+
+def en_hilos(funcion, cantidad):
+    """return: lista de (resultado o excepción, milisegundos) de cada hilo"""
+    barrera = threading.Barrier(cantidad)
+    resultados = [None] * cantidad
+
+    def correr(i):
+        barrera.wait()
+        inicio = time.perf_counter()
+        try:
+            resultado = funcion()
+        except Exception as e:
+            resultado = e
+        resultados[i] = (resultado, (time.perf_counter() - inicio) * 1000)
+
+    hilos = [threading.Thread(target=correr, args=(i,)) for i in range(cantidad)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return resultados
+
+
+def kid_de(resultado):
+    return resultado.key_id if isinstance(resultado, jwt.PyJWK) else type(resultado).__name__
+
+
+def nuevo_cliente(clase, servidor, reloj):
+    return clase(servidor.uri, lifespan=LIFESPAN, max_stale=MAX_STALE,
+                 min_refresh_interval=INTERVALO, timeout=5, clock=reloj)
+
+
+def comprobar_hilos(servidor, retraso, concurrencia):
+    print("RefreshingJWKClient (hilos)")
+    servidor.reiniciar()
+    reloj = RelojFalso()
+    cliente = nuevo_cliente(jwt.RefreshingJWKClient, servidor, reloj)
+
+    # Arranque en frío: todos esperan la misma petición
+    servidor.retraso = retraso
+    resultados = en_hilos(lambda: cliente.get_signing_key('k1'), concurrencia)
+    comprobar(f"frío: {concurrencia} hilos, una petición",
+              servidor.peticiones == 1 and all(kid_de(r) == 'k1' for r, _ in resultados),
+              f"{servidor.peticiones} peticiones")
+
+    # Vigentes: del dict, sin red
+    reloj.avanzar(LIFESPAN - 1)
+    for _ in range(1000):
+        cliente.get_signing_key('k1')
+    comprobar("vigentes: 1000 búsquedas sin peticiones", servidor.peticiones == 1)
+
+    # Stale: se sirve la llave vieja mientras un refresco trae la rotada
+    servidor.kids = ['k1', 'k2']
+    reloj.avanzar(2)
+    resultados = en_hilos(lambda: cliente.get_signing_key('k1'), concurrencia)
+    peor = max(ms for _, ms in resultados)
+    comprobar(f"stale: {concurrencia} búsquedas sin esperar el refresco de {retraso * 1000:.0f} ms",
+              peor < SIN_ESPERA_MS and all(kid_de(r) == 'k1' for r, _ in resultados),
+              f"máximo {peor:.2f} ms")
+    esperar(lambda: cliente._flight is None and servidor.peticiones == 2)
+    comprobar("stale: un solo refresco en segundo plano", servidor.peticiones == 2,
+              f"{servidor.peticiones - 1} refrescos")
+    comprobar("stale: la llave rotada aparece sin otra petición",
+              kid_de(cliente.get_signing_key('k2')) == 'k2' and servidor.peticiones == 2)
+
+    # Kid desconocido: un refresco por intervalo, sin importar cuántos lleguen
+    servidor.retraso = 0.0
+    reloj.avanzar(INTERVALO)
+    antes = servidor.peticiones
+    resultados = en_hilos(lambda: cliente.get_signing_key(f'x{threading.get_ident()}'), concurrencia)
+    errores = all(isinstance(r, jwt.PyJWKClientError) for r, _ in resultados)
+    comprobar(f"desconocido: {concurrencia} kids, un refresco y PyJWKClientError",
+              servidor.peticiones - antes == 1 and errores, f"{servidor.peticiones - antes} refrescos")
+    reloj.avanzar(INTERVALO - 1)
+    en_hilos(lambda: cliente.get_signing_key('otro'), concurrencia)
+    comprobar("desconocido: sin refrescos antes del intervalo", servidor.peticiones - antes == 1)
+    reloj.avanzar(1)
+    en_hilos(lambda: cliente.get_signing_key('otro'), concurrencia)
+    comprobar("desconocido: otro refresco al cumplirse el intervalo", servidor.peticiones - antes == 2)
+
+    # Endpoint caído: llaves viejas, reintento por intervalo, error pasado max_stale
+    servidor.falla = True
+    reloj.avanzar(LIFESPAN)
+    antes = servidor.peticiones
+    llave = cliente.get_signing_key('k1')
+    esperar(lambda: cliente._flight is None and servidor.peticiones > antes)
+    comprobar("caído: se sirve la llave vieja y se guarda last_error",
+              llave.key_id == 'k1' and isinstance(cliente.last_error, jwt.PyJWKClientConnectionError))
+    cliente.get_signing_key('k1')
+    comprobar("caído: sin reintento antes del intervalo", servidor.peticiones - antes == 1)
+    reloj.avanzar(INTERVALO)
+    cliente.get_signing_key('k1')
+    esperar(lambda: cliente._flight is None and servidor.peticiones - antes == 2)
+    comprobar("caído: reintento al cumplirse el intervalo", servidor.peticiones - antes == 2)
+    reloj.avanzar(MAX_STALE)
+    try:
+        cliente.get_signing_key('k1')
+        error = None
+    except jwt.PyJWKClientConnectionError as e:
+        error = e
+    comprobar("caído: pasado max_stale se lanza PyJWKClientConnectionError", error is not None)
+
+
+async def comprobar_asyncio(servidor, retraso, concurrencia):
+    print("AsyncRefreshingJWKClient (asyncio)")
+    servidor.reiniciar()
+    reloj = RelojFalso()
+    cliente = nuevo_cliente(jwt.AsyncRefreshingJWKClient, servidor, reloj)
+
+    async def medir(kid):
+        inicio = time.perf_counter()
+        try:
+            resultado = await cliente.get_signing_key(kid)
+        except Exception as e:
+            resultado = e
+        return resultado, (time.perf_counter() - inicio) * 1000
+
+    servidor.retraso = retraso
+    resultados = await asyncio.gather(*(medir('k1') for _ in range(concurrencia)))
+    comprobar(f"frío: {concurrencia} tareas, una petición",
+              servidor.peticiones == 1 and all(kid_de(r) == 'k1' for r, _ in resultados),
+              f"{servidor.peticiones} peticiones")
+
+    servidor.kids = ['k1', 'k2']
+    reloj.avanzar(LIFESPAN + 1)
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(*(medir('k1') for _ in range(concurrencia)))
+    total = (time.perf_counter() - inicio) * 1000
+    comprobar(f"stale: {concurrencia} búsquedas sin esperar el refresco de {retraso * 1000:.0f} ms",
+              total < SIN_ESPERA_MS and all(kid_de(r) == 'k1' for r, _ in resultados),
+              f"{total:.2f} ms en total")
+    while cliente._flight is not None:
+        await asyncio.sleep(0.01)
+    comprobar("stale: un solo refresco y la llave rotada aparece",
+              servidor.peticiones == 2 and kid_de(await cliente.get_signing_key('k2')) == 'k2',
+              f"{servidor.peticiones - 1} refrescos")
+
+    servidor.retraso = 0.0
+    reloj.avanzar(INTERVALO)
+    resultados = await asyncio.gather(*(medir(f'x{i}') for i in range(concurrencia)))
+    comprobar(f"desconocido: {concurrencia} kids, un refresco y PyJWKClientError",
+              servidor.peticiones == 3 and all(isinstance(r, jwt.PyJWKClientError) for r, _ in resultados),
+              f"{servidor.peticiones - 2} refrescos")
+    await asyncio.gather(*(medir('otro') for _ in range(concurrencia)))
+    comprobar("desconocido: sin refrescos antes del intervalo", servidor.peticiones == 3)
+
+    # Cancelar a quien espera no cancela la petición que comparten
+    servidor.reiniciar()
+    servidor.retraso = retraso
+    cliente = nuevo_cliente(jwt.AsyncRefreshingJWKClient, servidor, reloj)
+    cancelada = asyncio.ensure_future(cliente.get_signing_key('k1'))
+    await asyncio.sleep(retraso / 3)
+    cancelada.cancel()
+    llave = await cliente.get_signing_key('k1')
+    comprobar("cancelación: la otra tarea recibe la llave de la misma petición",
+              cancelada.cancelled() and llave.key_id == 'k1' and servidor.peticiones == 1,
+              f"{servidor.peticiones} peticiones")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Comprueba los clientes JWKS con refresco contra un servidor local'
+    )
+    parser.add_argument('--retraso', type=float, default=0.3,
+                        help='Segundos que tarda el JWKS en responder (default: 0.3)')
+    parser.add_argument('--concurrencia', type=int, default=50,
+                        help='Hilos o tareas por comprobación (default: 50)')
+    args = parser.parse_args()
+
+    servidor = ServidorJWKS()
+    print(f"Python {platform.python_version()}, jwt {jwt.__version__} ({LAYER_DIR})")
+    print(f"JWKS en {servidor.uri}, lifespan {LIFESPAN}s, max_stale {MAX_STALE}s, intervalo {INTERVALO}s\n")
+    try:
+        comprobar_hilos(servidor, args.retraso, args.concurrencia)
+        print()
+        asyncio.run(comprobar_asyncio(servidor, args.retraso, args.concurrencia))
+    finally:
+        servidor.cerrar()
+
+    if fallas:
+        print(f"\n❌ {len(fallas)} comprobaciones fallaron")
+        return 1
+    print("\n✅ Todas las comprobaciones pasaron")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
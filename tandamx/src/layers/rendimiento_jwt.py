@@ -0,0 +1,128 @@
+"""
+Microbenchmark de jwt.FastHS256Verifier contra jwt.decode
+
+tokens_verificados usa FastHS256Verifier cuando solo se acepta HS256.
+Este script mide las verificaciones por segundo de los dos caminos con
+la copia de jwt de la capa auth_layer (la misma que carga Lambda), para
+tres casos:
+
+- valido: token como el de generate_token (id, email, exp en 1 hora)
+- expirado: mismo token con exp en el pasado (ExpiredSignatureError)
+- alterado: payload cambiado sin volver a firmar (InvalidSignatureError)
+
+Antes de medir comprueba que los dos regresan lo mismo (claims o tipo y
+mensaje de la excepción) en cada caso. De cada caso reporta la mediana
+de varias corridas; una corrida son --iteraciones verificaciones seguidas.
+Está fuera de auth_layer/ para no subirlo con la capa.
+
+Uso:
+    python rendimiento_jwt.py
+    python rendimiento_jwt.py --corridas 9 --iteraciones 50000
+    python rendimiento_jwt.py --guardar jwt.json
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+import platform
+import statistics
+import timeit
+
+LAYER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'auth_layer', 'python')
+sys.path.insert(0, LAYER_DIR)
+
+import jwt  # la copia de la capa, no la instalada
+
+SECRETO = 'secreto-de-prueba-para-el-benchmark-hs256'
+
+
+def tokens():
+    """return: dict caso -> token"""
+    ahora = int(time.time())
+    claims = {'id': 'usr_20260101000000_a1b2c3', 'email': 'admin@tandamx.com'}
+
+    valido = jwt.encode({**claims, 'exp': ahora + 3600}, SECRETO, algorithm='HS256')
+    expirado = jwt.encode({**claims, 'exp': ahora - 3600}, SECRETO, algorithm='HS256')
+
+    # Otro usuario en el payload con la firma original
+    header, _, firma = valido.split('.')
+    payload = json.dumps({**claims, 'id': 'usr_20260101000000_ffffff', 'exp': ahora + 3600},
+                         separators=(',', ':')).encode()
+    payload = base64.urlsafe_b64encode(payload).rstrip(b'=').decode()
+    alterado = f"{header}.{payload}.{firma}"
+
+    return {'valido': valido, 'expirado': expirado, 'alterado': alterado}
+
+
+def resultado(decodificar, token):
+    """Claims, o (tipo, mensaje) de la excepción, para comparar los dos caminos"""
+    try:
+        return decodificar(token)
+    except jwt.PyJWTError as e:
+        return type(e).__name__, str(e)
+
+
+def ops_por_segundo(decodificar, token, corridas, iteraciones):
+    """return: mediana de verificaciones por segundo"""
+    def una():
+        try:
+            decodificar(token)
+        except jwt.PyJWTError:
+            pass
+
+    tiempos = timeit.repeat(una, number=iteraciones, repeat=corridas)
+    return statistics.median(iteraciones / t for t in tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compara FastHS256Verifier con jwt.decode (verificaciones por segundo)'
+    )
+    parser.add_argument('--corridas', type=int, default=5, help='Corridas por caso (default: 5)')
+    parser.add_argument('--iteraciones', type=int, default=20000,
+                        help='Verificaciones por corrida (default: 20000)')
+    parser.add_argument('--guardar', help='Archivo JSON donde guardar los resultados')
+    args = parser.parse_args()
+
+    verificador = jwt.FastHS256Verifier(SECRETO)
+    caminos = {
+        'jwt.decode': lambda token: jwt.decode(token, SECRETO, algorithms=['HS256']),
+        'FastHS256Verifier': verificador.decode,
+    }
+
+    print(f"Python {platform.python_version()}, jwt {jwt.__version__} ({LAYER_DIR})")
+    print(f"{'caso':<10} {'jwt.decode':>14} {'FastHS256':>14} {'mejora':>8}   resultado")
+
+    resultados = {}
+    for caso, token in tokens().items():
+        esperados = {nombre: resultado(decodificar, token) for nombre, decodificar in caminos.items()}
+        if esperados['jwt.decode'] != esperados['FastHS256Verifier']:
+            print(f"{caso:<10} ❌ resultados distintos: {esperados}")
+            return 1
+
+        ops = {nombre: ops_por_segundo(decodificar, token, args.corridas, args.iteraciones)
+               for nombre, decodificar in caminos.items()}
+        mejora = ops['FastHS256Verifier'] / ops['jwt.decode']
+        salida = esperados['jwt.decode']
+        salida = salida[0] if isinstance(salida, tuple) else 'claims'
+        resultados[caso] = {
+            'jwt_decode_ops': round(ops['jwt.decode']),
+            'fast_hs256_ops': round(ops['FastHS256Verifier']),
+            'mejora': round(mejora, 2),
+            'resultado': salida,
+        }
+        print(f"{caso:<10} {ops['jwt.decode']:>10,.0f} op/s {ops['FastHS256Verifier']:>9,.0f} op/s "
+              f"{mejora:>7.2f}x   {salida}")
+
+    if args.guardar:
+        with open(args.guardar, 'w') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados guardados en {args.guardar}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
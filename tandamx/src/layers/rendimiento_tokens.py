@@ -0,0 +1,164 @@
+"""
+Costo de verificar el token por llamada, antes y después de tokens_verificados
+
+Antes, cada llamada con authorizer decodificaba el mismo token dos veces:
+jwt.decode en lambda_authorizer y otra vez en el extract_user_id del
+handler. Ahora el authorizer usa verificar_token (cache por contenedor) y
+el handler toma el userId de requestContext.authorizer.lambda con
+usuario_del_evento. Este script mide los microsegundos por llamada de los
+dos caminos con la copia de jwt y tokens_verificados de la capa
+auth_layer (la misma que carga Lambda), para tres casos:
+
+- caliente: el mismo token en cada llamada (cache con acierto)
+- frio:     un token distinto en cada llamada, más que MAX_TOKENS, así
+            que el cache siempre falla (peor caso del cache)
+- publica:  ruta sin authorizer; el handler verifica el token él mismo
+            (antes jwt.decode, ahora verificar_token con acierto)
+
+Antes de medir comprueba que los dos caminos regresan el mismo userId. De
+cada caso reporta la mediana de varias corridas; una corrida son
+--iteraciones llamadas seguidas. Está fuera de auth_layer/ para no
+subirlo con la capa.
+
+Uso:
+    python rendimiento_tokens.py
+    python rendimiento_tokens.py --corridas 9 --iteraciones 20000
+    python rendimiento_tokens.py --guardar tokens.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import platform
+import statistics
+import timeit
+
+LAYER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'auth_layer', 'python')
+sys.path.insert(0, LAYER_DIR)
+
+import jwt  # la copia de la capa, no la instalada
+import tokens_verificados
+from tokens_verificados import verificar_token, usuario_del_evento
+
+SECRETO = 'secreto-de-prueba-para-el-benchmark-hs256'
+
+
+def token_de(numero):
+    """Token como el de generate_token (id, email, exp en 1 hora)"""
+    claims = {'id': f'usr_20260101000000_{numero:06x}', 'email': 'admin@tandamx.com',
+              'exp': int(time.time()) + 3600}
+    return jwt.encode(claims, SECRETO, algorithm='HS256')
+
+
+def evento(token, con_authorizer):
+    """Evento HTTP API 2.0 con el header y, si aplica, el contexto del authorizer"""
+    event = {'headers': {'authorization': f'Bearer {token}'}, 'requestContext': {}}
+    if con_authorizer:
+        claims = jwt.decode(token, SECRETO, algorithms=['HS256'])
+        event['requestContext']['authorizer'] = {
+            'lambda': {'userId': claims['id'], 'email': claims['email']}
+        }
+    return event
+
+
+# Camino anterior (lambda_authorizer y extract_user_id antes del cache)
+def authorizer_antes(event):
+    token = event['headers']['authorization'].replace('Bearer ', '')
+    return jwt.decode(token, SECRETO, algorithms=['HS256']).get('id')
+
+
+def extract_user_id_antes(event):
+    try:
+        auth_header = event['headers'].get('Authorization') or event['headers'].get('authorization')
+        if not auth_header:
+            return None
+        token = auth_header.replace('Bearer ', '')
+        payload = jwt.decode(token, SECRETO, algorithms=['HS256'])
+        return payload['id']
+    except Exception:
+        return None
+
+
+# Camino actual
+def authorizer_despues(event):
+    token = event['headers']['authorization'].replace('Bearer ', '')
+    return verificar_token(token, SECRETO).get('id')
+
+
+def extract_user_id_despues(event):
+    return usuario_del_evento(event, SECRETO)
+
+
+def llamada(authorizer, handler, con_authorizer):
+    """return: función que atiende una llamada (authorizer si aplica + handler)"""
+    if con_authorizer:
+        def atender(event):
+            authorizer(event)
+            return handler(event)
+    else:
+        atender = handler
+    return atender
+
+
+def microsegundos(atender, eventos, corridas, iteraciones):
+    """return: mediana de microsegundos por llamada"""
+    siguiente = itertools.cycle(eventos).__next__
+    tiempos = timeit.repeat(lambda: atender(siguiente()), number=iteraciones, repeat=corridas)
+    return statistics.median(t / iteraciones * 1e6 for t in tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compara el costo por llamada de verificar el token antes y después del cache'
+    )
+    parser.add_argument('--corridas', type=int, default=5, help='Corridas por caso (default: 5)')
+    parser.add_argument('--iteraciones', type=int, default=10000,
+                        help='Llamadas por corrida (default: 10000)')
+    parser.add_argument('--guardar', help='Archivo JSON donde guardar los resultados')
+    args = parser.parse_args()
+
+    caliente = token_de(1)
+    # Más tokens que entradas del LRU: recorrerlos en orden siempre falla
+    frios = [token_de(n) for n in range(tokens_verificados.MAX_TOKENS * 2)]
+    casos = {
+        'caliente': ([evento(caliente, True)], True),
+        'frio': ([evento(t, True) for t in frios], True),
+        'publica': ([evento(caliente, False)], False),
+    }
+
+    print(f"Python {platform.python_version()}, jwt {jwt.__version__}, "
+          f"cache de {tokens_verificados.MAX_TOKENS} tokens ({LAYER_DIR})")
+    print(f"{'caso':<10} {'antes':>12} {'después':>12} {'mejora':>8}")
+
+    resultados = {}
+    for caso, (eventos, con_authorizer) in casos.items():
+        antes = llamada(authorizer_antes, extract_user_id_antes, con_authorizer)
+        despues = llamada(authorizer_despues, extract_user_id_despues, con_authorizer)
+        for event in eventos[:3]:
+            if antes(event) != despues(event):
+                print(f"{caso:<10} ❌ userId distinto: {antes(event)} vs {despues(event)}")
+                return 1
+
+        tokens_verificados._verificadores.clear()
+        us_antes = microsegundos(antes, eventos, args.corridas, args.iteraciones)
+        us_despues = microsegundos(despues, eventos, args.corridas, args.iteraciones)
+        mejora = us_antes / us_despues
+        resultados[caso] = {
+            'antes_us': round(us_antes, 2),
+            'despues_us': round(us_despues, 2),
+            'mejora': round(mejora, 1)
+        }
+        print(f"{caso:<10} {us_antes:>9.2f} us {us_despues:>9.2f} us {mejora:>7.1f}x")
+
+    if args.guardar:
+        with open(args.guardar, 'w') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados guardados en {args.guardar}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -15,6 +15,93 @@ variable "app_url" {
   default = "http://localhost:3000"
 }
 
+variable "dynamo_max_concurrencia" {
+  description = "Máximo de consultas DynamoDB en paralelo por invocación (listado de tandas)"
+  type        = number
+  default     = 8
+}
+
+variable "sms_tasa_por_segundo" {
+  description = "Máximo de SMS por segundo en el envío masivo (cuota de SNS de la cuenta)"
+  type        = number
+  default     = 20
+}
+
+variable "sms_max_workers" {
+  description = "Hilos concurrentes para publicar SMS en el envío masivo"
+  type        = number
+  default     = 10
+}
+
+variable "reconciliacion_schedule" {
+  description = "Expresión cron (EventBridge) de la reconciliación de estadísticas precalculadas"
+  type        = string
+  default     = "cron(0 9 * * ? *)"
+}
+
+variable "vistas_stream_batch_size" {
+  description = "Registros del stream por invocación de lambda_vistas"
+  type        = number
+  default     = 100
+}
+
+variable "recordatorios_worker_concurrencia" {
+  description = "Máximo de invocaciones concurrentes del worker de recordatorios (mínimo 2)"
+  type        = number
+  default     = 2
+}
+
+variable "auth_lambda_memory" {
+  description = <<-EOT
+    Memoria de lambda_auth en MB. El CPU, y con él el tiempo del hash de
+    contraseñas, escala con ella (1769 MB = un vCPU, lo más que usa scrypt
+    con p=1). scrypt con el costo mínimo (n=2^17, 128 MB) necesita al
+    menos 512 MB. Ver password_hash_costo para el tiempo por login.
+  EOT
+  type        = number
+  default     = 1024
+
+  validation {
+    condition     = var.auth_lambda_memory >= 512 && var.auth_lambda_memory <= 10240
+    error_message = "auth_lambda_memory debe estar entre 512 y 10240 MB (scrypt con n=2^17 usa 128 MB)."
+  }
+}
+
+variable "password_hash_algoritmo" {
+  description = "Hash de contraseñas: scrypt o pbkdf2-sha256"
+  type        = string
+  default     = "scrypt"
+
+  validation {
+    condition     = contains(["scrypt", "pbkdf2-sha256"], var.password_hash_algoritmo)
+    error_message = "password_hash_algoritmo debe ser scrypt o pbkdf2-sha256."
+  }
+}
+
+variable "password_hash_costo" {
+  description = <<-EOT
+    log2(n) de scrypt (mínimo 17) o iteraciones de PBKDF2 (mínimo 600000;
+    cambiarlo junto con password_hash_algoritmo). Fijo por despliegue: el
+    login no calibra, calibrar_hash.py mide el tiempo por memoria.
+
+    Compromiso latencia/seguridad: el login tiene un objetivo de ~50 ms
+    por hash (p95 del endpoint), pero ningún costo que cumpla el mínimo de
+    OWASP cabe ahí. Con scrypt ln=17 cada login (y cada 401) paga un hash
+    de ~540 ms con un vCPU (1769 MB), ~0.9 s con 1024 MB y ~1.9 s con
+    512 MB (el CPU escala con la memoria; medir en Lambda con
+    calibrar_hash.py). Se prioriza el mínimo de seguridad sobre el p95 del
+    login; para acercarse al objetivo, subir auth_lambda_memory hasta 1769.
+  EOT
+  type        = string
+  default     = "17"
+}
+
+variable "password_hash_objetivo_ms" {
+  description = "Tiempo objetivo por hash de contraseña en ms; solo lo usa calibrar_hash.py para marcar los costos que se pasan"
+  type        = number
+  default     = 50
+}
+
 # ============================================================================
 # Variables de Configuración para Sistema de Backup DynamoDB
 # ============================================================================
@@ -60,6 +147,10 @@ variable "tables_config" {
       - sk: Nombre del atributo que es sort key (opcional)
       - attributes: Lista de atributos a incluir en backup (opcional, default: todos)
       - target_name: Nombre destino al restaurar (opcional, default: mismo nombre)
+      - delta_source: Origen de los backups incrementales (opcional):
+          "stream"    = archivo del DynamoDB Stream (incluye eliminaciones)
+          "updatedAt" = Scan filtrado por updatedAt/createdAt (sin eliminaciones)
+          null        = la tabla siempre se respalda completa
     
     Ejemplo:
       [{
@@ -71,46 +162,98 @@ variable "tables_config" {
   EOT
   
   type = list(object({
-    name       = string
-    pk         = string
-    sk         = optional(string)
-    attributes = optional(list(string))
+    name         = string
+    pk           = string
+    sk           = optional(string)
+    attributes   = optional(list(string))
+    delta_source = optional(string)
   }))
   
   default = [
     {
-      name = "tandas"
-      pk   = "id"
-      sk   = null
+      name         = "tandas"
+      pk           = "id"
+      sk           = null
+      delta_source = "stream"
     },
     {
-      name = "participantes"
-      pk   = "id"
-      sk   = "participanteId"
+      name         = "participantes"
+      pk           = "id"
+      sk           = "participanteId"
+      delta_source = "stream"
     },
     {
-      name = "pagos"
-      pk   = "id"
-      sk   = "pagoId"
+      name         = "pagos"
+      pk           = "id"
+      sk           = "pagoId"
+      delta_source = "stream"
     },
     {
-      name = "links_registro"
-      pk   = "token"
-      sk   = null
+      name         = "links_registro"
+      pk           = "token"
+      sk           = null
+      delta_source = "stream"
     },
     {
-      name = "notificaciones"
-      pk   = "id"
-      sk   = null
+      # Legado: solo respaldos completos hasta retirarla
+      name         = "notificaciones"
+      pk           = "id"
+      sk           = null
+      delta_source = null
     },
     {
-      name = "usuarios_admin"
-      pk   = "id"
-      sk   = null
+      name         = "notificaciones_v2"
+      pk           = "id"
+      sk           = "notificacionId"
+      delta_source = "stream"
+    },
+    {
+      name         = "usuarios_admin"
+      pk           = "id"
+      sk           = null
+      delta_source = "stream"
     },
   ]
 }
 
+variable "incremental_backup_schedule" {
+  description = <<-EOT
+    Expresión cron para los backups incrementales (mode = incremental).
+    Cada ejecución respalda solo los cambios desde el último backup de
+    cada tabla con delta_source. Dejar vacío para deshabilitarlos.
+  EOT
+  type        = string
+  default     = "cron(0 2 ? * MON-SAT *)"
+}
+
+variable "verify_backup_schedule" {
+  description = <<-EOT
+    Expresión cron para verificar el último backup de cada tabla
+    (checksums, conteos y una muestra contra la tabla, sin restaurar).
+    Dejar vacío para deshabilitarla.
+  EOT
+  type        = string
+  default     = "cron(0 5 ? * SUN *)"
+}
+
+variable "verify_sample_size" {
+  description = "Items por tabla que la verificación compara con la tabla en vivo (0 = sin muestreo)"
+  type        = number
+  default     = 100
+}
+
+variable "stream_archive_batch_size" {
+  description = "Registros del stream por archivo en S3 (archivador de backups incrementales)"
+  type        = number
+  default     = 1000
+}
+
+variable "stream_archive_retention_days" {
+  description = "Días que se conserva el archivo de streams (debe cubrir el intervalo entre backups)"
+  type        = number
+  default     = 35
+}
+
 variable "retention_days" {
   description = <<-EOT
     Número de días que los backups permanecen en S3 Standard antes
@@ -168,6 +311,79 @@ variable "lambda_memory" {
   }
 }
 
+variable "backup_max_parallel_tables" {
+  description = <<-EOT
+    Tablas que la Lambda de backup respalda al mismo tiempo (la más
+    grande primero). Cada tabla en curso guarda en memoria una parte
+    comprimida: subir lambda_memory si se aumenta mucho.
+  EOT
+  type        = number
+  default     = 4
+
+  validation {
+    condition     = var.backup_max_parallel_tables >= 1 && var.backup_max_parallel_tables <= 16
+    error_message = "backup_max_parallel_tables debe estar entre 1 y 16."
+  }
+}
+
+variable "backup_table_timeout" {
+  description = <<-EOT
+    Tiempo máximo en segundos para respaldar una tabla; al pasarlo la
+    tabla se reporta como error y no se sube su manifest.
+    0 = sin límite propio (solo el timeout de la Lambda).
+  EOT
+  type        = number
+  default     = 0
+
+  validation {
+    condition     = var.backup_table_timeout >= 0 && var.backup_table_timeout <= 900
+    error_message = "backup_table_timeout debe estar entre 0 y 900 segundos."
+  }
+}
+
+variable "parquet_export_tables" {
+  description = <<-EOT
+    Tablas que el backup completo además exporta a Parquet para análisis,
+    con la columna de fecha (ISO 8601) por cuyo mes se particionan.
+    Vacío ({}) por default: la exportación se habilita por ambiente, p. ej.
+      parquet_export_tables = {
+        pagos         = "fechaPago"
+        participantes = "createdAt"
+        tandas        = "createdAt"
+      }
+    Cada partición se guarda comprimida en /tmp mientras dura el scan;
+    ajustar backup_ephemeral_storage al tamaño de las tablas exportadas.
+  EOT
+  type        = map(string)
+  default     = {}
+}
+
+variable "backup_ephemeral_storage" {
+  description = "Almacenamiento /tmp de la Lambda de backup en MB (temporales de la exportación Parquet)"
+  type        = number
+  default     = 512
+
+  validation {
+    condition     = var.backup_ephemeral_storage >= 512 && var.backup_ephemeral_storage <= 10240
+    error_message = "El almacenamiento efímero debe estar entre 512 y 10240 MB."
+  }
+}
+
+variable "parquet_export_retention_days" {
+  description = "Días que se conserva cada exportación Parquet (analytics/)"
+  type        = number
+  default     = 90
+}
+
+variable "parquet_layer_arn" {
+  description = <<-EOT
+    ARN de un Lambda layer con pyarrow (por ejemplo AWS SDK for pandas)
+    para escribir Parquet con snappy. Vacío = escritor en Python puro.
+  EOT
+  type        = string
+  default     = ""
+}
+
 variable "enable_s3_replication" {
   description = "Habilitar replicación cross-region de backups a región secundaria"
   type        = bool